@@ -0,0 +1,63 @@
+"""
+privileged_helper.py: Build the Privileged Helper Tool if the prebuilt binary is out of date
+"""
+
+import re
+import subprocess
+
+from pathlib import Path
+
+from oclp_r.support import subprocess_wrapper
+
+
+class GeneratePrivilegedHelper:
+    """
+    Generate com.sumitduster.oclp-r.privileged-helper
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize
+        """
+        self._source_folder = Path("./ci_tooling/privileged_helper_tool")
+        self._helper_output = self._source_folder / "com.sumitduster.oclp-r.privileged-helper"
+
+
+    def _source_version(self) -> str:
+        """
+        UTILITY_VERSION of main.m
+        """
+        return re.search(r'#define UTILITY_VERSION "(.+?)"', (self._source_folder / "main.m").read_text()).group(1)
+
+
+    def _helper_version(self) -> str:
+        """
+        Version reported by the built helper, None if missing or unable to launch
+        '--version' is answered before any signature checks, thus works unsigned
+        """
+        if not self._helper_output.exists():
+            return None
+        try:
+            result = subprocess.run([self._helper_output, "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            return None
+        return result.stdout.decode().strip() if result.returncode == 0 else None
+
+
+    def generate(self) -> None:
+        """
+        Rebuild the helper when it predates main.m (ie. lacks session mode, 1.1.0)
+
+        A debug build ('make debug') of the current version is kept as is
+        """
+        source_version = self._source_version()
+        helper_version = self._helper_version()
+        if helper_version == source_version:
+            print(f"Privileged Helper Tool is up to date (v{helper_version})")
+            return
+
+        print(f"Building Privileged Helper Tool v{source_version} (prebuilt: v{helper_version})")
+        subprocess_wrapper.run_and_verify(["/usr/bin/make", "-C", self._source_folder, "all"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        if self._helper_version() != source_version:
+            raise Exception(f"Privileged Helper Tool reports v{self._helper_version()} after building v{source_version}")
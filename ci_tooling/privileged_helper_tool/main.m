@@ -8,13 +8,27 @@
     Server and client must have the same signing
     certificate in order to run commands.
     ------------------------------------------------
+    Session mode ('--session') authenticates the
+    client once, then executes length-prefixed JSON
+    requests read from stdin, writing responses to
+    stdout:
+        Request:  {"Command": str, "Arguments": [str],
+                   "Directory": str, "MergeOutput": bool}
+        Response: {"ReturnCode": int,
+                   "Stdout": base64, "Stderr": base64}
+    Lengths are 32-bit big endian. The session ends
+    when the client closes stdin.
+    ------------------------------------------------
 */
 
 #import <Foundation/Foundation.h>
 #import <Security/Security.h>
 #include <libproc.h>
+#include <arpa/inet.h>
+
+#define UTILITY_VERSION "1.1.0"
 
-#define UTILITY_VERSION "1.0.0"
+#define SESSION_MAX_MESSAGE_SIZE (16 * 1024 * 1024)
 
 #define VALID_CLIENT_TEAM_ID @"S74BDJXQMD"
 
@@ -71,6 +85,157 @@ BOOL isSBitSet(NSString *path) {
 }
 
 
+BOOL readExactly(int fd, void *buffer, size_t length) {
+    size_t offset = 0;
+    while (offset < length) {
+        ssize_t count = read(fd, (char *)buffer + offset, length - offset);
+        if (count < 0 && errno == EINTR) {
+            continue;
+        }
+        if (count <= 0) {
+            return NO;
+        }
+        offset += count;
+    }
+    return YES;
+}
+
+BOOL writeExactly(int fd, const void *buffer, size_t length) {
+    size_t offset = 0;
+    while (offset < length) {
+        ssize_t count = write(fd, (const char *)buffer + offset, length - offset);
+        if (count < 0 && errno == EINTR) {
+            continue;
+        }
+        if (count <= 0) {
+            return NO;
+        }
+        offset += count;
+    }
+    return YES;
+}
+
+NSDictionary *readSessionMessage(void) {
+    uint32_t length = 0;
+    if (!readExactly(STDIN_FILENO, &length, sizeof(length))) {
+        return nil;
+    }
+    length = ntohl(length);
+    if (length > SESSION_MAX_MESSAGE_SIZE) {
+        return nil;
+    }
+
+    NSMutableData *data = [NSMutableData dataWithLength:length];
+    if (!readExactly(STDIN_FILENO, [data mutableBytes], length)) {
+        return nil;
+    }
+
+    id message = [NSJSONSerialization JSONObjectWithData:data options:0 error:nil];
+    if (![message isKindOfClass:[NSDictionary class]]) {
+        return nil;
+    }
+    return message;
+}
+
+BOOL writeSessionMessage(NSDictionary *message) {
+    NSData *data = [NSJSONSerialization dataWithJSONObject:message options:0 error:nil];
+    if (data == nil) {
+        return NO;
+    }
+    uint32_t length = htonl((uint32_t)[data length]);
+    return writeExactly(STDOUT_FILENO, &length, sizeof(length)) && writeExactly(STDOUT_FILENO, [data bytes], [data length]);
+}
+
+NSDictionary *sessionResponse(int returnCode, NSData *standardOutput, NSData *standardError) {
+    return @{
+        @"ReturnCode": @(returnCode),
+        @"Stdout": [standardOutput base64EncodedStringWithOptions:0],
+        @"Stderr": [standardError base64EncodedStringWithOptions:0],
+    };
+}
+
+NSDictionary *runSessionRequest(NSDictionary *request) {
+    NSString *command = request[@"Command"];
+    NSArray *arguments = request[@"Arguments"];
+    NSString *directory = request[@"Directory"];
+    BOOL mergeOutput = [request[@"MergeOutput"] isEqual:@YES];
+
+    if (![command isKindOfClass:[NSString class]] || ![arguments isKindOfClass:[NSArray class]]) {
+        return sessionResponse(OCLP_PHT_ERROR_MISSING_ARGUMENTS, [NSData data], [NSData data]);
+    }
+    for (id argument in arguments) {
+        if (![argument isKindOfClass:[NSString class]]) {
+            return sessionResponse(OCLP_PHT_ERROR_MISSING_ARGUMENTS, [NSData data], [NSData data]);
+        }
+    }
+
+    // Verify command exists
+    if (![[NSFileManager defaultManager] fileExistsAtPath:command]) {
+        return sessionResponse(OCLP_PHT_ERROR_COMMAND_MISSING, [NSData data], [NSData data]);
+    }
+
+    NSPipe *outputPipe = [NSPipe pipe];
+    NSPipe *errorPipe = mergeOutput ? outputPipe : [NSPipe pipe];
+
+    NSTask *task = [[NSTask alloc] init];
+    [task setLaunchPath:command];
+    [task setArguments:arguments];
+    if ([directory isKindOfClass:[NSString class]]) {
+        [task setCurrentDirectoryPath:directory];
+    }
+    // stdin carries the session, commands must not read from it
+    [task setStandardInput:[NSFileHandle fileHandleWithNullDevice]];
+    [task setStandardOutput:outputPipe];
+    [task setStandardError:errorPipe];
+
+    @try {
+        [task launch];
+    } @catch (NSException *exception) {
+        return sessionResponse(OCLP_PHT_ERROR_COMMAND_FAILED, [NSData data], [[exception reason] dataUsingEncoding:NSUTF8StringEncoding]);
+    }
+
+    // Drain stderr in the background, so neither pipe can fill and stall the command
+    NSMutableData *errorData = [NSMutableData data];
+    dispatch_group_t group = dispatch_group_create();
+    if (!mergeOutput) {
+        NSFileHandle *errorHandle = [errorPipe fileHandleForReading];
+        dispatch_group_async(group, dispatch_get_global_queue(DISPATCH_QUEUE_PRIORITY_DEFAULT, 0), ^{
+            [errorData appendData:[errorHandle readDataToEndOfFile]];
+        });
+    }
+    NSData *outputData = [[outputPipe fileHandleForReading] readDataToEndOfFile];
+    dispatch_group_wait(group, DISPATCH_TIME_FOREVER);
+
+    // Release descriptors now, long sessions would otherwise exhaust them
+    [[outputPipe fileHandleForReading] closeFile];
+    if (!mergeOutput) {
+        [[errorPipe fileHandleForReading] closeFile];
+    }
+
+    [task waitUntilExit];
+    return sessionResponse([task terminationStatus], outputData, errorData);
+}
+
+int runSession(void) {
+    if (!writeSessionMessage(@{@"Version": @UTILITY_VERSION})) {
+        return OCLP_PHT_ERROR_CATCH_ALL;
+    }
+
+    while (true) {
+        @autoreleasepool {
+            NSDictionary *request = readSessionMessage();
+            if (request == nil) {
+                // Client closed the session
+                return 0;
+            }
+            if (!writeSessionMessage(runSessionRequest(request))) {
+                return OCLP_PHT_ERROR_CATCH_ALL;
+            }
+        }
+    }
+}
+
+
 int main(int argc, const char * argv[]) {
     @autoreleasepool {
         // We simply return if no arguments are passed
@@ -125,6 +290,10 @@ int main(int argc, const char * argv[]) {
         }
         #endif
 
+        if (argc == 2 && strcmp(argv[1], "--session") == 0) {
+            return runSession();
+        }
+
         NSString *command = nil;
         NSArray *arguments = @[];
         if (argc == 2) {
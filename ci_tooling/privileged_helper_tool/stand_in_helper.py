@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+stand_in_helper.py: Unprivileged stand-in for the Privileged Helper Tool
+
+Mirrors main.m's command line and session protocol, without the set UID
+and code signature checks, so subprocess_wrapper's sessions can be
+exercised and benchmarked on any host (ie. Linux CI). Commands run as
+the invoking user.
+
+Usage:
+    $ ./stand_in_helper.py /bin/ls -l
+    $ ./stand_in_helper.py --session
+"""
+
+import os
+import sys
+import json
+import base64
+import struct
+import subprocess
+
+
+UTILITY_VERSION = "1.1.0"
+
+SESSION_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+OCLP_PHT_ERROR_MISSING_ARGUMENTS = 160
+OCLP_PHT_ERROR_COMMAND_MISSING   = 168
+OCLP_PHT_ERROR_COMMAND_FAILED    = 169
+OCLP_PHT_ERROR_CATCH_ALL         = 170
+
+
+def _read_exactly(length: int) -> bytes:
+    data = sys.stdin.buffer.read(length)
+    if len(data) < length:
+        return None
+    return data
+
+
+def _read_session_message() -> dict:
+    header = _read_exactly(4)
+    if header is None:
+        return None
+    length = struct.unpack(">I", header)[0]
+    if length > SESSION_MAX_MESSAGE_SIZE:
+        return None
+    data = _read_exactly(length)
+    if data is None:
+        return None
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
+
+
+def _write_session_message(message: dict) -> None:
+    data = json.dumps(message).encode()
+    sys.stdout.buffer.write(struct.pack(">I", len(data)) + data)
+    sys.stdout.buffer.flush()
+
+
+def _session_response(return_code: int, output: bytes = b"", error: bytes = b"") -> dict:
+    return {
+        "ReturnCode": return_code,
+        "Stdout":     base64.b64encode(output).decode(),
+        "Stderr":     base64.b64encode(error).decode(),
+    }
+
+
+def _run_session_request(request: dict) -> dict:
+    command   = request.get("Command")
+    arguments = request.get("Arguments")
+    directory = request.get("Directory")
+
+    if not isinstance(command, str) or not isinstance(arguments, list) or not all(isinstance(argument, str) for argument in arguments):
+        return _session_response(OCLP_PHT_ERROR_MISSING_ARGUMENTS)
+    if not os.path.exists(command):
+        return _session_response(OCLP_PHT_ERROR_COMMAND_MISSING)
+
+    try:
+        # stdin carries the session, commands must not read from it
+        result = subprocess.run(
+            [command, *arguments],
+            cwd=directory if isinstance(directory, str) else None,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if request.get("MergeOutput") is True else subprocess.PIPE,
+        )
+    except OSError as e:
+        return _session_response(OCLP_PHT_ERROR_COMMAND_FAILED, error=str(e).encode())
+
+    return _session_response(result.returncode, result.stdout, result.stderr or b"")
+
+
+def _run_session() -> int:
+    _write_session_message({"Version": UTILITY_VERSION})
+    while True:
+        request = _read_session_message()
+        if request is None:
+            # Client closed the session
+            return 0
+        _write_session_message(_run_session_request(request))
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        return OCLP_PHT_ERROR_MISSING_ARGUMENTS
+
+    if len(sys.argv) == 2 and sys.argv[1] in ["--version", "-v"]:
+        print(UTILITY_VERSION)
+        return 0
+
+    if len(sys.argv) == 2 and sys.argv[1] == "--session":
+        return _run_session()
+
+    if not os.path.exists(sys.argv[1]):
+        return OCLP_PHT_ERROR_COMMAND_MISSING
+
+    # Output is inherited, as with NSTask
+    return subprocess.run(sys.argv[1:]).returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,8 +12,6 @@ from pathlib import Path
 
 from . import constants
 
-from .wx_gui import gui_entry
-
 from .detections import (
     device_probe,
     os_probe
@@ -25,7 +23,9 @@ from .support import (
     reroute_payloads,
     commit_info,
     logging_handler,
-    analytics_handler
+    analytics_handler,
+    global_settings,
+    updates
 )
 
 
@@ -42,6 +42,9 @@ class OpenCoreLegacyPatcher:
         self._generate_base_data()
 
         if utilities.check_cli_args() is None:
+            # Only load wxPython once we know a window will be shown,
+            # CLI and login invocations should not pay for it
+            from .wx_gui import gui_entry
             gui_entry.EntryPoint(self.constants).start()
 
 
@@ -59,6 +62,19 @@ class OpenCoreLegacyPatcher:
             logging.warning(f"Current working directory was invalid, switched to: {_test_dir}")
 
 
+    def _should_prefetch_updates(self) -> bool:
+        """
+        Determine whether this session will check for updates
+
+        Only the GUI and the login auto-patcher do
+        """
+        if "--auto_patch" in sys.argv:
+            return True
+        if utilities.check_cli_args() is not None:
+            return False
+        return global_settings.GlobalEnviromentSettings().read_property("IgnoreAppUpdates") is not True
+
+
     def _generate_base_data(self) -> None:
         """
         Generate base data required for the patcher to run
@@ -69,6 +85,10 @@ class OpenCoreLegacyPatcher:
         # Ensure we live after parent process dies (ie. LaunchAgent)
         os.setpgrp()
 
+        # Check for updates in the background, ready by the time a dialog would show
+        if self.constants.special_build is False and self._should_prefetch_updates():
+            updates.prefetch_latest_release()
+
         # Generate OS data
         os_data = os_probe.OSProbe()
         self.constants.detected_os = os_data.detect_kernel_major()
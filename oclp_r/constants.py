@@ -150,6 +150,7 @@ class Constants:
         self.needs_to_open_preferences: bool = False  # Determine if preferences need to be opened
         self.host_is_hackintosh:        bool = False  # Determine if host is Hackintosh
         self.should_nuke_kdks:          bool = True  #  Determine if KDKs should be nuked if unused in /L*/D*/KDKs
+        self.fast_media_verify:         bool = False  # Only sample large files when verifying flashed installer media
         self.launcher_binary:            str = None  #  Determine launch binary path (ie. Python vs PyInstaller)
         self.launcher_script:            str = None  #  Determine launch file path   (None if PyInstaller)
         self.booted_oc_disk:             str = None  #  Determine current disk OCLP booted from
@@ -170,6 +171,9 @@ class Constants:
         self.showpicker:     bool = True  # Show or Hide OpenCore's Boot Picker
         self.nvram_write:    bool = True  # Write to hardware NVRAM
         self.oc_timeout:      int = 5  #    Set OpenCore timeout
+        self.efi_materialization: str = "clone"  # Payload materialization for builds: 'clone', 'hardlink' or 'copy'
+        self.efi_dry_run:        bool = False    # Build and validate the EFI in memory, without writing the build folder
+        self.efi_build_cache:    bool = True     # Reuse the stored result of a previous build with identical inputs
 
         ## Kext Settings
         self.kext_debug:  bool = False  # Enables Lilu debug and DebugEnhancer
@@ -275,6 +279,10 @@ class Constants:
     def payload_local_binaries_root_path_dmg(self):
         return self.original_path / Path("Universal-Binaries.dmg")
 
+    @property
+    def payload_local_binaries_index_path(self):
+        return self.original_path / Path("Universal-Binaries.index.json")
+
     @property
     def overlay_psp_path_dmg(self):
         return self.original_path / Path("sumitdusterInternalResources.dmg")
@@ -362,6 +370,10 @@ class Constants:
     def installer_sh_path(self):
         return self.payload_path / Path("Installer.sh")
 
+    @property
+    def installer_progress_log_path(self):
+        return self.payload_path / Path("Installer-Progress.log")
+
     # Kexts
     @property
     def payload_kexts_path(self):
@@ -657,6 +669,14 @@ class Constants:
     def build_path(self):
         return self.current_path / Path("Build-Folder/")
 
+    @property
+    def efi_build_profile_path(self):
+        return self.build_path / Path("OpenCore-Build-Profile.json")
+
+    @property
+    def payload_store_path(self):
+        return self.current_path / Path("Payload-Store/")
+
     @property
     def opencore_release_folder(self):
         return self.build_path / Path(f"OpenCore-Build")
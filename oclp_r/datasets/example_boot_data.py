@@ -0,0 +1,118 @@
+"""
+example_boot_data.py: Sample boot states, for use in OCLP-R validation
+"""
+
+from ..detections.boot_state import BootState
+
+
+class Sonoma:
+
+    # OpenCore booted, SIP, SecureBootModel and FileVault left enabled
+    Stock = BootState(
+        nvram={
+            "boot-args": "keepsyms=1 debug=0x100",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version": b"2.0.0\x00",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:opencore-version": b"REL-101-2024-07-01",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:HardwareModel": b"j137ap\x00\x00",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:AppleSecureBootPolicy": b"\x02",
+        },
+        sysctl={
+            "kern.osrelease": "23.6.0",
+            "kern.osversion": "23G93",
+            "kern.osproductversion": "14.6.1",
+            "sysctl.proc_translated": "0",
+        },
+        chosen={
+            "apfs-preboot-uuid": b"6A0B5D62-1D0C-4F3E-A2D7-5C5C1F8E9B21\x00",
+        },
+        sip_status=0x0,
+        filevault=True,
+    )
+
+    # Booted with the settings root patching requires
+    Root_Patch_Ready = BootState(
+        nvram={
+            "boot-args": "keepsyms=1 debug=0x100 -lilubetaall amfi=0x80",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version": b"2.0.0\x00",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Settings": b"-allow_amfi -allow_fv\x00",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:opencore-version": b"REL-101-2024-07-01",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Spoofed-SN": b"C02TEST0XXXX\x00",
+        },
+        sysctl={
+            "kern.osrelease": "23.6.0",
+            "kern.osversion": "23G93",
+            "kern.osproductversion": "14.6.1",
+            "sysctl.proc_translated": "0",
+        },
+        chosen={
+            "apfs-preboot-uuid": b"6A0B5D62-1D0C-4F3E-A2D7-5C5C1F8E9B21\x00",
+        },
+        sip_status=0x803,
+        filevault=True,
+    )
+
+    # AMFIPass loaded, AMFI itself left enabled
+    AMFIPass = BootState(
+        nvram={
+            "boot-args": "keepsyms=1 debug=0x100 -lilubetaall",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version": b"2.0.0\x00",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Settings": b"-allow_fv\x00",
+        },
+        sysctl={
+            "kern.osrelease": "23.6.0",
+            "kern.osversion": "23G93",
+            "kern.osproductversion": "14.6.1",
+            "sysctl.proc_translated": "0",
+        },
+        sip_status=0x803,
+        filevault=False,
+        kexts={
+            "com.dhinakg.AMFIPass": "1.4.1",
+        },
+    )
+
+
+class BigSur:
+
+    # NVIDIA Web Drivers, booted without the boot-args they require
+    NVIDIA_Web_Drivers_Missing_Args = BootState(
+        nvram={
+            "boot-args": "keepsyms=1 debug=0x100 amfi=0x80",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version": b"2.0.0\x00",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:HardwareModel": b"x86legacyap\x00",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:AppleSecureBootPolicy": b"\x00",
+        },
+        sysctl={
+            "kern.osrelease": "20.6.0",
+            "kern.osversion": "20G1427",
+            "kern.osproductversion": "11.7.10",
+            "sysctl.proc_translated": "0",
+        },
+        sip_status=0xA03,
+        filevault=False,
+        kexts={
+            "as.vit9696.WhateverGreen": "1.6.7",
+        },
+    )
+
+    # NVIDIA Web Drivers, with their boot-args and nvda_drv set
+    NVIDIA_Web_Drivers = BootState(
+        nvram={
+            "boot-args": "keepsyms=1 debug=0x100 amfi=0x80 ngfxgl=1 ngfxcompat=1",
+            "nvda_drv": b"1\x00",
+            "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version": b"2.0.0\x00",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:HardwareModel": b"x86legacyap\x00",
+            "94B73556-2197-4702-82A8-3E1337DAFBFB:AppleSecureBootPolicy": b"\x00",
+        },
+        sysctl={
+            "kern.osrelease": "20.6.0",
+            "kern.osversion": "20G1427",
+            "kern.osproductversion": "11.7.10",
+            "sysctl.proc_translated": "0",
+        },
+        sip_status=0xA03,
+        filevault=False,
+        kexts={
+            "as.vit9696.WhateverGreen": "1.6.7",
+        },
+    )
@@ -0,0 +1,76 @@
+"""
+example_disk_data.py: Recorded diskutil output, for use in OCLP-R validation
+"""
+
+from ..support.disk_inventory import RecordedDiskutil
+
+
+class MacBookPro:
+
+    # Internal SSD, with USB drives, an SD card and an optical drive attached
+    #   disk0: Internal SSD, ESP and APFS
+    #   disk2: USB drive, ESP and exFAT
+    #   disk3: SD card, MBR with a FAT32 partition
+    #   disk4: Optical drive, no size reported
+    #   disk5: USB drive, ESP and a HFS+ installer
+    #   disk6: USB drive, NTFS only
+    #   disk7: USB SSD, ESP and APFS, garbage in its MediaName
+    External_Media = RecordedDiskutil(
+        listing={
+            "AllDisksAndPartitions": [
+                {"DeviceIdentifier": "disk0", "Content": "GUID_partition_scheme", "Size": 500277790720, "OSInternal": False, "Partitions": [
+                    {"DeviceIdentifier": "disk0s1", "Content": "EFI",        "Size": 209715200,    "VolumeName": "EFI"},
+                    {"DeviceIdentifier": "disk0s2", "Content": "Apple_APFS", "Size": 500068036608},
+                ]},
+                {"DeviceIdentifier": "disk2", "Content": "GUID_partition_scheme", "Size": 64023257088, "Partitions": [
+                    {"DeviceIdentifier": "disk2s1", "Content": "EFI",                  "Size": 209715200,   "VolumeName": "EFI"},
+                    {"DeviceIdentifier": "disk2s2", "Content": "Microsoft Basic Data", "Size": 63000000000, "VolumeName": "DATA", "MountPoint": "/Volumes/DATA"},
+                ]},
+                {"DeviceIdentifier": "disk3", "Content": "FDisk_partition_scheme", "Size": 31914983424, "Partitions": [
+                    {"DeviceIdentifier": "disk3s1", "Content": "DOS_FAT_32", "Size": 31914000000, "VolumeName": "SDCARD", "MountPoint": "/Volumes/SDCARD"},
+                ]},
+                {"DeviceIdentifier": "disk4", "Content": "CD_partition_scheme", "Size": 0, "Partitions": [
+                    {"DeviceIdentifier": "disk4s0", "Content": "CD_DA", "Size": 0},
+                ]},
+                {"DeviceIdentifier": "disk5", "Content": "GUID_partition_scheme", "Size": 32017047552, "Partitions": [
+                    {"DeviceIdentifier": "disk5s1", "Content": "EFI",       "Size": 209715200,   "VolumeName": "EFI"},
+                    {"DeviceIdentifier": "disk5s2", "Content": "Apple_HFS", "Size": 31670000000, "VolumeName": "Install", "MountPoint": "/Volumes/Install"},
+                ]},
+                {"DeviceIdentifier": "disk6", "Content": "GUID_partition_scheme", "Size": 8004829184, "Partitions": [
+                    {"DeviceIdentifier": "disk6s1", "Content": "Microsoft Basic Data", "Size": 8000000000, "VolumeName": "NTFSVOL"},
+                ]},
+                {"DeviceIdentifier": "disk7", "Content": "GUID_partition_scheme", "Size": 128035676160, "Partitions": [
+                    {"DeviceIdentifier": "disk7s1", "Content": "EFI",        "Size": 209715200,    "VolumeName": "EFI"},
+                    {"DeviceIdentifier": "disk7s2", "Content": "Apple_APFS", "Size": 127000000000},
+                ]},
+            ]
+        },
+        info={
+            "disk0":   {"DeviceIdentifier": "disk0", "DeviceNode": "/dev/disk0", "TotalSize": 500277790720, "Content": "GUID_partition_scheme", "WholeDisk": True, "MediaName": "APPLE SSD AP0512Q", "Internal": True, "SolidState": True, "BusProtocol": "PCI-Express"},
+            "disk0s1": {"DeviceIdentifier": "disk0s1", "ParentWholeDisk": "disk0", "TotalSize": 209715200, "Content": "EFI", "VolumeName": "EFI", "FilesystemType": "msdos", "BusProtocol": "PCI-Express"},
+            "disk2":   {"DeviceIdentifier": "disk2", "DeviceNode": "/dev/disk2", "TotalSize": 64023257088, "Content": "GUID_partition_scheme", "WholeDisk": True, "MediaName": "SanDisk Ultra", "Internal": False, "SolidState": False, "BusProtocol": "USB"},
+            "disk2s1": {"DeviceIdentifier": "disk2s1", "ParentWholeDisk": "disk2", "TotalSize": 209715200, "Content": "EFI", "VolumeName": "EFI", "FilesystemType": "msdos", "BusProtocol": "USB"},
+            "disk2s2": {"DeviceIdentifier": "disk2s2", "ParentWholeDisk": "disk2", "TotalSize": 63000000000, "Content": "Microsoft Basic Data", "VolumeName": "DATA", "FilesystemType": "exfat", "BusProtocol": "USB"},
+            "disk3":   {"DeviceIdentifier": "disk3", "DeviceNode": "/dev/disk3", "TotalSize": 31914983424, "Content": "FDisk_partition_scheme", "WholeDisk": True, "MediaName": "SD Card Reader", "Internal": False, "BusProtocol": "USB"},
+            "disk3s1": {"DeviceIdentifier": "disk3s1", "ParentWholeDisk": "disk3", "TotalSize": 31914000000, "Content": "DOS_FAT_32", "VolumeName": "SDCARD", "FilesystemType": "msdos", "BusProtocol": "USB"},
+            "disk4":   {"DeviceIdentifier": "disk4", "Content": "CD_partition_scheme", "MediaName": "DVD"},
+            "disk4s0": {"DeviceIdentifier": "disk4s0", "ParentWholeDisk": "disk4", "TotalSize": 0, "Content": "CD_DA", "FilesystemType": "cddafs"},
+            "disk5":   {"DeviceIdentifier": "disk5", "DeviceNode": "/dev/disk5", "TotalSize": 32017047552, "Content": "GUID_partition_scheme", "WholeDisk": True, "MediaName": "Kingston DataTraveler", "Internal": False, "SolidState": False, "BusProtocol": "USB"},
+            "disk5s1": {"DeviceIdentifier": "disk5s1", "ParentWholeDisk": "disk5", "TotalSize": 209715200, "Content": "EFI", "VolumeName": "EFI", "FilesystemType": "msdos", "BusProtocol": "USB"},
+            "disk5s2": {"DeviceIdentifier": "disk5s2", "ParentWholeDisk": "disk5", "TotalSize": 31670000000, "Content": "Apple_HFS", "VolumeName": "Install", "FilesystemType": "hfs", "BusProtocol": "USB"},
+            "disk6":   {"DeviceIdentifier": "disk6", "DeviceNode": "/dev/disk6", "TotalSize": 8004829184, "Content": "GUID_partition_scheme", "WholeDisk": True, "MediaName": "Seagate", "Internal": False, "BusProtocol": "USB"},
+            "disk6s1": {"DeviceIdentifier": "disk6s1", "ParentWholeDisk": "disk6", "TotalSize": 8000000000, "Content": "Microsoft Basic Data", "VolumeName": "NTFSVOL", "FilesystemType": "ntfs", "BusProtocol": "USB"},
+            # Chinesium USB, control characters in MediaName make the plist unparsable
+            "disk7":   b"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<plist version=\"1.0\">\n<dict>\n"
+                       b"\t<key>BusProtocol</key>\n\t<string>USB</string>\n"
+                       b"\t<key>DeviceIdentifier</key>\n\t<string>disk7</string>\n"
+                       b"\t<key>DeviceNode</key>\n\t<string>/dev/disk7</string>\n"
+                       b"\t<key>Internal</key>\n\t<false/>\n"
+                       b"\t<key>MediaName</key>\n\t<string>Samsung \x01\x02 T7</string>\n"
+                       b"\t<key>SolidState</key>\n\t<true/>\n"
+                       b"\t<key>TotalSize</key>\n\t<integer>128035676160</integer>\n"
+                       b"</dict>\n</plist>\n",
+            "disk7s1": {"DeviceIdentifier": "disk7s1", "ParentWholeDisk": "disk7", "TotalSize": 209715200, "Content": "EFI", "VolumeName": "EFI", "FilesystemType": "msdos", "BusProtocol": "USB"},
+            "disk7s2": {"DeviceIdentifier": "disk7s2", "ParentWholeDisk": "disk7", "TotalSize": 127000000000, "Content": "Apple_APFS", "BusProtocol": "USB"},
+        },
+    )
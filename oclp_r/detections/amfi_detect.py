@@ -4,7 +4,8 @@ amfi_detect.py: Determine AppleMobileFileIntegrity's OS configuration
 
 import enum
 
-from ..support import utilities
+from .boot_state import BootState
+
 from ..datasets import amfi_data
 
 
@@ -30,7 +31,13 @@ class AmfiConfigurationDetection:
 
     """
 
-    def __init__(self) -> None:
+    def __init__(self, boot_state: BootState = None) -> None:
+        """
+        Parameters:
+            boot_state (BootState): Boot state to read NVRAM from, defaults to BootState.current()
+        """
+        self._boot_state: BootState = boot_state or BootState.current()
+
         self.AMFI_ALLOW_TASK_FOR_PID:      bool = False
         self.AMFI_ALLOW_INVALID_SIGNATURE: bool = False
         self.AMFI_LV_ENFORCE_THIRD_PARTY:  bool = False
@@ -52,8 +59,8 @@ class AmfiConfigurationDetection:
         Initialize the boot-args and OCLP-Settings NVRAM dictionaries
         """
 
-        boot_args = utilities.get_nvram("boot-args", decode=True)
-        oclp_args = utilities.get_nvram("OCLP-Settings", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+        boot_args = self._boot_state.nvram_value("boot-args", decode=True)
+        oclp_args = self._boot_state.nvram_value("OCLP-Settings", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
 
         if boot_args:
             self.boot_args = boot_args.split(" ")
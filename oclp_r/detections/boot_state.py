@@ -0,0 +1,334 @@
+"""
+boot_state.py: Snapshot of the host's boot configuration
+
+Detection, defaults and root patching all decide from the same boot facts:
+NVRAM (boot-args, OCLP-Settings, SecureBootModel), the booted SIP
+configuration, FileVault, a few sysctls and loaded kexts. BootState
+captures them once, with a single NVRAM dump, sysctl batch and chosen node
+read, and consumers share the snapshot rather than querying the host.
+
+Snapshots are immutable and serialize to JSON, so a detection can be
+replayed offline (ex. on Linux) from a snapshot saved on another machine.
+Consumers accept a BootState, defaulting to BootState.current(): the
+snapshot entered as a context manager, else the host's, captured on first use.
+Facts the user can change mid-session (ex. FileVault) are re-read with
+refresh() where a stale value matters, replayed snapshots are left as is.
+
+Usage:
+    >>> from oclp_r.detections.boot_state import BootState
+    >>> BootState.capture().save("MacBookPro11,3.json")
+    >>> with BootState.from_file("MacBookPro11,3.json"):
+    >>>     detect.HardwarePatchsetDetection(constants)
+"""
+
+import re
+import json
+import time
+import logging
+import plistlib
+import subprocess
+import py_sip_xnu
+
+from types       import MappingProxyType
+from typing      import Optional
+from pathlib     import Path
+from dataclasses import dataclass, field, replace
+
+from . import ioreg
+
+from ..support import query_cache
+
+
+BOOT_STATE_VERSION: int = 1  # Bumped when the JSON format changes
+
+# Sysctls read in a single batch, answering LiveIORegistry.sysctl() as well
+SYSCTL_NAMES: list = [
+    "kern.osrelease",
+    "kern.osversion",
+    "kern.osproductversion",
+    "sysctl.proc_translated",
+    "machdep.cpu.brand_string",
+    "machdep.cpu.features",
+    "machdep.cpu.leaf7_features",
+]
+
+# IODeviceTree:/chosen properties kept
+CHOSEN_KEYS: list = [
+    "apfs-preboot-uuid",
+    "boot-uuid",
+    "booter-name",
+    "booter-version",
+]
+
+# Kexts whose loaded version is recorded
+KEXT_BUNDLES: list = [
+    "com.dhinakg.AMFIPass",
+    "as.vit9696.WhateverGreen",
+    "as.vit9696.AppleALC",
+]
+
+ACTIVE_BOOT_STATE = None  # BootState consumers default to, see BootState.current()
+
+_previous_states: list = []  # Boot states active before the entered ones
+
+
+def decode_nvram(value):
+    """
+    Decode a raw NVRAM value to a string, None if it is not valid UTF-8
+    """
+    if isinstance(value, bytes):
+        try:
+            return value.strip(b"\0").decode()
+        except UnicodeDecodeError:
+            # Some sceanrios the firmware will throw garbage in
+            # ie. iMac12,2 with FireWire boot-path
+            return None
+    if isinstance(value, str):
+        return value.strip("\0")
+    return value
+
+
+def _to_json(value):
+    """
+    JSON serializable form of a property, data is stored as hex
+    """
+    if isinstance(value, bytes):
+        return {"data": value.hex()}
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if list(value) == ["data"]:
+            return bytes.fromhex(value["data"])
+        return {key: _from_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True)
+class BootState:
+    """
+    Boot facts of a host, as captured by capture()
+    """
+
+    nvram:      dict = field(default_factory=dict)  # Variable (ex. 'boot-args', '4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Settings') -> raw value
+    sysctl:     dict = field(default_factory=dict)  # Name -> value, of SYSCTL_NAMES the host knows
+    chosen:     dict = field(default_factory=dict)  # IODeviceTree:/chosen property -> raw value, of CHOSEN_KEYS
+    sip_status: int  = 0                            # csr-active-config the kernel booted with
+    filevault:  bool = False                        # FileVault enabled on the booted volume
+    kexts:      dict = field(default_factory=dict)  # Bundle ID -> version, of loaded KEXT_BUNDLES
+    recovery:   bool = False                        # Booted into RecoveryOS
+    live:       bool = field(default=False, compare=False, repr=False)  # Captured from the running host, thus refreshable
+
+    def __post_init__(self) -> None:
+        for name in ["nvram", "sysctl", "chosen", "kexts"]:
+            object.__setattr__(self, name, MappingProxyType(dict(getattr(self, name))))
+
+
+    @classmethod
+    def current(cls, capture: bool = True) -> Optional["BootState"]:
+        """
+        Boot state consumers default to
+
+        Parameters:
+            capture (bool): Capture the host's boot state if none is active, otherwise return None
+        """
+        global ACTIVE_BOOT_STATE
+        if ACTIVE_BOOT_STATE is None and capture is True:
+            ACTIVE_BOOT_STATE = cls.capture()
+        return ACTIVE_BOOT_STATE
+
+
+    def __enter__(self) -> "BootState":
+        global ACTIVE_BOOT_STATE
+        _previous_states.append(ACTIVE_BOOT_STATE)
+        ACTIVE_BOOT_STATE = self
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        global ACTIVE_BOOT_STATE
+        ACTIVE_BOOT_STATE = _previous_states.pop()
+
+
+    @classmethod
+    def capture(cls) -> "BootState":
+        """
+        Capture the running host's boot state
+        """
+        start_time = time.perf_counter()
+        boot_state = cls(
+            nvram=_read_nvram_options(),
+            sysctl=_read_sysctls(SYSCTL_NAMES),
+            chosen=_read_chosen(CHOSEN_KEYS),
+            sip_status=py_sip_xnu.SipXnu().get_sip_status().value,
+            filevault=_read_filevault(),
+            kexts=_read_loaded_kexts(KEXT_BUNDLES),
+            recovery=Path("/System/Library/BaseSystem").exists(),
+            live=True,
+        )
+        logging.info(f"- Captured boot state in {time.perf_counter() - start_time:.2f}s: {len(boot_state.nvram)} NVRAM variables, SIP {hex(boot_state.sip_status)}")
+        return boot_state
+
+
+    def refresh(self, *names: str) -> "BootState":
+        """
+        Re-capture fields of a live snapshot, replacing it as the active one
+
+        Parameters:
+            names (str): Fields to re-read, ex. 'filevault'
+
+        Returns:
+            BootState: The refreshed snapshot, or self if replayed
+        """
+        global ACTIVE_BOOT_STATE
+        if self.live is False:
+            return self
+
+        # Fields that can change while OCLP-R is running
+        readers = {
+            "filevault": _read_filevault,
+        }
+        boot_state = replace(self, **{name: readers[name]() for name in names})
+        if ACTIVE_BOOT_STATE is self:
+            ACTIVE_BOOT_STATE = boot_state
+        return boot_state
+
+
+    def nvram_value(self, variable: str, uuid: str = None, *, decode: bool = False):
+        """
+        NVRAM variable, mirroring utilities.get_nvram()
+
+        Parameters:
+            variable (str):  Variable name
+            uuid     (str):  Vendor GUID, None for Apple's
+            decode   (bool): Decode to a string
+        """
+        value = self.nvram.get(f"{uuid}:{variable}" if uuid is not None else variable)
+        if value is None:
+            return None
+        return decode_nvram(value) if decode else value
+
+
+    def kext_version(self, bundle_id: str) -> str:
+        """
+        Loaded version of a kext of KEXT_BUNDLES, mirroring utilities.check_kext_loaded()
+
+        Returns:
+            str: The version of the kext if it is loaded, or "" if it is not loaded
+        """
+        return self.kexts.get(bundle_id, "")
+
+
+    @property
+    def xnu_version(self) -> tuple:
+        """
+        (major, minor) XNU version booted, (None, None) if unknown
+        """
+        release = self.sysctl.get("kern.osrelease")
+        if not release:
+            return None, None
+        major, minor = release.split(".")[:2]
+        return int(major), int(minor)
+
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "version":    BOOT_STATE_VERSION,
+            "nvram":      _to_json(dict(self.nvram)),
+            "sysctl":     dict(self.sysctl),
+            "chosen":     _to_json(dict(self.chosen)),
+            "sip-status": self.sip_status,
+            "filevault":  self.filevault,
+            "kexts":      dict(self.kexts),
+            "recovery":   self.recovery,
+        }, indent=4, sort_keys=True)
+
+
+    @classmethod
+    def from_json(cls, data: str) -> "BootState":
+        archive = json.loads(data)
+        if archive.get("version") != BOOT_STATE_VERSION:
+            raise ValueError(f"Unsupported boot state version: {archive.get('version')}")
+        return cls(
+            nvram=_from_json(archive["nvram"]),
+            sysctl=archive["sysctl"],
+            chosen=_from_json(archive["chosen"]),
+            sip_status=archive["sip-status"],
+            filevault=archive["filevault"],
+            kexts=archive["kexts"],
+            recovery=archive["recovery"],
+        )
+
+
+    def save(self, path: str) -> None:
+        Path(path).write_text(self.to_json())
+
+
+    @classmethod
+    def from_file(cls, path: str) -> "BootState":
+        return cls.from_json(Path(path).read_text())
+
+
+def _read_nvram_options() -> dict:
+    """
+    Every NVRAM variable, from a single read of IODeviceTree:/options
+    """
+    options = ioreg.IORegistryEntryFromPath(ioreg.kIOMasterPortDefault, "IODeviceTree:/options".encode())
+    properties = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperties(options, None, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)[1])
+    ioreg.IOObjectRelease(options)
+    return properties or {}
+
+
+def _read_filevault() -> bool:
+    result = subprocess.run(["/usr/bin/fdesetup", "status"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    return "FileVault is Off" not in result.stdout.decode()
+
+
+def _read_sysctls(names: list) -> dict:
+    """
+    Values of sysctls, from a single invocation, unknown names are left out
+    """
+    result = subprocess.run(["/usr/sbin/sysctl", *names], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    values = {}
+    for line in result.stdout.decode().splitlines():
+        name, separator, value = line.partition(": ")
+        if separator and name in names:
+            values[name] = value.strip()
+    return values
+
+
+def _read_chosen(keys: list) -> dict:
+    result = query_cache.run(["/usr/sbin/ioreg", "-a", "-n", "chosen", "-p", "IODeviceTree", "-r"])
+    if result.returncode != 0 or not result.stdout:
+        return {}
+    chosen = plistlib.loads(result.stdout)[0]
+    return {key: chosen[key] for key in keys if key in chosen}
+
+
+def _read_loaded_kexts(bundle_ids: list) -> dict:
+    """
+    Versions of loaded kexts, from a single listing of every loaded kext
+    """
+    args = ["/usr/sbin/kextstat", "-list-only"]
+    if Path("/usr/bin/kmutil").exists():
+        args = ["/usr/bin/kmutil", "showloaded", "--list-only", "--variant-suffix", "release"]
+
+    result = query_cache.run(args)
+    if result.returncode != 0:
+        return {}
+    output = result.stdout.decode()
+
+    # Name (Version) UUID <Linked Against>
+    versions = {}
+    for bundle_id in bundle_ids:
+        match = re.search(re.escape(bundle_id) + r"\s+\((?P<version>.+?)\)", output)
+        if match:
+            versions[bundle_id] = match.group("version")
+    return versions
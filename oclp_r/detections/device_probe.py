@@ -3,19 +3,21 @@ device_probe.py: Hardware probing
 """
 
 import enum
+import time
+import logging
 import itertools
 import subprocess
 import plistlib
 import hashlib
+import concurrent.futures
 
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Any, ClassVar, Optional, Type, Union
+from typing import Any, ClassVar, Iterator, Optional, Type, Union
 
-from . import ioreg
+from . import ioreg_backend
 
 from ..support import utilities
-
 from ..datasets import (
     pci_data,
     usb_data
@@ -44,8 +46,8 @@ class USBDevice:
     serial_number: Optional[str] = None
 
     @classmethod
-    def from_ioregistry(cls, entry: ioreg.io_registry_entry_t):
-        properties: dict = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperties(entry, None, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)[1])
+    def from_ioregistry(cls, registry: ioreg_backend.IORegistryBackend, entry):
+        properties: dict = registry.properties(entry)
 
         vendor_id     = None
         device_id     = None
@@ -151,8 +153,8 @@ class PCIDevice:
         }
 
     @classmethod
-    def from_ioregistry(cls, entry: ioreg.io_registry_entry_t, anti_spoof=False):
-        properties: dict = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperties(entry, None, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)[1])  # type: ignore
+    def from_ioregistry(cls, registry: ioreg_backend.IORegistryBackend, entry, anti_spoof=False):
+        properties: dict = registry.properties(entry)
 
         vendor_id = None
         device_id = None
@@ -177,7 +179,7 @@ class PCIDevice:
             vendor_id_unspoofed = vendor_id
             device_id_unspoofed = device_id
 
-        device = cls(vendor_id, device_id, int.from_bytes(properties["class-code"][:6], byteorder="little"), name=ioreg.io_name_t_to_str(ioreg.IORegistryEntryGetName(entry, None)[1]))
+        device = cls(vendor_id, device_id, int.from_bytes(properties["class-code"][:6], byteorder="little"), name=registry.name(entry))
         if "model" in properties:
             model = properties["model"]
             if isinstance(model, bytes):
@@ -192,7 +194,7 @@ class PCIDevice:
 
         device.vendor_id_unspoofed = vendor_id_unspoofed
         device.device_id_unspoofed = device_id_unspoofed
-        device.populate_pci_path(entry)
+        device.populate_pci_path(registry, entry)
         return device
 
     def vendor_detect(self, *, inherits: Optional[Type["PCIDevice"]] = None, classes: Optional[list] = None):
@@ -205,31 +207,31 @@ class PCIDevice:
     def detect(cls, device):
         return device.vendor_id == cls.VENDOR_ID and ((device.class_code in cls.CLASS_CODES) if getattr(cls, "CLASS_CODES", None) else True) and ((device.class_code == cls.CLASS_CODE) if getattr(cls, "CLASS_CODE", None) else True)  # type: ignore  # pylint: disable=no-member
 
-    def populate_pci_path(self, original_entry: ioreg.io_registry_entry_t):
+    def populate_pci_path(self, registry: ioreg_backend.IORegistryBackend, original_entry):
         # Based off gfxutil logic, seems to work.
         paths = []
         entry = original_entry
         while entry:
-            if ioreg.IOObjectConformsTo(entry, "IOPCIDevice".encode()):
+            if registry.conforms_to(entry, "IOPCIDevice"):
                 # Virtual PCI devices provide a botched IOService path (us.electronic.kext.vusb)
                 # We only care about physical devices, so skip them
                 try:
-                    location = [hex(int(i, 16)) for i in ioreg.io_name_t_to_str(ioreg.IORegistryEntryGetLocationInPlane(entry, "IOService".encode(), None)[1]).split(",") + ["0"]]
+                    location = [hex(int(i, 16)) for i in registry.location(entry).split(",") + ["0"]]
                     paths.append(f"Pci({location[0]},{location[1]})")
                 except ValueError:
                     break
-            elif ioreg.IOObjectConformsTo(entry, "IOACPIPlatformDevice".encode()):
-                paths.append(f"PciRoot({hex(int(ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, '_UID', ioreg.kCFAllocatorDefault, ioreg.kNilOptions)) or 0))})")  # type: ignore
+            elif registry.conforms_to(entry, "IOACPIPlatformDevice"):
+                paths.append(f"PciRoot({hex(int(registry.property(entry, '_UID') or 0))})")  # type: ignore
                 break
-            elif ioreg.IOObjectConformsTo(entry, "IOPCIBridge".encode()):
+            elif registry.conforms_to(entry, "IOPCIBridge"):
                 pass
             else:
                 # There's something in between that's not PCI! Abort
                 paths = []
                 break
-            parent = ioreg.IORegistryEntryGetParentEntry(entry, "IOService".encode(), None)[1]
+            parent = registry.parent(entry)
             if entry != original_entry:
-                ioreg.IOObjectRelease(entry)
+                registry.release(entry)
             entry = parent
         self.pci_path = "/".join(reversed(paths))
 
@@ -256,17 +258,18 @@ class WirelessCard(PCIDevice):
         self.detect_chipset()
 
     @classmethod
-    def from_ioregistry(cls, entry: ioreg.io_registry_entry_t, anti_spoof=True):
-        device = super().from_ioregistry(entry, anti_spoof=anti_spoof)
+    def from_ioregistry(cls, registry: ioreg_backend.IORegistryBackend, entry, anti_spoof=True):
+        device = super().from_ioregistry(registry, entry, anti_spoof=anti_spoof)
 
         matching_dict = {
-            "IOParentMatch": ioreg.corefoundation_to_native(ioreg.IORegistryEntryIDMatching(ioreg.IORegistryEntryGetRegistryEntryID(entry, None)[1])),
+            "IOParentMatch": registry.entry_id(entry),
             "IOProviderClass": "IO80211Interface",
         }
 
-        interface = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, matching_dict, None)[1]), None)
+        interface = registry.first_matching_service(matching_dict)
         if interface:
-            device.country_code = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(interface, "IO80211CountryCode", ioreg.kCFAllocatorDefault, ioreg.kNilOptions))  # type: ignore # If not present, will be None anyways
+            device.country_code = registry.property(interface, "IO80211CountryCode")  # type: ignore # If not present, will be None anyways
+            registry.release(interface)
         else:
             device.country_code = None  # type: ignore
 
@@ -288,10 +291,10 @@ class NVMeController(PCIDevice):
     # parent_aspm: Optional[int] = None
 
     @classmethod
-    def from_ioregistry(cls, entry: ioreg.io_registry_entry_t, anti_spoof=True):
-        device = super().from_ioregistry(entry, anti_spoof=anti_spoof)
+    def from_ioregistry(cls, registry: ioreg_backend.IORegistryBackend, entry, anti_spoof=True):
+        device = super().from_ioregistry(registry, entry, anti_spoof=anti_spoof)
 
-        device.aspm: Union[int, bytes] = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, "pci-aspm-default", ioreg.kCFAllocatorDefault, ioreg.kNilOptions)) or 0  # type: ignore
+        device.aspm: Union[int, bytes] = registry.property(entry, "pci-aspm-default") or 0  # type: ignore
         if isinstance(device.aspm, bytes):
             device.aspm = int.from_bytes(device.aspm, byteorder="little")
 
@@ -655,262 +658,249 @@ class Computer:
     firmware_vendor: Optional[str] = None
     rosetta_active: Optional[bool] = False
 
+    probe_durations: dict = field(default_factory=dict)  # Probe name -> seconds taken
+
+    # Probes run by Computer.probe(), and the probes they depend on
+    # Probes without pending dependencies are run concurrently
+    PROBE_DEPENDENCIES: ClassVar[dict] = {
+        "gpu_probe":                  [],
+        "dgpu_probe":                 [],
+        "igpu_probe":                 [],
+        "wifi_probe":                 [],
+        "storage_probe":              [],
+        "usb_controller_probe":       [],
+        "sdxc_controller_probe":      [],
+        "ethernet_probe":             [],
+        "smbios_probe":               [],
+        "usb_device_probe":           [],
+        "cpu_probe":                  [],
+        "bluetooth_probe":            ["usb_device_probe"],
+        "topcase_probe":              ["usb_device_probe"],
+        "t1_probe":                   ["usb_device_probe"],
+        "ambient_light_sensor_probe": [],
+        "pcie_webcam_probe":          [],
+        "sata_disk_probe":            [],
+        "oclp_sys_patch_probe":       [],
+        "check_rosetta":              [],
+    }
+
+    # Probes relying on the running host rather than the IORegistry
+    HOST_ONLY_PROBES: ClassVar[list] = ["sata_disk_probe", "oclp_sys_patch_probe"]
+
+    PROBE_THREAD_COUNT: ClassVar[int] = 8
+
     @staticmethod
-    def probe():
+    def probe(registry: Optional[ioreg_backend.IORegistryBackend] = None):
+        """
+        Probe hardware
+
+        Parameters:
+            registry (IORegistryBackend): Backend to query, defaults to a snapshot of the host
+                                          Offline backends (ex. saved snapshots) skip host-only probes
+        """
+        if registry is None:
+            try:
+                registry = ioreg_backend.HostSnapshotIORegistry.from_host()
+            except Exception as e:
+                logging.info(f"- Failed to snapshot IORegistry, querying IOKit per device: {e}")
+                registry = ioreg_backend.LiveIORegistry()
+
         computer = Computer()
-        computer.gpu_probe()
-        computer.dgpu_probe()
-        computer.igpu_probe()
-        computer.wifi_probe()
-        computer.storage_probe()
-        computer.usb_controller_probe()
-        computer.sdxc_controller_probe()
-        computer.ethernet_probe()
-        computer.smbios_probe()
-        computer.usb_device_probe()
-        computer.cpu_probe()
-        computer.bluetooth_probe()
-        computer.topcase_probe()
-        computer.t1_probe()
-        computer.ambient_light_sensor_probe()
-        computer.pcie_webcam_probe()
-        computer.sata_disk_probe()
-        computer.oclp_sys_patch_probe()
-        computer.check_rosetta()
+        computer._registry = registry
+
+        probes = {
+            name: dependencies for name, dependencies in Computer.PROBE_DEPENDENCIES.items()
+            if not (computer._registry.offline and name in Computer.HOST_ONLY_PROBES)
+        }
+
+        start = time.perf_counter()
+        computer._run_probes(probes)
+        total = time.perf_counter() - start
+
+        del computer._registry
+
+        logging.info(f"Hardware probe completed in {total:.3f}s")
+        for name, duration in sorted(computer.probe_durations.items(), key=lambda item: item[1], reverse=True):
+            logging.info(f"- {name}: {duration:.3f}s")
+
         return computer
 
 
+    def _run_probes(self, probes: dict) -> None:
+        """
+        Run probes on a thread pool, respecting declared dependencies
+
+        Parameters:
+            probes (dict): Probe name -> list of probe names to wait for
+        """
+        def _timed(name: str) -> None:
+            start = time.perf_counter()
+            getattr(self, name)()
+            self.probe_durations[name] = time.perf_counter() - start
+
+        pending   = dict(probes)
+        completed = set()
+        running   = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.PROBE_THREAD_COUNT) as executor:
+            while pending or running:
+                for name in [name for name, dependencies in pending.items() if all(dependency in completed or dependency not in probes for dependency in dependencies)]:
+                    running[executor.submit(_timed, name)] = name
+                    del pending[name]
+
+                if not running:
+                    raise RuntimeError(f"Unresolvable probe dependencies: {list(pending)}")
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # Re-raise probe exceptions
+                    completed.add(running.pop(future))
+
+
+    def _pci_devices(self, device_class: Type[PCIDevice]) -> Iterator[Any]:
+        return self._registry.matching_services(device_class.class_code_matching_dict())
+
+
     def usb_device_probe(self):
-        devices = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault, {"IOProviderClass": "IOUSBDevice"}, None
-            )[1]
-        )
+        devices = self._registry.matching_services({"IOProviderClass": "IOUSBDevice"})
         for device in devices:
-            properties = USBDevice.from_ioregistry(device)
+            properties = USBDevice.from_ioregistry(self._registry, device)
             if properties:
                 properties.detect()
                 self.usb_devices.append(properties)
-            ioreg.IOObjectRelease(device)
+            self._registry.release(device)
 
 
     def gpu_probe(self):
         # Chain together two iterators: one for class code 03:00:00, the other for class code 03:80:00
-        devices = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault, GPU.class_code_matching_dict(), None
-            )[1]
-        )
+        devices = self._pci_devices(GPU)
 
         for device in devices:
-            vendor: Type[GPU] = PCIDevice.from_ioregistry(device).vendor_detect(inherits=GPU)  # type: ignore
+            vendor: Type[GPU] = PCIDevice.from_ioregistry(self._registry, device).vendor_detect(inherits=GPU)  # type: ignore
             if vendor:
-                self.gpus.append(vendor.from_ioregistry(device))  # type: ignore
-            ioreg.IOObjectRelease(device)
+                self.gpus.append(vendor.from_ioregistry(self._registry, device))  # type: ignore
+            self._registry.release(device)
 
     def dgpu_probe(self):
-        device = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, ioreg.IOServiceNameMatching("GFX0".encode()), None)[1]), None)
+        device = self._registry.first_matching_service({"IONameMatch": "GFX0"})
         if not device:
             # No devices
             return
 
-        vendor: Type[GPU] = PCIDevice.from_ioregistry(device).vendor_detect(inherits=GPU)  # type: ignore
+        vendor: Type[GPU] = PCIDevice.from_ioregistry(self._registry, device).vendor_detect(inherits=GPU)  # type: ignore
         if vendor:
-            self.dgpu = vendor.from_ioregistry(device)  # type: ignore
-        ioreg.IOObjectRelease(device)
+            self.dgpu = vendor.from_ioregistry(self._registry, device)  # type: ignore
+        self._registry.release(device)
 
     def igpu_probe(self):
-        device = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, ioreg.IOServiceNameMatching("IGPU".encode()), None)[1]), None)
+        device = self._registry.first_matching_service({"IONameMatch": "IGPU"})
         if not device:
             # No devices
             return
 
-        vendor: Type[GPU] = PCIDevice.from_ioregistry(device).vendor_detect(inherits=GPU)  # type: ignore
+        vendor: Type[GPU] = PCIDevice.from_ioregistry(self._registry, device).vendor_detect(inherits=GPU)  # type: ignore
         if vendor:
-            self.igpu = vendor.from_ioregistry(device)  # type: ignore
-        ioreg.IOObjectRelease(device)
+            self.igpu = vendor.from_ioregistry(self._registry, device)  # type: ignore
+        self._registry.release(device)
 
     def wifi_probe(self):
-        devices = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                WirelessCard.class_code_matching_dict(),
-                None,
-            )[1]
-        )
+        devices = self._pci_devices(WirelessCard)
 
         for device in devices:
-            vendor: Type[WirelessCard] = PCIDevice.from_ioregistry(device, anti_spoof=True).vendor_detect(inherits=WirelessCard)  # type: ignore
+            vendor: Type[WirelessCard] = PCIDevice.from_ioregistry(self._registry, device, anti_spoof=True).vendor_detect(inherits=WirelessCard)  # type: ignore
             if vendor:
-                self.wifi = vendor.from_ioregistry(device, anti_spoof=True)  # type: ignore
+                self.wifi = vendor.from_ioregistry(self._registry, device, anti_spoof=True)  # type: ignore
                 break
-            ioreg.IOObjectRelease(device)
+            self._registry.release(device)
 
     def ambient_light_sensor_probe(self):
-        device = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, ioreg.IOServiceNameMatching("ALS0".encode()), None)[1]), None)
+        device = self._registry.first_matching_service({"IONameMatch": "ALS0"})
         if device:
             self.ambient_light_sensor = True
-            ioreg.IOObjectRelease(device)
+            self._registry.release(device)
 
     def pcie_webcam_probe(self):
         # CMRA/14E4:1570
-        device = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, ioreg.IOServiceNameMatching("CMRA".encode()), None)[1]), None)
+        device = self._registry.first_matching_service({"IONameMatch": "CMRA"})
         if device:
             self.pcie_webcam = True
-            ioreg.IOObjectRelease(device)
+            self._registry.release(device)
 
     def sdxc_controller_probe(self):
-        sdxc_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                SDXCController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
+        sdxc_controllers = self._pci_devices(SDXCController)
 
         for device in sdxc_controllers:
-            self.sdxc_controller.append(SDXCController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
+            self.sdxc_controller.append(SDXCController.from_ioregistry(self._registry, device))
+            self._registry.release(device)
 
     def usb_controller_probe(self):
-        xhci_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                XHCIController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-        ehci_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                EHCIController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-        ohci_controllers  = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                OHCIController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-
-        uhci_controllers  = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                UHCIController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-        for device in xhci_controllers:
-            self.usb_controllers.append(XHCIController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
-        for device in ehci_controllers:
-            self.usb_controllers.append(EHCIController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
-        for device in ohci_controllers:
-            self.usb_controllers.append(OHCIController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
-        for device in uhci_controllers:
-            self.usb_controllers.append(UHCIController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
+        for controller in [XHCIController, EHCIController, OHCIController, UHCIController]:
+            for device in self._pci_devices(controller):
+                self.usb_controllers.append(controller.from_ioregistry(self._registry, device))
+                self._registry.release(device)
 
     def ethernet_probe(self):
-        ethernet_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                EthernetController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
+        ethernet_controllers = self._pci_devices(EthernetController)
 
         for device in ethernet_controllers:
-            vendor: Type[EthernetController] = PCIDevice.from_ioregistry(device).vendor_detect(inherits=EthernetController)  # type: ignore
+            vendor: Type[EthernetController] = PCIDevice.from_ioregistry(self._registry, device).vendor_detect(inherits=EthernetController)  # type: ignore
             if vendor:
-                self.ethernet.append(vendor.from_ioregistry(device))  # type: ignore
-            ioreg.IOObjectRelease(device)
+                self.ethernet.append(vendor.from_ioregistry(self._registry, device))  # type: ignore
+            self._registry.release(device)
 
     def storage_probe(self):
-        sata_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                SATAController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-        sas_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                SASController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-
-        nvme_controllers = ioreg.ioiterator_to_list(
-            ioreg.IOServiceGetMatchingServices(
-                ioreg.kIOMasterPortDefault,
-                NVMeController.class_code_matching_dict(),
-                None,
-            )[1]
-        )
-        for device in sata_controllers:
-            self.storage.append(SATAController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
-
-        for device in sas_controllers:
-            self.storage.append(SASController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
-
-        for device in nvme_controllers:
-            self.storage.append(NVMeController.from_ioregistry(device))
-            ioreg.IOObjectRelease(device)
+        for controller in [SATAController, SASController, NVMeController]:
+            for device in self._pci_devices(controller):
+                self.storage.append(controller.from_ioregistry(self._registry, device))
+                self._registry.release(device)
 
     def smbios_probe(self):
         # Reported model
-        entry = next(ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, ioreg.IOServiceMatching("IOPlatformExpertDevice".encode()), None)[1]))
-        self.reported_model = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, "model", ioreg.kCFAllocatorDefault, ioreg.kNilOptions)).strip(b"\0").decode()  # type: ignore
-        translated = subprocess.run(["/usr/sbin/sysctl", "-in", "sysctl.proc_translated"], stdout=subprocess.PIPE).stdout.decode()
+        entry = self._registry.first_matching_service({"IOProviderClass": "IOPlatformExpertDevice"})
+        self.reported_model = self._registry.property(entry, "model").strip(b"\0").decode()  # type: ignore
+        translated = self._registry.sysctl("sysctl.proc_translated")
         if translated:
             board = "target-type"
         else:
             board = "board-id"
-        self.reported_board_id = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, board, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)).strip(b"\0").decode()  # type: ignore
-        self.uuid_sha1 = ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, "IOPlatformUUID", ioreg.kCFAllocatorDefault, ioreg.kNilOptions))  # type: ignore
+        self.reported_board_id = self._registry.property(entry, board).strip(b"\0").decode()  # type: ignore
+        self.uuid_sha1 = self._registry.property(entry, "IOPlatformUUID")  # type: ignore
         self.uuid_sha1 = hashlib.sha1(self.uuid_sha1.encode()).hexdigest()
-        ioreg.IOObjectRelease(entry)
+        self._registry.release(entry)
 
         # Real model
-        self.real_model = utilities.get_nvram("oem-product", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True) or self.reported_model
-        self.real_board_id = utilities.get_nvram("oem-board", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True) or self.reported_board_id
-        self.build_model = utilities.get_nvram("OCLP-Model", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+        boot_state = self._registry.boot_state()
+        self.real_model = boot_state.nvram_value("oem-product", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True) or self.reported_model
+        self.real_board_id = boot_state.nvram_value("oem-board", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True) or self.reported_board_id
+        self.build_model = boot_state.nvram_value("OCLP-Model", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
 
         # OCLP version
-        self.oclp_version = utilities.get_nvram("OCLP-Version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
-        self.opencore_version = utilities.get_nvram("opencore-version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
-        self.opencore_path = utilities.get_nvram("boot-path", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+        self.oclp_version = boot_state.nvram_value("OCLP-Version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+        self.opencore_version = boot_state.nvram_value("opencore-version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+        self.opencore_path = boot_state.nvram_value("boot-path", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
 
         # SecureBoot Variables
-        self.secure_boot_model = utilities.check_secure_boot_model()
-        self.secure_boot_policy = utilities.check_ap_security_policy()
+        self.secure_boot_model = utilities.check_secure_boot_model(boot_state)
+        self.secure_boot_policy = utilities.check_ap_security_policy(boot_state)
 
         # Firmware Vendor
-        firmware_vendor = utilities.get_firmware_vendor(decode=False)
+        firmware_vendor = self._registry.firmware_vendor()
         if isinstance(firmware_vendor, bytes):
             firmware_vendor = str(firmware_vendor.replace(b"\x00", b"").decode("utf-8"))
         self.firmware_vendor = firmware_vendor
 
     def cpu_probe(self):
         self.cpu = CPU(
-            subprocess.run(["/usr/sbin/sysctl", "machdep.cpu.brand_string"], stdout=subprocess.PIPE).stdout.decode().partition(": ")[2].strip(),
-            subprocess.run(["/usr/sbin/sysctl", "machdep.cpu.features"], stdout=subprocess.PIPE).stdout.decode().partition(": ")[2].strip().split(" "),
+            (self._registry.sysctl("machdep.cpu.brand_string") or "").strip(),
+            (self._registry.sysctl("machdep.cpu.features") or "").strip().split(" "),
             self.cpu_get_leafs(),
         )
 
     def cpu_get_leafs(self):
         leafs = []
-        result = subprocess.run(["/usr/sbin/sysctl", "machdep.cpu.leaf7_features"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-        if result.returncode == 0:
-            return result.stdout.decode().partition(": ")[2].strip().split(" ")
+        result = self._registry.sysctl("machdep.cpu.leaf7_features")
+        if result is not None:
+            return result.strip().split(" ")
         return leafs
 
     def bluetooth_probe(self):
@@ -1022,7 +1012,7 @@ class Computer:
                 self.oclp_sys_signed = sys_plist["Custom Signature"]
 
     def check_rosetta(self):
-        result = subprocess.run(["/usr/sbin/sysctl", "-in", "sysctl.proc_translated"], stdout=subprocess.PIPE).stdout.decode()
+        result = self._registry.sysctl("sysctl.proc_translated") or ""
         if "1" in result:
             self.rosetta_active = True
         else:
@@ -0,0 +1,505 @@
+"""
+ioreg_backend.py: Pluggable IORegistry backends for hardware probing
+
+Three backends are provided:
+- LiveIORegistry:         Queries IOKit directly through PyObjC (see ioreg.py)
+- SnapshotIORegistry:     Answers queries from an in-memory tree built from
+                          a single 'ioreg -a -l' archive, usable without IOKit (ex. CI on Linux)
+- HostSnapshotIORegistry: Snapshot of the running host, the default of device_probe.Computer.probe()
+
+All expose the same interface, so device_probe.Computer can probe any:
+    >>> from oclp_r.detections import device_probe, ioreg_backend
+    >>> computer = device_probe.Computer.probe()  # Host snapshot
+    >>> computer = device_probe.Computer.probe(ioreg_backend.LiveIORegistry())
+    >>> computer = device_probe.Computer.probe(ioreg_backend.SnapshotIORegistry.from_file("MacBookPro11,3.plist"))
+"""
+
+import plistlib
+import subprocess
+
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from . import ioreg
+from .boot_state import BootState, SYSCTL_NAMES
+
+from ..support import utilities
+
+
+# IOKit's 'ioreg -a' archive keys
+REGISTRY_CHILDREN_KEY: str = "IORegistryEntryChildren"
+REGISTRY_NAME_KEY:     str = "IORegistryEntryName"
+REGISTRY_LOCATION_KEY: str = "IORegistryEntryLocation"
+REGISTRY_ID_KEY:       str = "IORegistryEntryID"
+OBJECT_CLASS_KEY:      str = "IOObjectClass"
+OBJECT_INHERITANCE_KEY: str = "IOObjectInheritance"  # Not emitted by ioreg, optional for hand-crafted snapshots
+
+ARCHIVE_KEYS: list = [
+    REGISTRY_CHILDREN_KEY,
+    REGISTRY_NAME_KEY,
+    REGISTRY_LOCATION_KEY,
+    REGISTRY_ID_KEY,
+    OBJECT_CLASS_KEY,
+    OBJECT_INHERITANCE_KEY,
+    "IOObjectRetainCount",
+    "IOServiceBusyState",
+    "IOServiceBusyTime",
+    "IOServiceState",
+]
+
+# 'ioreg -a' does not record class inheritance, thus approximate
+# IOObjectConformsTo() with the classes device_probe cares about
+KNOWN_CLASS_INHERITANCE: dict = {
+    "IOPCIDevice":             ["IOPCIDevice"],
+    "IOPCI2PCIBridge":         ["IOPCI2PCIBridge", "IOPCIBridge"],
+    "AppleACPIPCI":            ["AppleACPIPCI", "IOPCIBridge"],
+    "IOPCIBridge":             ["IOPCIBridge"],
+    "IOACPIPlatformDevice":    ["IOACPIPlatformDevice", "IOPlatformDevice"],
+    "IOPlatformExpertDevice":  ["IOPlatformExpertDevice"],
+    "IOUSBHostDevice":         ["IOUSBHostDevice", "IOUSBDevice"],
+    "IOUSBDevice":             ["IOUSBDevice"],
+    "IO80211Interface":        ["IO80211Interface"],
+    "IODTNVRAM":               ["IODTNVRAM"],
+}
+
+# Classes whose conformance host snapshots resolve through IOKit, once per class
+CONFORMANCE_CLASSES: list = [
+    "IOPCIDevice",
+    "IOPCIBridge",
+    "IOACPIPlatformDevice",
+    "IOPlatformExpertDevice",
+    "IOUSBDevice",
+    "IO80211Interface",
+]
+
+
+class IORegistryBackend:
+    """
+    Interface shared by all IORegistry backends
+
+    Entries returned are opaque, and must only be passed back to the same backend
+    """
+
+    offline: bool = False  # Whether the backend describes a host other than the running one
+
+
+    def matching_services(self, matching: dict) -> Iterator[Any]:
+        """
+        Return entries matching an IOKit matching dictionary
+
+        Supported keys: IOProviderClass, IONameMatch, IOPropertyMatch, IOParentMatch
+        """
+        raise NotImplementedError
+
+
+    def first_matching_service(self, matching: dict) -> Optional[Any]:
+        return next(iter(self.matching_services(matching)), None)
+
+
+    def properties(self, entry) -> dict:
+        raise NotImplementedError
+
+
+    def property(self, entry, key: str) -> Any:
+        raise NotImplementedError
+
+
+    def name(self, entry) -> str:
+        raise NotImplementedError
+
+
+    def location(self, entry) -> str:
+        raise NotImplementedError
+
+
+    def parent(self, entry) -> Optional[Any]:
+        raise NotImplementedError
+
+
+    def conforms_to(self, entry, class_name: str) -> bool:
+        raise NotImplementedError
+
+
+    def entry_id(self, entry) -> int:
+        raise NotImplementedError
+
+
+    def nvram(self, variable: str) -> Any:
+        """
+        Return raw NVRAM variable (ex. '4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102:OCLP-Version'), or None
+        """
+        raise NotImplementedError
+
+
+    def firmware_vendor(self) -> Any:
+        raise NotImplementedError
+
+
+    def sysctl(self, name: str) -> Optional[str]:
+        """
+        Return sysctl value as string, or None if unavailable
+        """
+        raise NotImplementedError
+
+
+    def boot_state(self) -> BootState:
+        """
+        Return the BootState described by the backend's NVRAM and sysctls
+        """
+        raise NotImplementedError
+
+
+    def release(self, entry) -> None:
+        pass
+
+
+class LiveIORegistry(IORegistryBackend):
+    """
+    Backend querying the running host's IORegistry through IOKit
+    """
+
+    def matching_services(self, matching: dict) -> Iterator[Any]:
+        if "IOParentMatch" in matching:
+            matching = {
+                **matching,
+                "IOParentMatch": ioreg.corefoundation_to_native(ioreg.IORegistryEntryIDMatching(matching["IOParentMatch"]))
+            }
+        return ioreg.ioiterator_to_list(ioreg.IOServiceGetMatchingServices(ioreg.kIOMasterPortDefault, matching, None)[1])
+
+
+    def properties(self, entry) -> dict:
+        return ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperties(entry, None, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)[1])
+
+
+    def property(self, entry, key: str) -> Any:
+        return ioreg.corefoundation_to_native(ioreg.IORegistryEntryCreateCFProperty(entry, key, ioreg.kCFAllocatorDefault, ioreg.kNilOptions))
+
+
+    def name(self, entry) -> str:
+        return ioreg.io_name_t_to_str(ioreg.IORegistryEntryGetName(entry, None)[1])
+
+
+    def location(self, entry) -> str:
+        return ioreg.io_name_t_to_str(ioreg.IORegistryEntryGetLocationInPlane(entry, "IOService".encode(), None)[1])
+
+
+    def parent(self, entry) -> Optional[Any]:
+        return ioreg.IORegistryEntryGetParentEntry(entry, "IOService".encode(), None)[1]
+
+
+    def conforms_to(self, entry, class_name: str) -> bool:
+        return bool(ioreg.IOObjectConformsTo(entry, class_name.encode()))
+
+
+    def entry_id(self, entry) -> int:
+        return ioreg.IORegistryEntryGetRegistryEntryID(entry, None)[1]
+
+
+    def nvram(self, variable: str) -> Any:
+        return BootState.current().nvram.get(variable)
+
+
+    def firmware_vendor(self) -> Any:
+        return utilities.get_firmware_vendor(decode=False)
+
+
+    def sysctl(self, name: str) -> Optional[str]:
+        if name in SYSCTL_NAMES:
+            return BootState.current().sysctl.get(name)
+        result = subprocess.run(["/usr/sbin/sysctl", "-n", name], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode().strip()
+
+
+    def boot_state(self) -> BootState:
+        return BootState.current()
+
+
+    def release(self, entry) -> None:
+        ioreg.IOObjectRelease(entry)
+
+
+class IORegistryNode:
+    """
+    Single entry of an IORegistry snapshot
+    """
+
+    __slots__ = ("name", "object_class", "location", "entry_id", "properties", "parent", "children", "classes")
+
+    def __init__(self, archive: dict, parent: Optional["IORegistryNode"]) -> None:
+        self.name:         str  = archive.get(REGISTRY_NAME_KEY, "")
+        self.object_class: str  = archive.get(OBJECT_CLASS_KEY, "")
+        self.location:     str  = archive.get(REGISTRY_LOCATION_KEY, "")
+        self.entry_id:     int  = archive.get(REGISTRY_ID_KEY, 0)
+        self.properties:   dict = {key: value for key, value in archive.items() if key not in ARCHIVE_KEYS}
+        self.parent:       Optional[IORegistryNode] = parent
+        self.children:     list = []
+        self.classes:      list = archive.get(OBJECT_INHERITANCE_KEY) or KNOWN_CLASS_INHERITANCE.get(self.object_class, [self.object_class])
+
+
+    def __repr__(self) -> str:
+        return f"<IORegistryNode {self.name}@{self.location} ({self.object_class})>"
+
+
+class SnapshotIORegistry(IORegistryBackend):
+    """
+    Backend answering queries from an 'ioreg -a -l' archive
+
+    The tree is walked once on load, building indexes by class, name and property key,
+    so that every subsequent matching and parent query is served from memory.
+
+    Optionally, a snapshot may be wrapped in a dictionary to carry additional host data:
+        {
+            "IORegistry":      <'ioreg -a -l' output>,
+            "sysctl":          {"machdep.cpu.brand_string": "...", ...},
+            "firmware-vendor": <IODeviceTree:/efi 'firmware-vendor' property>,
+        }
+    """
+
+    offline: bool = True
+
+    def __init__(self, archive, sysctl: dict = None) -> None:
+        self._firmware_vendor = None
+        if isinstance(archive, dict) and "IORegistry" in archive:
+            sysctl = sysctl or archive.get("sysctl", {})
+            self._firmware_vendor = archive.get("firmware-vendor")
+            archive = archive["IORegistry"]
+        if isinstance(archive, list):
+            # 'ioreg -a' without '-r' returns a single root, with '-r' a list of roots
+            archive = {REGISTRY_NAME_KEY: "Root", OBJECT_CLASS_KEY: "IORegistryEntry", REGISTRY_CHILDREN_KEY: archive}
+
+        self._sysctl: dict = sysctl or {}
+
+        self._by_class:    dict = {}  # class name    -> [IORegistryNode]
+        self._by_name:     dict = {}  # entry name    -> [IORegistryNode]
+        self._by_property: dict = {}  # property key  -> [IORegistryNode]
+        self._by_id:       dict = {}  # registry ID   -> IORegistryNode
+
+        self.root: IORegistryNode = self._build_tree(archive)
+
+
+    @classmethod
+    def from_file(cls, path: str) -> "SnapshotIORegistry":
+        """
+        Load snapshot from a plist on disk
+        """
+        with Path(path).open("rb") as file:
+            return cls(plistlib.load(file))
+
+
+    @classmethod
+    def from_host(cls) -> "SnapshotIORegistry":
+        """
+        Capture a snapshot of the running host's IOService plane
+        """
+        result = subprocess.run(["/usr/sbin/ioreg", "-a", "-l", "-p", "IOService"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            raise RuntimeError("Failed to capture IORegistry snapshot")
+        return cls(plistlib.loads(result.stdout))
+
+
+    def _build_tree(self, archive: dict) -> IORegistryNode:
+        root = IORegistryNode(archive, None)
+        stack = [(root, archive)]
+        while stack:
+            node, node_archive = stack.pop()
+            self._index(node)
+            children = []
+            for child_archive in node_archive.get(REGISTRY_CHILDREN_KEY, []):
+                child = IORegistryNode(child_archive, node)
+                node.children.append(child)
+                children.append((child, child_archive))
+            # Visit in registry order (pre-order), keeping indexes ordered like IOKit iterators
+            stack.extend(reversed(children))
+        return root
+
+
+    def _index(self, node: IORegistryNode) -> None:
+        for class_name in node.classes:
+            self._by_class.setdefault(class_name, []).append(node)
+
+        names = {node.name}
+        ioname = node.properties.get("IOName")
+        if isinstance(ioname, bytes):
+            ioname = ioname.strip(b"\0").decode(errors="ignore")
+        if ioname:
+            names.add(ioname)
+        for name in names:
+            self._by_name.setdefault(name, []).append(node)
+
+        for key in node.properties:
+            self._by_property.setdefault(key, []).append(node)
+
+        if node.entry_id:
+            self._by_id[node.entry_id] = node
+
+
+    def _descendants(self, node: IORegistryNode) -> Iterator[IORegistryNode]:
+        stack = list(reversed(node.children))
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(reversed(child.children))
+
+
+    def _property_match(self, node: IORegistryNode, property_match) -> bool:
+        if isinstance(property_match, dict):
+            property_match = [property_match]
+        return any(
+            all(node.properties.get(key) == value for key, value in entry.items())
+            for entry in property_match
+        )
+
+
+    def _filter(self, candidates: Optional[list], nodes: list) -> list:
+        if candidates is None:
+            return nodes
+        allowed = {id(node) for node in nodes}
+        return [node for node in candidates if id(node) in allowed]
+
+
+    def matching_services(self, matching: dict) -> Iterator[IORegistryNode]:
+        candidates: Optional[list] = None
+
+        # Narrow down through the most selective index available
+        if "IONameMatch" in matching:
+            names = matching["IONameMatch"]
+            if not isinstance(names, list):
+                names = [names]
+            candidates = [node for name in names for node in self._by_name.get(name, [])]
+        if "IOProviderClass" in matching:
+            candidates = self._filter(candidates, self._by_class.get(matching["IOProviderClass"], []))
+        if "IOPropertyMatch" in matching:
+            if candidates is None:
+                keys = {key for entry in (matching["IOPropertyMatch"] if isinstance(matching["IOPropertyMatch"], list) else [matching["IOPropertyMatch"]]) for key in entry}
+                candidates = [node for key in keys for node in self._by_property.get(key, [])]
+            candidates = [node for node in candidates if self._property_match(node, matching["IOPropertyMatch"])]
+        if "IOParentMatch" in matching:
+            parent = self._by_id.get(matching["IOParentMatch"])
+            candidates = self._filter(candidates, list(self._descendants(parent)) if parent else [])
+
+        if candidates is None:
+            candidates = list(self._descendants(self.root))
+
+        # Preserve registry order, drop duplicates from multiple name matches
+        seen = set()
+        for node in candidates:
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            yield node
+
+
+    def properties(self, entry: IORegistryNode) -> dict:
+        return dict(entry.properties)
+
+
+    def property(self, entry: IORegistryNode, key: str) -> Any:
+        return entry.properties.get(key)
+
+
+    def name(self, entry: IORegistryNode) -> str:
+        return entry.name
+
+
+    def location(self, entry: IORegistryNode) -> str:
+        if entry.location:
+            return entry.location
+        # Fall back to 'pcidebug' (bus:device:function, decimal) for PCI devices
+        pcidebug = entry.properties.get("pcidebug")
+        if isinstance(pcidebug, str) and pcidebug.count(":") >= 2:
+            _, device, function = pcidebug.split(":")[:3]
+            function = function.partition("(")[0]
+            return f"{int(device):x},{int(function):x}"
+        return ""
+
+
+    def parent(self, entry: IORegistryNode) -> Optional[IORegistryNode]:
+        return entry.parent
+
+
+    def conforms_to(self, entry: IORegistryNode, class_name: str) -> bool:
+        return class_name in entry.classes
+
+
+    def entry_id(self, entry: IORegistryNode) -> int:
+        return entry.entry_id
+
+
+    def nvram(self, variable: str) -> Any:
+        node = next(iter(self._by_class.get("IODTNVRAM", [])), None)
+        if node is None:
+            return None
+        return node.properties.get(variable)
+
+
+    def firmware_vendor(self) -> Any:
+        # Only present in the IODeviceTree plane, thus must be provided alongside IOService snapshots
+        return self._firmware_vendor
+
+
+    def sysctl(self, name: str) -> Optional[str]:
+        value = self._sysctl.get(name)
+        return None if value is None else str(value)
+
+
+    def boot_state(self) -> BootState:
+        node = next(iter(self._by_class.get("IODTNVRAM", [])), None)
+        return BootState(
+            nvram=node.properties if node is not None else {},
+            sysctl={name: str(value) for name, value in self._sysctl.items()},
+        )
+
+
+class HostSnapshotIORegistry(SnapshotIORegistry):
+    """
+    Snapshot of the running host's IOService plane
+
+    Matching and parent queries are served from a single 'ioreg -a -l' pass.
+    The archive lacks class inheritance, thus conformance to CONFORMANCE_CLASSES
+    is resolved through IOKit once per class, by registry ID. NVRAM, sysctls and
+    the firmware vendor are answered by the host, as with LiveIORegistry.
+    """
+
+    offline: bool = False
+
+    def __init__(self, archive, sysctl: dict = None) -> None:
+        super().__init__(archive, sysctl)
+        self._host: LiveIORegistry = LiveIORegistry()
+        self._resolve_conformance()
+
+
+    def _resolve_conformance(self) -> None:
+        if not self._by_id:
+            raise RuntimeError("IORegistry snapshot lacks registry entry IDs")
+
+        nodes = list(self._descendants(self.root))
+        for class_name in CONFORMANCE_CLASSES:
+            entry_ids = set()
+            for entry in self._host.matching_services({"IOProviderClass": class_name}):
+                entry_ids.add(self._host.entry_id(entry))
+                self._host.release(entry)
+
+            # Kept in registry order, like the indexes built on load
+            conforming = [node for node in nodes if node.entry_id in entry_ids]
+            for node in conforming:
+                if class_name not in node.classes:
+                    node.classes = [*node.classes, class_name]
+            self._by_class[class_name] = conforming
+
+
+    def nvram(self, variable: str) -> Any:
+        return self._host.nvram(variable)
+
+
+    def firmware_vendor(self) -> Any:
+        return self._host.firmware_vendor()
+
+
+    def sysctl(self, name: str) -> Optional[str]:
+        return self._host.sysctl(name)
+
+
+    def boot_state(self) -> BootState:
+        return self._host.boot_state()
@@ -4,7 +4,8 @@ os_probe.py: OS Host information
 
 import platform
 import plistlib
-import subprocess
+
+from ..support import query_cache
 
 
 class OSProbe:
@@ -46,7 +47,7 @@ class OSProbe:
             str: OS version (ex. 12.0)
         """
 
-        result = subprocess.run(["/usr/bin/sw_vers", "-productVersion"], stdout=subprocess.PIPE)
+        result = query_cache.run(["/usr/bin/sw_vers", "-productVersion"])
         if result.returncode != 0:
             raise RuntimeError("Failed to detect OS version")
 
@@ -2,12 +2,8 @@
 build.py: Class for generating OpenCore Configurations tailored for Macs
 """
 
-import copy
-import pickle
-import shutil
 import logging
-import zipfile
-import plistlib
+import contextlib
 
 from pathlib import Path
 from datetime import date
@@ -26,18 +22,16 @@ from . import (
     graphics_audio,
     support,
     storage,
+    efi_tree,
+    build_cache,
+    materialize,
+    profile,
     smbios,
     security,
     misc
 )
 
 
-def rmtree_handler(func, path, exc_info) -> None:
-    if exc_info[0] == FileNotFoundError:
-        return
-    raise  # pylint: disable=misplaced-bare-raise
-
-
 class BuildOpenCore:
     """
     Core Build Library for generating and validating OpenCore EFI Configurations
@@ -48,6 +42,8 @@ class BuildOpenCore:
         self.model: str = model
         self.config: dict = None
         self.constants: constants.Constants = global_constants
+        self.tree: efi_tree.EFITree = efi_tree.EFITree(self.constants.opencore_release_folder, materialize.get_materializer(self.constants))
+        self.profile: profile.BuildProfile = profile.BuildProfile(model, bytes_written=lambda: materialize.get_materializer(self.constants).stats["Bytes Written"] + self.tree.stats["Bytes Written"])
 
         self._build_opencore()
 
@@ -60,29 +56,33 @@ class BuildOpenCore:
         utilities.cls()
         logging.info(f"Building Configuration {'for external' if self.constants.custom_model else 'on model'}: {self.model}")
 
-        self._generate_base()
-        self._set_revision()
-
-        # Set Lilu and co.
-        support.BuildSupport(self.model, self.constants, self.config).enable_kext("Lilu.kext", self.constants.lilu_version, self.constants.lilu_path)
-        self.config["Kernel"]["Quirks"]["DisableLinkeditJettison"] = True
-
-        # macOS Sequoia support for Lilu plugins
-        self.config["NVRAM"]["Add"]["7C436110-AB2A-4BBB-A880-FE41995C9F82"]["boot-args"] += " -lilubetaall"
-
-        # Call support functions
-        for function in [
-            firmware.BuildFirmware,
-            wired.BuildWiredNetworking,
-            wireless.BuildWirelessNetworking,
-            graphics_audio.BuildGraphicsAudio,
-            bluetooth.BuildBluetooth,
-            storage.BuildStorage,
-            smbios.BuildSMBIOS,
-            security.BuildSecurity,
-            misc.BuildMiscellaneous
-        ]:
-            function(self.model, self.constants, self.config)
+        with self.profile.span("Generate Base"):
+            self._generate_base()
+            self._set_revision()
+
+        with self.profile.span("Generate Config"):
+            # Set Lilu and co.
+            with self.profile.span("Lilu"):
+                support.BuildSupport(self.model, self.constants, self.config).enable_kext("Lilu.kext", self.constants.lilu_version, self.constants.lilu_path)
+            self.config["Kernel"]["Quirks"]["DisableLinkeditJettison"] = True
+
+            # macOS Sequoia support for Lilu plugins
+            self.config["NVRAM"]["Add"]["7C436110-AB2A-4BBB-A880-FE41995C9F82"]["boot-args"] += " -lilubetaall"
+
+            # Call support functions
+            for function in [
+                firmware.BuildFirmware,
+                wired.BuildWiredNetworking,
+                wireless.BuildWirelessNetworking,
+                graphics_audio.BuildGraphicsAudio,
+                bluetooth.BuildBluetooth,
+                storage.BuildStorage,
+                smbios.BuildSMBIOS,
+                security.BuildSecurity,
+                misc.BuildMiscellaneous
+            ]:
+                with self.profile.span(function.__name__):
+                    function(self.model, self.constants, self.config)
 
         # Work-around ocvalidate
         if self.constants.validate is False:
@@ -95,28 +95,14 @@ class BuildOpenCore:
         Generate OpenCore base folder and config
         """
 
-        if not Path(self.constants.build_path).exists():
-            logging.info("Creating build folder")
-            Path(self.constants.build_path).mkdir()
-        else:
-            logging.info("Build folder already present, skipping")
-
-        if Path(self.constants.opencore_zip_copied).exists():
-            logging.info("Deleting old copy of OpenCore zip")
-            Path(self.constants.opencore_zip_copied).unlink()
-        if Path(self.constants.opencore_release_folder).exists():
-            logging.info("Deleting old copy of OpenCore folder")
-            shutil.rmtree(self.constants.opencore_release_folder, onerror=rmtree_handler, ignore_errors=True)
-
         logging.info("")
         logging.info(f"- Adding OpenCore v{self.constants.opencore_version} {'DEBUG' if self.constants.opencore_debug is True else 'RELEASE'}")
-        shutil.copy(self.constants.opencore_zip_source, self.constants.build_path)
-        zipfile.ZipFile(self.constants.opencore_zip_copied).extractall(self.constants.build_path)
+        self.tree.install(self.constants.opencore_zip_source, self.constants.build_path)
 
         # Setup config.plist for editing
         logging.info("- Adding config.plist for OpenCore")
-        shutil.copy(self.constants.plist_template, self.constants.oc_folder)
-        self.config = plistlib.load(Path(self.constants.plist_path).open("rb"))
+        self.tree.copy(self.constants.plist_template, self.constants.oc_folder)
+        self.config = self.tree.read_plist(self.constants.plist_path)
 
 
     def _set_revision(self) -> None:
@@ -127,9 +113,7 @@ class BuildOpenCore:
         self.config["#Revision"]["Build-Version"] = f"{self.constants.patcher_version} - {date.today()}"
         if not self.constants.custom_model:
             self.config["#Revision"]["Build-Type"] = "OpenCore Built on Target Machine"
-            computer_copy = copy.copy(self.constants.computer)
-            computer_copy.ioregistry = None
-            self.config["#Revision"]["Hardware-Probe"] = pickle.dumps(computer_copy)
+            self.config["#Revision"]["Hardware-Probe"] = build_cache.hardware_probe(self.constants.computer)
         else:
             self.config["#Revision"]["Build-Type"] = "OpenCore Built for External Machine"
         self.config["#Revision"]["OpenCore-Version"] = f"{self.constants.opencore_version} - {'DEBUG' if self.constants.opencore_debug is True else 'RELEASE'}"
@@ -140,10 +124,45 @@ class BuildOpenCore:
 
     def _save_config(self) -> None:
         """
-        Save config.plist to disk
+        Save config.plist to the EFI tree
         """
 
-        plistlib.dump(self.config, Path(self.constants.plist_path).open("wb"), sort_keys=True)
+        self.tree.write_plist(self.constants.plist_path, self.config)
+
+
+    def _write_efi(self) -> None:
+        """
+        Write the EFI tree to the build folder
+        """
+
+        if not Path(self.constants.build_path).exists():
+            logging.info("Creating build folder")
+            Path(self.constants.build_path).mkdir()
+        else:
+            logging.info("Build folder already present, skipping")
+
+        if Path(self.constants.opencore_zip_copied).exists():
+            logging.info("Deleting old copy of OpenCore zip")
+            Path(self.constants.opencore_zip_copied).unlink()
+
+        self.tree.flush()
+
+
+    def _generate_efi(self) -> None:
+        """
+        Generate the OpenCore configuration and EFI tree, then validate them
+        """
+
+        self._build_efi()
+        if self.constants.allow_oc_everywhere is False or self.constants.allow_native_spoofs is True or (self.constants.custom_serial_number != "" and self.constants.custom_board_serial_number != ""):
+            with self.profile.span("Set SMBIOS"):
+                smbios.BuildSMBIOS(self.model, self.constants, self.config).set_smbios()
+        with self.profile.span("Cleanup"):
+            support.BuildSupport(self.model, self.constants, self.config).cleanup()
+        with self.profile.span("Save Config"):
+            self._save_config()
+        with self.profile.span("Validate Pathing"):
+            support.BuildSupport(self.model, self.constants, self.config).validate_pathing()
 
 
     def _build_opencore(self) -> None:
@@ -151,22 +170,68 @@ class BuildOpenCore:
         Kick off the build process
 
         This is the main function:
-        - Generates the OpenCore configuration
-        - Cleans working directory
+        - Restores a cached build with identical inputs, or
+        - Generates and validates the OpenCore configuration in memory
+        - Writes the EFI to the build folder, unless a dry run
         - Signs files
-        - Validates generated EFI
+        - Caches the build, when its inputs are deterministic
         """
 
-        # Generate OpenCore Configuration
-        self._build_efi()
-        if self.constants.allow_oc_everywhere is False or self.constants.allow_native_spoofs is True or (self.constants.custom_serial_number != "" and self.constants.custom_board_serial_number != ""):
-            smbios.BuildSMBIOS(self.model, self.constants, self.config).set_smbios()
-        support.BuildSupport(self.model, self.constants, self.config).cleanup()
-        self._save_config()
-
-        # Post-build handling
-        support.BuildSupport(self.model, self.constants, self.config).sign_files()
-        support.BuildSupport(self.model, self.constants, self.config).validate_pathing()
+        global_constants = self.constants
+        materializer = materialize.get_materializer(global_constants)
+        materializer.reset_stats()
+
+        cache = None
+        cached_build = None
+        recorder = None
+        if global_constants.efi_build_cache is True:
+            cache = build_cache.BuildCache(materializer)
+            cached_build = cache.lookup(self.model, global_constants)
+            if cached_build is None:
+                # Builders read settings through the recorder, noting the build's inputs
+                recorder = build_cache.InputRecorder(global_constants)
+                self.constants = recorder
+
+        with self.profile, self.tree, recorder or contextlib.nullcontext():
+            try:
+                if cached_build is not None:
+                    with self.profile.span("Restore Cached Build"):
+                        self.tree.restore(cached_build)
+                        self.config = self.tree.read_plist(global_constants.plist_path)
+                else:
+                    self._generate_efi()
+
+                if global_constants.efi_dry_run is False:
+                    with self.profile.span("Write EFI"):
+                        self._write_efi()
+
+                    # Post-build handling
+                    with self.profile.span("Sign Files"):
+                        support.BuildSupport(self.model, self.constants, self.config).sign_files()
+
+                if recorder is not None:
+                    with self.profile.span("Cache Build"):
+                        cache.store(self.model, recorder, self.tree)
+
+                if materializer.pruned is False:
+                    with self.profile.span("Prune Payload Store"):
+                        materializer.prune(keep=build_cache.BuildCache(materializer).referenced_objects())
+            finally:
+                self.constants = global_constants
+                # Kept on failure, to see which stage was reached
+                if self.constants.efi_dry_run is False:
+                    self.profile.save(self.constants.efi_build_profile_path)
+
+        materializer.log_stats()
+        self.profile.log_summary()
+
+        if self.constants.efi_dry_run is True:
+            logging.info("")
+            logging.info(f"Dry run of the OpenCore EFI for {self.model} passed validation, nothing was written")
+            logging.info("")
+            return
+
+        self.tree.log_stats()
 
         logging.info("")
         logging.info(f"Your OpenCore EFI for {self.model} has been built at:")
@@ -0,0 +1,348 @@
+"""
+build_cache.py: Input-keyed cache of EFI build results
+
+While a build runs, its inputs are recorded. These are the constants
+fields the builders read, as resolved values, so payload paths carry their
+versions. The hardware probe counts as one of those fields when read. Host
+state read besides constants (ie. the ROM's firmware features) and the
+payload files added to the EFI tree are recorded too. A fingerprint of
+those inputs, the model, the build date and OCLP-R's sources keys the built
+tree, kept as payload store objects. Rebuilding with the same inputs
+restores the stored tree and config.plist instead of running the builders.
+
+Which fields a build reads depends on the build, so each model's index
+lists the field sets its builds have read. A lookup fingerprints the
+current values of each set in turn.
+
+Builds with nondeterministic inputs report them with
+record_nondeterministic() and are not stored. Examples are generated
+serials and SystemUUIDs, and vault keys.
+
+Usage:
+    >>> from oclp_r.efi_builder import build_cache
+    >>> cache = build_cache.BuildCache(materializer)
+    >>> entry = cache.lookup(model, constants)
+    >>> if entry is None:
+    >>>     with build_cache.InputRecorder(constants) as recorder:
+    >>>         ...  # Build, reading settings from recorder
+    >>>     cache.store(model, recorder, tree)
+"""
+
+import copy
+import json
+import pickle
+import hashlib
+import logging
+
+from typing import Optional
+from pathlib import Path, PurePath
+from datetime import date
+
+from .. import constants
+
+from ..support import utilities
+from ..detections import device_probe
+
+from . import materialize, efi_tree
+
+
+CACHE_VERSION: int = 1  # Bumped when the entry format or fingerprint changes
+
+# Field sets remembered per model, most recently built first
+MAX_INPUT_SETS: int = 8
+
+# Fields read during a build that do not affect its output
+IGNORED_FIELDS: list = [
+    "efi_build_cache",
+    "efi_build_profile_path",
+    "efi_dry_run",
+    "efi_materialization",
+    "payload_store_path",
+]
+
+# Host state builders read besides constants, resolved again on lookup
+HOST_INPUTS: dict = {
+    "firmware-features": lambda: utilities.get_rom("firmware-features"),
+}
+
+ACTIVE_RECORDER = None  # InputRecorder of the build in progress, if any
+
+_code_stamp = None
+
+
+def record_nondeterministic(reason: str) -> None:
+    """
+    Mark the active build's output as not reproducible from its inputs (ie. a generated serial), so it is not stored
+    """
+    if ACTIVE_RECORDER is not None:
+        ACTIVE_RECORDER.nondeterministic.append(reason)
+
+
+def record_host_input(name: str) -> None:
+    """
+    Note host state read by the active build (see HOST_INPUTS), making it part of the fingerprint
+    """
+    if ACTIVE_RECORDER is not None:
+        ACTIVE_RECORDER.inputs[f"host:{name}"] = canonical(HOST_INPUTS[name]())
+
+
+def hardware_probe(computer: device_probe.Computer) -> bytes:
+    """
+    Pickled hardware probe, without the IORegistry handle and probe timings
+    """
+    computer_copy = copy.copy(computer)
+    if hasattr(computer_copy, "_registry"):
+        del computer_copy._registry
+    computer_copy.probe_durations = {}
+    return pickle.dumps(computer_copy)
+
+
+def canonical(value):
+    """
+    JSON serializable form of a field's value, for fingerprinting
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, PurePath):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, device_probe.Computer):
+        return hashlib.sha256(hardware_probe(value)).hexdigest()
+    try:
+        return hashlib.sha256(pickle.dumps(value)).hexdigest()
+    except Exception:
+        # Unpicklable values never match, their build is rebuilt each time
+        return repr(value)
+
+
+def file_stamp(path: Path) -> Optional[list]:
+    """
+    Size and modification time of a payload file, None if missing
+
+    Identifies the file without hashing it, as the payload store does for archives
+    """
+    try:
+        path_stat = Path(path).stat()
+    except OSError:
+        return None
+    return [path_stat.st_size, path_stat.st_mtime_ns]
+
+
+def code_stamp() -> str:
+    """
+    Digest of OCLP-R's source file stamps, so builder changes invalidate entries
+
+    Empty in bundled builds without sources, where the recorded patcher version covers it
+    """
+    global _code_stamp
+    if _code_stamp is None:
+        package_path = Path(__file__).parent.parent
+        stamps = [(path.relative_to(package_path).as_posix(), file_stamp(path)) for path in sorted(package_path.rglob("*.py"))]
+        _code_stamp = hashlib.sha256(json.dumps(stamps).encode()).hexdigest() if stamps else ""
+    return _code_stamp
+
+
+class InputRecorder:
+    """
+    Stand-in for Constants, noting each field read by a build
+
+    Values are recorded on first read, before any builder could alter them
+    """
+
+    def __init__(self, global_constants: constants.Constants) -> None:
+        """
+        Parameters:
+            global_constants (Constants): Settings of the build
+        """
+        object.__setattr__(self, "_constants", global_constants)
+        object.__setattr__(self, "inputs", {})            # Field -> canonical value
+        object.__setattr__(self, "nondeterministic", [])  # Reasons the output cannot be reproduced
+
+
+    def __getattr__(self, name: str):
+        value = getattr(self._constants, name)
+        if name not in self.inputs and name not in IGNORED_FIELDS:
+            self.inputs[name] = canonical(value)
+        return value
+
+
+    def __setattr__(self, name: str, value) -> None:
+        self.nondeterministic.append(f"Build changed constants.{name}")
+        setattr(self._constants, name, value)
+
+
+    def changed_fields(self) -> list:
+        """
+        Fields whose value changed since first read, ie. the hardware probe edited in place by a builder
+        """
+        return [field for field, value in self.inputs.items() if not field.startswith("host:") and canonical(getattr(self._constants, field)) != value]
+
+
+    def __enter__(self) -> "InputRecorder":
+        global ACTIVE_RECORDER
+        ACTIVE_RECORDER = self
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        global ACTIVE_RECORDER
+        if ACTIVE_RECORDER is self:
+            ACTIVE_RECORDER = None
+
+
+def fingerprint(model: str, inputs: dict) -> str:
+    """
+    Build fingerprint
+
+    Parameters:
+        model  (str):  Model being built for
+        inputs (dict): Field -> canonical value
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    return hashlib.sha256(json.dumps({
+        "Version": CACHE_VERSION,
+        "Model":   model,
+        "Date":    date.today().isoformat(),  # Stamped into config.plist's Build-Version
+        "Code":    code_stamp(),
+        "Inputs":  inputs,
+    }, sort_keys=True).encode()).hexdigest()
+
+
+class BuildCache:
+    """
+    Built EFI trees keyed by their fingerprint, stored next to the payload store's objects
+    """
+
+    def __init__(self, materializer: materialize.PayloadMaterializer) -> None:
+        """
+        Parameters:
+            materializer (PayloadMaterializer): Store holding the built files
+        """
+        self.materializer: materialize.PayloadMaterializer = materializer
+
+        self.cache_path: Path = materializer.store_path / "builds"
+        self.index_path: Path = self.cache_path / "index"
+
+
+    def lookup(self, model: str, global_constants: constants.Constants) -> Optional[dict]:
+        """
+        Stored build matching the current settings, if any
+
+        Returns:
+            dict: Entry to restore with EFITree.restore(), None on a miss
+        """
+        for fields in self._input_sets(model):
+            try:
+                inputs = {field: canonical(self._resolve(global_constants, field)) for field in fields}
+            except Exception:
+                continue
+            key = fingerprint(model, inputs)
+            entry = self._read_json(self.cache_path / f"{key}.json")
+            if entry is None or self._is_current(entry) is False:
+                continue
+            logging.info(f"- Reusing cached build {key[:12]} for {model}, {len(inputs)} inputs unchanged")
+            return entry
+        return None
+
+
+    def store(self, model: str, recorder: InputRecorder, tree: efi_tree.EFITree) -> None:
+        """
+        Store a finished build, unless its inputs were nondeterministic
+        """
+        # A cached build could not repeat changes made to its inputs
+        reasons = recorder.nondeterministic + [f"Build changed constants.{field}" for field in recorder.changed_fields()]
+        if reasons:
+            logging.info(f"- Not caching build, output is nondeterministic: {', '.join(sorted(set(reasons)))}")
+            return
+
+        key = fingerprint(model, recorder.inputs)
+        entry = {
+            "Model":   model,
+            "Date":    date.today().isoformat(),
+            "Sources": {str(source): file_stamp(source) for source in sorted(tree.sources)},
+            **tree.snapshot(),
+        }
+
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        self._write_json(self.cache_path / f"{key}.json", entry)
+
+        fields = sorted(recorder.inputs)
+        input_sets = [fields] + [input_set for input_set in self._input_sets(model) if input_set != fields]
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        self._write_json(self._index_file(model), input_sets[:MAX_INPUT_SETS])
+
+        logging.info(f"- Cached build {key[:12]} for {model}: {len(recorder.inputs)} inputs, {len(entry['Files'])} files")
+
+
+    def referenced_objects(self) -> set:
+        """
+        Store objects of entries still usable, for PayloadMaterializer.prune()
+
+        Entries whose payload files changed are removed, they can no longer be restored
+        """
+        digests = set()
+        for entry_path in self.cache_path.glob("*.json"):
+            entry = self._read_json(entry_path)
+            try:
+                if any(file_stamp(Path(source)) != stamp for source, stamp in entry["Sources"].items()):
+                    entry_path.unlink()
+                    continue
+                digests.update(entry["Files"].values())
+            except (OSError, KeyError, TypeError, AttributeError):
+                continue
+        return digests
+
+
+    def _resolve(self, global_constants: constants.Constants, field: str):
+        if field.startswith("host:"):
+            return HOST_INPUTS[field[len("host:"):]]()
+        return getattr(global_constants, field)
+
+
+    def _is_current(self, entry: dict) -> bool:
+        """
+        Whether the entry's payload files are unchanged and its objects still stored
+        """
+        if any(file_stamp(Path(source)) != stamp for source, stamp in entry["Sources"].items()):
+            return False
+        return all(self.materializer.object_path(digest).exists() for digest in set(entry["Files"].values()))
+
+
+    def _prune(self) -> None:
+        """
+        Remove entries of previous days, their fingerprints can no longer match
+        """
+        today = date.today()
+        for entry_path in self.cache_path.glob("*.json"):
+            try:
+                if date.fromtimestamp(entry_path.stat().st_mtime) != today:
+                    entry_path.unlink()
+            except OSError:
+                pass
+
+
+    def _input_sets(self, model: str) -> list:
+        return self._read_json(self._index_file(model)) or []
+
+
+    def _index_file(self, model: str) -> Path:
+        return self.index_path / f"{hashlib.sha256(model.encode()).hexdigest()}.json"
+
+
+    def _read_json(self, path: Path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+
+    def _write_json(self, path: Path, data) -> None:
+        temporary_path = path.with_name(f".{path.name}.tmp")
+        temporary_path.write_text(json.dumps(data))
+        temporary_path.replace(path)
@@ -0,0 +1,375 @@
+"""
+efi_tree.py: In-memory overlay of the EFI build output
+
+Builders add, read and edit files of the build output through the overlay
+rather than the build folder. Members reference their source (a payload
+store object or payload file) until read, and edits are held in memory as
+dirty members. Validation inspects the overlay directly, and the build
+folder is written once by flush(), which dry-run builds skip.
+
+Usage:
+    >>> from oclp_r.efi_builder import efi_tree
+    >>> with efi_tree.EFITree(constants.opencore_release_folder, materializer) as tree:
+    >>>     tree.install(constants.lilu_path, constants.kexts_path)
+    >>>     info = tree.read_plist(constants.kexts_path / "Lilu.kext/Contents/Info.plist")
+    >>>     tree.write_plist(constants.kexts_path / "Lilu.kext/Contents/Info.plist", info)
+    >>>     tree.flush()
+"""
+
+import os
+import io
+import errno
+import shutil
+import zipfile
+import logging
+import plistlib
+
+from typing import Optional
+from pathlib import Path
+from dataclasses import dataclass
+
+from . import materialize
+
+
+ACTIVE_TREE = None  # EFITree of the build in progress, if any
+
+
+def active() -> "EFITree":
+    """
+    EFITree of the build in progress
+    """
+    if ACTIVE_TREE is None:
+        raise RuntimeError("No EFI build in progress")
+    return ACTIVE_TREE
+
+
+@dataclass
+class TreeMember:
+    source: Optional[Path] = None   # File holding the contents, read on demand
+    stored: bool = False            # Source is a payload store object
+    data:   Optional[bytes] = None  # Contents written through the overlay
+    plist:  Optional[dict] = None   # Plist written through the overlay, serialized on flush
+
+    @property
+    def dirty(self) -> bool:
+        return self.data is not None or self.plist is not None
+
+
+    def read(self) -> bytes:
+        if self.plist is not None:
+            return plistlib.dumps(self.plist, sort_keys=True)
+        if self.data is not None:
+            return self.data
+        return self.source.read_bytes()
+
+
+class EFITree:
+    """
+    Files and folders of an EFI build, relative to the build's root folder
+    """
+
+    def __init__(self, root: str, materializer: materialize.PayloadMaterializer) -> None:
+        """
+        Parameters:
+            root         (str):                 Folder the tree is flushed to (ie. OpenCore-Build)
+            materializer (PayloadMaterializer): Store payloads are installed from
+        """
+        self.root:         Path = Path(root)
+        self.materializer: materialize.PayloadMaterializer = materializer
+
+        self._members: dict = {}     # Relative path -> TreeMember
+        self._folders: set  = set()  # Relative paths of folders, including empty ones
+
+        self.sources: set = set()  # Payload files added to the tree
+
+        self.stats: dict = {
+            "Written":       0,
+            "Unchanged":     0,
+            "Removed":       0,
+            "Bytes Written": 0,
+        }
+
+
+    def __enter__(self) -> "EFITree":
+        global ACTIVE_TREE
+        ACTIVE_TREE = self
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        global ACTIVE_TREE
+        if ACTIVE_TREE is self:
+            ACTIVE_TREE = None
+
+
+    def relative(self, path: str) -> str:
+        """
+        Path within the tree, '/' separated, raises ValueError if outside the root
+        """
+        return Path(path).relative_to(self.root).as_posix()
+
+
+    def install(self, source: str, destination_folder: str) -> None:
+        """
+        Add a payload from the store, zip archives are expanded (as extractall() would)
+
+        destination_folder may be above the root (ie. the OpenCore archive, holding 'OpenCore-Build/'),
+        as long as the payload's files land within it
+        """
+        destination_folder = Path(destination_folder)
+        self.sources.add(Path(source))
+        for relative_path, object_path in self.materializer.objects(source):
+            path = self.relative(destination_folder / relative_path)
+            if object_path is None:
+                self._add_folder(path)
+                continue
+            self._add_member(path, TreeMember(source=object_path, stored=True))
+
+
+    def copy(self, source: str, destination_folder: str) -> None:
+        """
+        Add a file into a folder, keeping its name
+        """
+        self.add_file(Path(destination_folder) / Path(source).name, source)
+
+
+    def add_file(self, destination: str, source: str) -> None:
+        """
+        Add a file, its contents are read from source when needed
+        """
+        source = Path(source)
+        if not source.is_file():
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(source))
+        self.sources.add(source)
+        self._add_member(self.relative(destination), TreeMember(source=source))
+
+
+    def mkdir(self, path: str) -> None:
+        self._add_folder(self.relative(path))
+
+
+    def read_bytes(self, path: str) -> bytes:
+        return self._member(path).read()
+
+
+    def write_bytes(self, path: str, data: bytes) -> None:
+        self._add_member(self.relative(path), TreeMember(data=data))
+
+
+    def read_plist(self, path: str) -> dict:
+        """
+        Parsed plist member, changes must be saved with write_plist()
+        """
+        member = self._member(path)
+        if member.plist is not None:
+            return member.plist
+        return plistlib.loads(member.read())
+
+
+    def write_plist(self, path: str, data: dict) -> None:
+        self._add_member(self.relative(path), TreeMember(plist=data))
+
+
+    def exists(self, path: str) -> bool:
+        relative_path = self.relative(path)
+        return relative_path in self._members or relative_path in self._folders
+
+
+    def is_dir(self, path: str) -> bool:
+        return self.relative(path) in self._folders
+
+
+    def iterdir(self, path: str) -> list:
+        """
+        Paths of a folder's direct children
+        """
+        folder = self.relative(path)
+        prefix = "" if folder == "." else f"{folder}/"
+        names = {relative_path[len(prefix):].split("/", 1)[0] for relative_path in [*self._members, *self._folders] if relative_path.startswith(prefix) and relative_path != folder}
+        return [Path(path) / name for name in sorted(names)]
+
+
+    def walk(self, path: str):
+        """
+        os.walk() over the tree, top-down
+
+        Yields:
+            tuple: (relative folder ('' for path itself), folder names, file names)
+        """
+        top = self.relative(path)
+        prefix = "" if top == "." else f"{top}/"
+        children = {}
+        for relative_path in sorted([*self._folders, *self._members]):
+            if relative_path == top or not relative_path.startswith(prefix):
+                continue
+            parent, _, name = relative_path[len(prefix):].rpartition("/")
+            children.setdefault(parent, ([], []))[0 if relative_path in self._folders else 1].append(name)
+
+        pending = [""]
+        while pending:
+            folder = pending.pop(0)
+            folders, files = children.get(folder, ([], []))
+            yield folder, folders, files
+            pending.extend(f"{folder}/{name}" if folder else name for name in folders)
+
+
+    def files(self, path: str) -> list:
+        """
+        Paths of every file under a folder
+        """
+        prefix = f"{self.relative(path)}/"
+        return [self.root / relative_path for relative_path in sorted(self._members) if prefix == "./" or relative_path.startswith(prefix)]
+
+
+    def folders(self) -> list:
+        return [self.root / folder for folder in sorted(self._folders)]
+
+
+    def remove(self, path: str) -> None:
+        """
+        Remove a file, or a folder and everything within it
+        """
+        relative_path = self.relative(path)
+        if relative_path not in self._members and relative_path not in self._folders:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
+        prefix = f"{relative_path}/"
+        self._members = {key: member for key, member in self._members.items() if key != relative_path and not key.startswith(prefix)}
+        self._folders = {folder for folder in self._folders if folder != relative_path and not folder.startswith(prefix)}
+
+
+    def move(self, source: str, destination: str) -> None:
+        """
+        Move a file, as shutil.move() would
+        """
+        member = self._member(source)
+        self.remove(source)
+        self._add_member(self.relative(destination), member)
+
+
+    def extract(self, path: str, destination_folder: str) -> None:
+        """
+        Expand a zip member into a folder
+        """
+        destination_folder = Path(destination_folder)
+        with zipfile.ZipFile(io.BytesIO(self.read_bytes(path))) as zip_file:
+            for info in zip_file.infolist():
+                # Matches ZipFile.extractall()'s sanitization
+                relative_path = "/".join(part for part in info.filename.replace("\\", "/").split("/") if part not in ["", ".", ".."])
+                if not relative_path:
+                    continue
+                if info.is_dir():
+                    self._add_folder(self.relative(destination_folder / relative_path))
+                    continue
+                self._add_member(self.relative(destination_folder / relative_path), TreeMember(data=zip_file.read(info)))
+
+
+    def flush(self) -> None:
+        """
+        Write the tree to the root folder
+
+        Files and folders not in the tree are removed, files already matching are left untouched
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._prune()
+
+        for folder in sorted(self._folders):
+            (self.root / folder).mkdir(parents=True, exist_ok=True)
+
+        for relative_path, member in sorted(self._members.items()):
+            destination = self.root / relative_path
+            if member.stored is True and member.dirty is False:
+                self.materializer.materialize(member.source, destination)
+                continue
+            self._write(destination, member.read())
+
+
+    def snapshot(self) -> dict:
+        """
+        Add every file of the tree to the materializer's store
+
+        Returns:
+            dict: 'Files' (relative path -> digest) and 'Folders' (relative paths), see restore()
+        """
+        files = {}
+        for relative_path, member in sorted(self._members.items()):
+            if member.stored is True and member.dirty is False:
+                files[relative_path] = member.source.name
+                continue
+            files[relative_path] = self.materializer.store(member.read()).name
+        return {"Files": files, "Folders": sorted(self._folders)}
+
+
+    def restore(self, snapshot: dict) -> None:
+        """
+        Replace the tree's contents with a snapshot()
+        """
+        self._members = {relative_path: TreeMember(source=self.materializer.object_path(digest), stored=True) for relative_path, digest in snapshot["Files"].items()}
+        self._folders = set(snapshot["Folders"])
+
+
+    def log_stats(self) -> None:
+        logging.info(f"- Flushed EFI tree: {len(self._members)} files, {self.stats['Written']} written, {self.stats['Unchanged']} unchanged, {self.stats['Removed']} removed, {self.stats['Bytes Written']} bytes written")
+
+
+    def _member(self, path: str) -> TreeMember:
+        try:
+            return self._members[self.relative(path)]
+        except KeyError:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path)) from None
+
+
+    def _add_member(self, relative_path: str, member: TreeMember) -> None:
+        if relative_path in self._folders:
+            raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), str(self.root / relative_path))
+        self._members[relative_path] = member
+        self._add_folder(relative_path.rpartition("/")[0])
+
+
+    def _add_folder(self, relative_path: str) -> None:
+        while relative_path not in ["", "."] and relative_path not in self._folders:
+            self._folders.add(relative_path)
+            relative_path = relative_path.rpartition("/")[0]
+
+
+    def _prune(self) -> None:
+        """
+        Remove anything on disk the tree does not contain
+        """
+        root = str(self.root)
+        for directory, folders, files in os.walk(root, topdown=False):
+            relative_directory = directory[len(root) + 1:]
+            for name in files:
+                relative_path = f"{relative_directory}/{name}" if relative_directory else name
+                if relative_path not in self._members:
+                    os.unlink(os.path.join(directory, name))
+                    self.stats["Removed"] += 1
+            for name in folders:
+                relative_path = f"{relative_directory}/{name}" if relative_directory else name
+                path = os.path.join(directory, name)
+                if os.path.islink(path):
+                    os.unlink(path)
+                    self.stats["Removed"] += 1
+                elif relative_path not in self._folders:
+                    shutil.rmtree(path)
+                    self.stats["Removed"] += 1
+
+
+    def _write(self, destination: Path, data: bytes) -> None:
+        """
+        Write a file unless it already holds data
+
+        Written to a temporary file first, as the destination may be a hardlink to the store
+        """
+        try:
+            if destination.stat().st_size == len(data) and destination.read_bytes() == data:
+                self.stats["Unchanged"] += 1
+                return
+        except FileNotFoundError:
+            pass
+
+        temporary_path = destination.with_name(f".{destination.name}.flush")
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, destination)
+        self.stats["Written"] += 1
+        self.stats["Bytes Written"] += len(data)
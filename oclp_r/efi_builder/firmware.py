@@ -2,13 +2,12 @@
 firmware.py: Class for handling CPU and Firmware Patches, invocation from build.py
 """
 
-import shutil
 import logging
 import binascii
 
 from pathlib import Path
 
-from . import support
+from . import support, efi_tree
 
 from .. import constants
 
@@ -133,7 +132,7 @@ class BuildFirmware:
         if smbios_data.smbios_dictionary[self.model]["CPU Generation"] == cpu_data.CPUGen.nehalem.value and not (self.model.startswith("MacPro") or self.model.startswith("Xserve")):
             logging.info("- Adding SSDT-CPBG.aml")
             support.BuildSupport(self.model, self.constants, self.config).get_item_by_kv(self.config["ACPI"]["Add"], "Path", "SSDT-CPBG.aml")["Enabled"] = True
-            shutil.copy(self.constants.pci_ssdt_path, self.constants.acpi_path)
+            efi_tree.active().copy(self.constants.pci_ssdt_path, self.constants.acpi_path)
 
         if cpu_data.CPUGen.sandy_bridge <= smbios_data.smbios_dictionary[self.model]["CPU Generation"] <= cpu_data.CPUGen.ivy_bridge.value and self.model != "MacPro6,1":
             # Based on: https://egpu.io/forums/pc-setup/fix-dsdt-override-to-correct-error-12/
@@ -141,7 +140,7 @@ class BuildFirmware:
             logging.info("- Enabling Windows 10 UEFI Audio support")
             support.BuildSupport(self.model, self.constants, self.config).get_item_by_kv(self.config["ACPI"]["Add"], "Path", "SSDT-PCI.aml")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_item_by_kv(self.config["ACPI"]["Patch"], "Comment", "BUF0 to BUF1")["Enabled"] = True
-            shutil.copy(self.constants.windows_ssdt_path, self.constants.acpi_path)
+            efi_tree.active().copy(self.constants.windows_ssdt_path, self.constants.acpi_path)
 
 
     def _cpu_compatibility_handling(self) -> None:
@@ -221,40 +220,40 @@ class BuildFirmware:
         # must be replaced with the macOS 15 APFS EFI driver.
         logging.info("- Enabling macOS 26 FileVault 2 support")
         self.config["UEFI"]["APFS"]["EnableJumpstart"] = False
-        shutil.copy(self.constants.sequoia_apfs_driver_path, self.constants.drivers_path)
+        efi_tree.active().copy(self.constants.sequoia_apfs_driver_path, self.constants.drivers_path)
         support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("apfs_aligned.efi", "UEFI", "Drivers")["Enabled"] = True
         # Exfat check
         if smbios_data.smbios_dictionary[self.model]["CPU Generation"] < cpu_data.CPUGen.sandy_bridge.value:
             # Sandy Bridge and newer Macs natively support ExFat
             logging.info("- Adding ExFatDxeLegacy.efi")
-            shutil.copy(self.constants.exfat_legacy_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.exfat_legacy_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("ExFatDxeLegacy.efi", "UEFI", "Drivers")["Enabled"] = True
 
         # NVMe check
         if self.constants.nvme_boot is True:
             logging.info("- Enabling NVMe boot support")
-            shutil.copy(self.constants.nvme_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.nvme_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("NvmExpressDxe.efi", "UEFI", "Drivers")["Enabled"] = True
 
         # USB check
         if self.constants.xhci_boot is True:
             logging.info("- Adding USB 3.0 Controller Patch")
             logging.info("- Adding XhciDxe.efi and UsbBusDxe.efi")
-            shutil.copy(self.constants.xhci_driver_path, self.constants.drivers_path)
-            shutil.copy(self.constants.usb_bus_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.xhci_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.usb_bus_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("XhciDxe.efi", "UEFI", "Drivers")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("UsbBusDxe.efi", "UEFI", "Drivers")["Enabled"] = True
 
         # PCIe Link Rate check
         if self.model == "MacPro3,1":
             logging.info("- Adding PCIe Link Rate Patch")
-            shutil.copy(self.constants.link_rate_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.link_rate_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("FixPCIeLinkRate.efi", "UEFI", "Drivers")["Enabled"] = True
 
         # CSM check
         # For model support, check for GUID in firmware and as well as Bootcamp Assistant's Info.plist ('PreUEFIModels' key)
         # Ref: https://github.com/acidanthera/OpenCorePkg/blob/0.9.5/Platform/OpenLegacyBoot/OpenLegacyBoot.c#L19
-        if Path(self.constants.drivers_path / Path("OpenLegacyBoot.efi")).exists():
+        if efi_tree.active().exists(self.constants.drivers_path / Path("OpenLegacyBoot.efi")):
             # if smbios_data.smbios_dictionary[self.model]["CPU Generation"] <= cpu_data.CPUGen.ivy_bridge.value and self.model != "MacPro6,1":
             #     logging.info("- Enabling CSM support")
             #     support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("OpenLegacyBoot.efi", "UEFI", "Drivers")["Enabled"] = True
@@ -264,7 +263,7 @@ class BuildFirmware:
 
             # Currently disabled for compatibility reasons
             # Certain machines freeze on boot with OpenLegacyBoot.efi
-            (self.constants.drivers_path / Path("OpenLegacyBoot.efi")).unlink()
+            efi_tree.active().remove(self.constants.drivers_path / Path("OpenLegacyBoot.efi"))
 
     def _firmware_compatibility_handling(self) -> None:
         """
@@ -358,11 +357,11 @@ class BuildFirmware:
         self.config["Misc"]["Boot"]["LauncherPath"] = "\\boot.efi"
 
         # Setup diags.efi chainloading
-        Path(self.constants.opencore_release_folder / Path("System/Library/CoreServices/.diagnostics/Drivers/HardwareDrivers")).mkdir(parents=True, exist_ok=True)
+        efi_tree.active().mkdir(self.constants.opencore_release_folder / Path("System/Library/CoreServices/.diagnostics/Drivers/HardwareDrivers"))
         if self.constants.boot_efi is True:
             path_oc_loader = self.constants.opencore_release_folder / Path("EFI/BOOT/BOOTx64.efi")
         else:
             path_oc_loader = self.constants.opencore_release_folder / Path("System/Library/CoreServices/boot.efi")
-        shutil.move(path_oc_loader, self.constants.opencore_release_folder / Path("System/Library/CoreServices/.diagnostics/Drivers/HardwareDrivers/Product.efi"))
-        shutil.copy(self.constants.diags_launcher_path, self.constants.opencore_release_folder)
-        shutil.move(self.constants.opencore_release_folder / Path("diags.efi"), self.constants.opencore_release_folder / Path("boot.efi"))
\ No newline at end of file
+        efi_tree.active().move(path_oc_loader, self.constants.opencore_release_folder / Path("System/Library/CoreServices/.diagnostics/Drivers/HardwareDrivers/Product.efi"))
+        efi_tree.active().copy(self.constants.diags_launcher_path, self.constants.opencore_release_folder)
+        efi_tree.active().move(self.constants.opencore_release_folder / Path("diags.efi"), self.constants.opencore_release_folder / Path("boot.efi"))
\ No newline at end of file
@@ -2,13 +2,12 @@
 graphics_audio.py: Class for handling Graphics and Audio Patches, invocation from build.py
 """
 
-import shutil
 import logging
 import binascii
 
 from pathlib import Path
 
-from . import support
+from . import support, efi_tree
 
 from .. import constants
 
@@ -220,7 +219,7 @@ class BuildGraphicsAudio:
                 "name": binascii.unhexlify("23646973706C6179"),
                 "class-code": binascii.unhexlify("FFFFFFFF"),
             }
-        shutil.copy(self.constants.backlight_injector_path, self.constants.kexts_path)
+        efi_tree.active().install(self.constants.backlight_injector_path, self.constants.kexts_path)
         support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("BacklightInjector.kext")["Enabled"] = True
         self.config["UEFI"]["Quirks"]["ForgeUefiSupport"] = True
         self.config["UEFI"]["Quirks"]["ReloadOptionRoms"] = True
@@ -374,7 +373,7 @@ class BuildGraphicsAudio:
             # Add ACPI patches
             support.BuildSupport(self.model, self.constants, self.config).get_item_by_kv(self.config["ACPI"]["Add"], "Path", "SSDT-DGPU.aml")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_item_by_kv(self.config["ACPI"]["Patch"], "Comment", "_INI to XINI")["Enabled"] = True
-            shutil.copy(self.constants.demux_ssdt_path, self.constants.acpi_path)
+            efi_tree.active().copy(self.constants.demux_ssdt_path, self.constants.acpi_path)
             # Disable dGPU
             # IOACPIPlane:/_SB/PCI0@0/P0P2@10000/GFX0@0
             self.config["DeviceProperties"]["Add"]["PciRoot(0x0)/Pci(0x1,0x0)/Pci(0x0,0x0)"] = {
@@ -400,13 +399,13 @@ class BuildGraphicsAudio:
         # AMD GOP VBIOS injection for AMD GCN 1-4 GPUs
         if self.constants.amd_gop_injection is True:
             logging.info("- Adding AMDGOP.efi")
-            shutil.copy(self.constants.amd_gop_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.amd_gop_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("AMDGOP.efi", "UEFI", "Drivers")["Enabled"] = True
 
         # Nvidia Kepler GOP VBIOS injection
         if self.constants.nvidia_kepler_gop_injection is True:
             logging.info("- Adding NVGOP_GK.efi")
-            shutil.copy(self.constants.nvidia_kepler_gop_driver_path, self.constants.drivers_path)
+            efi_tree.active().copy(self.constants.nvidia_kepler_gop_driver_path, self.constants.drivers_path)
             support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("NVGOP_GK.efi", "UEFI", "Drivers")["Enabled"] = True
 
 
@@ -423,25 +422,19 @@ class BuildGraphicsAudio:
             logging.info("- Adding AppleMuxControl Override")
             amc_map_path = Path(self.constants.plist_folder_path) / Path("AppleMuxControl/Info.plist")
             self.config["DeviceProperties"]["Add"]["PciRoot(0x0)/Pci(0x1,0x0)/Pci(0x0,0x0)"] = {"agdpmod": "vit9696"}
-            Path(self.constants.amc_kext_folder).mkdir()
-            Path(self.constants.amc_contents_folder).mkdir()
-            shutil.copy(amc_map_path, self.constants.amc_contents_folder)
+            efi_tree.active().copy(amc_map_path, self.constants.amc_contents_folder)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("AMC-Override.kext")["Enabled"] = True
 
         if self.model not in model_array.NoAGPMSupport:
             logging.info("- Adding AppleGraphicsPowerManagement Override")
             agpm_map_path = Path(self.constants.plist_folder_path) / Path("AppleGraphicsPowerManagement/Info.plist")
-            Path(self.constants.agpm_kext_folder).mkdir()
-            Path(self.constants.agpm_contents_folder).mkdir()
-            shutil.copy(agpm_map_path, self.constants.agpm_contents_folder)
+            efi_tree.active().copy(agpm_map_path, self.constants.agpm_contents_folder)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("AGPM-Override.kext")["Enabled"] = True
 
         if self.model in model_array.AGDPSupport:
             logging.info("- Adding AppleGraphicsDevicePolicy Override")
             agdp_map_path = Path(self.constants.plist_folder_path) / Path("AppleGraphicsDevicePolicy/Info.plist")
-            Path(self.constants.agdp_kext_folder).mkdir()
-            Path(self.constants.agdp_contents_folder).mkdir()
-            shutil.copy(agdp_map_path, self.constants.agdp_contents_folder)
+            efi_tree.active().copy(agdp_map_path, self.constants.agdp_contents_folder)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("AGDP-Override.kext")["Enabled"] = True
 
         # AGPM Patch
@@ -0,0 +1,385 @@
+"""
+materialize.py: Assemble EFI builds from a content-addressed payload store
+
+Payload archives (OpenCore, kexts, OpenCanopy resources) are expanded once
+into a store of files named by their SHA-256 digest. Builds then link or
+clone files out of the store instead of copying and extracting archives
+each time, so only files that diverge from the store are written.
+
+Materialization modes:
+- 'clone':    Copy-on-write clones (clonefile on APFS, FICLONE on Linux), falling back to copies
+- 'hardlink': Hardlinks to the store, falling back to clones, then copies
+- 'copy':     Plain copies
+
+Files edited in place after materialization must be detached first, see detach().
+Objects no longer referenced by a current payload's manifest are removed by prune().
+
+Usage:
+    >>> from oclp_r.efi_builder import materialize
+    >>> materializer = materialize.get_materializer(constants)
+    >>> materializer.install(constants.lilu_path, constants.kexts_path)
+    >>> materializer.stats
+"""
+
+import os
+import json
+import fcntl
+import errno
+import shutil
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import zipfile
+import threading
+
+from pathlib import Path
+
+from .. import constants
+
+
+MATERIALIZATION_MODES: list = ["clone", "hardlink", "copy"]
+
+FICLONE: int = 0x40049409  # Linux ioctl, _IOW(0x94, 9, int)
+
+# Errors indicating the filesystem does not support linking or cloning between these paths
+UNSUPPORTED_ERRNOS: list = [errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTTY, errno.EPERM, errno.EMLINK]
+
+_materializers:     dict = {}
+_materializer_lock: threading.Lock = threading.Lock()
+
+
+def get_materializer(global_constants: constants.Constants) -> "PayloadMaterializer":
+    """
+    Shared materializer for the store configured in constants
+    """
+    with _materializer_lock:
+        key = (str(global_constants.payload_store_path), global_constants.efi_materialization)
+        if key not in _materializers:
+            _materializers[key] = PayloadMaterializer(global_constants.payload_store_path, global_constants.efi_materialization)
+        return _materializers[key]
+
+
+class PayloadMaterializer:
+    """
+    Content-addressed store of expanded payload archives
+    """
+
+    def __init__(self, store_path: str, mode: str = "clone") -> None:
+        """
+        Parameters:
+            store_path (str): Store root
+            mode       (str): 'clone', 'hardlink' or 'copy'
+        """
+        if mode not in MATERIALIZATION_MODES:
+            raise ValueError(f"Unknown materialization mode: {mode}")
+
+        self.store_path: Path = Path(store_path)
+        self.mode:       str  = mode
+
+        self._objects_path:   Path = self.store_path / "objects"
+        self._manifests_path: Path = self.store_path / "manifests"
+
+        self._lock:      threading.Lock = threading.Lock()
+        self._manifests: dict = {}  # Manifest key -> entries
+
+        self._clone_supported:    bool = True
+        self._hardlink_supported: bool = True
+        self._clonefile = None
+
+        self.pruned: bool = False  # Whether prune() ran this session
+
+        self.stats: dict = {}
+        self.reset_stats()
+
+
+    def reset_stats(self) -> None:
+        """
+        Reset counters, called at the start of each build
+        """
+        self.stats = {
+            "Linked":        0,
+            "Cloned":        0,
+            "Copied":        0,
+            "Unchanged":     0,
+            "Bytes Written": 0,
+        }
+
+
+    def install(self, source: str, destination_folder: str) -> None:
+        """
+        Install a payload into a folder
+
+        Zip archives are expanded (as extractall() would), other files are materialized as is
+
+        Parameters:
+            source             (str): Payload file
+            destination_folder (str): Folder to install into
+        """
+        destination_folder = Path(destination_folder)
+        destination_folder.mkdir(parents=True, exist_ok=True)
+
+        for relative_path, object_path in self.objects(source):
+            destination = destination_folder / relative_path
+            if object_path is None:
+                destination.mkdir(parents=True, exist_ok=True)
+                continue
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            self.materialize(object_path, destination)
+
+
+    def objects(self, source: str) -> list:
+        """
+        Store objects making up a payload, storing it first if needed
+
+        Parameters:
+            source (str): Payload file, zip archives are expanded
+
+        Returns:
+            list: (relative path, object path) for each entry, object path is None for folders
+        """
+        source = Path(source)
+        return [(relative_path, self.object_path(digest) if digest else None) for relative_path, digest in self._manifest(source)]
+
+
+    def object_path(self, digest: str) -> Path:
+        """
+        Path of the store object holding data with this SHA-256 digest
+        """
+        return self._objects_path / digest[:2] / digest
+
+
+    def store(self, data: bytes) -> Path:
+        """
+        Add data to the store (ie. a generated file of a build), returning its object path
+        """
+        return self.object_path(self._store_bytes(data))
+
+
+    def detach(self, path: str) -> None:
+        """
+        Replace a hardlink to the store with a private copy, before editing the file in place
+        """
+        path = Path(path)
+        try:
+            if path.stat().st_nlink < 2:
+                return
+        except FileNotFoundError:
+            return
+
+        temporary_path = path.with_name(f".{path.name}.detach")
+        shutil.copyfile(path, temporary_path)
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+        self.stats["Bytes Written"] += path.stat().st_size
+
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"- Materialized payloads ({self.mode}): "
+            f"{self.stats['Linked']} linked, {self.stats['Cloned']} cloned, {self.stats['Copied']} copied, "
+            f"{self.stats['Unchanged']} unchanged, {self.stats['Bytes Written']} bytes written"
+        )
+
+
+    def _manifest_key(self, source: Path) -> str:
+        """
+        Archives are identified by path, size and modification time, avoiding a re-hash per build
+        """
+        source_stat = source.stat()
+        return hashlib.sha256(f"{source.resolve()}:{source_stat.st_size}:{source_stat.st_mtime_ns}".encode()).hexdigest()
+
+
+    def _manifest(self, source: Path) -> list:
+        """
+        Store a payload, once, recording its entries in a manifest
+
+        Returns:
+            list: (relative path, digest) for each entry, digest is None for folders
+        """
+        key = self._manifest_key(source)
+
+        with self._lock:
+            if key in self._manifests:
+                return self._manifests[key]
+
+            manifest_path = self._manifests_path / f"{key}.json"
+            try:
+                entries = json.loads(manifest_path.read_text())["Entries"]
+                if all(digest is None or self.object_path(digest).exists() for _, digest in entries):
+                    self._manifests[key] = entries
+                    return entries
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+            if source.suffix == ".zip":
+                entries = self._expand(source)
+            else:
+                entries = [(source.name, self._store_bytes(source.read_bytes()))]
+
+            self._manifests_path.mkdir(parents=True, exist_ok=True)
+            # Source is recorded for prune(), to tell whether the manifest is still current
+            manifest_path.write_text(json.dumps({"Source": str(source.resolve()), "Entries": entries}))
+            self._manifests[key] = entries
+            return entries
+
+
+    def _expand(self, source: Path) -> list:
+        """
+        Expand an archive into the store
+
+        Returns:
+            list: (relative path, digest) for each entry, digest is None for folders
+        """
+        entries = []
+        with zipfile.ZipFile(source) as zip_file:
+            for info in zip_file.infolist():
+                # Matches ZipFile.extractall()'s sanitization
+                relative_path = "/".join(part for part in info.filename.replace("\\", "/").split("/") if part not in ["", ".", ".."])
+                if not relative_path:
+                    continue
+                if info.is_dir():
+                    entries.append((relative_path, None))
+                    continue
+                entries.append((relative_path, self._store_bytes(zip_file.read(info))))
+        return entries
+
+
+    def prune(self, keep: set = None) -> None:
+        """
+        Remove manifests of payloads since changed or removed, and objects no current manifest references
+
+        Parameters:
+            keep (set): Additional digests to keep (ie. files of cached builds)
+        """
+        referenced = set(keep or [])
+        removed_manifests = 0
+        removed_objects = 0
+        removed_bytes = 0
+
+        with self._lock:
+            for manifest_path in self._manifests_path.glob("*.json"):
+                try:
+                    manifest = json.loads(manifest_path.read_text())
+                    if self._manifest_key(Path(manifest["Source"])) == manifest_path.stem:
+                        referenced.update(digest for _, digest in manifest["Entries"] if digest)
+                        continue
+                except (OSError, ValueError, KeyError, TypeError):
+                    # Source removed, or a manifest predating recorded sources
+                    pass
+                manifest_path.unlink(missing_ok=True)
+                self._manifests.pop(manifest_path.stem, None)
+                removed_manifests += 1
+
+            for object_path in self._objects_path.glob("*/*"):
+                # Skips partially written objects (ie. '.<digest>.<thread>')
+                if object_path.name.startswith(".") or object_path.name in referenced:
+                    continue
+                try:
+                    removed_bytes += object_path.stat().st_size
+                    object_path.unlink()
+                    removed_objects += 1
+                except OSError:
+                    pass
+
+            for folder in self._objects_path.glob("*"):
+                try:
+                    folder.rmdir()
+                except OSError:
+                    pass
+
+            self.pruned = True
+
+        if removed_manifests or removed_objects:
+            logging.info(f"- Pruned payload store: {removed_manifests} manifests, {removed_objects} objects, {removed_bytes} bytes")
+
+
+    def _store_bytes(self, data: bytes) -> str:
+        """
+        Write data to the store if not already present
+
+        Returns:
+            str: Digest of data
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self.object_path(digest)
+        if object_path.exists():
+            return digest
+
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = object_path.with_name(f".{digest}.{threading.get_ident()}")
+        temporary_path.write_bytes(data)
+        self.stats["Bytes Written"] += len(data)
+        # Read-only, as builds may hardlink to it
+        os.chmod(temporary_path, 0o444)
+        os.replace(temporary_path, object_path)
+        return digest
+
+
+    def materialize(self, object_path: Path, destination: Path) -> None:
+        """
+        Place a store object at destination, writing only if it diverges
+        """
+        try:
+            destination_stat = destination.stat()
+            object_stat = object_path.stat()
+            if destination_stat.st_ino == object_stat.st_ino and destination_stat.st_dev == object_stat.st_dev:
+                self.stats["Unchanged"] += 1
+                return
+            if destination_stat.st_size == object_stat.st_size and hashlib.sha256(destination.read_bytes()).hexdigest() == object_path.name:
+                self.stats["Unchanged"] += 1
+                return
+            destination.unlink()
+        except FileNotFoundError:
+            pass
+
+        if self.mode == "hardlink" and self._hardlink_supported:
+            try:
+                os.link(object_path, destination)
+                self.stats["Linked"] += 1
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                logging.info(f"- Hardlinks unsupported for {destination.parent}, falling back: {e}")
+                self._hardlink_supported = False
+
+        if self.mode in ["clone", "hardlink"] and self._clone_supported:
+            try:
+                self._clone(object_path, destination)
+                self.stats["Cloned"] += 1
+                return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                logging.info(f"- Clones unsupported for {destination.parent}, falling back to copies: {e}")
+                self._clone_supported = False
+                if destination.exists():
+                    destination.unlink()
+
+        shutil.copyfile(object_path, destination)
+        os.chmod(destination, 0o644)
+        self.stats["Copied"] += 1
+        self.stats["Bytes Written"] += object_path.stat().st_size
+
+
+    def _clone(self, source: Path, destination: Path) -> None:
+        """
+        Copy-on-write clone, raises OSError if unsupported
+        """
+        if hasattr(os, "uname") and os.uname().sysname == "Darwin":
+            if self._clonefile is None:
+                libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                self._clonefile = libc.clonefile
+                self._clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+                self._clonefile.restype = ctypes.c_int
+            if self._clonefile(os.fsencode(source), os.fsencode(destination), 0) != 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+            # Clones keep the store's read-only mode
+            os.chmod(destination, 0o644)
+            return
+
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        os.chmod(destination, 0o644)
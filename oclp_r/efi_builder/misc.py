@@ -2,13 +2,12 @@
 misc.py: Class for handling Misc Patches, invocation from build.py
 """
 
-import shutil
 import logging
 import binascii
 
 from pathlib import Path
 
-from . import support
+from . import support, efi_tree
 
 from .. import constants
 
@@ -170,9 +169,7 @@ xw
             pp_map_path = Path(self.constants.platform_plugin_plist_path) / Path(f"{self.model}/Info.plist")
             if not pp_map_path.exists():
                 raise Exception(f"{pp_map_path} does not exist!!! Please file an issue stating file is missing for {self.model}.")
-            Path(self.constants.pp_kext_folder).mkdir()
-            Path(self.constants.pp_contents_folder).mkdir()
-            shutil.copy(pp_map_path, self.constants.pp_contents_folder)
+            efi_tree.active().copy(pp_map_path, self.constants.pp_contents_folder)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("CPUFriendDataProvider.kext")["Enabled"] = True
 
 
@@ -296,13 +293,9 @@ xw
                 or self.constants.serial_settings in ["Moderate", "Advanced"])
         ):
             logging.info("- Adding USB-Map.kext and USB-Map-Tahoe.kext")
-            Path(self.constants.map_kext_folder).mkdir()
-            Path(self.constants.map_kext_folder_tahoe).mkdir()
-            Path(self.constants.map_contents_folder).mkdir()
-            Path(self.constants.map_contents_folder_tahoe).mkdir()
-            shutil.copy(usb_map_path, self.constants.map_contents_folder)
+            efi_tree.active().copy(usb_map_path, self.constants.map_contents_folder)
             # for the tahoe, need to copy but rename to Info.plist
-            shutil.copy(usb_map_tahoe_path, self.constants.map_contents_folder_tahoe / Path("Info.plist"))
+            efi_tree.active().add_file(self.constants.map_contents_folder_tahoe / Path("Info.plist"), usb_map_tahoe_path)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("USB-Map.kext")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("USB-Map-Tahoe.kext")["Enabled"] = True
             if self.model in model_array.Missing_USB_Map_Ventura and self.constants.serial_settings not in ["Moderate", "Advanced"]:
@@ -325,7 +318,7 @@ xw
             self.model in ["MacPro4,1", "MacPro5,1", "Xserve3,1"]
         ):
             logging.info("- Adding UHCI/OHCI USB support")
-            shutil.copy(self.constants.apple_usb_11_injector_path, self.constants.kexts_path)
+            efi_tree.active().install(self.constants.apple_usb_11_injector_path, self.constants.kexts_path)
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("USB1.1-Injector.kext/Contents/PlugIns/AppleUSBOHCI.kext")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("USB1.1-Injector.kext/Contents/PlugIns/AppleUSBOHCIPCI.kext")["Enabled"] = True
             support.BuildSupport(self.model, self.constants, self.config).get_kext_by_bundle_path("USB1.1-Injector.kext/Contents/PlugIns/AppleUSBUHCI.kext")["Enabled"] = True
@@ -362,7 +355,7 @@ xw
         """
 
         logging.info("- Adding OpenCanopy GUI")
-        shutil.copy(self.constants.gui_path, self.constants.oc_folder)
+        efi_tree.active().install(self.constants.gui_path, self.constants.oc_folder)
         support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("OpenCanopy.efi", "UEFI", "Drivers")["Enabled"] = True
         support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("OpenRuntime.efi", "UEFI", "Drivers")["Enabled"] = True
         support.BuildSupport(self.model, self.constants, self.config).get_efi_binary_by_path("OpenLinuxBoot.efi", "UEFI", "Drivers")["Enabled"] = True
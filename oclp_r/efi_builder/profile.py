@@ -0,0 +1,140 @@
+"""
+profile.py: Timing instrumentation for the EFI build pipeline
+
+Stages of a build are wrapped in spans, recording duration, I/O and
+config lookups. The profile is written as JSON next to the built EFI and
+summarized in the log, so regressions show up in validation runs.
+
+Usage:
+    >>> from oclp_r.efi_builder import profile
+    >>> build_profile = profile.BuildProfile("MacBookPro11,1")
+    >>> with build_profile.span("Cleanup"):
+    >>>     ...
+    >>> build_profile.log_summary()
+    >>> build_profile.save(constants.efi_build_profile_path)
+"""
+
+import json
+import time
+import logging
+import resource
+import contextlib
+
+from pathlib import Path
+
+
+ACTIVE_PROFILE = None  # BuildProfile of the build in progress, if any
+
+
+def record_config_lookup(items_scanned: int) -> None:
+    """
+    Count a config entry lookup (ie. kext by BundlePath) against the active build
+    """
+    if ACTIVE_PROFILE is not None:
+        ACTIVE_PROFILE.config_lookups += 1
+        ACTIVE_PROFILE.config_items_scanned += items_scanned
+
+
+class BuildProfile:
+    """
+    Nested timing spans of a single EFI build
+    """
+
+    def __init__(self, model: str, bytes_written: callable = None) -> None:
+        """
+        Parameters:
+            model         (str):      Model being built for
+            bytes_written (callable): Returns bytes written by the build so far (ie. materializer stats)
+        """
+        self.model: str = model
+        self.spans: list = []  # Spans, in the order they started
+
+        self.config_lookups:       int = 0
+        self.config_items_scanned: int = 0
+
+        self._bytes_written: callable = bytes_written or (lambda: 0)
+        self._stack:         list = []
+        self._start_time:    float = time.perf_counter()
+
+
+    def __enter__(self) -> "BuildProfile":
+        global ACTIVE_PROFILE
+        ACTIVE_PROFILE = self
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        global ACTIVE_PROFILE
+        if ACTIVE_PROFILE is self:
+            ACTIVE_PROFILE = None
+
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """
+        Record a stage of the build, spans may be nested
+
+        Parameters:
+            name (str): Stage name (ie. 'BuildFirmware')
+        """
+        start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        start_bytes = self._bytes_written()
+        start_lookups = (self.config_lookups, self.config_items_scanned)
+
+        record = {
+            "Name":   name,
+            "Parent": self._stack[-1]["Name"] if self._stack else None,
+            "Depth":  len(self._stack),
+        }
+        self._stack.append(record)
+        self.spans.append(record)
+        start_time = time.perf_counter()
+        try:
+            yield record
+        finally:
+            end_usage = resource.getrusage(resource.RUSAGE_SELF)
+            record.update({
+                "Duration":             time.perf_counter() - start_time,
+                "Blocks Read":          end_usage.ru_inblock - start_usage.ru_inblock,
+                "Blocks Written":       end_usage.ru_oublock - start_usage.ru_oublock,
+                "Bytes Written":        self._bytes_written() - start_bytes,
+                "Config Lookups":       self.config_lookups - start_lookups[0],
+                "Config Items Scanned": self.config_items_scanned - start_lookups[1],
+            })
+            self._stack.pop()
+
+
+    def total_duration(self) -> float:
+        return time.perf_counter() - self._start_time
+
+
+    def to_dict(self) -> dict:
+        return {
+            "Model":                self.model,
+            "Duration":             self.total_duration(),
+            "Config Lookups":       self.config_lookups,
+            "Config Items Scanned": self.config_items_scanned,
+            "Spans":                self.spans,
+        }
+
+
+    def save(self, path: str) -> None:
+        """
+        Write the profile as JSON, failures are logged and ignored
+        """
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps(self.to_dict(), indent=4))
+        except OSError as e:
+            logging.info(f"- Failed to write build profile: {e}")
+
+
+    def log_summary(self) -> None:
+        """
+        Log stage durations, slowest stages first
+        """
+        logging.info(f"- Build profile for {self.model}: {self.total_duration():.2f}s, {self.config_lookups} config lookups ({self.config_items_scanned} entries scanned)")
+        for span in sorted([span for span in self.spans if span["Depth"] == 0], key=lambda span: span["Duration"], reverse=True):
+            logging.info(f"  - {span['Name']}: {span['Duration'] * 1000:.1f}ms, {span['Bytes Written']} bytes written, {span['Config Lookups']} lookups")
+            for child in sorted([child for child in self.spans if child["Parent"] == span["Name"] and child["Depth"] == 1], key=lambda child: child["Duration"], reverse=True):
+                logging.info(f"    - {child['Name']}: {child['Duration'] * 1000:.1f}ms, {child['Bytes Written']} bytes written, {child['Config Lookups']} lookups")
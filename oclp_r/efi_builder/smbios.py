@@ -6,12 +6,11 @@ import ast
 import uuid
 import logging
 import binascii
-import plistlib
 import subprocess
 
 from pathlib import Path
 
-from . import support
+from . import support, efi_tree, build_cache
 
 from .. import constants
 
@@ -68,7 +67,7 @@ class BuildSMBIOS:
             self.config["NVRAM"]["Add"]["7C436110-AB2A-4BBB-A880-FE41995C9F82"]["boot-args"] += " -no_compat_check"
 
     def _strip_usb_map(self, map_path, model, spoofed_model, serial_settings):
-        config = plistlib.load(Path(map_path).open("rb"))
+        config = efi_tree.active().read_plist(map_path)
         for entry in list(config["IOKitPersonalities_x86_64"]):
             if not entry.startswith(model):
                 config["IOKitPersonalities_x86_64"].pop(entry)
@@ -84,7 +83,8 @@ class BuildSMBIOS:
                             config["IOKitPersonalities_x86_64"][entry]["IONameMatch"] = "XHC1"
                 except KeyError:
                     continue
-        plistlib.dump(config, Path(map_path).open("wb"), sort_keys=True)
+        efi_tree.active().write_plist(map_path, config)
+
     def set_smbios(self) -> None:
         """
         SMBIOS Handler
@@ -165,25 +165,25 @@ class BuildSMBIOS:
         if self.constants.allow_oc_everywhere is False and self.model not in ["iMac7,1", "Xserve2,1", "sumitduster1,1"] and self.constants.disallow_cpufriend is False and self.constants.serial_settings != "None":
             # Adjust CPU Friend Data to correct SMBIOS
             new_cpu_ls = Path(self.constants.pp_contents_folder) / Path("Info.plist")
-            cpu_config = plistlib.load(Path(new_cpu_ls).open("rb"))
+            cpu_config = efi_tree.active().read_plist(new_cpu_ls)
             string_stuff = str(cpu_config["IOKitPersonalities"]["CPUFriendDataProvider"]["cf-frequency-data"])
             string_stuff = string_stuff.replace(self.model, self.spoofed_model)
             string_stuff = ast.literal_eval(string_stuff)
             cpu_config["IOKitPersonalities"]["CPUFriendDataProvider"]["cf-frequency-data"] = string_stuff
-            plistlib.dump(cpu_config, Path(new_cpu_ls).open("wb"), sort_keys=True)
+            efi_tree.active().write_plist(new_cpu_ls, cpu_config)
 
         if self.constants.allow_oc_everywhere is False and self.constants.serial_settings != "None":
             if self.model == "MacBookPro9,1":
                 new_amc_ls = Path(self.constants.amc_contents_folder) / Path("Info.plist")
-                amc_config = plistlib.load(Path(new_amc_ls).open("rb"))
+                amc_config = efi_tree.active().read_plist(new_amc_ls)
                 amc_config["IOKitPersonalities"]["AppleMuxControl"]["ConfigMap"][self.spoofed_board] = amc_config["IOKitPersonalities"]["AppleMuxControl"]["ConfigMap"].pop(self.model)
                 for entry in list(amc_config["IOKitPersonalities"]["AppleMuxControl"]["ConfigMap"]):
                     if not entry.startswith(self.spoofed_board):
                         amc_config["IOKitPersonalities"]["AppleMuxControl"]["ConfigMap"].pop(entry)
-                plistlib.dump(amc_config, Path(new_amc_ls).open("wb"), sort_keys=True)
+                efi_tree.active().write_plist(new_amc_ls, amc_config)
             if self.model not in model_array.NoAGPMSupport:
                 new_agpm_ls = Path(self.constants.agpm_contents_folder) / Path("Info.plist")
-                agpm_config = plistlib.load(Path(new_agpm_ls).open("rb"))
+                agpm_config = efi_tree.active().read_plist(new_agpm_ls)
                 agpm_config["IOKitPersonalities"]["AGPM"]["Machines"][self.spoofed_board] = agpm_config["IOKitPersonalities"]["AGPM"]["Machines"].pop(self.model)
                 if self.model == "MacBookPro6,2":
                     # Force G State to not exceed moderate state
@@ -197,17 +197,17 @@ class BuildSMBIOS:
                     if not entry.startswith(self.spoofed_board):
                         agpm_config["IOKitPersonalities"]["AGPM"]["Machines"].pop(entry)
 
-                plistlib.dump(agpm_config, Path(new_agpm_ls).open("wb"), sort_keys=True)
+                efi_tree.active().write_plist(new_agpm_ls, agpm_config)
             if self.model in model_array.AGDPSupport:
                 new_agdp_ls = Path(self.constants.agdp_contents_folder) / Path("Info.plist")
-                agdp_config = plistlib.load(Path(new_agdp_ls).open("rb"))
+                agdp_config = efi_tree.active().read_plist(new_agdp_ls)
                 agdp_config["IOKitPersonalities"]["AppleGraphicsDevicePolicy"]["ConfigMap"][self.spoofed_board] = agdp_config["IOKitPersonalities"]["AppleGraphicsDevicePolicy"]["ConfigMap"].pop(
                     self.model
                 )
                 for entry in list(agdp_config["IOKitPersonalities"]["AppleGraphicsDevicePolicy"]["ConfigMap"]):
                     if not entry.startswith(self.spoofed_board):
                         agdp_config["IOKitPersonalities"]["AppleGraphicsDevicePolicy"]["ConfigMap"].pop(entry)
-                plistlib.dump(agdp_config, Path(new_agdp_ls).open("wb"), sort_keys=True)
+                efi_tree.active().write_plist(new_agdp_ls, agdp_config)
 
 
     def _minimal_serial_patch(self) -> None:
@@ -222,6 +222,9 @@ class BuildSMBIOS:
         """
 
         # Generate Firmware Features
+        if not self.constants.custom_model:
+            # Read from the host's ROM
+            build_cache.record_host_input("firmware-features")
         fw_feature = generate_smbios.generate_fw_features(self.model, self.constants.custom_model)
         # fw_feature = self.patch_firmware_feature()
         fw_feature = hex(fw_feature).lstrip("0x").rstrip("L").strip()
@@ -301,6 +304,7 @@ class BuildSMBIOS:
         """
 
         if self.constants.custom_serial_number == "" or self.constants.custom_board_serial_number == "":
+            build_cache.record_nondeterministic("Generated serial numbers")
             macserial_output = subprocess.run([self.constants.macserial_path, "--generate", "--model", self.spoofed_model, "--num", "1"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             macserial_output = macserial_output.stdout.decode().strip().split(" | ")
             sn = macserial_output[0]
@@ -319,5 +323,6 @@ class BuildSMBIOS:
         self.config["PlatformInfo"]["Generic"]["SystemSerialNumber"] = sn
         self.config["PlatformInfo"]["Generic"]["MLB"] = mlb
         self.config["PlatformInfo"]["Generic"]["SystemUUID"] = str(uuid.uuid4()).upper()
+        build_cache.record_nondeterministic("Generated SystemUUID")
         self.config["NVRAM"]["Add"]["4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102"]["OCLP-Spoofed-SN"] = sn
         self.config["NVRAM"]["Add"]["4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102"]["OCLP-Spoofed-MLB"] = mlb
\ No newline at end of file
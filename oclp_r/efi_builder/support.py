@@ -2,17 +2,18 @@
 support.py: Utility class for build functions
 """
 
-import shutil
+import time
 import typing
 import logging
-import plistlib
-import zipfile
 import subprocess
 
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import constants
 
+from . import efi_tree, profile, build_cache
+
 
 class BuildSupport:
     """
@@ -38,10 +39,13 @@ class BuildSupport:
         """
 
         item = None
+        scanned = 0
         for i in iterable:
+            scanned += 1
             if i[key] == value:
                 item = i
                 break
+        profile.record_config_lookup(scanned)
         return item
 
 
@@ -97,7 +101,7 @@ class BuildSupport:
             return
 
         logging.info(f"- Adding {kext_name} {kext_version}")
-        shutil.copy(kext_path, self.constants.kexts_path)
+        efi_tree.active().install(kext_path, self.constants.kexts_path)
         kext["Enabled"] = True
 
 
@@ -110,6 +114,9 @@ class BuildSupport:
             return
 
         logging.info("- Vaulting EFI\n=========================================")
+        build_cache.record_nondeterministic("Vault signing generates a new key")
+        # Vaulting edits OpenCore.efi in place
+        efi_tree.active().materializer.detach(self.constants.oc_folder / Path("OpenCore.efi"))
         popen = subprocess.Popen([str(self.constants.vault_path), f"{self.constants.oc_folder}/"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
         for stdout_line in iter(popen.stdout.readline, ""):
             logging.info(stdout_line.strip())
@@ -117,79 +124,125 @@ class BuildSupport:
 
     def validate_pathing(self) -> None:
         """
-        Validate whether all files are accounted for on-disk
+        Validate whether all files are accounted for in the EFI tree
 
         This ensures that OpenCore won't hit a critical error and fail to boot
+
+        Entries are checked against the in-memory config and EFI tree, before
+        anything is written to disk
         """
 
         logging.info("- Validating generated config")
-        if not Path(self.constants.opencore_release_folder / Path("EFI/OC/config.plist")):
+        start_time = time.time()
+
+        oc_folder = Path(self.constants.opencore_release_folder / Path("EFI/OC"))
+        if not efi_tree.active().exists(oc_folder / Path("config.plist")):
             logging.info("- OpenCore config file missing!!!")
             raise Exception("OpenCore config file missing")
 
-        config_plist = plistlib.load(Path(self.constants.opencore_release_folder / Path("EFI/OC/config.plist")).open("rb"))
+        oc_tree = self._scan_efi_tree(oc_folder)
+        folded_tree = {relative_path.casefold() for relative_path in oc_tree}
 
-        for acpi in config_plist["ACPI"]["Add"]:
-            if not Path(self.constants.opencore_release_folder / Path("EFI/OC/ACPI") / Path(acpi["Path"])).exists():
+        def _exists(relative_path: str) -> bool:
+            # ESPs are case-insensitive
+            return relative_path in oc_tree or relative_path.casefold() in folded_tree
+
+        for acpi in self.config["ACPI"]["Add"]:
+            if not _exists(f"ACPI/{acpi['Path']}"):
                 logging.info(f"- Missing ACPI Table: {acpi['Path']}")
                 raise Exception(f"Missing ACPI Table: {acpi['Path']}")
 
-        for kext in config_plist["Kernel"]["Add"]:
-            kext_path = Path(self.constants.opencore_release_folder / Path("EFI/OC/Kexts") / Path(kext["BundlePath"]))
-            kext_binary_path = Path(kext_path / Path(kext["ExecutablePath"]))
-            kext_plist_path = Path(kext_path / Path(kext["PlistPath"]))
-            if not kext_path.exists():
-                logging.info(f"- Missing kext: {kext_path}")
-                raise Exception(f"Missing {kext_path}")
-            if not kext_binary_path.exists():
-                logging.info(f"- Missing {kext['BundlePath']}'s binary: {kext_binary_path}")
-                raise Exception(f"Missing {kext_binary_path}")
-            if not kext_plist_path.exists():
-                logging.info(f"- Missing {kext['BundlePath']}'s plist: {kext_plist_path}")
-                raise Exception(f"Missing {kext_plist_path}")
-
-        for tool in config_plist["Misc"]["Tools"]:
-            if not Path(self.constants.opencore_release_folder / Path("EFI/OC/Tools") / Path(tool["Path"])).exists():
-                logging.info(f"- Missing tool: {tool['Path']}")
-                raise Exception(f"Missing tool: {tool['Path']}")
-
-        for driver in config_plist["UEFI"]["Drivers"]:
-            if not Path(self.constants.opencore_release_folder / Path("EFI/OC/Drivers") / Path(driver["Path"])).exists():
-                logging.info(f"- Missing driver: {driver['Path']}")
-                raise Exception(f"Missing driver: {driver['Path']}")
+        for kext in self.config["Kernel"]["Add"]:
+            kext_path        = f"Kexts/{kext['BundlePath']}"
+            kext_binary_path = f"{kext_path}/{kext['ExecutablePath']}" if kext["ExecutablePath"] else kext_path
+            kext_plist_path  = f"{kext_path}/{kext['PlistPath']}"
+            if not _exists(kext_path):
+                logging.info(f"- Missing kext: {oc_folder / kext_path}")
+                raise Exception(f"Missing {oc_folder / kext_path}")
+            if not _exists(kext_binary_path):
+                logging.info(f"- Missing {kext['BundlePath']}'s binary: {oc_folder / kext_binary_path}")
+                raise Exception(f"Missing {oc_folder / kext_binary_path}")
+            if not _exists(kext_plist_path):
+                logging.info(f"- Missing {kext['BundlePath']}'s plist: {oc_folder / kext_plist_path}")
+                raise Exception(f"Missing {oc_folder / kext_plist_path}")
+
+        tools   = {tool["Path"]   for tool   in self.config["Misc"]["Tools"]}
+        drivers = {driver["Path"] for driver in self.config["UEFI"]["Drivers"]}
+
+        for tool in tools:
+            if not _exists(f"Tools/{tool}"):
+                logging.info(f"- Missing tool: {tool}")
+                raise Exception(f"Missing tool: {tool}")
+
+        for driver in drivers:
+            if not _exists(f"Drivers/{driver}"):
+                logging.info(f"- Missing driver: {driver}")
+                raise Exception(f"Missing driver: {driver}")
 
         # Validating local files
         # Report if they have no associated config.plist entry (i.e. they're not being used)
-        for tool_files in Path(self.constants.opencore_release_folder / Path("EFI/OC/Tools")).glob("*"):
-            if tool_files.name not in [x["Path"] for x in config_plist["Misc"]["Tools"]]:
-                logging.info(f"- Missing tool from config: {tool_files.name}")
-                raise Exception(f"Missing tool from config: {tool_files.name}")
+        for tool_file in sorted(oc_tree["Tools"]):
+            if tool_file not in tools:
+                logging.info(f"- Missing tool from config: {tool_file}")
+                raise Exception(f"Missing tool from config: {tool_file}")
+
+        for driver_file in sorted(oc_tree["Drivers"]):
+            if driver_file not in drivers:
+                logging.info(f"- Found extra driver: {driver_file}")
+                raise Exception(f"Found extra driver: {driver_file}")
 
-        for driver_file in Path(self.constants.opencore_release_folder / Path("EFI/OC/Drivers")).glob("*"):
-            if driver_file.name not in [x["Path"] for x in config_plist["UEFI"]["Drivers"]]:
-                logging.info(f"- Found extra driver: {driver_file.name}")
-                raise Exception(f"Found extra driver: {driver_file.name}")
+        self._validate_malformed_kexts(oc_folder, oc_tree, _exists)
 
-        self._validate_malformed_kexts(self.constants.opencore_release_folder / Path("EFI/OC/Kexts"))
+        logging.info(f"- Validated EFI in {time.time() - start_time:.2f}s")
 
 
-    def _validate_malformed_kexts(self, directory: str | Path) -> None:
+    def _scan_efi_tree(self, oc_folder: Path) -> dict:
         """
-        Validate Info.plist and executable pathing for kexts
+        Walk the EFI/OC folder of the EFI tree once
+
+        Returns:
+            dict: Relative path ('/' separated) -> names within it, for every file and folder
         """
-        for kext_folder in Path(directory).glob("*.kext"):
-            if not Path(kext_folder / Path("Contents/Info.plist")).exists():
-                continue
 
-            kext_data = plistlib.load(Path(kext_folder / Path("Contents/Info.plist")).open("rb"))
-            if "CFBundleExecutable" in kext_data:
-                expected_executable = Path(kext_folder / Path("Contents/MacOS") / Path(kext_data["CFBundleExecutable"]))
-                if not expected_executable.exists():
-                    logging.info(f"- Missing executable for {kext_folder.name}: Contents/MacOS/{expected_executable.name}")
-                    raise Exception(f" - Missing executable for {kext_folder.name}: Contents/MacOS/{expected_executable.name}")
+        oc_tree = {"Tools": set(), "Drivers": set()}
+        for relative_directory, folders, files in efi_tree.active().walk(oc_folder):
+            names = set(folders) | set(files)
+            if relative_directory:
+                oc_tree[relative_directory] = names
+            for name in names:
+                oc_tree.setdefault(f"{relative_directory}/{name}" if relative_directory else name, set())
+        return oc_tree
 
-            if Path(kext_folder / Path("Contents/PlugIns")).exists():
-                self._validate_malformed_kexts(kext_folder / Path("Contents/PlugIns"))
+
+    def _validate_malformed_kexts(self, oc_folder: Path, oc_tree: dict, exists: typing.Callable) -> None:
+        """
+        Validate Info.plist and executable pathing for kexts, including PlugIns
+
+        Info.plists are parsed concurrently, unmodified ones are read from the payload store
+        """
+
+        kexts = [
+            relative_path for relative_path in oc_tree
+            if relative_path.endswith(".kext")
+            and (relative_path.count("/") == 1 and relative_path.startswith("Kexts/") or relative_path.rsplit("/", 1)[0].endswith(".kext/Contents/PlugIns"))
+            and f"{relative_path}/Contents/Info.plist" in oc_tree
+        ]
+
+        tree = efi_tree.active()
+        def _load_info_plist(relative_path: str) -> dict:
+            return tree.read_plist(oc_folder / f"{relative_path}/Contents/Info.plist")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            kext_data_list = list(executor.map(_load_info_plist, kexts))
+
+        for relative_path, kext_data in zip(kexts, kext_data_list):
+            if "CFBundleExecutable" not in kext_data:
+                continue
+            kext_name = relative_path.rsplit("/", 1)[-1]
+            expected_executable = f"{relative_path}/Contents/MacOS/{kext_data['CFBundleExecutable']}"
+            if not exists(expected_executable):
+                logging.info(f"- Missing executable for {kext_name}: Contents/MacOS/{kext_data['CFBundleExecutable']}")
+                raise Exception(f" - Missing executable for {kext_name}: Contents/MacOS/{kext_data['CFBundleExecutable']}")
 
 
     def cleanup(self) -> None:
@@ -213,20 +266,20 @@ class BuildSupport:
                     if item["Enabled"] is False:
                         self.config[entry][sub_entry].remove(item)
 
-        for kext in self.constants.kexts_path.rglob("*.zip"):
-            with zipfile.ZipFile(kext) as zip_file:
-                zip_file.extractall(self.constants.kexts_path)
-            kext.unlink()
+        tree = efi_tree.active()
+        for kext in tree.files(self.constants.kexts_path):
+            if kext.suffix == ".zip":
+                tree.extract(kext, self.constants.kexts_path)
+                tree.remove(kext)
 
-        for item in self.constants.oc_folder.rglob("*.zip"):
-            with zipfile.ZipFile(item) as zip_file:
-                zip_file.extractall(self.constants.oc_folder)
-            item.unlink()
+        for item in tree.files(self.constants.oc_folder):
+            if item.suffix == ".zip":
+                tree.extract(item, self.constants.oc_folder)
+                tree.remove(item)
 
-        if not self.constants.recovery_status:
-            # Crashes in RecoveryOS for unknown reason
-            for i in self.constants.build_path.rglob("__MACOSX"):
-                shutil.rmtree(i)
+        for folder in tree.folders():
+            if folder.name == "__MACOSX" and tree.exists(folder):
+                tree.remove(folder)
 
         # Remove unused plugins inside of kexts
         # Following plugins are sometimes unused as there's different variants machines need
@@ -237,8 +290,12 @@ class BuildSupport:
             "AirPortBrcm4360_Injector.kext",
             "AirPortBrcmNIC_Injector.kext"
         ]
-        for kext in Path(self.constants.opencore_release_folder / Path("EFI/OC/Kexts")).glob("*.kext"):
-            for plugin in Path(kext / "Contents/PlugIns/").glob("*.kext"):
+        for kext in tree.iterdir(self.constants.opencore_release_folder / Path("EFI/OC/Kexts")):
+            if kext.suffix != ".kext":
+                continue
+            for plugin in tree.iterdir(kext / "Contents/PlugIns"):
+                if plugin.suffix != ".kext":
+                    continue
                 should_remove = True
                 for enabled_kexts in self.config["Kernel"]["Add"]:
                     if enabled_kexts["BundlePath"].endswith(plugin.name):
@@ -247,6 +304,4 @@ class BuildSupport:
                 if should_remove:
                     if plugin.name not in known_unused_plugins:
                         raise Exception(f" - Unknown plugin found: {plugin.name}")
-                    shutil.rmtree(plugin)
-
-        Path(self.constants.opencore_zip_copied).unlink()
\ No newline at end of file
+                    tree.remove(plugin)
\ No newline at end of file
@@ -15,7 +15,6 @@ from . import subprocess_wrapper
 
 from .. import constants
 
-from ..wx_gui import gui_entry
 from ..efi_builder import build
 from ..sys_patch import sys_patch
 from ..sys_patch.auto_patcher import StartAutomaticPatching
@@ -148,6 +147,7 @@ class arguments:
             logging.info("Another instance of OS caching is running, exiting")
             return
 
+        from ..wx_gui import gui_entry
         gui_entry.EntryPoint(self.constants).start(entry=gui_entry.SupportedEntryPoints.OS_CACHE)
 
 
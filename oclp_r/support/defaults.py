@@ -1,19 +1,39 @@
 """
 defaults.py: Generate default data for host/target
+
+Defaults are declared as an ordered list of rules (DEFAULT_RULES). Each rule
+decides from the model, a snapshot of host facts and the persisted settings.
+A rule that applies assigns its fields, overriding earlier rules, and may
+request host side effects (ie. saving a persisted setting), run once per
+session. Resolved defaults are memoized per model and host/target until the
+persisted settings, or a constants field the rules read, change. They
+record which rule set each field, and can be diffed against each other.
+
+Usage:
+    >>> from oclp_r.support import defaults
+    >>> defaults.GenerateDefaults("MacBookPro11,1", False, constants)
+    >>> resolved = defaults.get_engine(constants).resolve("iMac11,1", False)
+    >>> resolved.explain("sip_status")
+    [('Reset', True), ('Non-Metal GPU', False)]
+    >>> resolved.diff(defaults.get_engine(constants).resolve("MacBookPro11,1", False))
+    {'sip_status': (False, True), ...}
 """
 
+import copy
 import logging
 import plistlib
 import subprocess
 
+from typing import Optional
 from pathlib import Path
+from dataclasses import dataclass, field
 
 from .. import constants
 
 from ..detections import device_probe
+from ..detections.boot_state import BootState
 
 from . import (
-    utilities,
     generate_smbios,
     global_settings
 )
@@ -24,425 +44,595 @@ from ..datasets import (
 )
 
 
-class GenerateDefaults:
-
-    def __init__(self, model: str, host_is_target: bool, global_constants: constants.Constants, ignore_settings_file: bool = False) -> None:
-        self.constants: constants.Constants = global_constants
-
-        self.model: str = model
-
-        self.host_is_target: bool = host_is_target
-        self.ignore_settings_file: bool = ignore_settings_file
-
-        # Reset Variables
-        self.constants.sip_status = True
-        self.constants.secure_status = False
-        self.constants.disable_cs_lv = False
-        self.constants.disable_amfi = False
-        self.constants.fu_status = False
-
-        # Reset Variables - GUI override
-        # Match constants.py for model specific settings
-        # TODO: Write a sane system for this...
-        self.constants.firewire_boot = False
-        self.constants.xhci_boot = False
-        self.constants.nvme_boot = False
-        self.constants.force_quad_thread = False
-        self.constants.enable_wake_on_wlan = False
-        self.constants.disable_tb = False
-        self.constants.dGPU_switch = False
-        self.constants.disallow_cpufriend = False
-        self.constants.disable_mediaanalysisd = False
-        self.constants.set_alc_usage = True
-        self.constants.nvram_write = True
-        self.constants.allow_nvme_fixing = True
-        self.constants.allow_3rd_party_drives = True
-        self.constants.disable_fw_throttle = False
-        self.constants.software_demux = False
-        self.constants.disable_connectdrivers = False
-        self.constants.amd_gop_injection = False
-        self.constants.nvidia_kepler_gop_injection = False
-        self.constants.disable_cs_lv = False
-        self.constants.disable_amfi = False
-        self.constants.secure_status = False
-        self.constants.serial_settings = "None"
-        self.constants.override_smbios = "Default"
-        self.constants.allow_native_spoofs = False
-        self.constants.allow_oc_everywhere = False
-        self.constants.sip_status = True
-        self.constants.custom_sip_value = None
-
-
-        self.constants.fu_arguments = None
-
-        self.constants.custom_serial_number = ""
-        self.constants.custom_board_serial_number = ""
-
-        if self.host_is_target is True:
-            for gpu in self.constants.computer.gpus:
-                if gpu.device_id_unspoofed == -1:
-                    gpu.device_id_unspoofed = gpu.device_id
-                if gpu.vendor_id_unspoofed == -1:
-                    gpu.vendor_id_unspoofed = gpu.vendor_id
-
-        self._general_probe()
-        self._nvram_probe()
-        self._gpu_probe()
-        self._networking_probe()
-        self._misc_hardwares_probe()
-        self._smbios_probe()
-        self._check_amfipass_supported()
-        self._load_gui_defaults()
+# Match constants.py for model specific settings
+RESET_DEFAULTS: dict = {
+    "sip_status":                  True,
+    "secure_status":               False,
+    "disable_cs_lv":               False,
+    "disable_amfi":                False,
+    "fu_status":                   False,
+    "fu_arguments":                None,
+    "firewire_boot":               False,
+    "xhci_boot":                   False,
+    "nvme_boot":                   False,
+    "force_quad_thread":           False,
+    "enable_wake_on_wlan":         False,
+    "disable_tb":                  False,
+    "dGPU_switch":                 False,
+    "disallow_cpufriend":          False,
+    "disable_mediaanalysisd":      False,
+    "set_alc_usage":               True,
+    "nvram_write":                 True,
+    "allow_nvme_fixing":           True,
+    "allow_3rd_party_drives":      True,
+    "disable_fw_throttle":         False,
+    "software_demux":              False,
+    "disable_connectdrivers":      False,
+    "amd_gop_injection":           False,
+    "nvidia_kepler_gop_injection": False,
+    "serial_settings":             "None",
+    "override_smbios":             "Default",
+    "allow_native_spoofs":         False,
+    "allow_oc_everywhere":         False,
+    "custom_sip_value":            None,
+    "custom_serial_number":        "",
+    "custom_board_serial_number":  "",
+}
+
+# Metal GPUs needing root patches, unless natively supported
+METAL_ARCHS: list = [
+    device_probe.Intel.Archs.Ivy_Bridge,
+    device_probe.Intel.Archs.Haswell,
+    device_probe.Intel.Archs.Broadwell,
+    device_probe.Intel.Archs.Skylake,
+    device_probe.NVIDIA.Archs.Kepler,
+    device_probe.AMD.Archs.Legacy_GCN_7000,
+    device_probe.AMD.Archs.Legacy_GCN_8000,
+    device_probe.AMD.Archs.Legacy_GCN_9000,
+    device_probe.AMD.Archs.Polaris,
+    device_probe.AMD.Archs.Polaris_Spoof,
+    device_probe.AMD.Archs.Vega,
+    device_probe.AMD.Archs.Navi,
+]
+
+# Metal GPUs whose patches require AMFI disabled
+AMFI_METAL_ARCHS: list = [
+    device_probe.Intel.Archs.Ivy_Bridge,
+    device_probe.Intel.Archs.Haswell,
+    device_probe.NVIDIA.Archs.Kepler,
+]
+
+AMD_METAL_ARCHS: list = [
+    device_probe.AMD.Archs.Legacy_GCN_7000,
+    device_probe.AMD.Archs.Legacy_GCN_8000,
+    device_probe.AMD.Archs.Legacy_GCN_9000,
+    device_probe.AMD.Archs.Polaris,
+    device_probe.AMD.Archs.Polaris_Spoof,
+    device_probe.AMD.Archs.Vega,
+    device_probe.AMD.Archs.Navi,
+]
+
+# AMD GPUs the native Ventura stack supports, given AVX2
+NATIVE_AMD_ARCHS: list = [
+    device_probe.AMD.Archs.Polaris,
+    device_probe.AMD.Archs.Polaris_Spoof,
+    device_probe.AMD.Archs.Vega,
+    device_probe.AMD.Archs.Navi,
+]
+
+NON_METAL_ARCHS: list = [
+    device_probe.Intel.Archs.Iron_Lake,
+    device_probe.Intel.Archs.Sandy_Bridge,
+    device_probe.NVIDIA.Archs.Tesla,
+    device_probe.NVIDIA.Archs.Fermi,
+    device_probe.NVIDIA.Archs.Maxwell,
+    device_probe.NVIDIA.Archs.Pascal,
+    device_probe.AMD.Archs.TeraScale_1,
+    device_probe.AMD.Archs.TeraScale_2,
+]
+
+# 12.0: Legacy Wireless chipsets require root patching
+LEGACY_WIRELESS: list = [
+    device_probe.Broadcom.Chipsets.AirPortBrcm4331,
+    device_probe.Broadcom.Chipsets.AirPortBrcm43224,
+    device_probe.Atheros.Chipsets.AirPortAtheros40,
+]
+
+# 14.0: Modern Wireless chipsets require root patching
+MODERN_WIRELESS: list = [
+    device_probe.Broadcom.Chipsets.AirPortBrcm4360,
+    device_probe.Broadcom.Chipsets.AirportBrcmNIC,
+]
+
+
+@dataclass(frozen=True)
+class HostFacts:
+    """
+    Host state the rules depend on, gathered from the boot state once per session
+    """
+
+    recovery:             bool           # Booted into RecoveryOS
+    boot_args:            str
+    spoofed_serial:       Optional[str]  # OCLP-Spoofed-SN in NVRAM
+    spoofed_board_serial: Optional[str]  # OCLP-Spoofed-MLB in NVRAM
+
+    @classmethod
+    def gather(cls, boot_state: BootState) -> "HostFacts":
+        return cls(
+            recovery=boot_state.recovery,
+            boot_args=boot_state.nvram_value("boot-args") or "",
+            spoofed_serial=boot_state.nvram_value("OCLP-Spoofed-SN", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True),
+            spoofed_board_serial=boot_state.nvram_value("OCLP-Spoofed-MLB", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True),
+        )
+
+
+@dataclass
+class DefaultsContext:
+    """
+    Inputs of the rules, and the fields resolved by earlier rules
+    """
+
+    model:                str
+    host_is_target:       bool
+    ignore_settings_file: bool
+    constants:            constants.Constants
+    host:                 HostFacts
+    settings:             dict                                # Persisted settings, empty if unreadable
+    resolved:             dict = field(default_factory=dict)  # Field -> value
+    inputs:               dict = field(default_factory=dict)  # Field -> value read from constants, as first read
+
+    @property
+    def computer(self) -> device_probe.Computer:
+        return self.constants.computer
+
+    @property
+    def smbios(self) -> Optional[dict]:
+        """
+        Model's smbios_data entry, None if unknown
+        """
+        return smbios_data.smbios_dictionary.get(self.model)
 
+    def value(self, name: str):
+        """
+        Field as resolved so far, falling back to its current value
 
-    def _general_probe(self) -> None:
+        Rules read constants through here, so the fields they depend on are recorded
         """
-        General probe for data
+        if name in self.resolved:
+            return self.resolved[name]
+        value = getattr(self.constants, name)
+        if name not in self.inputs:
+            self.inputs[name] = copy.deepcopy(value)
+        return value
+
+    def gpu_archs(self) -> list:
+        if self.host_is_target:
+            return [gpu.arch for gpu in self.computer.gpus if gpu.class_code != 0xFFFFFFFF]
+        if self.smbios is not None:
+            return self.smbios["Stock GPUs"]
+        return []
+
+
+@dataclass(frozen=True)
+class DefaultRule:
+    """
+    A default, decided from a DefaultsContext
+    """
+
+    name:    str                 # Shown in traces (ie. 'Non-Metal GPU')
+    applies: callable            # Context -> whether to assign the rule's values
+    values:  object = None       # Field -> value, or context -> such a dict
+    effects: callable = None     # Context -> [(description, callable)], host side effects once applied
+
+
+@dataclass
+class ResolvedDefaults:
+    """
+    Defaults of a model, and the rules they came from
+    """
+
+    model:          str
+    host_is_target: bool
+    values:         dict = field(default_factory=dict)  # Field -> value
+    trace:          list = field(default_factory=list)  # (rule, field, value) of every assignment, in rule order
+    effects:        list = field(default_factory=list)  # (description, callable)
+    inputs:         dict = field(default_factory=dict)  # Constants field -> value the rules read, see DefaultsContext.value()
+
+    def explain(self, name: str) -> list:
+        """
+        Assignments of a field, the last one wins
+
+        Returns:
+            list: (rule, value)
         """
+        return [(rule, value) for rule, field_name, value in self.trace if field_name == name]
 
-        if self.model in ["MacBookPro8,2", "MacBookPro8,3"]:
-            # Users disabling TS2 most likely have a faulty dGPU
-            # users can override this in settings
-            ts2_status = global_settings.GlobalEnviromentSettings().read_property("MacBookPro_TeraScale_2_Accel")
-            if ts2_status is True:
-                self.constants.allow_ts2_accel = True
-            else:
-                global_settings.GlobalEnviromentSettings().write_property("MacBookPro_TeraScale_2_Accel", False)
-                self.constants.allow_ts2_accel = False
-
-        if self.model in ["MacPro3,1", "Xserve2,1"]:
-            self.constants.force_quad_thread = True
-        else:
-            self.constants.force_quad_thread = False
-
-        if self.model in smbios_data.smbios_dictionary:
-            if smbios_data.smbios_dictionary[self.model]["CPU Generation"] >= cpu_data.CPUGen.skylake.value:
-                # On 2016-2017 MacBook Pros, 15" devices used a stock Samsung SSD with IONVMeController
-                # Technically this should be patched based on NVMeFix.kext logic,
-                # however Apple deemed the SSD unsupported for enhanced performance
-                # In addition, some upgraded NVMe drives still have issues with enhanced power management
-                # Safest to disable by default, allow user to configure afterwards
-                self.constants.allow_nvme_fixing = False
-            else:
-                self.constants.allow_nvme_fixing = True
-
-        # Check if running in RecoveryOS
-        self.constants.recovery_status = utilities.check_recovery()
-
-        if global_settings.GlobalEnviromentSettings().read_property("Force_Web_Drivers") is True:
-            self.constants.force_nv_web = True
-
-        result = global_settings.GlobalEnviromentSettings().read_property("ShouldNukeKDKs")
-        if result is False:
-            self.constants.should_nuke_kdks = False
-
-
-    def _smbios_probe(self) -> None:
+    def rule_for(self, name: str) -> Optional[str]:
         """
-        SMBIOS specific probe
+        Rule deciding a field, None if no rule sets it
         """
+        assignments = self.explain(name)
+        return assignments[-1][0] if assignments else None
 
-        if not self.host_is_target:
-            if self.model in ["MacPro4,1", "MacPro5,1"]:
-                # Allow H.265 on AMD
-                # Assume 2009+ machines have Polaris on pre-builts (internal testing)
-                # Hardware Detection will never hit this
-                self.constants.serial_settings = "Minimal"
+    def diff(self, other: "ResolvedDefaults") -> dict:
+        """
+        Fields set differently by other
 
+        Returns:
+            dict: Field -> (value here, value in other), None where a side does not set it
+        """
+        return {
+            name: (self.values.get(name), other.values.get(name))
+            for name in [*self.values, *[name for name in other.values if name not in self.values]]
+            if (name in self.values, self.values.get(name)) != (name in other.values, other.values.get(name))
+        }
+
+
+def _wireless_needs_patches(context: DefaultsContext) -> bool:
+    if context.host_is_target:
+        wifi = context.computer.wifi
+        is_legacy = (
+            (isinstance(wifi, device_probe.Broadcom) and wifi.chipset in LEGACY_WIRELESS) or
+            (isinstance(wifi, device_probe.Atheros) and wifi.chipset in LEGACY_WIRELESS)
+        )
+        is_modern = isinstance(wifi, device_probe.Broadcom) and wifi.chipset in MODERN_WIRELESS
+        if is_legacy is False and is_modern is False:
+            return False
+    elif context.smbios is None or context.smbios["Wireless Model"] not in LEGACY_WIRELESS + MODERN_WIRELESS:
+        return False
+
+    return context.smbios is not None and context.smbios["Max OS Supported"] < os_data.os_data.sonoma
+
+
+def _skips_rosetta_gcn(context: DefaultsContext, arch) -> bool:
+    """
+    Legacy GCN 7000 under Rosetta is left alone
+    """
+    return arch == device_probe.AMD.Archs.Legacy_GCN_7000 and context.host_is_target and context.computer.rosetta_active is True
+
+
+def _metal_needs_patches(context: DefaultsContext, arch) -> bool:
+    if arch not in METAL_ARCHS or _skips_rosetta_gcn(context, arch):
+        return False
+    if arch in NATIVE_AMD_ARCHS:
+        # See if system can use the native AMD stack in Ventura
+        if context.host_is_target:
+            return "AVX2" not in context.computer.cpu.leafs
+        if context.smbios is not None and context.smbios["CPU Generation"] >= cpu_data.CPUGen.haswell.value:
+            return False
+    return True
+
+
+def _smbios_spoof(context: DefaultsContext) -> Optional[dict]:
+    try:
+        spoof_model = generate_smbios.set_smbios_model_spoof(context.model)
+    except:
+        # Native Macs (mainly M1s) will error out as they don't know what SMBIOS to spoof to
+        # As we don't spoof on native models, we can safely ignore this
+        spoof_model = context.model
+    return smbios_data.smbios_dictionary.get(spoof_model)
+
+
+def _saved_settings(context: DefaultsContext) -> tuple:
+    """
+    'GUI:' settings saved by the settings window
+
+    Returns:
+        tuple: (field -> value, (key, field type, saved type) of settings whose type no longer matches)
+    """
+    values = {}
+    mismatched = []
+    for key, value in context.settings.items():
+        if not key.startswith("GUI:"):
+            continue
+        constants_key = key.replace("GUI:", "")
+        if not hasattr(context.constants, constants_key):
+            continue
+        if value == "PYTHON_NONE_VALUE":
+            value = None
+        if type(context.value(constants_key)) != type(value):
+            mismatched.append((key, type(context.value(constants_key)), type(value)))
+            continue
+        values[constants_key] = value
+    return values, mismatched
+
+
+def _remove_mismatched_setting(key: str, expected_type: type, saved_type: type) -> None:
+    logging.error(f"Global settings type mismatch for {key.replace('GUI:', '')}: {expected_type} vs {saved_type}")
+    logging.error(f"Removing {key} from global settings")
+    global_settings.GlobalEnviromentSettings().delete_property(key)
+
+
+def _enable_blur_beta() -> None:
+    for key in ["Moraea_BlurBeta"]:
+        # Enable BetaBlur if user hasn't disabled it
+        is_key_enabled = subprocess.run(["/usr/bin/defaults", "read", "-globalDomain", key], stdout=subprocess.PIPE).stdout.decode("utf-8").strip()
+        if is_key_enabled not in ["false", "0"]:
+            subprocess.run(["/usr/bin/defaults", "write", "-globalDomain", key, "-bool", "true"])
+
+
+DEFAULT_RULES: list = [
+    DefaultRule(
+        name="Reset",
+        applies=lambda context: True,
+        values=RESET_DEFAULTS,
+    ),
+    DefaultRule(
+        # Users disabling TS2 most likely have a faulty dGPU
+        # users can override this in settings
+        name="TeraScale 2 Acceleration",
+        applies=lambda context: context.model in ["MacBookPro8,2", "MacBookPro8,3"],
+        values=lambda context: {"allow_ts2_accel": context.settings.get("MacBookPro_TeraScale_2_Accel") is True},
+        effects=lambda context: [] if isinstance(context.settings.get("MacBookPro_TeraScale_2_Accel"), bool) else [
+            ("Save MacBookPro_TeraScale_2_Accel as False", lambda: global_settings.GlobalEnviromentSettings().write_property("MacBookPro_TeraScale_2_Accel", False)),
+        ],
+    ),
+    DefaultRule(
+        name="Quad Thread",
+        applies=lambda context: context.model in ["MacPro3,1", "Xserve2,1"],
+        values={"force_quad_thread": True},
+    ),
+    DefaultRule(
+        # On 2016-2017 MacBook Pros, 15" devices used a stock Samsung SSD with IONVMeController
+        # Technically this should be patched based on NVMeFix.kext logic,
+        # however Apple deemed the SSD unsupported for enhanced performance
+        # In addition, some upgraded NVMe drives still have issues with enhanced power management
+        # Safest to disable by default, allow user to configure afterwards
+        name="NVMe Power Management",
+        applies=lambda context: context.smbios is not None,
+        values=lambda context: {"allow_nvme_fixing": context.smbios["CPU Generation"] < cpu_data.CPUGen.skylake.value},
+    ),
+    DefaultRule(
+        name="RecoveryOS",
+        applies=lambda context: True,
+        values=lambda context: {"recovery_status": context.host.recovery},
+    ),
+    DefaultRule(
+        name="Web Drivers",
+        applies=lambda context: context.settings.get("Force_Web_Drivers") is True,
+        values={"force_nv_web": True},
+    ),
+    DefaultRule(
+        name="Keep KDKs",
+        applies=lambda context: context.settings.get("ShouldNukeKDKs") is False,
+        values={"should_nuke_kdks": False},
+    ),
+    DefaultRule(
+        name="Verbose Boot",
+        applies=lambda context: context.host_is_target and "-v" in context.host.boot_args,
+        values={"verbose_debug": True},
+    ),
+    DefaultRule(
+        # If either variables are missing, we assume something is wrong with the spoofed variables and reset
+        name="Spoofed Serials",
+        applies=lambda context: context.host_is_target,
+        values=lambda context: {
+            "custom_serial_number":       context.host.spoofed_serial,
+            "custom_board_serial_number": context.host.spoofed_board_serial,
+        } if None not in [context.host.spoofed_serial, context.host.spoofed_board_serial] else {
+            "custom_serial_number":       "",
+            "custom_board_serial_number": "",
+        },
+    ),
+    DefaultRule(
+        name="Legacy Metal GPU",
+        applies=lambda context: any(arch in AMFI_METAL_ARCHS for arch in context.gpu_archs()),
+        values={"disable_amfi": True, "disable_mediaanalysisd": True},
+    ),
+    DefaultRule(
+        # Allow H.265 on AMD
+        name="AMD GPU H.265",
+        applies=lambda context: context.smbios is not None and "Socketed GPUs" in context.smbios and any(arch in AMD_METAL_ARCHS and not _skips_rosetta_gcn(context, arch) for arch in context.gpu_archs()),
+        values={"serial_settings": "Minimal"},
+    ),
+    DefaultRule(
+        name="Metal GPU",
+        applies=lambda context: any(_metal_needs_patches(context, arch) for arch in context.gpu_archs()),
+        values={"sip_status": False, "secure_status": False, "disable_cs_lv": True},
+    ),
+    DefaultRule(
+        name="Non-Metal GPU",
+        applies=lambda context: any(arch in NON_METAL_ARCHS for arch in context.gpu_archs()),
+        values=lambda context: {
+            "sip_status": False,
+            "secure_status": False,
+            "disable_cs_lv": True,
+            # Only disable AMFI if we officially support Ventura
+            **({"disable_amfi": True} if os_data.os_data.ventura in context.value("legacy_accel_support") else {}),
+        },
+        effects=lambda context: [("Enable Moraea_BlurBeta", _enable_blur_beta)],
+    ),
+    DefaultRule(
+        name="Wireless",
+        applies=_wireless_needs_patches,
+        values={"sip_status": False, "secure_status": False, "disable_cs_lv": True, "disable_amfi": True},
+    ),
+    DefaultRule(
+        # Pre-Ivy do not natively support XHCI boot support
+        # If we detect XHCI on older model, enable
+        name="XHCI Boot",
+        applies=lambda context: (
+            context.host_is_target and bool(context.computer.usb_controllers) and context.smbios is not None
+            and context.smbios["CPU Generation"] < cpu_data.CPUGen.ivy_bridge.value
+            and any(isinstance(controller, device_probe.XHCIController) for controller in context.computer.usb_controllers)
+        ),
+        values={"xhci_boot": True},
+    ),
+    DefaultRule(
+        # Allow H.265 on AMD
+        # Assume 2009+ machines have Polaris on pre-builts (internal testing)
+        # Hardware Detection will never hit this
+        name="Mac Pro H.265",
+        applies=lambda context: not context.host_is_target and context.model in ["MacPro4,1", "MacPro5,1"],
+        values={"serial_settings": "Minimal"},
+    ),
+    DefaultRule(
         # Check if model uses T2 SMBIOS, if so see if it needs root patching (determined earlier on via SIP variable)
         # If not, allow SecureBootModel usage, otherwise force VMM patching
         # Needed for macOS Monterey to allow OTA updates
-        try:
-            spoof_model = generate_smbios.set_smbios_model_spoof(self.model)
-        except:
-            # Native Macs (mainly M1s) will error out as they don't know what SMBIOS to spoof to
-            # As we don't spoof on native models, we can safely ignore this
-            spoof_model = self.model
-
-        if spoof_model in smbios_data.smbios_dictionary:
-            if smbios_data.smbios_dictionary[spoof_model]["SecureBootModel"] is not None:
-                if self.constants.sip_status is False:
-                    # Force VMM as root patching breaks .im4m signature
-                    self.constants.secure_status = False
-                    self.constants.force_vmm = True
-                else:
-                    # Allow SecureBootModel
-                    self.constants.secure_status = True
-                    self.constants.force_vmm = False
-
-
-    def _nvram_probe(self) -> None:
+        name="SecureBootModel",
+        applies=lambda context: _smbios_spoof(context) is not None and _smbios_spoof(context)["SecureBootModel"] is not None,
+        values=lambda context: (
+            # Force VMM as root patching breaks .im4m signature
+            {"secure_status": False, "force_vmm": True} if context.value("sip_status") is False else
+            {"secure_status": True, "force_vmm": False}
+        ),
+    ),
+    DefaultRule(
+        # Root volume without adhoc signed binaries, AMFI and CS_LV can stay enabled
+        # Unknown whether a non-target host uses old binaries, rebuild it once on the host
+        name="AMFIPass",
+        applies=lambda context: context.host_is_target and context.computer.oclp_sys_signed is not False,
+        values={"disable_amfi": False, "disable_cs_lv": False},
+    ),
+    DefaultRule(
+        name="Saved Settings",
+        applies=lambda context: context.host_is_target and context.ignore_settings_file is False,
+        values=lambda context: _saved_settings(context)[0],
+        effects=lambda context: [
+            (f"Remove {mismatch[0]} from global settings", lambda mismatch=mismatch: _remove_mismatched_setting(*mismatch))
+            for mismatch in _saved_settings(context)[1]
+        ],
+    ),
+]
+
+
+class DefaultsEngine:
+    """
+    Resolves DEFAULT_RULES, memoized per model, host/target and persisted settings
+
+    A memoized result is reused while the constants fields its rules read keep their values
+    """
+
+    def __init__(self, global_constants: constants.Constants, boot_state: BootState = None) -> None:
         """
-        NVRAM specific probe
+        Parameters:
+            global_constants (Constants): Settings to resolve into
+            boot_state       (BootState): Boot state of the host, defaults to BootState.current() on first use
         """
+        self.constants:  constants.Constants = global_constants
+        self.computer:   device_probe.Computer = global_constants.computer
+        self.boot_state: BootState = boot_state
 
-        if not self.host_is_target:
-            return
+        self._host:        HostFacts = None
+        self._resolved:    dict = {}     # (model, host_is_target, ignore_settings_file, settings stamp) -> ResolvedDefaults, checked against its inputs
+        self._effects_run: set  = set()  # Descriptions of side effects already run
 
-        if "-v" in (utilities.get_nvram("boot-args") or ""):
-            self.constants.verbose_debug = True
 
-        self.constants.custom_serial_number = utilities.get_nvram("OCLP-Spoofed-SN", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
-        self.constants.custom_board_serial_number = utilities.get_nvram("OCLP-Spoofed-MLB", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
-        if self.constants.custom_serial_number is None or self.constants.custom_board_serial_number is None:
-            # If either variables are missing, we assume something is wrong with the spoofed variables and reset
-            self.constants.custom_serial_number = ""
-            self.constants.custom_board_serial_number = ""
+    @property
+    def host(self) -> HostFacts:
+        if self._host is None:
+            if self.boot_state is None:
+                self.boot_state = BootState.current()
+            self._host = HostFacts.gather(self.boot_state)
+        return self._host
 
 
-    def _networking_probe(self) -> None:
+    def resolve(self, model: str, host_is_target: bool, ignore_settings_file: bool = False) -> ResolvedDefaults:
         """
-        Networking specific probe
-        """
-
-        is_legacy_wifi = False
-        is_modern_wifi = False
+        Defaults of a model
 
-        if self.host_is_target:
-            if (
-                (
-                    isinstance(self.constants.computer.wifi, device_probe.Broadcom) and
-                    self.constants.computer.wifi.chipset in [
-                        device_probe.Broadcom.Chipsets.AirPortBrcm4331,
-                        device_probe.Broadcom.Chipsets.AirPortBrcm43224,
-                    ]
-                ) or (
-                    isinstance(self.constants.computer.wifi, device_probe.Atheros) and
-                    self.constants.computer.wifi.chipset == device_probe.Atheros.Chipsets.AirPortAtheros40
-                )
-            ):
-                is_legacy_wifi = True
-            elif (
-                (
-                    isinstance(self.constants.computer.wifi, device_probe.Broadcom) and
-                    self.constants.computer.wifi.chipset in [
-                        device_probe.Broadcom.Chipsets.AirPortBrcm4360,
-                        device_probe.Broadcom.Chipsets.AirportBrcmNIC,
-                    ]
-                )
-            ):
-                is_modern_wifi = True
-
-        else:
-            if self.model not in smbios_data.smbios_dictionary:
-                return
-            if (
-                smbios_data.smbios_dictionary[self.model]["Wireless Model"] in [
-                    device_probe.Broadcom.Chipsets.AirPortBrcm4331,
-                    device_probe.Broadcom.Chipsets.AirPortBrcm43224,
-                    device_probe.Atheros.Chipsets.AirPortAtheros40,
-                ]
-            ):
-                is_legacy_wifi = True
-            elif (
-                    smbios_data.smbios_dictionary[self.model]["Wireless Model"] in [
-                    device_probe.Broadcom.Chipsets.AirPortBrcm4360,
-                    device_probe.Broadcom.Chipsets.AirportBrcmNIC,
-                ]
-            ):
-                is_modern_wifi = True
-
-        if is_legacy_wifi is False and is_modern_wifi is False:
-            return
-
-        # 12.0: Legacy Wireless chipsets require root patching
-        # 14.0: Modern Wireless chipsets require root patching
-        if self.model in smbios_data.smbios_dictionary:
-            if smbios_data.smbios_dictionary[self.model]["Max OS Supported"] < os_data.os_data.sonoma:
-                self.constants.sip_status = True
-                self.constants.sip_status = False
-                self.constants.secure_status = False
-                self.constants.disable_cs_lv = True
-                self.constants.disable_amfi = True
-
-        # if is_legacy_wifi is True:
-        #     # 13.0: Enabling AirPlay to Mac patches breaks Control Center on legacy chipsets
-        #     # AirPlay to Mac was unsupported regardless, so we can safely disable it
-        #     self.constants.fu_arguments = " -disable_sidecar_mac"
-
-
-    def _misc_hardwares_probe(self) -> None:
-        """
-        Misc probe
-        """
-        if self.host_is_target:
-            if self.constants.computer.usb_controllers:
-                if self.model in smbios_data.smbios_dictionary:
-                    if smbios_data.smbios_dictionary[self.model]["CPU Generation"] < cpu_data.CPUGen.ivy_bridge.value:
-                        # Pre-Ivy do not natively support XHCI boot support
-                        # If we detect XHCI on older model, enable
-                        for controller in self.constants.computer.usb_controllers:
-                            if isinstance(controller, device_probe.XHCIController):
-                                self.constants.xhci_boot = True
-                                break
-
-
-    def _gpu_probe(self) -> None:
-        """
-        Graphics specific probe
+        Parameters:
+            model                (str):  Model to resolve for
+            host_is_target       (bool): Whether building for this machine
+            ignore_settings_file (bool): Skip settings saved by the settings window
         """
+        settings = global_settings.GlobalEnviromentSettings()
+        try:
+            settings_stat = Path(settings.global_settings_plist).stat()
+            stamp = (settings_stat.st_size, settings_stat.st_mtime_ns)
+        except OSError:
+            stamp = None
 
-        gpu_archs = []
-        if self.host_is_target:
-            gpu_archs = [gpu.arch for gpu in self.constants.computer.gpus if gpu.class_code != 0xFFFFFFFF]
-        else:
-            if self.model in smbios_data.smbios_dictionary:
-                gpu_archs = smbios_data.smbios_dictionary[self.model]["Stock GPUs"]
-
-        for arch in gpu_archs:
-            # Legacy Metal Logic
-            if arch in [
-                device_probe.Intel.Archs.Ivy_Bridge,
-                device_probe.Intel.Archs.Haswell,
-                device_probe.Intel.Archs.Broadwell,
-                device_probe.Intel.Archs.Skylake,
-                device_probe.NVIDIA.Archs.Kepler,
-                device_probe.AMD.Archs.Legacy_GCN_7000,
-                device_probe.AMD.Archs.Legacy_GCN_8000,
-                device_probe.AMD.Archs.Legacy_GCN_9000,
-                device_probe.AMD.Archs.Polaris,
-                device_probe.AMD.Archs.Polaris_Spoof,
-                device_probe.AMD.Archs.Vega,
-                device_probe.AMD.Archs.Navi,
-            ]:
-                if arch in [
-                    device_probe.Intel.Archs.Ivy_Bridge,
-                    device_probe.Intel.Archs.Haswell,
-                    device_probe.NVIDIA.Archs.Kepler,
-                ]:
-                    self.constants.disable_amfi = True
-                    self.constants.disable_mediaanalysisd = True
-
-                if arch in [
-                        device_probe.AMD.Archs.Legacy_GCN_7000,
-                        device_probe.AMD.Archs.Legacy_GCN_8000,
-                        device_probe.AMD.Archs.Legacy_GCN_9000,
-                        device_probe.AMD.Archs.Polaris,
-                        device_probe.AMD.Archs.Polaris_Spoof,
-                        device_probe.AMD.Archs.Vega,
-                        device_probe.AMD.Archs.Navi,
-                ]:
-                    if arch == device_probe.AMD.Archs.Legacy_GCN_7000:
-                        # Check if we're running in Rosetta
-                        if self.host_is_target:
-                            if self.constants.computer.rosetta_active is True:
-                                continue
-
-                    # Allow H.265 on AMD
-                    if self.model in smbios_data.smbios_dictionary:
-                        if "Socketed GPUs" in smbios_data.smbios_dictionary[self.model]:
-                            self.constants.serial_settings = "Minimal"
-
-                # See if system can use the native AMD stack in Ventura
-                if arch in [
-                    device_probe.AMD.Archs.Polaris,
-                    device_probe.AMD.Archs.Polaris_Spoof,
-                    device_probe.AMD.Archs.Vega,
-                    device_probe.AMD.Archs.Navi,
-                ]:
-                    if self.host_is_target:
-                        if "AVX2" in self.constants.computer.cpu.leafs:
-                            continue
-                    else:
-                        if self.model in smbios_data.smbios_dictionary:
-                            if smbios_data.smbios_dictionary[self.model]["CPU Generation"] >= cpu_data.CPUGen.haswell.value:
-                                continue
-
-                self.constants.sip_status = False
-                self.constants.secure_status = False
-                self.constants.disable_cs_lv = True
-
-            # Non-Metal Logic
-            elif arch in [
-                device_probe.Intel.Archs.Iron_Lake,
-                device_probe.Intel.Archs.Sandy_Bridge,
-                device_probe.NVIDIA.Archs.Tesla,
-                device_probe.NVIDIA.Archs.Fermi,
-                device_probe.NVIDIA.Archs.Maxwell,
-                device_probe.NVIDIA.Archs.Pascal,
-                device_probe.AMD.Archs.TeraScale_1,
-                device_probe.AMD.Archs.TeraScale_2,
-            ]:
-                self.constants.sip_status = False
-                self.constants.secure_status = False
-                self.constants.disable_cs_lv = True
-                if os_data.os_data.ventura in self.constants.legacy_accel_support:
-                    # Only disable AMFI if we officially support Ventura
-                    self.constants.disable_amfi = True
-
-                for key in ["Moraea_BlurBeta"]:
-                    # Enable BetaBlur if user hasn't disabled it
-                    is_key_enabled = subprocess.run(["/usr/bin/defaults", "read", "-globalDomain", key], stdout=subprocess.PIPE).stdout.decode("utf-8").strip()
-                    if is_key_enabled not in ["false", "0"]:
-                        subprocess.run(["/usr/bin/defaults", "write", "-globalDomain", key, "-bool", "true"])
-
-    def _check_amfipass_supported(self) -> None:
-        """
-        Check if root volume supports AMFIPass
+        key = (model, host_is_target, ignore_settings_file, stamp)
+        resolved = self._resolved.get(key)
+        if resolved is None or any(getattr(self.constants, name) != value for name, value in resolved.inputs.items()):
+            resolved = self._evaluate(model, host_is_target, ignore_settings_file, self._read_settings(settings.global_settings_plist))
+            self._resolved[key] = resolved
+        return resolved
 
-        The basic requirements of this function are:
-        - The host is the target
-        - Root volume doesn't have adhoc signed binaries
 
-        If all of these conditions are met, it is safe to disable AMFI and CS_LV. Otherwise, for safety, leave it be.
+    def apply(self, resolved: ResolvedDefaults) -> None:
         """
+        Set the resolved fields, then run side effects not yet run this session
+        """
+        for name, value in resolved.values.items():
+            setattr(self.constants, name, value)
+        for description, effect in resolved.effects:
+            if description in self._effects_run:
+                continue
+            self._effects_run.add(description)
+            effect()
 
-        if not self.host_is_target:
-            # Unknown whether the host is using old binaries
-            # Rebuild it once you are on the host
-            return
-
-        # Check for adhoc signed binaries
-        if self.constants.computer.oclp_sys_signed is False:
-            # Root patch with new binaries, then reboot
-            return
 
-        # Note: simply checking the authority is not enough, as the authority can be spoofed
-        # (but do we really care? this is just a simple check)
-        # Note: the cert will change
+    def _evaluate(self, model: str, host_is_target: bool, ignore_settings_file: bool, settings: dict) -> ResolvedDefaults:
+        if host_is_target is True:
+            for gpu in self.computer.gpus:
+                if gpu.device_id_unspoofed == -1:
+                    gpu.device_id_unspoofed = gpu.device_id
+                if gpu.vendor_id_unspoofed == -1:
+                    gpu.vendor_id_unspoofed = gpu.vendor_id
 
-        self.constants.disable_amfi = False
-        self.constants.disable_cs_lv = False
+        context = DefaultsContext(model, host_is_target, ignore_settings_file, self.constants, self.host, settings)
+        resolved = ResolvedDefaults(model, host_is_target)
+        for rule in DEFAULT_RULES:
+            if not rule.applies(context):
+                continue
+            values = rule.values(context) if callable(rule.values) else rule.values
+            for name, value in (values or {}).items():
+                context.resolved[name] = value
+                resolved.trace.append((rule.name, name, value))
+            if rule.effects is not None:
+                resolved.effects.extend(rule.effects(context))
 
+        resolved.values = dict(context.resolved)
+        resolved.inputs = context.inputs
+        return resolved
 
-    def _load_gui_defaults(self) -> None:
-        """
-        Load GUI defaults from global settings
-        """
-        if not self.host_is_target:
-            return
-        if self.ignore_settings_file is True:
-            return
-
-        settings_plist = global_settings.GlobalEnviromentSettings().global_settings_plist
-        if not Path(settings_plist).exists():
-            return
 
+    def _read_settings(self, path: str) -> dict:
+        if not Path(path).exists():
+            return {}
         try:
-            plist = plistlib.load(Path(settings_plist).open("rb"))
+            return plistlib.load(Path(path).open("rb"))
         except Exception as e:
             logging.error("Error: Unable to read global settings file")
             logging.error(e)
-            return
+            return {}
 
-        for key in plist:
-            if not key.startswith("GUI:"):
-                continue
 
-            constants_key = key.replace("GUI:", "")
+_engine: DefaultsEngine = None
+
+
+def get_engine(global_constants: constants.Constants) -> DefaultsEngine:
+    """
+    Shared engine, replaced when the constants, hardware probe or boot state change (ie. validating dumped models)
+    """
+    global _engine
+    if (
+        _engine is None
+        or _engine.constants is not global_constants
+        or _engine.computer is not global_constants.computer
+        or _engine.boot_state not in [None, BootState.current(capture=False)]
+    ):
+        _engine = DefaultsEngine(global_constants)
+    return _engine
+
+
+class GenerateDefaults:
+
+    def __init__(self, model: str, host_is_target: bool, global_constants: constants.Constants, ignore_settings_file: bool = False) -> None:
+        self.constants: constants.Constants = global_constants
 
-            if plist[key] == "PYTHON_NONE_VALUE":
-                plist[key] = None
+        self.model: str = model
+
+        self.host_is_target: bool = host_is_target
+        self.ignore_settings_file: bool = ignore_settings_file
 
-            if hasattr(self.constants, constants_key):
-                # Check if type is different
-                original_type = type(getattr(self.constants, constants_key))
-                new_type = type(plist[key])
-                if original_type != new_type:
-                    logging.error(f"Global settings type mismatch for {constants_key}: {original_type} vs {new_type}")
-                    logging.error(f"Removing {key} from global settings")
-                    global_settings.GlobalEnviromentSettings().delete_property(key)
-                    continue
+        engine = get_engine(self.constants)
+        self.defaults: ResolvedDefaults = engine.resolve(self.model, self.host_is_target, self.ignore_settings_file)
 
-                logging.info(f"Setting {constants_key} to {plist[key]}")
-                setattr(self.constants, constants_key, plist[key])
\ No newline at end of file
+        for name, value in self.defaults.values.items():
+            if getattr(self.constants, name, None) != value:
+                logging.info(f"- Default {name}: {value} ({self.defaults.rule_for(name)})")
+        engine.apply(self.defaults)
@@ -0,0 +1,252 @@
+"""
+disk_inventory.py: Disk and partition topology from diskutil
+
+The whole topology comes from a single 'diskutil list -plist'. Details that
+listing lacks (media name, filesystem, internal/external) are queried with
+'diskutil info -plist' only for the disks and partitions that need them,
+concurrently, since diskutil only describes one device per invocation.
+
+Queries are never cached, as listings must reflect media attached or removed
+since. Recorded output (see datasets/example_disk_data.py) can be replayed
+instead, ie. for validation off macOS:
+    >>> with example_disk_data.MacBookPro.External_Media:
+    >>>     disk_inventory.list_disks()
+
+Usage:
+    >>> from oclp_r.support import disk_inventory
+    >>> for disk in disk_inventory.list_disks(lambda disk: any(partition.is_fat for partition in disk.partitions)):
+    >>>     print(disk.identifier, disk.name, [partition.identifier for partition in disk.partitions])
+"""
+
+import re
+import plistlib
+import logging
+import subprocess
+
+from typing import Optional
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Partition content types implying a FAT filesystem
+FAT_CONTENT: list = [
+    "EFI",
+    "DOS_FAT_12",
+    "DOS_FAT_16",
+    "DOS_FAT_32",
+    "Windows_FAT_16",
+    "Windows_FAT_32",
+]
+
+# Partition content types never FAT formatted, their filesystem is not queried
+NON_FAT_CONTENT: list = [
+    "Apple_APFS",
+    "Apple_APFS_ISC",
+    "Apple_APFS_Recovery",
+    "Apple_HFS",
+    "Apple_HFSX",
+    "Apple_Boot",
+    "Apple_CoreStorage",
+    "Apple_KernelCoreDump",
+    "Linux",
+    "Linux Swap",
+    "Microsoft Reserved",
+]
+
+FAT_FILESYSTEMS: list = ["msdos", "EFI"]
+
+MAX_WORKERS: int = 8
+
+ACTIVE_RECORDING = None  # RecordedDiskutil replayed instead of running diskutil
+
+
+@dataclass
+class PartitionRecord:
+    identifier:  str                   # ex. 'disk0s1'
+    content:     str                   # Partition type (ex. 'EFI', 'Microsoft Basic Data')
+    size:        int                   # Bytes
+    name:        str = ""              # Volume name
+    filesystem:  Optional[str] = None  # ex. 'msdos', None if not queried
+    mount_point: Optional[str] = None
+
+    @classmethod
+    def from_listing(cls, entry: dict):
+        content = entry.get("Content", "")
+        return cls(
+            identifier=entry["DeviceIdentifier"],
+            content=content,
+            size=entry.get("Size", 0),
+            name=entry.get("VolumeName", ""),
+            filesystem="msdos" if content in FAT_CONTENT else None,
+            mount_point=entry.get("MountPoint"),
+        )
+
+    def apply_info(self, info: dict) -> None:
+        """
+        Fill in details from 'diskutil info'
+        """
+        self.content    = info.get("Content", self.content)
+        self.filesystem = info.get("FilesystemType", self.content)
+        self.name       = info.get("VolumeName", self.name)
+        self.size       = info.get("TotalSize", self.size)
+
+    @property
+    def is_fat(self) -> bool:
+        """
+        FAT formatted, or an ESP (OpenCore install target)
+        """
+        return self.content == "EFI" or self.filesystem in FAT_FILESYSTEMS
+
+
+@dataclass
+class DiskRecord:
+    identifier:  str                   # ex. 'disk0'
+    size:        int                   # Bytes
+    device_node: str = ""              # ex. '/dev/disk0'
+    name:        str = "Disk"          # Media name
+    internal:    Optional[bool] = None
+    solid_state: Optional[bool] = None
+    partitions:  list = field(default_factory=list)  # PartitionRecord
+
+    @classmethod
+    def from_listing(cls, entry: dict):
+        return cls(
+            identifier=entry["DeviceIdentifier"],
+            size=entry.get("Size", 0),
+            device_node=f"/dev/{entry['DeviceIdentifier']}",
+            partitions=[PartitionRecord.from_listing(partition) for partition in entry.get("Partitions", []) if "DeviceIdentifier" in partition],
+        )
+
+    def apply_info(self, info: dict) -> None:
+        """
+        Fill in details from 'diskutil info', raises KeyError for media without a size (ex. CD drives)
+        """
+        self.device_node = info["DeviceNode"]
+        self.size        = info["TotalSize"]
+        self.name        = info.get("MediaName", "Disk")
+        self.internal    = info.get("Internal")
+        self.solid_state = info.get("SolidState", False)
+
+
+class RecordedDiskutil:
+    """
+    Recorded 'diskutil list -plist' and 'diskutil info -plist' output, replayed while entered
+    """
+
+    def __init__(self, listing: dict, info: dict) -> None:
+        """
+        Parameters:
+            listing (dict): 'diskutil list -plist' output
+            info    (dict): Device identifier -> 'diskutil info -plist' output, raw bytes kept as is
+        """
+        self.listing: dict = listing
+        self.info:    dict = info
+
+        self._previous = None
+
+
+    def __enter__(self) -> "RecordedDiskutil":
+        global ACTIVE_RECORDING
+        self._previous = ACTIVE_RECORDING
+        ACTIVE_RECORDING = self
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        global ACTIVE_RECORDING
+        ACTIVE_RECORDING = self._previous
+
+
+    def replay(self, args: list) -> bytes:
+        if args[0] == "list":
+            return plistlib.dumps(self.listing)
+        info = self.info.get(args[-1])
+        if info is None:
+            # diskutil reports unknown devices on stderr
+            return b""
+        return info if isinstance(info, bytes) else plistlib.dumps(info)
+
+
+def diskutil(args: list) -> bytes:
+    """
+    Output of 'diskutil <args>', run afresh on every call
+    """
+    if ACTIVE_RECORDING is not None:
+        return ACTIVE_RECORDING.replay(args)
+    return subprocess.run(["/usr/sbin/diskutil", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+
+
+def disk_info(identifier: str) -> dict:
+    """
+    'diskutil info -plist' for a single device, None if unavailable
+    """
+    output = diskutil(["info", "-plist", identifier])
+    try:
+        return plistlib.loads(output)
+    except Exception:
+        pass
+    try:
+        # Chinesium USB can have garbage data in MediaName
+        return plistlib.loads(re.sub(rb"(<key>MediaName</key>\s*<string>).*?(</string>)", rb"\1\2", output))
+    except Exception:
+        logging.info(f"- Failed to parse disk info for {identifier}")
+        return None
+
+
+def list_topology(physical_only: bool = True) -> list:
+    """
+    'diskutil list -plist' entries, one per whole disk
+
+    Parameters:
+        physical_only (bool): Exclude synthesized (APFS container) and disk image devices
+    """
+    # TODO: AllDisksAndPartitions is not supported in Snow Leopard and older
+    if physical_only is True:
+        try:
+            # High Sierra and newer
+            return plistlib.loads(diskutil(["list", "-plist", "physical"]))["AllDisksAndPartitions"]
+        except Exception:
+            pass
+    # Sierra and older
+    return plistlib.loads(diskutil(["list", "-plist"]))["AllDisksAndPartitions"]
+
+
+def list_disks(candidate: callable = None, physical_only: bool = True, describe_partitions: bool = True, max_workers: int = MAX_WORKERS) -> list:
+    """
+    Disks with their partitions, filled in with 'diskutil info' details
+
+    Partitions whose filesystem the listing does not imply are described first,
+    then disks passing 'candidate' are described. Disks without a size
+    (ex. CD drives) are skipped.
+
+    Parameters:
+        candidate           (callable): Takes a DiskRecord (partitions described, disk details not yet), returns whether to include it
+        physical_only       (bool):     Exclude synthesized and disk image devices
+        describe_partitions (bool):     Query filesystems the listing does not imply
+        max_workers         (int):      Maximum concurrent diskutil invocations
+
+    Returns:
+        list: DiskRecords, in diskutil order
+    """
+    disks = [DiskRecord.from_listing(entry) for entry in list_topology(physical_only) if "DeviceIdentifier" in entry]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        if describe_partitions is True:
+            pending = [partition for disk in disks for partition in disk.partitions if partition.filesystem is None and partition.content not in NON_FAT_CONTENT]
+        for partition, info in zip(pending, executor.map(disk_info, [partition.identifier for partition in pending])):
+            if info is not None:
+                partition.apply_info(info)
+
+        if candidate is not None:
+            disks = [disk for disk in disks if candidate(disk)]
+
+        described = []
+        for disk, info in zip(disks, executor.map(disk_info, [disk.identifier for disk in disks])):
+            try:
+                disk.apply_info(info)
+            except (KeyError, TypeError):
+                continue
+            described.append(disk)
+
+    return described
@@ -0,0 +1,241 @@
+"""
+download_manager.py: Shared queue for concurrent downloads
+
+Flows that stage several assets (ex. KDK and MetallibSupportPkg for an
+incoming macOS update) enqueue their DownloadObjects here and wait on the
+returned futures, so the assets download side by side within a global
+concurrency and bandwidth budget.
+
+Usage:
+    >>> from oclp_r.support import download_manager
+    >>> future = download_manager.DOWNLOAD_MANAGER.enqueue(download_obj, priority=download_manager.DownloadPriority.HIGH)
+    >>> download_obj = future.result()
+    >>> if download_obj.download_complete is False:
+    >>>     print("Download failed")
+"""
+
+import enum
+import time
+import shutil
+import logging
+import threading
+import itertools
+
+import concurrent.futures
+
+from queue import PriorityQueue
+from pathlib import Path
+from concurrent.futures import Future
+
+from . import network_handler
+
+
+class DownloadPriority(enum.IntEnum):
+    """
+    Enum for queue priority, lower values are started first
+    """
+
+    HIGH:   int = 0
+    NORMAL: int = 1
+    LOW:    int = 2
+
+
+class BandwidthBudget:
+    """
+    Token bucket shared by all downloads of a manager
+
+    Downloads call consume() after each receive, which blocks
+    until the budget allows the bytes through
+    """
+
+    def __init__(self, bytes_per_second: float) -> None:
+        self.bytes_per_second: float = bytes_per_second
+
+        self._lock:      threading.Lock = threading.Lock()
+        self._available: float = bytes_per_second
+        self._updated:   float = time.monotonic()
+
+
+    def consume(self, size: int) -> None:
+        """
+        Take size bytes from the budget, sleeping if it is exhausted
+
+        Parameters:
+            size (int): Bytes received
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.bytes_per_second, self._available + (now - self._updated) * self.bytes_per_second)
+            self._updated = now
+            self._available -= size
+            delay = -self._available / self.bytes_per_second if self._available < 0 else 0
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DownloadManager:
+    """
+    Priority queue of downloads, run by a fixed pool of workers
+
+    Identical URLs are only downloaded once, requests for another
+    destination receive a copy once the download completes
+    """
+
+    def __init__(self, max_concurrent: int = 3, bytes_per_second: float = None) -> None:
+        """
+        Parameters:
+            max_concurrent   (int):   Maximum downloads running at once
+            bytes_per_second (float): Bandwidth shared by all downloads, None for unlimited
+        """
+        self.max_concurrent: int = max_concurrent
+        self.bandwidth:      BandwidthBudget = BandwidthBudget(bytes_per_second) if bytes_per_second else None
+
+        self._queue:    PriorityQueue = PriorityQueue()
+        self._sequence: itertools.count = itertools.count()  # Keeps FIFO order within a priority
+        self._lock:     threading.Lock = threading.Lock()
+        self._workers:  list = []
+
+        self._in_flight: dict = {}  # url -> (DownloadObject, Future)
+
+
+    def enqueue(self, download_obj: network_handler.DownloadObject, priority: DownloadPriority = DownloadPriority.NORMAL) -> Future:
+        """
+        Queue a download
+
+        Parameters:
+            download_obj (DownloadObject):   Download to run, must not be started
+            priority     (DownloadPriority): Queue priority
+
+        Returns:
+            Future: Resolves to download_obj once finished, check download_complete for success
+        """
+        with self._lock:
+            if download_obj.url in self._in_flight:
+                existing_obj, existing_future = self._in_flight[download_obj.url]
+                if existing_obj is download_obj or Path(existing_obj.filepath) == Path(download_obj.filepath):
+                    logging.info(f"Download already queued: {download_obj.filename}")
+                    return existing_future
+                logging.info(f"Download already queued for another destination, copying once complete: {download_obj.filename}")
+                return self._chain_copy(existing_future, download_obj)
+
+            future = Future()
+            self._in_flight[download_obj.url] = (download_obj, future)
+            download_obj.bandwidth_budget = self.bandwidth
+            self._queue.put((priority, next(self._sequence), download_obj, future))
+            self._spawn_worker()
+
+        return future
+
+
+    def cancel(self, future: Future) -> None:
+        """
+        Cancel a queued or running download
+
+        Parameters:
+            future (Future): Future returned by enqueue()
+        """
+        with self._lock:
+            for download_obj, in_flight_future in list(self._in_flight.values()):
+                if in_flight_future is not future:
+                    continue
+                if future.cancel():
+                    # Never started, allow the URL to be queued again
+                    self._forget(download_obj, future)
+                else:
+                    download_obj.stop()
+                return
+        future.cancel()
+
+
+    def wait(self, futures: list, timeout: float = None) -> list:
+        """
+        Block until all provided downloads have finished
+
+        Parameters:
+            futures (list): Futures returned by enqueue()
+            timeout (float): Seconds to wait, None for no limit
+
+        Returns:
+            list: Finished DownloadObjects, in the order provided (None if cancelled or timed out)
+        """
+        concurrent.futures.wait(futures, timeout=timeout)
+        return [future.result() if future.done() and not future.cancelled() else None for future in futures]
+
+
+    def _chain_copy(self, source_future: Future, download_obj: network_handler.DownloadObject) -> Future:
+        """
+        Resolve download_obj from another download of the same URL
+        """
+        future = Future()
+
+        def _copy(source: Future) -> None:
+            if source.cancelled() or source.result().download_complete is False:
+                download_obj.error_msg = "Source download failed" if not source.cancelled() else "Source download cancelled"
+            else:
+                try:
+                    Path(download_obj.filepath).parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(source.result().filepath, download_obj.filepath)
+                    download_obj.downloaded_file_size = source.result().downloaded_file_size
+                    download_obj.download_complete = True
+                except OSError as e:
+                    download_obj.error_msg = str(e)
+            if download_obj.error_msg:
+                download_obj.error = True
+            download_obj.status = network_handler.DownloadStatus.COMPLETE
+            future.set_result(download_obj)
+
+        source_future.add_done_callback(_copy)
+        return future
+
+
+    def _forget(self, download_obj: network_handler.DownloadObject, future: Future) -> None:
+        """
+        Drop a download from the in-flight table, unless its URL was queued again since
+
+        Expected to be called with the lock held
+        """
+        if self._in_flight.get(download_obj.url, (None, None))[1] is future:
+            del self._in_flight[download_obj.url]
+
+
+    def _spawn_worker(self) -> None:
+        """
+        Start another worker if below the concurrency budget
+
+        Workers exit once the queue is empty, expected to be called with the lock held
+        """
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        if len(self._workers) >= self.max_concurrent:
+            return
+        worker = threading.Thread(target=self._worker, daemon=True)
+        self._workers.append(worker)
+        worker.start()
+
+
+    def _worker(self) -> None:
+        """
+        Run queued downloads until the queue is empty
+        """
+        while True:
+            with self._lock:
+                if self._queue.empty():
+                    self._workers.remove(threading.current_thread())
+                    return
+                _, _, download_obj, future = self._queue.get()
+
+            running = future.set_running_or_notify_cancel()
+            if running:
+                try:
+                    download_obj.download(spawn_thread=False)
+                except Exception as e:
+                    logging.error(f"Error downloading {download_obj.url}: {e}")
+
+            with self._lock:
+                self._forget(download_obj, future)
+
+            if running:
+                future.set_result(download_obj)
+
+
+DOWNLOAD_MANAGER = DownloadManager()
@@ -0,0 +1,395 @@
+"""
+esp_transaction.py: Transactional, differential installation of files to an ESP
+
+Each managed root on the ESP (ie. 'EFI/OC') is staged in full next to the
+live copy, then swapped in by rename. FAT has no hardlinks or clones, so to
+avoid rewriting unchanged files the previous generation (kept for rollback)
+is recycled as the next staging area: only files whose size or SHA-256
+differ are written. Files it lacks that the live root already holds (ie.
+the first installation over an existing OpenCore) are seeded from the live
+copy, only files changed by the build are written from it.
+
+Layout on the ESP:
+    .OCLP-R/Staging/<root>   Next generation, being staged
+    .OCLP-R/Rollback/<root>  Previous generation
+    .OCLP-R/Journal.json     Present while roots are being swapped, for recovery
+    .OCLP-R/Manifest.json    Sizes and digests of the installed generation
+
+Usage:
+    >>> from oclp_r.support import esp_transaction
+    >>> transaction = esp_transaction.ESPTransaction("/Volumes/EFI", {"EFI/OC/OpenCore.efi": "/path/to/OpenCore.efi"}, ["EFI/OC"])
+    >>> transaction.install()
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from pathlib import Path
+
+
+TRANSACTION_FOLDER: str = ".OCLP-R"
+
+# Created by macOS on FAT volumes, not part of an installation
+IGNORED_NAMES: list = [".DS_Store", ".fseventsd"]
+
+COPY_CHUNK_SIZE: int = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 hex digest of a file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_ignored(name: str) -> bool:
+    return name in IGNORED_NAMES or name.startswith("._")
+
+
+def _fsync_directory(path: str) -> None:
+    """
+    Flush a directory's entries, not supported by all filesystems
+    """
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+class ESPTransaction:
+    """
+    Installs a set of files to an ESP, one managed root at a time
+
+    Managed roots are replaced as a whole: files under a root that are not in
+    the layout are removed, and roots without any files in the layout are removed.
+    """
+
+    def __init__(self, mount_path: str, layout: dict, roots: list) -> None:
+        """
+        Parameters:
+            mount_path (str):  ESP mount point
+            layout     (dict): Relative path on the ESP -> source file
+            roots      (list): Managed roots, relative to the ESP (ie. 'EFI/OC', 'boot.efi')
+        """
+        self.mount_path: Path = Path(mount_path)
+        self.layout:     dict = {relative_path: Path(source) for relative_path, source in layout.items()}
+        self.roots:      list = roots
+
+        for relative_path in self.layout:
+            if self._root_of(relative_path) is None:
+                raise ValueError(f"{relative_path} is not within a managed root")
+
+        self.transaction_path: Path = self.mount_path / TRANSACTION_FOLDER
+        self.staging_path:     Path = self.transaction_path / "Staging"
+        self.rollback_path:    Path = self.transaction_path / "Rollback"
+        self.journal_path:     Path = self.transaction_path / "Journal.json"
+        self.manifest_path:    Path = self.transaction_path / "Manifest.json"
+
+        self.stats: dict = {
+            "Files":         len(self.layout),
+            "Files Written": 0,  # From the build
+            "Files Seeded":  0,  # From the live root, unchanged by the build
+            "Bytes":         0,
+            "Bytes Written": 0,
+            "Bytes Seeded":  0,
+        }
+
+        self._digests: dict = {}  # Relative path -> source digest
+        self._swapped: dict = {}  # Root swapped in by commit() -> whether it replaced a previous copy
+
+
+    def install(self) -> bool:
+        """
+        Recover any interrupted installation, then stage, swap in and verify the layout
+
+        Returns:
+            bool: True if the ESP matches the layout, False if rolled back
+        """
+        self.recover()
+
+        for relative_path, source in self.layout.items():
+            self._digests[relative_path] = file_digest(source)
+            self.stats["Bytes"] += source.stat().st_size
+
+        if self._matches(self.mount_path) is True:
+            logging.info("- ESP already up to date, no files written")
+            self._write_manifest()
+            return True
+
+        self.stage()
+        self.commit()
+
+        if self.verify() is False:
+            logging.error("- Installed files do not match the build, rolling back")
+            self.rollback()
+            return False
+
+        self._write_manifest()
+        logging.info(f"- Wrote {self.stats['Files Written']} of {self.stats['Files']} files, {self.stats['Bytes Written']} of {self.stats['Bytes']} bytes")
+        if self.stats["Files Seeded"] > 0:
+            logging.info(f"- Seeded {self.stats['Files Seeded']} unchanged files ({self.stats['Bytes Seeded']} bytes) from the live ESP")
+        return True
+
+
+    def stage(self) -> None:
+        """
+        Bring the staging area in line with the layout, writing only differing files
+        """
+        self.transaction_path.mkdir(exist_ok=True)
+        if not self.staging_path.exists() and self.rollback_path.exists():
+            # Recycle the previous generation, it usually shares most files with the next
+            os.rename(self.rollback_path, self.staging_path)
+        self.staging_path.mkdir(exist_ok=True)
+
+        for relative_path, source in self.layout.items():
+            destination = self.staging_path / relative_path
+            if self._is_current(destination, relative_path):
+                continue
+            if destination.is_dir():
+                shutil.rmtree(destination)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if self._is_current(self.mount_path / relative_path, relative_path):
+                # Unchanged since the live generation, copy within the ESP
+                self._copy(self.mount_path / relative_path, destination, seeded=True)
+                continue
+            self._copy(source, destination)
+
+        # Drop anything the layout no longer contains
+        for root in self.roots:
+            self._prune(self.staging_path, root)
+
+        _fsync_directory(self.staging_path)
+
+
+    def commit(self) -> None:
+        """
+        Swap staged roots in, moving the live roots to the rollback area
+        """
+        wanted = [root for root in self.roots if any(self._root_of(relative_path) == root for relative_path in self.layout)]
+        self._write_json(self.journal_path, {"Roots": self.roots, "Wanted": wanted})
+        self._swapped = self._swap(self.roots, wanted)
+        self.journal_path.unlink()
+        # Leftovers would stop the next installation from recycling the rollback area
+        _remove(self.staging_path)
+        _fsync_directory(self.transaction_path)
+
+
+    def recover(self) -> None:
+        """
+        Finish swapping roots if a previous installation was interrupted
+
+        Staged files were flushed before the journal was written, so rolling forward is safe
+        """
+        if not self.journal_path.exists():
+            return
+        try:
+            journal = json.loads(self.journal_path.read_text())
+        except (OSError, ValueError):
+            logging.info("- Unreadable installation journal, ignoring")
+            self.journal_path.unlink()
+            return
+
+        logging.info("- Completing interrupted installation")
+        self._swap(journal["Roots"], journal["Wanted"])
+        self.journal_path.unlink()
+        _remove(self.staging_path)
+
+
+    def verify(self) -> bool:
+        """
+        Compare the live roots against the layout's sizes and digests
+        """
+        return self._matches(self.mount_path, log_mismatches=True)
+
+
+    def rollback(self) -> None:
+        """
+        Restore the roots swapped in by commit() to their previous generation
+        """
+        for root, had_previous in self._swapped.items():
+            live      = self.mount_path / root
+            previous  = self.rollback_path / root
+            discarded = self.staging_path / root
+
+            _remove(discarded)
+            if live.exists():
+                discarded.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(live, discarded)
+            if had_previous is True:
+                live.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(previous, live)
+        _fsync_directory(self.mount_path)
+
+
+    def _swap(self, roots: list, wanted: list) -> dict:
+        """
+        Move each live root to the rollback area and the staged root into place
+
+        Idempotent, roots already swapped are skipped
+
+        Returns:
+            dict: Root swapped -> whether a live copy was moved to the rollback area
+        """
+        swapped = {}
+        self.rollback_path.mkdir(exist_ok=True)
+        for root in roots:
+            live     = self.mount_path / root
+            staged   = self.staging_path / root
+            previous = self.rollback_path / root
+
+            if root in wanted and not staged.exists():
+                continue
+            if root not in wanted and not live.exists():
+                continue
+
+            swapped[root] = live.exists()
+            if live.exists():
+                _remove(previous)
+                previous.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(live, previous)
+            if root in wanted:
+                live.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(staged, live)
+
+        _fsync_directory(self.mount_path)
+        return swapped
+
+
+    def _matches(self, base: Path, log_mismatches: bool = False) -> bool:
+        """
+        Whether the managed roots under base hold exactly the layout's files
+        """
+        matches = True
+        for relative_path in self.layout:
+            if not self._is_current(base / relative_path, relative_path):
+                if log_mismatches is False:
+                    return False
+                logging.info(f"  - Mismatch: {relative_path}")
+                matches = False
+
+        for root in self.roots:
+            for relative_path in self._files_under(base, root):
+                if relative_path not in self.layout:
+                    if log_mismatches is False:
+                        return False
+                    logging.info(f"  - Unexpected file: {relative_path}")
+                    matches = False
+
+        return matches
+
+
+    def _is_current(self, path: Path, relative_path: str) -> bool:
+        """
+        Whether path holds the layout's file, size is compared before hashing
+        """
+        try:
+            if not path.is_file() or path.stat().st_size != self.layout[relative_path].stat().st_size:
+                return False
+        except OSError:
+            return False
+        return file_digest(path) == self._digests[relative_path]
+
+
+    def _files_under(self, base: Path, root: str) -> list:
+        """
+        Relative paths of files within a root under base
+        """
+        path = base / root
+        if path.is_file():
+            return [root]
+        files = []
+        for directory, folders, names in os.walk(path):
+            folders[:] = [folder for folder in folders if not _is_ignored(folder)]
+            relative_directory = Path(directory).relative_to(base).as_posix()
+            files.extend(f"{relative_directory}/{name}" for name in names if not _is_ignored(name))
+        return files
+
+
+    def _prune(self, base: Path, root: str) -> None:
+        """
+        Remove files, and then folders, not in the layout
+        """
+        path = base / root
+        if not path.exists():
+            return
+        if not any(self._root_of(relative_path) == root for relative_path in self.layout):
+            _remove(path)
+            return
+        for relative_path in self._files_under(base, root):
+            if relative_path not in self.layout:
+                (base / relative_path).unlink()
+        if not path.is_dir():
+            return
+
+        folders = {root}
+        for relative_path in self.layout:
+            if self._root_of(relative_path) == root:
+                folders.update(parent.as_posix() for parent in Path(relative_path).parents)
+        for directory, subfolders, _ in os.walk(path):
+            relative_directory = Path(directory).relative_to(base).as_posix()
+            for folder in list(subfolders):
+                if f"{relative_directory}/{folder}" not in folders:
+                    shutil.rmtree(Path(directory) / folder)
+                    subfolders.remove(folder)
+
+
+    def _copy(self, source: Path, destination: Path, seeded: bool = False) -> None:
+        """
+        Write a file and flush it to disk
+
+        Parameters:
+            source      (Path): File to copy
+            destination (Path): File to write
+            seeded      (bool): Source is the live copy, rather than the build's
+        """
+        kind = "Seeded" if seeded is True else "Written"
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            while chunk := source_file.read(COPY_CHUNK_SIZE):
+                destination_file.write(chunk)
+                self.stats[f"Bytes {kind}"] += len(chunk)
+            destination_file.flush()
+            os.fsync(destination_file.fileno())
+        self.stats[f"Files {kind}"] += 1
+
+
+    def _root_of(self, relative_path: str) -> str:
+        for root in self.roots:
+            if relative_path == root or relative_path.startswith(root + "/"):
+                return root
+        return None
+
+
+    def _write_manifest(self) -> None:
+        self._write_json(self.manifest_path, {
+            relative_path: {"Size": self.layout[relative_path].stat().st_size, "SHA256": self._digests[relative_path]}
+            for relative_path in sorted(self.layout)
+        })
+
+
+    def _write_json(self, path: Path, data: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        _fsync_directory(path.parent)
@@ -3,13 +3,11 @@ install.py: Installation of OpenCore files to ESP
 """
 
 import logging
-import plistlib
 import subprocess
-import re
 
 from pathlib import Path
 
-from . import utilities, subprocess_wrapper
+from . import utilities, subprocess_wrapper, esp_transaction, disk_inventory
 
 from .. import constants
 
@@ -20,34 +18,15 @@ class tui_disk_installation:
 
     def list_disks(self):
         all_disks = {}
-        # TODO: AllDisksAndPartitions is not supported in Snow Leopard and older
-        try:
-            # High Sierra and newer
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist", "physical"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        except ValueError:
-            # Sierra and older
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        for disk in disks["AllDisksAndPartitions"]:
-            try:
-                disk_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-            except:
-                # Chinesium USB can have garbage data in MediaName
-                diskutil_output = subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip()
-                ungarbafied_output = re.sub(r'(<key>MediaName</key>\s*<string>).*?(</string>)', r'\1\2', diskutil_output).encode()
-                disk_info = plistlib.loads(ungarbafied_output)
-            try:
-                all_disks[disk["DeviceIdentifier"]] = {"identifier": disk_info["DeviceNode"], "name": disk_info.get("MediaName", "Disk"), "size": disk_info["TotalSize"], "partitions": {}}
-                for partition in disk["Partitions"]:
-                    partition_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", partition["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-                    all_disks[disk["DeviceIdentifier"]]["partitions"][partition["DeviceIdentifier"]] = {
-                        "fs": partition_info.get("FilesystemType", partition_info["Content"]),
-                        "type": partition_info["Content"],
-                        "name": partition_info.get("VolumeName", ""),
-                        "size": partition_info["TotalSize"],
-                    }
-            except KeyError:
-                # Avoid crashing with CDs installed
-                continue
+        for disk in disk_inventory.list_disks(lambda disk: any(partition.is_fat for partition in disk.partitions)):
+            all_disks[disk.identifier] = {"identifier": disk.device_node, "name": disk.name, "size": disk.size, "partitions": {}}
+            for partition in disk.partitions:
+                all_disks[disk.identifier]["partitions"][partition.identifier] = {
+                    "fs": partition.filesystem or partition.content,
+                    "type": partition.content,
+                    "name": partition.name,
+                    "size": partition.size,
+                }
 
         supported_disks = {}
         for disk in all_disks:
@@ -102,9 +81,9 @@ class tui_disk_installation:
             subprocess_wrapper.log(result)
             return
 
-        partition_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", full_disk_identifier], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+        partition_info = disk_inventory.disk_info(full_disk_identifier)
         parent_disk = partition_info["ParentWholeDisk"]
-        drive_host_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", parent_disk], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+        drive_host_info = disk_inventory.disk_info(parent_disk)
         sd_type = drive_host_info.get("MediaName", "Disk")
         try:
             ssd_type = drive_host_info["SolidState"]
@@ -117,52 +96,83 @@ class tui_disk_installation:
             logging.info("EFI failed to mount!")
             return False
 
-        if (mount_path / Path("EFI/OC")).exists():
-            logging.info("Removing preexisting EFI/OC folder")
-            subprocess.run(["/bin/rm", "-rf", mount_path / Path("EFI/OC")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        if (mount_path / Path("System")).exists():
-            logging.info("Removing preexisting System folder")
-            subprocess.run(["/bin/rm", "-rf", mount_path / Path("System")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        if (mount_path / Path("boot.efi")).exists():
-            logging.info("Removing preexisting boot.efi")
-            subprocess.run(["/bin/rm", mount_path / Path("boot.efi")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
         logging.info("Copying OpenCore onto EFI partition")
-        subprocess.run(["/bin/mkdir", "-p", mount_path / Path("EFI")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        subprocess.run(["/bin/cp", "-r", self.constants.opencore_release_folder / Path("EFI/OC"), mount_path / Path("EFI/OC")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        subprocess.run(["/bin/cp", "-r", self.constants.opencore_release_folder / Path("System"), mount_path / Path("System")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        if Path(self.constants.opencore_release_folder / Path("boot.efi")).exists():
-            subprocess.run(["/bin/cp", self.constants.opencore_release_folder / Path("boot.efi"), mount_path / Path("boot.efi")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
         if self.constants.boot_efi is True:
             logging.info("Converting Bootstrap to BOOTx64.efi")
-            if (mount_path / Path("EFI/BOOT")).exists():
-                subprocess.run(["/bin/rm", "-rf", mount_path / Path("EFI/BOOT")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            Path(mount_path / Path("EFI/BOOT")).mkdir()
-            subprocess.run(["/bin/mv", mount_path / Path("System/Library/CoreServices/boot.efi"), mount_path / Path("EFI/BOOT/BOOTx64.efi")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            subprocess.run(["/bin/rm", "-rf", mount_path / Path("System")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            layout, roots = self._generate_layout()
+            installed = esp_transaction.ESPTransaction(mount_path, layout, roots).install()
+        except OSError as e:
+            logging.error(f"Failed to install OpenCore: {e}")
+            installed = False
 
         if self._determine_sd_card(sd_type) is True:
             logging.info("Adding SD Card icon")
-            subprocess.run(["/bin/cp", self.constants.icon_path_sd, mount_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._install_icon(self.constants.icon_path_sd, mount_path)
         elif ssd_type is True:
             logging.info("Adding SSD icon")
-            subprocess.run(["/bin/cp", self.constants.icon_path_ssd, mount_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._install_icon(self.constants.icon_path_ssd, mount_path)
         elif disk_type == "USB":
             logging.info("Adding External USB Drive icon")
-            subprocess.run(["/bin/cp", self.constants.icon_path_external, mount_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._install_icon(self.constants.icon_path_external, mount_path)
         else:
             logging.info("Adding Internal Drive icon")
-            subprocess.run(["/bin/cp", self.constants.icon_path_internal, mount_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._install_icon(self.constants.icon_path_internal, mount_path)
 
         logging.info("Cleaning install location")
         if not self.constants.recovery_status:
             logging.info("Unmounting EFI partition")
             subprocess.run(["/usr/sbin/diskutil", "umount", mount_path], stdout=subprocess.PIPE).stdout.decode().strip().encode()
 
+        if installed is False:
+            logging.info("OpenCore transfer failed, previous installation kept")
+            return False
+
         logging.info("OpenCore transfer complete")
 
-        return True
\ No newline at end of file
+        return True
+
+
+    def _generate_layout(self) -> tuple:
+        """
+        Files to install from the OpenCore build, and the ESP folders they replace
+
+        Returns:
+            tuple: (relative path on the ESP -> source file, managed roots)
+
+        Raises:
+            FileNotFoundError: Bootstrap requested, but missing from the build
+        """
+        release_folder = Path(self.constants.opencore_release_folder)
+        layout = {}
+
+        for root in ["EFI/OC", "System", "boot.efi"]:
+            source = release_folder / root
+            if source.is_file():
+                layout[root] = source
+                continue
+            for file in sorted(source.rglob("*")):
+                if file.is_file():
+                    layout[file.relative_to(release_folder).as_posix()] = file
+
+        roots = ["EFI/OC", "System", "boot.efi"]
+        if self.constants.boot_efi is True:
+            # Bootstrap is installed as the fallback bootloader instead
+            bootstrap = layout.pop("System/Library/CoreServices/boot.efi", None)
+            if bootstrap is None:
+                raise FileNotFoundError(f"Bootstrap missing from build: {release_folder / 'System/Library/CoreServices/boot.efi'}")
+            layout = {relative_path: source for relative_path, source in layout.items() if not relative_path.startswith("System/")}
+            layout["EFI/BOOT/BOOTx64.efi"] = bootstrap
+            roots.append("EFI/BOOT")
+
+        return layout, roots
+
+
+    def _install_icon(self, icon_path: Path, mount_path: Path) -> None:
+        """
+        Copy the volume icon, unless already present
+        """
+        destination = Path(mount_path) / Path(icon_path).name
+        if destination.exists() and esp_transaction.file_digest(destination) == esp_transaction.file_digest(icon_path):
+            return
+        subprocess.run(["/bin/cp", icon_path, mount_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+installer_progress.py: Byte-accurate progress for macOS installer media creation
+
+The total is computed up front from the installer application's files,
+plus any payloads (ex. AutoPkg-Assets.pkg, KDK) copied onto the media.
+Progress of the installer copy is read from createinstallmedia's output,
+streamed to a log file, with per-file accounting of the application copied
+onto the target volume as a fallback when the output carries no
+percentages. Payloads are accounted by their size on the target volume.
+
+Usage:
+    >>> from oclp_r.support import installer_progress
+    >>> progress = installer_progress.InstallerMediaProgress(installer_path, log_path, lambda: "/Volumes/Install macOS Ventura")
+    >>> progress.add_payload("/Volumes/Install macOS Ventura/Library/Packages/Install.pkg", 730000000)
+    >>> progress.poll()
+    InstallerProgress(stage='Copying Installer', bytes_written=..., total_bytes=..., percent=..., speed=..., time_remaining=...)
+"""
+
+import os
+import re
+import stat
+import time
+import threading
+
+from pathlib import Path
+from dataclasses import dataclass
+
+
+# createinstallmedia output marker -> stage, in the order they appear
+CREATEINSTALLMEDIA_STAGES: list = [
+    ("Erasing disk",                "Erasing Disk"),
+    ("Copying to disk",             "Copying Installer"),
+    ("Copying essential files",     "Copying Installer"),
+    ("Making disk bootable",        "Making Disk Bootable"),
+    ("Copying boot files",          "Making Disk Bootable"),
+    ("Install media now available", "Copying Packages"),
+]
+
+# Stages after which the installer copy has finished
+INSTALLER_COPIED_STAGES: list = ["Making Disk Bootable", "Copying Packages"]
+
+
+@dataclass(frozen=True)
+class InstallerProgress:
+    """
+    Snapshot of installer creation progress
+    """
+
+    stage:          str
+    bytes_written:  int
+    total_bytes:    int
+    percent:        float  # -1 if unknown
+    speed:          float  # Bytes per second
+    time_remaining: float  # Seconds, -1 if unknown
+
+
+def directory_size(path: str) -> int:
+    """
+    Total size of regular files within path, symlinks are not followed
+    """
+    total = 0
+    for directory, _, files in os.walk(path):
+        for file in files:
+            try:
+                file_stat = os.lstat(os.path.join(directory, file))
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                total += file_stat.st_size
+    return total
+
+
+def parse_createinstallmedia_output(output: str) -> tuple:
+    """
+    Stage and installer copy percentage from createinstallmedia's output so far
+
+    ex. 'Erasing disk: 0%... 10%... 100%\\nCopying to disk: 0%... 10%... 20%...'
+
+    Returns:
+        tuple: (stage, percent copied), either may be None if not yet reported
+    """
+    stage = None
+    stage_position = -1
+    for marker, marker_stage in CREATEINSTALLMEDIA_STAGES:
+        position = output.rfind(marker)
+        if position > stage_position:
+            stage, stage_position = marker_stage, position
+
+    if stage in INSTALLER_COPIED_STAGES:
+        return stage, 100.0
+    if stage != "Copying Installer":
+        return stage, None
+
+    percentages = re.findall(r"(\d+(?:\.\d+)?)%", output[stage_position:])
+    if not percentages:
+        return stage, None
+    return stage, min(float(percentages[-1]), 100.0)
+
+
+class InstallerMediaProgress:
+    """
+    Progress of createinstallmedia and the payloads copied after it
+
+    poll() may be called as often as the UI likes, figures are refreshed at most every POLL_INTERVAL
+    """
+
+    POLL_INTERVAL:        float = 0.5  # Seconds between refreshes
+    THROUGHPUT_SMOOTHING: float = 0.3  # EWMA weight of the newest sample
+
+    def __init__(self, installer_path: str, log_path: str = None, volume_resolver: callable = None) -> None:
+        """
+        Parameters:
+            installer_path  (str):      Installer application being flashed
+            log_path        (str):      File createinstallmedia's output is streamed to
+            volume_resolver (callable): Returns the target volume's mount point, used for per-file accounting
+        """
+        self.log_path:        Path = Path(log_path) if log_path else None
+        self.volume_resolver: callable = volume_resolver
+
+        self.installer_name:  str = Path(installer_path).name
+        self.installer_bytes: int = directory_size(installer_path)
+
+        self._payloads:       dict = {}  # Destination -> (expected size, bytes seen)
+        self._payloads_lock:  threading.Lock = threading.Lock()
+
+        self._output:         str = ""
+        self._log_offset:     int = 0
+        self._installer_done: int = 0
+        self._stage:          str = "Preparing"
+
+        self._throughput:  float = None
+        self._sample_time: float = None
+        self._sample_size: int = 0
+        self._last_event:  InstallerProgress = None
+
+
+    @property
+    def total_bytes(self) -> int:
+        with self._payloads_lock:
+            return self.installer_bytes + sum(expected for expected, _ in self._payloads.values())
+
+
+    def add_payload(self, destination: str, size: int) -> None:
+        """
+        Account for a file copied onto the media, the total grows by its size
+
+        Parameters:
+            destination (str): Path the file is written to
+            size        (int): Expected size in bytes
+        """
+        with self._payloads_lock:
+            self._payloads[str(destination)] = (int(size), 0)
+
+
+    def poll(self) -> InstallerProgress:
+        """
+        Current progress
+        """
+        now = time.monotonic()
+        if self._last_event is not None and now - self._sample_time < self.POLL_INTERVAL:
+            return self._last_event
+
+        self._read_output()
+        stage, percent = parse_createinstallmedia_output(self._output)
+        if stage is not None:
+            self._stage = stage
+
+        installer_done = 0
+        if percent is not None:
+            installer_done = int(self.installer_bytes * percent / 100)
+        if percent != 100.0 and self.volume_resolver is not None:
+            # Fallback, and finer grained than createinstallmedia's 10% steps
+            installer_done = max(installer_done, self._volume_bytes())
+        self._installer_done = max(self._installer_done, min(installer_done, self.installer_bytes))
+
+        payloads_done = self._payload_bytes()
+        if payloads_done > 0 and self._stage not in INSTALLER_COPIED_STAGES:
+            self._stage = "Copying Packages"
+
+        bytes_written = self._installer_done + payloads_done
+        total_bytes = self.total_bytes
+        self._update_throughput(now, bytes_written)
+
+        speed = self._throughput or 0.0
+        self._last_event = InstallerProgress(
+            stage=self._stage,
+            bytes_written=bytes_written,
+            total_bytes=total_bytes,
+            percent=bytes_written / total_bytes * 100 if total_bytes else -1,
+            speed=speed,
+            time_remaining=(total_bytes - bytes_written) / speed if speed > 0 else -1,
+        )
+        return self._last_event
+
+
+    def _read_output(self) -> None:
+        """
+        Append createinstallmedia output written since the last poll
+        """
+        if self.log_path is None:
+            return
+        try:
+            with open(self.log_path, "rb") as file:
+                file.seek(self._log_offset)
+                data = file.read()
+        except OSError:
+            return
+        self._log_offset += len(data)
+        self._output += data.decode("utf-8", errors="replace")
+
+
+    def _volume_bytes(self) -> int:
+        """
+        Size of the installer application on the target volume
+
+        Only the application is counted, the volume holds the disk's old contents until erased
+        """
+        try:
+            volume = self.volume_resolver()
+        except Exception:
+            return 0
+        if not volume:
+            return 0
+        return directory_size(Path(volume) / self.installer_name)
+
+
+    def _payload_bytes(self) -> int:
+        """
+        Bytes written for each payload, never decreasing (ex. a KDK disk image removed once extracted)
+        """
+        with self._payloads_lock:
+            for destination, (expected, seen) in self._payloads.items():
+                try:
+                    size = os.path.getsize(destination)
+                except OSError:
+                    continue
+                self._payloads[destination] = (expected, max(seen, min(size, expected)))
+            return sum(seen for _, seen in self._payloads.values())
+
+
+    def _update_throughput(self, now: float, bytes_written: int) -> None:
+        if self._sample_time is None:
+            self._sample_time, self._sample_size = now, bytes_written
+            return
+        elapsed = now - self._sample_time
+        if elapsed <= 0:
+            return
+        rate = (bytes_written - self._sample_size) / elapsed
+        if self._throughput is None:
+            self._throughput = rate
+        else:
+            self._throughput = self.THROUGHPUT_SMOOTHING * rate + (1 - self.THROUGHPUT_SMOOTHING) * self._throughput
+        self._sample_time, self._sample_size = now, bytes_written
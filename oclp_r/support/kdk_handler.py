@@ -18,6 +18,7 @@ from ..datasets import os_data
 from ..volume   import generate_copy_arguments
 
 from . import (
+    query_cache,
     network_handler,
     subprocess_wrapper
 )
@@ -338,7 +339,7 @@ class KernelDebugKitObject:
         kdk_build = kdk_plist_data["ProductBuildVersion"]
 
         # Check pkg receipts for this build, will give a canonical list if all files that should be present
-        result = subprocess.run(["/usr/sbin/pkgutil", "--files", f"com.apple.pkg.KDK.{kdk_build}"], capture_output=True)
+        result = query_cache.run(["/usr/sbin/pkgutil", "--files", f"com.apple.pkg.KDK.{kdk_build}"])
         if result.returncode != 0:
             # If pkg receipt is missing, we'll fallback to legacy validation
             logging.info(f"pkg receipt missing for {kdk_path.name}, falling back to legacy validation")
@@ -632,7 +633,7 @@ class KernelDebugKitUtilities:
         Parameters:
             mount_point (Path): Path to mount point
         """
-        subprocess.run(["/usr/bin/hdiutil", "detach", mount_point], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        subprocess_wrapper.run(["/usr/bin/hdiutil", "detach", mount_point], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
 
     def _create_backup(self, kdk_path: Path, kdk_info_plist: Path) -> None:
@@ -6,7 +6,6 @@ import logging
 import plistlib
 import tempfile
 import subprocess
-import re
 
 from pathlib import Path
 
@@ -14,6 +13,7 @@ from ..datasets import os_data
 
 from . import (
     utilities,
+    disk_inventory,
     subprocess_wrapper
 )
 
@@ -28,6 +28,34 @@ APPLICATION_SEARCH_PATH:  str = "/Applications"
 tmp_dir = tempfile.TemporaryDirectory()
 
 
+def installer_creation_script(erase_command: str, createinstallmedia_path: str, additional_args: str = "", progress_log: str = None) -> str:
+    """
+    Contents of Installer.sh: erase the disk, then run createinstallmedia onto it
+
+    Parameters:
+        erase_command           (str): Command erasing the disk as 'OCLP-Installer'
+        createinstallmedia_path (str): createinstallmedia to run
+        additional_args         (str): Additional arguments, each with a leading space
+        progress_log            (str): File to stream createinstallmedia's output to, for progress reporting
+
+    Returns:
+        str: Script, exiting with createinstallmedia's status
+    """
+    output_redirect = ""
+    if progress_log is not None:
+        # Output is still returned to us, tee only mirrors it
+        # pipefail keeps createinstallmedia's exit status rather than tee's
+        output_redirect = f" 2>&1 | /usr/bin/tee '{progress_log}'"
+
+    return f'''#!/bin/bash
+set -o pipefail
+erase_disk='{erase_command}'
+if $erase_disk; then
+    "{createinstallmedia_path}" --volume /Volumes/OCLP-Installer --nointeraction{additional_args}{output_redirect}
+fi
+            '''
+
+
 class InstallerCreation():
 
     def __init__(self) -> None:
@@ -56,7 +84,7 @@ class InstallerCreation():
         return True
 
 
-    def generate_installer_creation_script(self, tmp_location: str, installer_path: str, disk: str) -> bool:
+    def generate_installer_creation_script(self, tmp_location: str, installer_path: str, disk: str, progress_log: str = None) -> bool:
         """
         Creates installer.sh to be piped to OCLP-Helper and run as admin
 
@@ -71,6 +99,7 @@ class InstallerCreation():
             tmp_location (str): Path to temporary directory
             installer_path (str): Path to InstallAssistant.pkg
             disk (str): Disk to install to
+            progress_log (str): File to stream createinstallmedia's output to, for progress reporting
 
         Returns:
             bool: True if successful, False otherwise
@@ -134,12 +163,7 @@ class InstallerCreation():
         script_location.touch()
 
         with script_location.open("w") as script:
-            script.write(f'''#!/bin/bash
-erase_disk='/usr/sbin/diskutil eraseDisk HFS+ OCLP-Installer {disk}'
-if $erase_disk; then
-    "{createinstallmedia_path}" --volume /Volumes/OCLP-Installer --nointeraction{additional_args}
-fi
-            ''')
+            script.write(installer_creation_script(f"/usr/sbin/diskutil eraseDisk HFS+ OCLP-Installer {disk}", createinstallmedia_path, additional_args, progress_log))
         if Path(script_location).exists():
             return True
         return False
@@ -159,46 +183,21 @@ fi
             dict: Dictionary of disks
         """
 
-        all_disks:  dict = {}
         list_disks: dict = {}
 
-        # TODO: AllDisksAndPartitions is not supported in Snow Leopard and older
-        try:
-            # High Sierra and newer
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist", "physical"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        except ValueError:
-            # Sierra and older
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-
-        for disk in disks["AllDisksAndPartitions"]:
-            try:
-                disk_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-            except:
-                # Chinesium USB can have garbage data in MediaName
-                diskutil_output = subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip()
-                ungarbafied_output = re.sub(r'(<key>MediaName</key>\s*<string>).*?(</string>)', r'\1\2', diskutil_output).encode()
-                disk_info = plistlib.loads(ungarbafied_output)
-            try:
-                all_disks[disk["DeviceIdentifier"]] = {"identifier": disk_info["DeviceNode"], "name": disk_info.get("MediaName", "Disk"), "size": disk_info["TotalSize"], "removable": disk_info["Internal"], "partitions": {}}
-            except KeyError:
-                # Avoid crashing with CDs installed
-                continue
-
-        for disk in all_disks:
-            # Strip disks that are under 14GB (15,032,385,536 bytes)
-            # createinstallmedia isn't great at detecting if a disk has enough space
-            if not any(all_disks[disk]['size'] > 15032385536 for partition in all_disks[disk]):
-                continue
+        # Strip disks that are under 14GB (15,032,385,536 bytes)
+        # createinstallmedia isn't great at detecting if a disk has enough space
+        for disk in disk_inventory.list_disks(lambda disk: disk.size > 15032385536, describe_partitions=False):
             # Strip internal disks as well (avoid user formatting their SSD/HDD)
             # Ensure user doesn't format their boot drive
-            if not any(all_disks[disk]['removable'] is False for partition in all_disks[disk]):
+            if disk.internal is not False:
                 continue
 
             list_disks.update({
-                disk: {
-                    "identifier": all_disks[disk]["identifier"],
-                    "name": all_disks[disk]["name"],
-                    "size": all_disks[disk]["size"],
+                disk.identifier: {
+                    "identifier": disk.device_node,
+                    "name": disk.name,
+                    "size": disk.size,
                 }
             })
 
@@ -331,7 +330,7 @@ class LocalInstallerCatalog:
         # Create temporary directory to extract SharedSupport.dmg to
         with tempfile.TemporaryDirectory() as tmpdir:
 
-            output = subprocess.run(
+            output = subprocess_wrapper.run(
                 [
                     "/usr/bin/hdiutil", "attach", "-noverify", sharedsupport_path,
                     "-mountpoint", tmpdir,
@@ -360,6 +359,6 @@ class LocalInstallerCatalog:
                         detected_os = plist["Assets"][0]["OSVersion"]
 
             # Unmount SharedSupport.dmg
-            subprocess.run(["/usr/bin/hdiutil", "detach", tmpdir], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            subprocess_wrapper.run(["/usr/bin/hdiutil", "detach", tmpdir], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
         return (detected_build, detected_os)
\ No newline at end of file
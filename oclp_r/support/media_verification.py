@@ -0,0 +1,244 @@
+"""
+media_verification.py: Manifest-based verification of flashed installer media
+
+A manifest of relative path, size and SHA-256 digest is recorded for the
+source installer application, while createinstallmedia reads it, so the
+source is mostly served from cache. The copy on the target volume is then
+verified against the manifest, reporting each missing or corrupt file.
+
+Files are read front to back in large chunks. Large files are read one
+after another as a single sequential stream, while the remaining workers
+verify small files in parallel, grouped per folder in path order.
+A fast mode only reads evenly spaced samples of large files.
+
+Usage:
+    >>> from oclp_r.support import media_verification
+    >>> manifest = media_verification.InstallerManifest.from_directory("/Applications/Install macOS Ventura.app")
+    >>> result = media_verification.verify(manifest, "/Volumes/Install macOS Ventura/Install macOS Ventura.app")
+    >>> result.passed, result.missing, result.corrupt
+"""
+
+import os
+import stat
+import time
+import hashlib
+import logging
+
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_WORKERS: int = min(4, os.cpu_count() or 1)  # Hashing is CPU bound past a single stream
+
+READ_CHUNK_SIZE: int = 8 * 1024 * 1024
+
+# Fast mode, files at least this large are sampled instead of read in full
+SAMPLE_THRESHOLD:  int = 64 * 1024 * 1024
+SAMPLE_COUNT:      int = 32
+SAMPLE_CHUNK_SIZE: int = 1024 * 1024
+
+# Small files are verified in groups of about this many bytes
+BATCH_SIZE: int = 64 * 1024 * 1024
+
+
+def sample_offsets(size: int) -> list:
+    """
+    Offsets of the chunks read for a sampled digest, evenly spaced and always including the first and last chunk
+    """
+    if size <= SAMPLE_CHUNK_SIZE * SAMPLE_COUNT:
+        return [0]
+    last = size - SAMPLE_CHUNK_SIZE
+    return [last * index // (SAMPLE_COUNT - 1) for index in range(SAMPLE_COUNT)]
+
+
+def file_digest(path: str, sampled: bool = False) -> tuple:
+    """
+    SHA-256 hex digest of a file, or of its samples
+
+    Returns:
+        tuple: (digest, bytes read)
+    """
+    digest = hashlib.sha256()
+    bytes_read = 0
+    with open(path, "rb", buffering=0) as file:
+        if sampled is False:
+            while chunk := file.read(READ_CHUNK_SIZE):
+                digest.update(chunk)
+                bytes_read += len(chunk)
+        else:
+            for offset in sample_offsets(os.fstat(file.fileno()).st_size):
+                file.seek(offset)
+                chunk = file.read(SAMPLE_CHUNK_SIZE)
+                digest.update(chunk)
+                bytes_read += len(chunk)
+    return digest.hexdigest(), bytes_read
+
+
+def _schedule(entries: list) -> list:
+    """
+    Group entries into work items for the worker pool
+
+    Large files are read one after another by a single worker, as concurrent
+    streams defeat read-ahead on USB media. Small files, dominated by
+    per-file latency, are batched in path order for the remaining workers,
+    keeping each folder's files together.
+
+    Returns:
+        list: Lists of entries, each verified in order by a single worker
+    """
+    large = sorted([entry for entry in entries if entry.size >= BATCH_SIZE], key=lambda entry: entry.path)
+    small = sorted([entry for entry in entries if entry.size < BATCH_SIZE], key=lambda entry: entry.path)
+
+    batches = [large] if large else []
+    batch, batch_size = [], 0
+    for entry in small:
+        batch.append(entry)
+        batch_size += entry.size
+        if batch_size >= BATCH_SIZE:
+            batches.append(batch)
+            batch, batch_size = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    path:           str  # Relative to the installer
+    size:           int  # Bytes
+    digest:         str  # SHA-256 of the file
+    sampled_digest: str  # SHA-256 of the file's samples, see sample_offsets()
+
+
+@dataclass
+class VerificationResult:
+    missing:       list = field(default_factory=list)  # Relative paths
+    corrupt:       list = field(default_factory=list)  # (relative path, reason)
+    files_checked: int = 0
+    bytes_read:    int = 0
+    duration:      float = 0.0
+    sampled:       bool = False
+
+    @property
+    def passed(self) -> bool:
+        return not self.missing and not self.corrupt
+
+
+    def summary(self, limit: int = 10) -> str:
+        """
+        Human readable list of failures, truncated to 'limit' entries
+        """
+        lines = [f"Missing: {path}" for path in self.missing] + [f"Corrupt: {path} ({reason})" for path, reason in self.corrupt]
+        if len(lines) > limit:
+            lines = lines[:limit] + [f"... and {len(lines) - limit} more"]
+        return "\n".join(lines)
+
+
+class InstallerManifest:
+    """
+    Sizes and digests of an installer application's files
+    """
+
+    def __init__(self, entries: list) -> None:
+        """
+        Parameters:
+            entries (list): ManifestEntry for each regular file
+        """
+        self.entries: list = entries
+
+
+    @classmethod
+    def from_directory(cls, path: str, max_workers: int = MAX_WORKERS) -> "InstallerManifest":
+        """
+        Record every regular file under path, symlinks are not followed
+        """
+        path = Path(path)
+        entries = []
+        for directory, _, files in os.walk(path):
+            for file in files:
+                file_path = Path(directory) / file
+                file_stat = file_path.lstat()
+                if stat.S_ISREG(file_stat.st_mode):
+                    entries.append(ManifestEntry(file_path.relative_to(path).as_posix(), file_stat.st_size, None, None))
+
+        def _record(batch: list) -> list:
+            recorded = []
+            for entry in batch:
+                digest, _ = file_digest(path / entry.path)
+                sampled_digest = digest
+                if entry.size >= SAMPLE_THRESHOLD:
+                    # Samples are re-read from cache, the file was just read in full
+                    sampled_digest, _ = file_digest(path / entry.path, sampled=True)
+                recorded.append(ManifestEntry(entry.path, entry.size, digest, sampled_digest))
+            return recorded
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            entries = [entry for batch in executor.map(_record, _schedule(entries)) for entry in batch]
+
+        return cls(sorted(entries, key=lambda entry: entry.path))
+
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self.entries)
+
+
+def verify(manifest: InstallerManifest, path: str, sampled: bool = False, max_workers: int = MAX_WORKERS) -> VerificationResult:
+    """
+    Compare a copy of the installer against its manifest
+
+    Parameters:
+        manifest    (InstallerManifest): Manifest of the source installer
+        path        (str):               Copy to verify
+        sampled     (bool):              Fast mode, only read samples of files over SAMPLE_THRESHOLD
+        max_workers (int):               Files read concurrently
+
+    Returns:
+        VerificationResult: Missing and corrupt files, sorted by path
+    """
+    path = Path(path)
+    start_time = time.perf_counter()
+    result = VerificationResult(sampled=sampled)
+
+    def _verify(batch: list) -> list:
+        outcomes = []
+        for entry in batch:
+            try:
+                size = (path / entry.path).stat().st_size
+            except FileNotFoundError:
+                outcomes.append((entry, "Missing", 0))
+                continue
+            except OSError as e:
+                outcomes.append((entry, f"Unreadable: {e.strerror}", 0))
+                continue
+            if size != entry.size:
+                outcomes.append((entry, f"Size {size}, expected {entry.size}", 0))
+                continue
+
+            use_samples = sampled is True and entry.size >= SAMPLE_THRESHOLD
+            try:
+                digest, bytes_read = file_digest(path / entry.path, sampled=use_samples)
+            except OSError as e:
+                outcomes.append((entry, f"Unreadable: {e.strerror}", 0))
+                continue
+            expected = entry.sampled_digest if use_samples else entry.digest
+            outcomes.append((entry, None if digest == expected else "Digest mismatch", bytes_read))
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for outcomes in executor.map(_verify, _schedule(manifest.entries)):
+            for entry, failure, bytes_read in outcomes:
+                result.files_checked += 1
+                result.bytes_read += bytes_read
+                if failure == "Missing":
+                    result.missing.append(entry.path)
+                elif failure is not None:
+                    result.corrupt.append((entry.path, failure))
+
+    result.missing.sort()
+    result.corrupt.sort()
+    result.duration = time.perf_counter() - start_time
+
+    logging.info(f"- Verified {result.files_checked} files ({result.bytes_read} bytes read{', sampled' if sampled else ''}) in {result.duration:.2f}s: {len(result.missing)} missing, {len(result.corrupt)} corrupt")
+    return result
@@ -2,10 +2,12 @@
 network_handler.py: Library dedicated to Network Handling tasks including downloading files
 
 Primarily based around the DownloadObject class, which provides a simple
-object for libraries to query download progress and status
+object for libraries to query download progress and status, or to subscribe
+to progress events
 """
 
 import time
+import queue
 import requests
 import threading
 import logging
@@ -15,6 +17,7 @@ import atexit
 
 from typing import Union
 from pathlib import Path
+from dataclasses import dataclass
 
 from . import utilities
 
@@ -32,6 +35,30 @@ class DownloadStatus(enum.Enum):
     COMPLETE:    str = "Complete"
 
 
+class DownloadEvent(enum.Enum):
+    """
+    Enum for download events delivered to subscribers
+    """
+
+    PROGRESS: str = "Progress"
+    COMPLETE: str = "Complete"
+    ERROR:    str = "Error"
+
+
+@dataclass(frozen=True)
+class DownloadProgress:
+    """
+    Snapshot of download progress, delivered with each DownloadEvent
+    """
+
+    downloaded_file_size: float
+    total_file_size:      float
+    percent:              float  # -1 if unknown
+    speed:                float  # Bytes per second
+    time_remaining:       float  # Seconds, -1 if unknown
+    error_msg:            str = ""
+
+
 class NetworkUtilities:
     """
     Utilities for network related tasks, primarily used for downloading files
@@ -160,8 +187,22 @@ class DownloadObject:
 
         >>> print("Download complete"")
 
+    Alternatively, subscribe to progress events instead of polling:
+        >>> def on_event(event: DownloadEvent, progress: DownloadProgress):
+        >>>     print(event, progress.percent)
+        >>> download_object.subscribe(on_event, interval=0.5)
+        >>> download_object.download()
+
     """
 
+    THROUGHPUT_SAMPLE_INTERVAL: float = 0.5  # Seconds between throughput samples
+    THROUGHPUT_SMOOTHING:       float = 0.3  # EWMA weight of the newest sample
+
+    # Buffers in flight bound memory use, see PatcherValidation._validate_download_pipeline()
+    # 4 x 2MB keeps up with 8 x 2MB, smaller buffers are notably slower
+    PIPELINE_BUFFER_SIZE:  int = 2 * 1024 * 1024  # Bytes per receive buffer, small enough for steady progress on slow links
+    PIPELINE_BUFFER_COUNT: int = 4                # Buffers in flight
+
     def __init__(self, url: str, path: str) -> None:
         self.url:       str = url
         self.status:    str = DownloadStatus.INACTIVE
@@ -173,6 +214,14 @@ class DownloadObject:
         self.total_file_size:      float = 0.0
         self.downloaded_file_size: float = 0.0
         self.start_time:           float = time.time()
+        self.transfer_start_time:  float = None  # Set once the transfer begins, excludes probing
+
+        self._throughput:          float = None  # EWMA of bytes per second
+        self._sample_time:         float = None
+        self._sample_size:         float = 0.0
+
+        self._subscribers:      list = []  # [callback, interval, last delivery]
+        self._subscribers_lock: threading.Lock = threading.Lock()
 
         self.error:             bool = False
         self.should_stop:       bool = False
@@ -183,8 +232,9 @@ class DownloadObject:
 
         self.should_checksum: bool = False
 
+        self.bandwidth_budget = None  # Optional download_manager.BandwidthBudget shared with other downloads
+
         self.checksum = None
-        self._checksum_storage: hash = None
 
         if self.has_network:
             self._populate_file_size()
@@ -213,12 +263,12 @@ class DownloadObject:
             if self.active_thread:
                 logging.error("Download already in progress")
                 return
-            self.should_checksum = verify_checksum
+            self.should_checksum = self.should_checksum or verify_checksum
             self.active_thread = threading.Thread(target=self._download, args=(display_progress,))
             self.active_thread.start()
             return
 
-        self.should_checksum = verify_checksum
+        self.should_checksum = self.should_checksum or verify_checksum
         self._download(display_progress)
 
 
@@ -246,6 +296,115 @@ class DownloadObject:
         return self.checksum.hexdigest() if self.checksum else True
 
 
+    def subscribe(self, callback: callable, interval: float = 0.5) -> None:
+        """
+        Subscribe to download events
+
+        Callbacks are invoked from the downloading thread as callback(event, progress),
+        GUI subscribers must marshal to the main thread themselves (ie. wx.CallAfter)
+
+        Parameters:
+            callback (callable): Function accepting (DownloadEvent, DownloadProgress)
+            interval (float):    Minimum seconds between PROGRESS events, COMPLETE and ERROR are always delivered
+        """
+        with self._subscribers_lock:
+            self._subscribers.append([callback, interval, 0.0])
+
+
+    def unsubscribe(self, callback: callable) -> None:
+        """
+        Remove a callback registered with subscribe()
+        """
+        with self._subscribers_lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber[0] != callback]
+
+
+    def get_progress(self) -> DownloadProgress:
+        """
+        Query a snapshot of the download progress
+
+        Returns:
+            DownloadProgress: Current progress
+        """
+        return DownloadProgress(
+            downloaded_file_size=self.downloaded_file_size,
+            total_file_size=self.total_file_size,
+            percent=self.get_percent(),
+            speed=self.get_speed(),
+            time_remaining=self.get_time_remaining(),
+            error_msg=self.error_msg,
+        )
+
+
+    def _notify(self, event: DownloadEvent) -> None:
+        """
+        Deliver event to subscribers, rate limiting PROGRESS events per subscriber
+
+        Parameters:
+            event (DownloadEvent): Event to deliver
+        """
+        if not self._subscribers:
+            return
+
+        now = time.monotonic()
+        with self._subscribers_lock:
+            due = []
+            for subscriber in self._subscribers:
+                if event == DownloadEvent.PROGRESS and now - subscriber[2] < subscriber[1]:
+                    continue
+                subscriber[2] = now
+                due.append(subscriber[0])
+
+        if not due:
+            return
+
+        progress = self.get_progress()
+        for callback in due:
+            try:
+                callback(event, progress)
+            except Exception as e:
+                logging.error(f"Error in download subscriber: {e}")
+
+
+    def _update_throughput(self, force: bool = False) -> None:
+        """
+        Update the EWMA throughput estimate
+
+        Samples are taken at most every THROUGHPUT_SAMPLE_INTERVAL seconds,
+        so a burst of small chunks does not skew the estimate
+
+        Parameters:
+            force (bool): Sample even if the interval has not elapsed
+        """
+        now = time.monotonic()
+        elapsed = now - self._sample_time
+        if elapsed <= 0 or (elapsed < self.THROUGHPUT_SAMPLE_INTERVAL and not force):
+            return
+
+        rate = (self.downloaded_file_size - self._sample_size) / elapsed
+        if self._throughput is None:
+            self._throughput = rate
+        else:
+            self._throughput = self.THROUGHPUT_SMOOTHING * rate + (1 - self.THROUGHPUT_SMOOTHING) * self._throughput
+
+        self._sample_time = now
+        self._sample_size = self.downloaded_file_size
+
+
+    def _print_progress(self, event: DownloadEvent, progress: DownloadProgress) -> None:
+        """
+        Console subscriber used with display_progress
+        """
+        if event != DownloadEvent.PROGRESS:
+            return
+
+        # Don't use logging here, as we'll be spamming the log file
+        if progress.percent == -1:
+            print(f"Downloaded {utilities.human_fmt(progress.downloaded_file_size)} of {self.filename}")
+        else:
+            print(f"Downloaded {progress.percent:.2f}% of {self.filename} ({utilities.human_fmt(progress.speed)}/s) ({progress.time_remaining:.2f} seconds remaining)")
+
+
     def _get_filename(self) -> str:
         """
         Get the filename from the URL
@@ -276,14 +435,102 @@ class DownloadObject:
             self.total_file_size = 0.0
 
 
-    def _update_checksum(self, chunk: bytes) -> None:
+    def _update_checksum(self, chunk: memoryview) -> None:
         """
         Update checksum with new chunk
 
         Parameters:
-            chunk (bytes): Chunk to update checksum with
+            chunk (memoryview): Chunk to update checksum with
+        """
+        if self.checksum is None:
+            self.checksum = hashlib.sha256()
+        self.checksum.update(chunk)
+
+
+    def _receive(self, response: requests.Response, file) -> None:
         """
-        self._checksum_storage.update(chunk)
+        Receive the response body through a bounded pipeline
+
+        The calling thread reads from the socket into pooled buffers, a writer
+        thread stores them to disk and, if requested, a hasher thread updates
+        the checksum. Stages overlap, so neither disk nor hashing throttles
+        the socket, and buffers are reused rather than allocated per chunk
+
+        Parameters:
+            response (requests.Response): Streamed response
+            file:                         File opened for binary writing
+        """
+
+        free_buffers: queue.Queue = queue.Queue()
+        for _ in range(self.PIPELINE_BUFFER_COUNT):
+            free_buffers.put(bytearray(self.PIPELINE_BUFFER_SIZE))
+
+        write_queue: queue.Queue = queue.Queue()
+        hash_queue:  queue.Queue = queue.Queue() if self.should_checksum else None
+        errors:      list = []
+
+        def _writer() -> None:
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    break
+                buffer, length = item
+                if not errors:
+                    try:
+                        file.write(memoryview(buffer)[:length])
+                        self.downloaded_file_size += length
+                        self._update_throughput()
+                        self._notify(DownloadEvent.PROGRESS)
+                    except Exception as e:
+                        errors.append(e)
+                # On error, keep draining so the reader never waits on a buffer
+                if hash_queue is not None and not errors:
+                    hash_queue.put(item)
+                else:
+                    free_buffers.put(buffer)
+            if hash_queue is not None:
+                hash_queue.put(None)
+
+        def _hasher() -> None:
+            while True:
+                item = hash_queue.get()
+                if item is None:
+                    break
+                buffer, length = item
+                if not errors:
+                    try:
+                        self._update_checksum(memoryview(buffer)[:length])
+                    except Exception as e:
+                        errors.append(e)
+                free_buffers.put(buffer)
+
+        threads = [threading.Thread(target=_writer)]
+        if hash_queue is not None:
+            threads.append(threading.Thread(target=_hasher))
+        for thread in threads:
+            thread.start()
+
+        stream = response.raw
+        stream.decode_content = True
+
+        try:
+            while not errors:
+                if self.should_stop:
+                    raise Exception("Download stopped")
+                buffer = free_buffers.get()
+                length = stream.readinto(buffer)
+                if not length:
+                    break
+                if self.bandwidth_budget is not None:
+                    self.bandwidth_budget.consume(length)
+                write_queue.put((buffer, length))
+        finally:
+            write_queue.put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
 
 
     def _prepare_working_directory(self, path: Path) -> bool:
@@ -336,6 +583,9 @@ class DownloadObject:
 
         utilities.disable_sleep_while_running()
 
+        if display_progress:
+            self.subscribe(self._print_progress, interval=5)
+
         try:
             if not self.has_network:
                 raise Exception("No network connection")
@@ -343,30 +593,30 @@ class DownloadObject:
             if self._prepare_working_directory(self.filepath) is False:
                 raise Exception(self.error_msg)
 
+            self.transfer_start_time = time.monotonic()
+            self._sample_time = self.transfer_start_time
             response = NetworkUtilities().get(self.url, stream=True, timeout=10)
+            if response.raw is None:
+                raise Exception("Failed to connect")
 
             with open(self.filepath, 'wb') as file:
                 atexit.register(self.stop)
-                for i, chunk in enumerate(response.iter_content(1024 * 1024 * 4)):
-                    if self.should_stop:
-                        raise Exception("Download stopped")
-                    if chunk:
-                        file.write(chunk)
-                        self.downloaded_file_size += len(chunk)
-                        if self.should_checksum:
-                            self._update_checksum(chunk)
-                        if display_progress and i % 100:
-                            # Don't use logging here, as we'll be spamming the log file
-                            if self.total_file_size == 0.0:
-                                print(f"Downloaded {utilities.human_fmt(self.downloaded_file_size)} of {self.filename}")
-                            else:
-                                print(f"Downloaded {self.get_percent():.2f}% of {self.filename} ({utilities.human_fmt(self.get_speed())}/s) ({self.get_time_remaining():.2f} seconds remaining)")
+                if self.total_file_size > 0:
+                    # Extend the file up front, rather than on every write
+                    file.truncate(int(self.total_file_size))
+                try:
+                    self._receive(response, file)
+                finally:
+                    # Drop the unwritten preallocation, also when stopped or failed,
+                    # so a partial download is never mistaken for a complete one
+                    file.truncate(int(self.downloaded_file_size))
                 self.download_complete = True
+                elapsed = time.monotonic() - self.transfer_start_time
                 logging.info(f"Download complete: {self.filename}")
                 logging.info("Stats:")
                 logging.info(f"- Downloaded size: {utilities.human_fmt(self.downloaded_file_size)}")
-                logging.info(f"- Time elapsed: {(time.time() - self.start_time):.2f} seconds")
-                logging.info(f"- Speed: {utilities.human_fmt(self.downloaded_file_size / (time.time() - self.start_time))}/s")
+                logging.info(f"- Time elapsed: {elapsed:.2f} seconds")
+                logging.info(f"- Speed: {utilities.human_fmt(self.downloaded_file_size / elapsed if elapsed > 0 else 0)}/s")
                 logging.info(f"- Location: {self.filepath}")
         except Exception as e:
             self.error = True
@@ -377,6 +627,11 @@ class DownloadObject:
         self.status = DownloadStatus.COMPLETE
         utilities.enable_sleep_after_running()
 
+        self._notify(DownloadEvent.COMPLETE if self.download_complete else DownloadEvent.ERROR)
+
+        if display_progress:
+            self.unsubscribe(self._print_progress)
+
 
     def get_percent(self) -> float:
         """
@@ -395,11 +650,21 @@ class DownloadObject:
         """
         Query the download speed
 
+        Smoothed over recent samples (EWMA), falling back to the average
+        since the transfer began until the first sample is taken
+
         Returns:
             float: The download speed in bytes per second
         """
 
-        return self.downloaded_file_size / (time.time() - self.start_time)
+        if self._throughput is not None:
+            return self._throughput
+        if self.transfer_start_time is None:
+            return 0.0
+        elapsed = time.monotonic() - self.transfer_start_time
+        if elapsed <= 0:
+            return 0.0
+        return self.downloaded_file_size / elapsed
 
 
     def get_time_remaining(self) -> float:
@@ -0,0 +1,225 @@
+"""
+query_cache.py: Session-scoped cache for idempotent host queries
+
+Many read-only queries (ex. 'sw_vers', 'kmutil showloaded', NVRAM reads)
+are issued repeatedly throughout a session while their results rarely change.
+This module memoizes them keyed by argv, with per-command TTLs, and drops
+affected entries whenever a mutating command (ex. bless, install) runs.
+
+Disk layout queries ('diskutil', 'hdiutil') are not cached: disks are
+erased, mounted and attached from many call sites (and by the user), so
+a cached layout cannot be kept coherent.
+
+Usage:
+    >>> from oclp_r.support import query_cache
+    >>> result = query_cache.run(["/usr/bin/sw_vers", "-productVersion"])
+    >>> query_cache.invalidate("kmutil")
+"""
+
+import time
+import atexit
+import logging
+import threading
+import subprocess
+
+
+# Cacheable queries
+#   argv prefix -> (group, TTL in seconds)
+#   TTL of None indicates the result is valid for the whole session,
+#   unless invalidated by a mutating command
+CACHEABLE_QUERIES: dict = {
+    ("/usr/sbin/ioreg", "-a", "-n", "chosen"):               ("ioreg",    None),
+    ("/usr/bin/sw_vers",):                                   ("sw_vers",  None),
+    ("/usr/bin/kmutil", "showloaded"):                       ("kmutil",   60),
+    ("/usr/sbin/kextstat",):                                 ("kmutil",   60),
+    ("/usr/sbin/system_profiler", "SPSoftwareDataType"):     ("system_profiler", None),
+    ("/usr/sbin/pkgutil", "--files"):                        ("pkgutil",  None),
+}
+
+# Mutating commands
+#   executable -> groups invalidated once the command has run
+MUTATING_COMMANDS: dict = {
+    "/usr/sbin/bless":     ["ioreg", "nvram"],
+    "/usr/sbin/nvram":     ["nvram"],
+    "/usr/sbin/installer": ["pkgutil", "kmutil"],
+    "/usr/bin/kmutil":     ["kmutil"],
+    "/usr/sbin/kextcache": ["kmutil"],
+}
+
+
+class QueryCache:
+    """
+    Thread-safe memoization of query results, grouped for invalidation
+    """
+
+    def __init__(self) -> None:
+        self._lock:    threading.Lock = threading.Lock()
+        self._entries: dict = {}  # key -> (group, expiry, value)
+
+        self._generation: int = 0  # Incremented on every invalidation
+
+        self._hits:   dict = {}  # group -> int
+        self._misses: dict = {}  # group -> int
+
+
+    def lookup(self, key: tuple, group: str, ttl: float, generator: callable):
+        """
+        Return cached value for key, or generate and store it
+
+        Parameters:
+            key       (tuple):    Unique key for the query
+            group     (str):      Invalidation group the query belongs to
+            ttl       (float):    Seconds until the entry expires, None for session lifetime
+            generator (callable): Function producing the value on a miss
+
+        Returns:
+            Value returned by generator
+        """
+        with self._lock:
+            if key in self._entries:
+                _, expiry, value = self._entries[key]
+                if expiry is None or expiry > time.monotonic():
+                    self._hits[group] = self._hits.get(group, 0) + 1
+                    return value
+                del self._entries[key]
+            self._misses[group] = self._misses.get(group, 0) + 1
+            generation = self._generation
+
+        # Generate outside of the lock, queries may be slow
+        value = generator()
+
+        with self._lock:
+            # Avoid storing a result that may predate an invalidation
+            if generation != self._generation:
+                return value
+            self._entries[key] = (group, None if ttl is None else time.monotonic() + ttl, value)
+
+        return value
+
+
+    def invalidate(self, *groups: str) -> None:
+        """
+        Drop cached entries
+
+        Parameters:
+            groups (str): Groups to drop, all entries are dropped if none are provided
+        """
+        with self._lock:
+            self._generation += 1
+            if not groups:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if entry[0] in groups]:
+                del self._entries[key]
+
+
+    def statistics(self) -> dict:
+        """
+        Return hit and miss counts per group
+
+        Returns:
+            dict: group -> {"hits": int, "misses": int}
+        """
+        with self._lock:
+            return {
+                group: {"hits": self._hits.get(group, 0), "misses": self._misses.get(group, 0)}
+                for group in sorted(set(self._hits) | set(self._misses))
+            }
+
+
+SESSION_CACHE = QueryCache()
+
+
+def _resolve_query(args: list) -> tuple:
+    """
+    Find the cache group and TTL for the provided argv
+
+    Returns:
+        tuple: (group, ttl), or (None, None) if the query is not cacheable
+    """
+    for prefix, (group, ttl) in CACHEABLE_QUERIES.items():
+        if tuple(args[:len(prefix)]) == prefix:
+            return group, ttl
+    return None, None
+
+
+def run(args: list, merge_output: bool = False) -> subprocess.CompletedProcess:
+    """
+    Run a read-only query, returning a cached result when available
+
+    Output is always captured, with stdout and stderr kept separate unless merged.
+    Queries not listed in CACHEABLE_QUERIES are run without caching.
+
+    Parameters:
+        args         (list): Full argv to run
+        merge_output (bool): Redirect stderr into stdout
+
+    Returns:
+        subprocess.CompletedProcess: Result of the query
+    """
+    args = [str(arg) for arg in args]
+    stderr = subprocess.STDOUT if merge_output is True else subprocess.PIPE
+    group, ttl = _resolve_query(args)
+    if group is None:
+        return subprocess.run(args, stdout=subprocess.PIPE, stderr=stderr)
+
+    return SESSION_CACHE.lookup(
+        ("run", merge_output, *args), group, ttl,
+        lambda: subprocess.run(args, stdout=subprocess.PIPE, stderr=stderr)
+    )
+
+
+def memoize(key: tuple, group: str, generator: callable, ttl: float = None):
+    """
+    Cache an arbitrary query, ex. NVRAM reads through IOKit
+
+    Parameters:
+        key       (tuple):    Unique key for the query
+        group     (str):      Invalidation group
+        generator (callable): Function producing the value on a miss
+        ttl       (float):    Seconds until the entry expires, None for session lifetime
+    """
+    return SESSION_CACHE.lookup((group, *key), group, ttl, generator)
+
+
+def invalidate(*groups: str) -> None:
+    """
+    Drop cached results after a mutating operation
+
+    Parameters:
+        groups (str): Groups to drop (ex. "kmutil"), all if none are provided
+    """
+    SESSION_CACHE.invalidate(*groups)
+
+
+def invalidate_for_command(args: list) -> None:
+    """
+    Drop cached results affected by the provided command, if it is a mutating one
+
+    Parameters:
+        args (list): argv of the command that was run
+    """
+    if not args:
+        return
+    args = [str(arg) for arg in args]
+    if _resolve_query(args)[0] is not None:
+        return
+    if args[0] in MUTATING_COMMANDS:
+        SESSION_CACHE.invalidate(*MUTATING_COMMANDS[args[0]])
+
+
+def log_statistics() -> None:
+    """
+    Log hit rates for each query group
+    """
+    statistics = SESSION_CACHE.statistics()
+    if not statistics:
+        return
+
+    logging.info("Query cache statistics:")
+    for group, counts in statistics.items():
+        total = counts["hits"] + counts["misses"]
+        logging.info(f"- {group}: {counts['hits']}/{total} hits ({counts['hits'] / total:.0%})")
+
+
+atexit.register(log_statistics)
@@ -12,7 +12,10 @@ import logging
 
 from pathlib import Path
 
-from . import subprocess_wrapper
+from . import (
+    query_cache,
+    subprocess_wrapper
+)
 
 from .. import constants
 
@@ -40,7 +43,7 @@ class RoutePayloadDiskImage:
             logging.info("Creating payloads directory")
             Path(self.temp_dir.name / Path("payloads")).mkdir(parents=True, exist_ok=True)
             self._unmount_active_dmgs(unmount_all_active=False)
-            output = subprocess.run(
+            output = subprocess_wrapper.run(
                 [
                     "/usr/bin/hdiutil", "attach", "-noverify", f"{self.constants.payload_path_dmg}",
                     "-mountpoint", Path(self.temp_dir.name / Path("payloads")),
@@ -72,7 +75,7 @@ class RoutePayloadDiskImage:
             unmount_all_active (bool): If True, unmount all active DMGs, otherwise only unmount our own DMG
         """
 
-        dmg_info = subprocess.run(["/usr/bin/hdiutil", "info", "-plist"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        dmg_info = query_cache.run(["/usr/bin/hdiutil", "info", "-plist"])
         dmg_info = plistlib.loads(dmg_info.stdout)
 
 
@@ -84,13 +87,13 @@ class RoutePayloadDiskImage:
                         if "shadow-path" in image:
                             if self.temp_dir.name in image["shadow-path"]:
                                 logging.info(f"Unmounting personal {variant}")
-                                subprocess.run(
+                                subprocess_wrapper.run(
                                     ["/usr/bin/hdiutil", "detach", image["system-entities"][0]["dev-entry"], "-force"],
                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT
                                 )
                     else:
                         logging.info(f"Unmounting {variant} at: {image['system-entities'][0]['dev-entry']}")
-                        subprocess.run(
+                        subprocess_wrapper.run(
                             ["/usr/bin/hdiutil", "detach", image["system-entities"][0]["dev-entry"], "-force"],
                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT
                         )
\ No newline at end of file
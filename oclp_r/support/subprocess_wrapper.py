@@ -3,15 +3,34 @@ subprocess_wrapper.py: Wrapper for subprocess module to better handle errors and
                        Additionally handles our Privileged Helper Tool
 """
 
+import os
 import enum
+import json
+import atexit
+import base64
+import struct
 import logging
+import threading
 import subprocess
 
 from pathlib import Path
 
+from . import query_cache
+
 
 OCLP_PRIVILEGED_HELPER = "/Library/PrivilegedHelperTools/com.sumitduster.oclp-r.privileged-helper"
 
+# run_as_root() arguments a session can honour, others launch the helper per command
+SESSION_SUPPORTED_KWARGS: list = ["stdout", "stderr", "capture_output", "text"]
+
+# Sessions run one command at a time, further concurrent commands launch the helper per command
+SESSION_POOL_SIZE: int = 2
+
+_idle_sessions:     list = []  # PrivilegedHelperSessions not running a command
+_session_count:     int  = 0   # Sessions started and not ended
+_session_supported: bool = True  # Cleared once a session fails, ie. helper predates session mode
+_session_lock:      threading.Lock = threading.Lock()
+
 
 class PrivilegedHelperErrorCodes(enum.IntEnum):
     """
@@ -33,11 +52,210 @@ class PrivilegedHelperErrorCodes(enum.IntEnum):
     OCLP_PHT_ERROR_CATCH_ALL                   = 170
 
 
+class PrivilegedHelperSession:
+    """
+    Persistent Privileged Helper Tool process
+
+    The helper authenticates us once at launch, then executes commands sent over its stdin.
+    Messages are a 32-bit big endian length followed by JSON, see
+    ci_tooling/privileged_helper_tool/main.m for the format.
+    """
+
+    def __init__(self, helper_path: str = OCLP_PRIVILEGED_HELPER) -> None:
+        self.helper_path: str = helper_path
+        self.version:     str = None
+
+        self._process: subprocess.Popen = None
+        self._lock:    threading.Lock = threading.Lock()
+
+
+    def start(self) -> bool:
+        """
+        Launch the helper in session mode
+
+        Returns:
+            bool: True if the helper authenticated us and supports sessions
+        """
+        try:
+            self._process = subprocess.Popen([self.helper_path, "--session"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError:
+            return False
+
+        try:
+            handshake = self._receive()
+        except OSError:
+            handshake = None
+
+        if not isinstance(handshake, dict) or "Version" not in handshake:
+            # Older helpers treat '--session' as a missing command and exit
+            self.close()
+            return False
+
+        self.version = handshake["Version"]
+        return True
+
+
+    def run(self, command: list, merge_output: bool = False) -> tuple:
+        """
+        Execute a command as root
+
+        Parameters:
+            command      (list): Command and arguments, full path required
+            merge_output (bool): Redirect stderr into stdout
+
+        Returns:
+            tuple: (return code, stdout bytes, stderr bytes)
+
+        Raises:
+            OSError: Session ended unexpectedly
+        """
+        with self._lock:
+            if self._process is None:
+                raise BrokenPipeError("Privileged Helper session is closed")
+            self._send({
+                "Command":     str(command[0]),
+                "Arguments":   [str(argument) for argument in command[1:]],
+                "Directory":   os.getcwd(),
+                "MergeOutput": merge_output,
+            })
+            response = self._receive()
+
+        if response is None:
+            raise BrokenPipeError("Privileged Helper session ended unexpectedly")
+
+        return response["ReturnCode"], base64.b64decode(response["Stdout"]), base64.b64decode(response["Stderr"])
+
+
+    def close(self) -> None:
+        """
+        End the session, the helper exits once stdin is closed
+        """
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process = None
+
+
+    def _send(self, message: dict) -> None:
+        data = json.dumps(message).encode()
+        self._process.stdin.write(struct.pack(">I", len(data)) + data)
+        self._process.stdin.flush()
+
+
+    def _receive(self) -> dict:
+        """
+        Read a message, None if the helper exited
+        """
+        header = self._process.stdout.read(4)
+        if len(header) < 4:
+            return None
+        length = struct.unpack(">I", header)[0]
+        data = self._process.stdout.read(length)
+        if len(data) < length:
+            return None
+        return json.loads(data)
+
+
+def _acquire_session() -> PrivilegedHelperSession:
+    """
+    Idle session from the pool, starting one if below SESSION_POOL_SIZE
+
+    Returns None if all sessions are busy or the helper does not support sessions,
+    so long-running commands (ie. Installer.sh) never hold up other threads
+    """
+    global _session_count, _session_supported
+    with _session_lock:
+        if _idle_sessions:
+            return _idle_sessions.pop()
+        if _session_supported is False or _session_count >= SESSION_POOL_SIZE:
+            return None
+        _session_count += 1
+
+    session = PrivilegedHelperSession(OCLP_PRIVILEGED_HELPER)
+    if session.start() is True:
+        logging.info(f"- Started Privileged Helper session (v{session.version})")
+        atexit.register(session.close)
+        return session
+
+    logging.info("- Privileged Helper does not support sessions, launching it per command")
+    with _session_lock:
+        _session_count -= 1
+        _session_supported = False
+    return None
+
+
+def _release_session(session: PrivilegedHelperSession) -> None:
+    """
+    Return a session to the pool once its command finished
+    """
+    with _session_lock:
+        if _session_supported is True:
+            _idle_sessions.append(session)
+            return
+    session.close()
+
+
+def _end_session(session: PrivilegedHelperSession) -> None:
+    """
+    Drop a failed session, later commands launch the helper per command
+    """
+    global _session_count, _session_supported
+    with _session_lock:
+        _session_count -= 1
+        _session_supported = False
+        idle_sessions = list(_idle_sessions)
+        _idle_sessions.clear()
+    for idle_session in [session, *idle_sessions]:
+        idle_session.close()
+
+
+def _run_in_session(session: PrivilegedHelperSession, command: list, **kwargs) -> subprocess.CompletedProcess:
+    """
+    Run a command through a session, mirroring subprocess.run()'s output handling
+
+    Output is returned once the command exits, thus only captured output is supported
+    """
+    stderr = subprocess.PIPE if kwargs.get("capture_output", False) is True else kwargs.get("stderr")
+    merge_output = stderr == subprocess.STDOUT
+
+    args = [OCLP_PRIVILEGED_HELPER] + [command[0]] + command[1:]
+    try:
+        return_code, output, error = session.run(command, merge_output=merge_output)
+    except (OSError, ValueError) as e:
+        # The command may or may not have run, don't retry it
+        logging.info(f"- Privileged Helper session failed: {e}")
+        _end_session(session)
+        return subprocess.CompletedProcess(args, PrivilegedHelperErrorCodes.OCLP_PHT_ERROR_CATCH_ALL.value, b"", str(e).encode() if merge_output is False else None)
+
+    _release_session(session)
+
+    if merge_output is True:
+        error = None
+
+    if kwargs.get("text", False) is True:
+        output = output.decode("utf-8", errors="replace")
+        error  = error.decode("utf-8", errors="replace") if error is not None else None
+
+    return subprocess.CompletedProcess(args, return_code, output, error)
+
+
 def run(*args, **kwargs) -> subprocess.CompletedProcess:
     """
     Basic subprocess.run wrapper.
+
+    Mutating commands (ex. 'kmutil load') invalidate affected query cache entries.
     """
-    return subprocess.run(*args, **kwargs)
+    result = subprocess.run(*args, **kwargs)
+    query_cache.invalidate_for_command(args[0] if args else kwargs.get("args"))
+    return result
 
 
 def run_as_root(*args, **kwargs) -> subprocess.CompletedProcess:
@@ -46,12 +264,29 @@ def run_as_root(*args, **kwargs) -> subprocess.CompletedProcess:
 
     Note: Full path to first argument is required.
     Helper tool does not resolve PATH.
+
+    Commands are sent through a persistent helper session when possible,
+    avoiding the helper's signature checks on every command.
     """
     # Check if first argument exists
     if not Path(args[0][0]).exists():
         raise FileNotFoundError(f"File not found: {args[0][0]}")
 
-    return subprocess.run([OCLP_PRIVILEGED_HELPER] + [args[0][0]] + args[0][1:], **kwargs)
+    # Sessions return output once the command exits, uncaptured output is streamed by a per-command helper
+    captured = kwargs.get("capture_output", False) is True or (
+        kwargs.get("stdout") == subprocess.PIPE and kwargs.get("stderr") in [subprocess.PIPE, subprocess.STDOUT]
+    )
+
+    session = None
+    if len(args) == 1 and captured and all(key in SESSION_SUPPORTED_KWARGS for key in kwargs):
+        session = _acquire_session()
+
+    if session is not None:
+        result = _run_in_session(session, list(args[0]), **kwargs)
+    else:
+        result = subprocess.run([OCLP_PRIVILEGED_HELPER] + [args[0][0]] + args[0][1:], **kwargs)
+    query_cache.invalidate_for_command(args[0])
+    return result
 
 
 def verify(process_result: subprocess.CompletedProcess) -> None:
@@ -3,11 +3,18 @@ updates.py: Check for OCLP-R binary updates
 
 Call check_binary_updates() to determine if any updates are available
 Returns dict with Link and Version of the latest binary update if available
+
+The latest release is fetched once per session, with a conditional request
+against an ETag cached across runs. prefetch_latest_release() starts the
+request in the background so the result is ready once it's needed.
 """
 
+import json
 import logging
+import threading
 
 from typing import Optional, Union
+from pathlib import Path
 from packaging import version
 
 from . import network_handler
@@ -16,6 +23,97 @@ from .. import constants
 
 
 REPO_LATEST_RELEASE_URL: str = "https://api.github.com/repos/sumitduster/OCLP-R/releases/latest"
+RELEASE_CACHE_PATH:      str = "/Users/Shared/.com.sumitduster.oclp-r.release.json"
+
+LATEST_RELEASE:        dict             = None
+LATEST_RELEASE_THREAD: threading.Thread = None
+LATEST_RELEASE_LOCK:   threading.Lock   = threading.Lock()
+
+
+def _load_release_cache() -> dict:
+    """
+    Load the release cached by a previous run
+
+    Returns:
+        dict: {"ETag": str, "Release": dict}, empty if unavailable
+    """
+    try:
+        cache = json.loads(Path(RELEASE_CACHE_PATH).read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or not isinstance(cache.get("Release"), dict):
+        return {}
+    return cache
+
+
+def _save_release_cache(etag: str, release: dict) -> None:
+    """
+    Store the release and its ETag for future runs
+    """
+    try:
+        Path(RELEASE_CACHE_PATH).write_text(json.dumps({"ETag": etag, "Release": release}))
+    except OSError as e:
+        logging.warning(f"Unable to write release cache: {e}")
+
+
+def _fetch_latest_release() -> None:
+    """
+    Fetch the latest release from GitHub's API
+
+    Issues a single conditional request, an unchanged release (304)
+    is served from the cache and does not count against rate limits
+    """
+    global LATEST_RELEASE
+
+    cache   = _load_release_cache()
+    headers = {"If-None-Match": cache["ETag"]} if cache.get("ETag") else {}
+
+    response = network_handler.NetworkUtilities().get(REPO_LATEST_RELEASE_URL, headers=headers, timeout=10)
+    if response.status_code == 304:
+        logging.info("Latest release unchanged since last check")
+        LATEST_RELEASE = cache["Release"]
+        return
+    if response.status_code != 200:
+        logging.info(f"Unable to fetch latest release (status: {response.status_code})")
+        return
+
+    try:
+        release = response.json()
+    except ValueError:
+        logging.info("Unable to parse latest release")
+        return
+    if not isinstance(release, dict):
+        return
+
+    LATEST_RELEASE = release
+    if response.headers.get("ETag"):
+        _save_release_cache(response.headers["ETag"], release)
+
+
+def prefetch_latest_release() -> None:
+    """
+    Start fetching the latest release in the background
+
+    Subsequent calls (and fetch_latest_release()) share the same request
+    """
+    global LATEST_RELEASE_THREAD
+
+    with LATEST_RELEASE_LOCK:
+        if LATEST_RELEASE_THREAD is None:
+            LATEST_RELEASE_THREAD = threading.Thread(target=_fetch_latest_release, daemon=True)
+            LATEST_RELEASE_THREAD.start()
+
+
+def fetch_latest_release() -> Optional[dict]:
+    """
+    Return the latest release from GitHub's API, waiting on the request if in flight
+
+    Returns:
+        dict: Release as reported by GitHub, None if it could not be verified
+    """
+    prefetch_latest_release()
+    LATEST_RELEASE_THREAD.join()
+    return LATEST_RELEASE
 
 
 class CheckBinaryUpdates:
@@ -95,12 +193,10 @@ class CheckBinaryUpdates:
             # We already checked
             return self.latest_details
 
-        if not network_handler.NetworkUtilities(REPO_LATEST_RELEASE_URL).verify_network_connection():
+        data_set = fetch_latest_release()
+        if data_set is None:
             return None
 
-        response = network_handler.NetworkUtilities().get(REPO_LATEST_RELEASE_URL)
-        data_set = response.json()
-
         if "tag_name" not in data_set:
             return None
 
@@ -122,6 +218,7 @@ class CheckBinaryUpdates:
                     "Version": latest_remote_version,
                     "Link": asset["browser_download_url"],
                     "Github Link": f"https://github.com/sumitduster/OCLP-R/releases/{latest_remote_version}",
+                    "Changelog": (data_set.get("body") or "").split("## Asset Information")[0],
                 }
                 return self.latest_details
 
@@ -12,13 +12,15 @@ import argparse
 import binascii
 import plistlib
 import subprocess
-import py_sip_xnu
 
 from pathlib import Path
 
+from . import query_cache
+
 from .. import constants
 
 from ..detections import ioreg
+from ..detections.boot_state import BootState, decode_nvram
 
 from ..datasets import (
     os_data,
@@ -99,6 +101,8 @@ def header(lines):
 
 RECOVERY_STATUS = None
 
+NVRAM_CACHE_TTL = 5  # Seconds a get_nvram() read is reused
+
 
 def check_recovery():
     global RECOVERY_STATUS  # pylint: disable=global-statement # We need to cache the result
@@ -110,14 +114,14 @@ def check_recovery():
 
 
 def get_disk_path():
-    root_partition_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", "/"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+    root_partition_info = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", "/"]).stdout.decode().strip().encode())
     root_mount_path = root_partition_info["DeviceIdentifier"]
     root_mount_path = root_mount_path[:-2] if root_mount_path.count("s") > 1 else root_mount_path
     return root_mount_path
 
 
 def check_if_root_is_apfs_snapshot():
-    root_partition_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", "/"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+    root_partition_info = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", "/"]).stdout.decode().strip().encode())
     try:
         is_snapshotted = root_partition_info["APFSSnapshot"]
     except KeyError:
@@ -127,7 +131,7 @@ def check_if_root_is_apfs_snapshot():
 
 def check_seal():
     # 'Snapshot Sealed' property is only listed on booted snapshots
-    sealed = subprocess.run(["/usr/sbin/diskutil", "apfs", "list"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    sealed = query_cache.run(["/usr/sbin/diskutil", "apfs", "list"], merge_output=True)
     if "Snapshot Sealed:           Yes" in sealed.stdout.decode():
         return True
     else:
@@ -135,18 +139,17 @@ def check_seal():
 
 def check_filesystem_type():
     # Expected to return 'apfs' or 'hfs'
-    filesystem_type = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", "/"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+    filesystem_type = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", "/"]).stdout.decode().strip().encode())
     return filesystem_type["FilesystemType"]
 
 
-def csr_decode(os_sip):
-    sip_int = py_sip_xnu.SipXnu().get_sip_status().value
-    for i,  current_sip_bit in enumerate(sip_data.system_integrity_protection.csr_values):
-        if sip_int & (1 << i):
-            sip_data.system_integrity_protection.csr_values[current_sip_bit] = True
+def csr_decode(os_sip, boot_state: BootState = None):
+    sip_int = (boot_state or BootState.current()).sip_status
+    # Decoded per call, so boot states replayed one after another do not mix
+    sip_values = {current_sip_bit: bool(sip_int & (1 << i)) for i, current_sip_bit in enumerate(sip_data.system_integrity_protection.csr_values)}
 
     # Can be adjusted to whatever OS needs patching
-    sip_needs_change = all(sip_data.system_integrity_protection.csr_values[i] for i in os_sip)
+    sip_needs_change = all(sip_values[i] for i in os_sip)
     if sip_needs_change is True:
         return False
     else:
@@ -194,7 +197,7 @@ def check_kext_loaded(bundle_id: str) -> str:
     if Path("/usr/bin/kmutil").exists():
         args = ["/usr/bin/kmutil", "showloaded", "--list-only", "--variant-suffix", "release", "--optional-identifier", bundle_id]
 
-    kext_loaded = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    kext_loaded = query_cache.run(args, merge_output=True)
     if kext_loaded.returncode != 0:
         return ""
     output = kext_loaded.stdout.decode()
@@ -206,8 +209,8 @@ def check_kext_loaded(bundle_id: str) -> str:
     return ""
 
 
-def check_oclp_boot():
-    if get_nvram("OCLP-Version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True):
+def check_oclp_boot(boot_state: BootState = None):
+    if (boot_state or BootState.current()).nvram_value("OCLP-Version", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True):
         return True
     else:
         return False
@@ -243,25 +246,25 @@ def check_metal_support(device_probe, computer):
     return True
 
 
-def check_filevault_skip():
+def check_filevault_skip(boot_state: BootState = None):
     # Check whether we can skip FileVault check with Root Patching
-    nvram = get_nvram("OCLP-Settings", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
+    nvram = (boot_state or BootState.current()).nvram_value("OCLP-Settings", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
     if nvram:
         if "-allow_fv" in nvram:
             return True
     return False
 
 
-def check_secure_boot_model():
-    sbm_byte = get_nvram("HardwareModel", "94B73556-2197-4702-82A8-3E1337DAFBFB", decode=False)
+def check_secure_boot_model(boot_state: BootState = None):
+    sbm_byte = (boot_state or BootState.current()).nvram_value("HardwareModel", "94B73556-2197-4702-82A8-3E1337DAFBFB", decode=False)
     if sbm_byte:
         sbm_byte = sbm_byte.replace(b"\x00", b"")
         sbm_string = sbm_byte.decode("utf-8")
         return sbm_string
     return None
 
-def check_ap_security_policy():
-    ap_security_policy_byte = get_nvram("AppleSecureBootPolicy", "94B73556-2197-4702-82A8-3E1337DAFBFB", decode=False)
+def check_ap_security_policy(boot_state: BootState = None):
+    ap_security_policy_byte = (boot_state or BootState.current()).nvram_value("AppleSecureBootPolicy", "94B73556-2197-4702-82A8-3E1337DAFBFB", decode=False)
     if ap_security_policy_byte:
         # Supported Apple Secure Boot Policy values:
         #     AppleImg4SbModeDisabled = 0,
@@ -271,8 +274,8 @@ def check_ap_security_policy():
         return int.from_bytes(ap_security_policy_byte, byteorder="little")
     return 0
 
-def check_secure_boot_level():
-    if check_secure_boot_model() in constants.Constants().sbm_values:
+def check_secure_boot_level(boot_state: BootState = None):
+    if check_secure_boot_model(boot_state) in constants.Constants().sbm_values:
         # OpenCorePkg logic:
         #   - If a T2 Unit is used with ApECID, will return 2
         #   - Either x86legacy or T2 without ApECID, returns 1
@@ -283,14 +286,14 @@ def check_secure_boot_level():
         #   - On genuine non-T2 Macs, they always return 0
         #   - T2 Macs will return based on their Startup Policy (Full(2), Medium(1), Disabled(0))
         # Ref: https://support.apple.com/en-us/HT208198
-        if check_ap_security_policy() != 0:
+        if check_ap_security_policy(boot_state) != 0:
             return True
         else:
             return False
     return False
 
 
-def patching_status(os_sip, os):
+def patching_status(os_sip, os, boot_state: BootState = None):
     # Detection for Root Patching
     sip_enabled = True  #  System Integrity Protection
     sbm_enabled = True  #  Secure Boot Status (SecureBootModel)
@@ -301,18 +304,19 @@ def patching_status(os_sip, os):
     gen7_kext = "/System/Library/Extension/AppleIntelHD3000Graphics.kext"
 
 
-    sbm_enabled = check_secure_boot_level()
+    # FileVault may have been toggled since the snapshot was captured
+    boot_state = (boot_state or BootState.current()).refresh("filevault")
+
+    sbm_enabled = check_secure_boot_level(boot_state)
 
     if os > os_data.os_data.yosemite:
-        sip_enabled = csr_decode(os_sip)
+        sip_enabled = csr_decode(os_sip, boot_state)
     else:
         sip_enabled = False
 
-    if os > os_data.os_data.catalina and not check_filevault_skip():
+    if os > os_data.os_data.catalina and not check_filevault_skip(boot_state):
         # Assume non-OCLP Macs do not have our APFS seal patch
-        fv_status: str = subprocess.run(["/usr/bin/fdesetup", "status"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout.decode()
-        if "FileVault is Off" in fv_status:
-            fv_enabled = False
+        fv_enabled = boot_state.filevault
     else:
         fv_enabled = False
 
@@ -357,28 +361,30 @@ def get_nvram(variable: str, uuid: str = None, *, decode: bool = False):
     else:
         uuid = ""
 
+    # Short lived, as other processes may write NVRAM (ex. boot-args) during the session
+    value = query_cache.memoize((f"{uuid}{variable}",), "nvram", lambda: _read_nvram(f"{uuid}{variable}"), ttl=NVRAM_CACHE_TTL)
+    if value is None:
+        return None
+
+    if decode:
+        value = decode_nvram(value)
+    return value
+
+
+def _read_nvram(key: str):
+    """
+    Read raw NVRAM value through IOKit, uncached
+    """
     nvram = ioreg.IORegistryEntryFromPath(ioreg.kIOMasterPortDefault, "IODeviceTree:/options".encode())
 
-    value = ioreg.IORegistryEntryCreateCFProperty(nvram, f"{uuid}{variable}", ioreg.kCFAllocatorDefault, ioreg.kNilOptions)
+    value = ioreg.IORegistryEntryCreateCFProperty(nvram, key, ioreg.kCFAllocatorDefault, ioreg.kNilOptions)
 
     ioreg.IOObjectRelease(nvram)
 
     if not value:
         return None
 
-    value = ioreg.corefoundation_to_native(value)
-
-    if decode:
-        if isinstance(value, bytes):
-            try:
-                value = value.strip(b"\0").decode()
-            except UnicodeDecodeError:
-                # Some sceanrios the firmware will throw garbage in
-                # ie. iMac12,2 with FireWire boot-path
-                value = None
-        elif isinstance(value, str):
-            value = value.strip("\0")
-    return value
+    return ioreg.corefoundation_to_native(value)
 
 
 def get_rom(variable: str, *, decode: bool = False):
@@ -422,7 +428,7 @@ def find_apfs_physical_volume(device):
     disk_list = None
     physical_disks = []
     try:
-        disk_list = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", device], stdout=subprocess.PIPE).stdout)
+        disk_list = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", device]).stdout)
     except TypeError:
         pass
 
@@ -467,7 +473,7 @@ def find_disk_off_uuid(uuid):
     # Find disk by UUID
     disk_list = None
     try:
-        disk_list = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", uuid], stdout=subprocess.PIPE).stdout)
+        disk_list = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", uuid]).stdout)
     except TypeError:
         pass
     if disk_list:
@@ -494,26 +500,15 @@ def get_free_space(disk=None):
     return free
 
 def grab_mount_point_from_disk(disk):
-    data = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk], stdout=subprocess.PIPE).stdout.decode().strip().encode())
+    data = plistlib.loads(query_cache.run(["/usr/sbin/diskutil", "info", "-plist", disk]).stdout.decode().strip().encode())
     return data["MountPoint"]
 
-def monitor_disk_output(disk):
-    # Returns MB written on drive
-    output = subprocess.check_output(["/usr/sbin/iostat", "-Id", disk])
-    output = output.decode("utf-8")
-    #  Grab second last entry (last is \n)
-    output = output.split(" ")
-    output = output[-2]
-    return output
-
 
-def get_preboot_uuid() -> str:
+def get_preboot_uuid(boot_state: BootState = None) -> str:
     """
     Get the UUID of the Preboot volume
     """
-    args = ["/usr/sbin/ioreg", "-a", "-n", "chosen", "-p", "IODeviceTree", "-r"]
-    output = plistlib.loads(subprocess.run(args, stdout=subprocess.PIPE).stdout)
-    return output[0]["apfs-preboot-uuid"].strip(b"\0").decode()
+    return (boot_state or BootState.current()).chosen["apfs-preboot-uuid"].strip(b"\0").decode()
 
 
 def block_os_updaters():
@@ -541,7 +536,7 @@ def block_os_updaters():
 def check_boot_mode():
     # Check whether we're in Safe Mode or not
     try:
-        sys_plist = plistlib.loads(subprocess.run(["/usr/sbin/system_profiler", "SPSoftwareDataType"], stdout=subprocess.PIPE).stdout)
+        sys_plist = plistlib.loads(query_cache.run(["/usr/sbin/system_profiler", "SPSoftwareDataType"]).stdout)
         return sys_plist[0]["_items"][0]["boot_mode"]
     except (KeyError, TypeError, plistlib.InvalidFileException):
         return None
@@ -2,32 +2,104 @@
 validation.py: Validation class for the patcher
 """
 
+import os
+import sys
+import copy
+import time
+import hashlib
 import atexit
 import logging
+import tempfile
+import threading
 import subprocess
 
-from pathlib import Path
+from pathlib     import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
-from . import network_handler
+from . import network_handler, install, macos_installer_handler, utilities, esp_transaction, installer_progress, media_verification, defaults, global_settings
 
 from .. import constants
 
 from ..sys_patch import sys_patch_helpers
+from ..sys_patch import utilities as sys_patch_utilities
 from ..efi_builder import build
+from ..wx_gui import gui_settings_model
 from ..support import subprocess_wrapper
 
 from ..datasets import (
     example_data,
+    example_boot_data,
+    example_disk_data,
     model_array,
     os_data
 )
+from ..detections.boot_state import BootState
 from ..sys_patch.patchsets import (
     HardwarePatchsetDetection,
-    PatchType,
-    DynamicPatchset
+    HardwarePatchsetValidation,
+    PatchPlan
 )
 
 
+class _LocalFileRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the server's payload, paced to the server's rate (bytes per second) if set
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.server.payload)))
+        self.end_headers()
+
+
+    def do_GET(self) -> None:
+        self.do_HEAD()
+        payload = memoryview(self.server.payload)
+        start_time = time.monotonic()
+        try:
+            for offset in range(0, len(payload), 64 * 1024):
+                self.wfile.write(payload[offset:offset + 64 * 1024])
+                if self.server.rate is not None:
+                    time.sleep(max(0, start_time + (offset + 64 * 1024) / self.server.rate - time.monotonic()))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class _LocalFileServer:
+    """
+    HTTP server on localhost serving a single payload, for validating downloads without network access
+
+    Usage:
+        >>> with _LocalFileServer(payload, rate=4 * 1024 * 1024) as url:
+        >>>     network_handler.DownloadObject(url, path).download(spawn_thread=False)
+    """
+
+    def __init__(self, payload: bytes, rate: float = None) -> None:
+        self.payload = payload
+        self.rate    = rate
+        self.server: ThreadingHTTPServer = None
+
+
+    def __enter__(self) -> str:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _LocalFileRequestHandler)
+        self.server.daemon_threads = True
+        self.server.payload = self.payload
+        self.server.rate    = self.rate
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_port}/payload.bin"
+
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
 class PatcherValidation:
     """
     Validation class for the patcher
@@ -38,9 +110,13 @@ class PatcherValidation:
     def __init__(self, global_constants: constants.Constants, verify_unused_files: bool = False) -> None:
         self.constants: constants.Constants = global_constants
         self.verify_unused_files = verify_unused_files
-        self.active_patchset_files = []
+        self.active_patchset_files = set()
+
+        self.missing_patchset_files = []    # (Darwin version, path)
+        self.payload_index          = None  # Index of the mounted Universal-Binaries.dmg
 
         self.constants.validate = True
+        self.constants.efi_build_cache = False  # Exercise the builders for every model
 
         self.valid_dumps = [
             example_data.MacBookPro.MacBookPro92_Stock,
@@ -72,10 +148,583 @@ class PatcherValidation:
             example_data.MacBookPro.MacBookPro141_SSD_Upgrade,
         ]
 
+        # (Hardware probe, boot state, expected validation results)
+        self.valid_boot_states = [
+            (example_data.MacBookPro.MacBookPro111_Stock, example_boot_data.Sonoma.Stock, {
+                HardwarePatchsetValidation.FILEVAULT_ENABLED:         True,
+                HardwarePatchsetValidation.SIP_ENABLED:               True,
+                HardwarePatchsetValidation.SECURE_BOOT_MODEL_ENABLED: True,
+                HardwarePatchsetValidation.AMFI_ENABLED:              True,
+                HardwarePatchsetValidation.PATCHING_NOT_POSSIBLE:     True,
+            }),
+            (example_data.MacBookPro.MacBookPro111_Stock, example_boot_data.Sonoma.Root_Patch_Ready, {
+                HardwarePatchsetValidation.FILEVAULT_ENABLED:         False,
+                HardwarePatchsetValidation.SIP_ENABLED:               False,
+                HardwarePatchsetValidation.SECURE_BOOT_MODEL_ENABLED: False,
+                HardwarePatchsetValidation.AMFI_ENABLED:              False,
+                HardwarePatchsetValidation.PATCHING_NOT_POSSIBLE:     False,
+            }),
+            (example_data.MacBookPro.MacBookPro111_Stock, example_boot_data.Sonoma.AMFIPass, {
+                HardwarePatchsetValidation.AMFI_ENABLED:              False,
+                HardwarePatchsetValidation.PATCHING_NOT_POSSIBLE:     False,
+            }),
+            (example_data.MacPro.MacPro41_51_Flashed_NVIDIA_WEB_DRIVERS, example_boot_data.BigSur.NVIDIA_Web_Drivers_Missing_Args, {
+                HardwarePatchsetValidation.NVDA_DRV_MISSING:          True,
+                HardwarePatchsetValidation.PATCHING_NOT_POSSIBLE:     True,
+            }),
+            (example_data.MacPro.MacPro41_51_Flashed_NVIDIA_WEB_DRIVERS, example_boot_data.BigSur.NVIDIA_Web_Drivers, {
+                HardwarePatchsetValidation.NVDA_DRV_MISSING:          False,
+                HardwarePatchsetValidation.FORCE_OPENGL_MISSING:      False,
+                HardwarePatchsetValidation.FORCE_COMPAT_MISSING:      False,
+                HardwarePatchsetValidation.PATCHING_NOT_POSSIBLE:     False,
+            }),
+        ]
+
+        # (Recorded diskutil output, expected OpenCore install targets -> FAT partitions, expected installer targets)
+        self.valid_disk_recordings = [
+            (example_disk_data.MacBookPro.External_Media, {
+                "disk0": ["disk0s1"],
+                "disk2": ["disk2s1"],
+                "disk3": ["disk3s1"],
+                "disk5": ["disk5s1"],
+                "disk7": ["disk7s1"],
+            }, ["disk2", "disk3", "disk5", "disk7"]),
+        ]
+
+        self._validate_startup_imports()
+        self._validate_boot_states()
+        self._validate_disk_inventory()
+        self._validate_download_progress()
+        self._validate_download_pipeline()
+        self._validate_privileged_helper_session()
+        self._validate_esp_transaction()
+        self._validate_installer_progress()
+        self._validate_media_verification()
+        self._validate_efi_build_cache()
+        self._validate_settings_view_model()
         self._validate_configs()
         self._validate_sys_patch()
 
 
+    def _validate_startup_imports(self) -> None:
+        """
+        Ensure the headless startup path (ie. login auto-patcher, CLI)
+        does not import GUI modules, using '-X importtime'
+        """
+
+        if getattr(sys, "frozen", False):
+            logging.info("Skipping startup import validation on frozen build")
+            return
+
+        gui_modules = ["wx", "markdown2"]
+
+        logging.info("Validating startup imports")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import oclp_r.sys_patch.auto_patcher"],
+            cwd=Path(__file__).parent.parent.parent,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if result.returncode != 0:
+            subprocess_wrapper.log(result)
+            raise Exception("Failed to import startup modules")
+
+        # Format: 'import time: <self us> | <cumulative us> | <module>'
+        total = 0
+        for line in result.stderr.decode("utf-8").splitlines():
+            if not line.startswith("import time:") or line.endswith("imported package"):
+                continue
+            _, cumulative, module = [column.strip() for column in line.split(":", 1)[1].split("|")]
+            if module.split(".")[0] in gui_modules:
+                raise Exception(f"GUI module imported on startup path: {module}")
+            if module == "oclp_r":
+                total = int(cumulative)
+
+        logging.info(f"Startup imports completed in {total / 1000000:.2f}s")
+
+
+    def _validate_boot_states(self) -> None:
+        """
+        Replay root patch detection against sample boot states, round-tripped through JSON
+
+        Detection must only read the boot state, thus this is independent of the host
+        """
+        computer = self.constants.computer
+
+        for hardware, boot_state, expected in self.valid_boot_states:
+            boot_state = BootState.from_json(boot_state.to_json())
+            xnu_major, xnu_minor = boot_state.xnu_version
+            logging.info(f"Validating boot state: {hardware.real_model} on macOS {boot_state.sysctl['kern.osproductversion']}")
+
+            self.constants.computer = hardware
+            results = HardwarePatchsetDetection(
+                self.constants,
+                xnu_major=xnu_major, xnu_minor=xnu_minor,
+                os_build=boot_state.sysctl["kern.osversion"], os_version=boot_state.sysctl["kern.osproductversion"],
+                boot_state=boot_state
+            ).device_properties
+
+            mismatches = {str(key): results.get(key) for key, value in expected.items() if results.get(key) != value}
+            if mismatches:
+                raise Exception(f"Validation failed for boot state: {hardware.real_model}, unexpected {mismatches}")
+
+        self.constants.computer = computer
+
+
+    def _validate_disk_inventory(self) -> None:
+        """
+        List install targets from recorded diskutil output, independent of the host's disks
+        """
+        for recording, expected_opencore_disks, expected_installer_disks in self.valid_disk_recordings:
+            logging.info(f"Validating disk inventory: {len(recording.listing['AllDisksAndPartitions'])} recorded disks")
+            with recording:
+                installation = install.tui_disk_installation(self.constants)
+                opencore_disks = installation.list_disks()
+                opencore_disks = {disk: sorted(installation.list_partitions(disk, opencore_disks)) for disk in opencore_disks}
+                installer_disks = sorted(macos_installer_handler.InstallerCreation().list_disk_to_format())
+
+            if opencore_disks != expected_opencore_disks:
+                raise Exception(f"Validation failed for OpenCore install targets, got {opencore_disks}")
+            if installer_disks != expected_installer_disks:
+                raise Exception(f"Validation failed for installer targets, got {installer_disks}")
+
+
+    def _validate_download_progress(self) -> None:
+        """
+        Download from a throttled local server, events must arrive in order
+        and the smoothed throughput must settle near the throttled rate
+        """
+        rate    = 4 * 1024 * 1024
+        payload = os.urandom(rate * 3)
+        events  = []
+
+        logging.info(f"Validating download progress at {utilities.human_fmt(rate)}/s")
+        with tempfile.TemporaryDirectory() as directory, _LocalFileServer(payload, rate=rate) as url:
+            path = Path(directory) / "payload.bin"
+            download_obj = network_handler.DownloadObject(url, path)
+            download_obj.subscribe(lambda event, progress: events.append((event, progress)), interval=0.1)
+            download_obj.download(spawn_thread=False)
+            if download_obj.download_complete is False or path.read_bytes() != payload:
+                raise Exception(f"Validation failed for download progress, download incomplete: {download_obj.error_msg}")
+
+        kinds = [event for event, _ in events]
+        if kinds[-1] != network_handler.DownloadEvent.COMPLETE or set(kinds[:-1]) != {network_handler.DownloadEvent.PROGRESS}:
+            raise Exception(f"Validation failed for download progress, unexpected events: {[event.value for event in kinds]}")
+
+        sizes = [progress.downloaded_file_size for _, progress in events]
+        if sizes != sorted(sizes) or sizes[-1] != len(payload) or events[-1][1].percent != 100:
+            raise Exception(f"Validation failed for download progress, progress not monotonic: {sizes}")
+
+        speed = events[-1][1].speed
+        if abs(speed - rate) > rate * 0.25:
+            raise Exception(f"Validation failed for download progress, throughput {utilities.human_fmt(speed)}/s, expected {utilities.human_fmt(rate)}/s")
+
+        logging.info(f"- {len(events)} events, throughput settled at {utilities.human_fmt(speed)}/s")
+
+
+    def _validate_download_pipeline(self) -> None:
+        """
+        Benchmark the receive/write/hash pipeline against a single-threaded loop,
+        across buffer pool sizes, on an unthrottled local download with checksumming
+
+        Every variant must produce the payload's checksum, throughput is only reported
+        """
+        payload  = os.urandom(128 * 1024 * 1024)
+        expected = hashlib.sha256(payload).hexdigest()
+        results  = {}
+
+        logging.info(f"Benchmarking download pipeline with {utilities.human_fmt(len(payload))}")
+        with tempfile.TemporaryDirectory() as directory, _LocalFileServer(payload) as url:
+            path = Path(directory) / "payload.bin"
+
+            def _single_threaded() -> str:
+                # Reference: receive, write and hash in turn, as before the pipeline
+                response = network_handler.NetworkUtilities().get(url, stream=True, timeout=10)
+                checksum = hashlib.sha256()
+                with open(path, "wb") as file:
+                    for chunk in response.iter_content(4 * 1024 * 1024):
+                        file.write(chunk)
+                        checksum.update(chunk)
+                return checksum.hexdigest()
+
+            def _pipelined(buffer_count: int) -> str:
+                download_obj = network_handler.DownloadObject(url, path)
+                download_obj.PIPELINE_BUFFER_COUNT = buffer_count
+                return download_obj.download_simple(verify_checksum=True)
+
+            variants = {"Single-threaded": _single_threaded}
+            for buffer_count in [2, 4, 8]:
+                name = f"Pipeline, {buffer_count} x {utilities.human_fmt(network_handler.DownloadObject.PIPELINE_BUFFER_SIZE)}"
+                variants[name] = lambda buffer_count=buffer_count: _pipelined(buffer_count)
+
+            # Best of three, local transfers are noisy
+            for _ in range(3):
+                for name, variant in variants.items():
+                    start_time = time.perf_counter()
+                    checksum = variant()
+                    elapsed = time.perf_counter() - start_time
+                    if checksum != expected:
+                        raise Exception(f"Validation failed for download pipeline, {name} returned checksum {checksum}")
+                    results[name] = max(results.get(name, 0), len(payload) / elapsed)
+
+        for name, speed in results.items():
+            logging.info(f"- {name}: {utilities.human_fmt(speed)}/s")
+
+
+    def _validate_privileged_helper_session(self) -> None:
+        """
+        Exercise the Privileged Helper session protocol against the unprivileged
+        stand-in helper, then benchmark launching the helper per command against a session
+
+        The stand-in's interpreter start up takes the place of the real helper's
+        signature checks, both are paid once per launch
+        """
+        if getattr(sys, "frozen", False):
+            logging.info("Skipping Privileged Helper session validation on frozen build")
+            return
+
+        helper = Path(__file__).parent.parent.parent / "ci_tooling" / "privileged_helper_tool" / "stand_in_helper.py"
+        count  = 1000
+
+        logging.info("Validating Privileged Helper session protocol")
+        session = subprocess_wrapper.PrivilegedHelperSession(str(helper))
+        if session.start() is False:
+            raise Exception("Validation failed for Privileged Helper session, handshake failed")
+
+        try:
+            # (command, merge output, expected (return code, stdout, stderr))
+            for command, merge_output, expected in [
+                (["/bin/echo", "OCLP-R"],                                  False, (0, b"OCLP-R\n", b"")),
+                (["/bin/sh", "-c", "echo out; echo err >&2; exit 3"],      False, (3, b"out\n", b"err\n")),
+                (["/bin/sh", "-c", "echo out; echo err >&2"],              True,  (0, b"out\nerr\n", b"")),
+                (["/bin/sh", "-c", "head -c 1048576 /dev/zero"],           False, (0, bytes(1048576), b"")),
+                (["/OCLP-R/missing"],                                      False, (subprocess_wrapper.PrivilegedHelperErrorCodes.OCLP_PHT_ERROR_COMMAND_MISSING, b"", b"")),
+            ]:
+                result = session.run(command, merge_output=merge_output)
+                if result != expected:
+                    raise Exception(f"Validation failed for Privileged Helper session, {command} returned {result[0]} with {len(result[1])} bytes of output")
+
+            start_time = time.perf_counter()
+            for _ in range(count):
+                session.run(["/usr/bin/true"])
+            session_time = time.perf_counter() - start_time
+        finally:
+            session.close()
+
+        start_time = time.perf_counter()
+        for _ in range(count):
+            subprocess.run([str(helper), "/usr/bin/true"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        launch_time = time.perf_counter() - start_time
+
+        logging.info(f"- {count} commands: {launch_time:.2f}s launching the helper per command, {session_time:.2f}s in a session")
+
+
+    def _validate_esp_transaction(self) -> None:
+        """
+        Install to a folder standing in for the ESP, over an existing OpenCore installation
+
+        Only files changed by the build may be written from it: unchanged files are seeded
+        from the live copy, or recycled from the previous generation, and a repeated
+        installation writes nothing
+        """
+        logging.info("Validating ESP transaction")
+        files = [
+            "EFI/BOOT/BOOTx64.efi",
+            "EFI/OC/OpenCore.efi",
+            "EFI/OC/config.plist",
+            "EFI/OC/Drivers/OpenRuntime.efi",
+            "EFI/OC/Kexts/Lilu.kext/Contents/Info.plist",
+            "EFI/OC/Kexts/Lilu.kext/Contents/MacOS/Lilu",
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            build = Path(directory) / "Build"
+            esp   = Path(directory) / "ESP"
+            for relative_path in files:
+                for base in [build, esp]:
+                    (base / relative_path).parent.mkdir(parents=True, exist_ok=True)
+                (build / relative_path).write_bytes(os.urandom(256 * 1024))
+                (esp / relative_path).write_bytes((build / relative_path).read_bytes())
+            (esp / "EFI/OC/Kexts/Legacy.kext").mkdir()
+            (esp / "EFI/OC/Kexts/Legacy.kext/Info.plist").write_bytes(b"")
+
+            layout = {relative_path: build / relative_path for relative_path in files}
+
+            # (file changed by the build, expected (files written, files seeded))
+            for changed_file, expected in [
+                ("EFI/OC/config.plist", (1, len(files) - 1)),  # Over an existing installation, nothing to recycle
+                (None,                  (0, 0)),               # Repeated
+                ("EFI/OC/OpenCore.efi", (1, 1)),               # Previous generation recycled, config.plist seeded
+            ]:
+                if changed_file is not None:
+                    (build / changed_file).write_bytes(os.urandom(256 * 1024))
+
+                transaction = esp_transaction.ESPTransaction(esp, layout, ["EFI/BOOT", "EFI/OC"])
+                if transaction.install() is False:
+                    raise Exception("Validation failed for ESP transaction, installation rolled back")
+
+                stats = transaction.stats
+                logging.info(f"- Wrote {stats['Files Written']} files ({stats['Bytes Written']} bytes), seeded {stats['Files Seeded']} files ({stats['Bytes Seeded']} bytes)")
+                if (stats["Files Written"], stats["Files Seeded"]) != expected:
+                    raise Exception(f"Validation failed for ESP transaction, wrote {stats['Files Written']} and seeded {stats['Files Seeded']} files, expected {expected[0]} and {expected[1]}")
+
+            if (esp / "EFI/OC/Kexts/Legacy.kext").exists():
+                raise Exception("Validation failed for ESP transaction, stale kext left behind")
+
+
+    def _validate_installer_progress(self) -> None:
+        """
+        Run Installer.sh's pipeline with a scripted createinstallmedia in place of the real one
+
+        Progress must follow the scripted percentages, and the script must exit
+        with createinstallmedia's status rather than tee's
+        """
+        logging.info("Validating installer media progress")
+
+        # (percentages printed while copying, exit status)
+        for percentages, exit_status in [
+            (list(range(0, 101, 10)), 0),
+            ([0, 10, 20, 30],         3),
+        ]:
+            with tempfile.TemporaryDirectory() as directory:
+                installer = Path(directory) / "Install macOS Validation.app"
+                createinstallmedia = installer / "Contents" / "Resources" / "createinstallmedia"
+                createinstallmedia.parent.mkdir(parents=True)
+                (installer / "Contents" / "SharedSupport.dmg").write_bytes(bytes(1024 * 1024))
+
+                steps = "\n".join(f'printf "{percent}%%... "; sleep 0.2' for percent in percentages)
+                ending = 'echo "Making disk bootable..."\necho "Install media now available at \\"/Volumes/Install macOS Validation\\""' if exit_status == 0 else 'echo "Failed to copy installer" >&2'
+                createinstallmedia.write_text(f'#!/bin/bash\necho "Erasing disk: 0%... 100%"\nprintf "Copying to disk: "\n{steps}\necho\n{ending}\nexit {exit_status}\n')
+                createinstallmedia.chmod(0o755)
+
+                log    = Path(directory) / "createinstallmedia.log"
+                script = Path(directory) / "Installer.sh"
+                script.write_text(macos_installer_handler.installer_creation_script("/usr/bin/true", createinstallmedia, progress_log=log))
+
+                progress = installer_progress.InstallerMediaProgress(installer, log)
+                progress.POLL_INTERVAL = 0
+                reported = []
+
+                # As the GUI's '/bin/sh', which is bash on macOS
+                process = subprocess.Popen(["/bin/bash", script], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                while process.poll() is None:
+                    reported.append(round(progress.poll().percent))
+                    time.sleep(0.05)
+                output = process.communicate()[0].decode()
+                reported.append(round(progress.poll().percent))
+
+            # Polls may land between steps, but never report a figure that was not printed
+            reported = [percent for index, percent in enumerate(reported) if index == 0 or percent != reported[index - 1]]
+            if any(percent not in percentages for percent in reported) or reported != sorted(reported) or reported[-1] != percentages[-1]:
+                raise Exception(f"Validation failed for installer progress, reported {reported}, expected {percentages}")
+            if process.returncode != exit_status:
+                raise Exception(f"Validation failed for installer progress, Installer.sh exited with {process.returncode}, expected {exit_status}")
+            if ("Install media now available" in output) != (exit_status == 0):
+                raise Exception("Validation failed for installer progress, createinstallmedia output not mirrored")
+
+            logging.info(f"- Exit status {process.returncode}, reported {reported}")
+
+
+    def _validate_media_verification(self) -> None:
+        """
+        Benchmark manifest verification of a synthetic installer copy against the previous
+        scope (reading SharedSupport.dmg alone), then ensure corruption is reported
+
+        Files are served from cache, so timings compare hashing and scheduling, not the media
+        """
+        logging.info("Benchmarking installer media verification")
+        with tempfile.TemporaryDirectory() as directory:
+            source = Path(directory) / "Install macOS Validation.app"
+            shared_support = source / "Contents" / "SharedSupport"
+            shared_support.mkdir(parents=True)
+            with open(shared_support / "SharedSupport.dmg", "wb") as file:
+                for _ in range(8):
+                    file.write(os.urandom(64 * 1024 * 1024))
+            for index in range(2):
+                (shared_support / f"Payload{index}.dmg").write_bytes(os.urandom(96 * 1024 * 1024))
+            for folder in range(20):
+                (source / "Contents" / "Resources" / f"Folder{folder}").mkdir(parents=True)
+                for index in range(30):
+                    (source / "Contents" / "Resources" / f"Folder{folder}" / f"File{index}").write_bytes(os.urandom(64 * 1024))
+
+            copy = Path(directory) / "Volume" / source.name
+            copy.parent.mkdir()
+            subprocess_wrapper.run_and_verify(["/bin/cp", "-R", source, copy.parent], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            manifest = media_verification.InstallerManifest.from_directory(source)
+
+            def _previous_scope() -> None:
+                media_verification.file_digest(copy / "Contents" / "SharedSupport" / "SharedSupport.dmg")
+
+            for name, variant in {
+                "SharedSupport.dmg only (previous scope)": _previous_scope,
+                "Full, 1 worker":                          lambda: media_verification.verify(manifest, copy, max_workers=1),
+                f"Full, {media_verification.MAX_WORKERS} worker(s)":lambda: media_verification.verify(manifest, copy),
+                "Sampled":                                 lambda: media_verification.verify(manifest, copy, sampled=True),
+            }.items():
+                start_time = time.perf_counter()
+                result = variant()
+                if result is not None and result.passed is False:
+                    raise Exception(f"Validation failed for media verification, intact copy reported: {result.summary()}")
+                logging.info(f"- {name}: {time.perf_counter() - start_time:.2f}s")
+
+            # Flip a byte in the image, remove a file and grow another
+            with open(copy / "Contents" / "SharedSupport" / "SharedSupport.dmg", "r+b") as file:
+                file.seek(300 * 1024 * 1024)
+                byte = file.read(1)
+                file.seek(300 * 1024 * 1024)
+                file.write(bytes([byte[0] ^ 1]))
+            (copy / "Contents" / "Resources" / "Folder5" / "File3").unlink()
+            with open(copy / "Contents" / "Resources" / "Folder7" / "File1", "ab") as file:
+                file.write(b"\0")
+
+            # The sampled mode is not expected to catch the flipped byte
+            for sampled, expected_corrupt in [(False, 2), (True, 1)]:
+                result = media_verification.verify(manifest, copy, sampled=sampled)
+                if result.missing != ["Contents/Resources/Folder5/File3"] or len(result.corrupt) != expected_corrupt:
+                    raise Exception(f"Validation failed for media verification, corruption not reported (sampled: {sampled}): {result.summary()}")
+
+
+    def _validate_efi_build_cache(self) -> None:
+        """
+        Build one model twice with the build cache enabled, ensuring the second build
+        is restored from the cache and matches an uncached build byte for byte
+        """
+        model = "MacBookPro11,1"
+        logging.info(f"Validating EFI build cache: {model}")
+
+        def _snapshot() -> dict:
+            return {
+                path.relative_to(self.constants.opencore_release_folder).as_posix(): hashlib.sha256(path.read_bytes()).hexdigest()
+                for path in sorted(Path(self.constants.opencore_release_folder).rglob("*")) if path.is_file()
+            }
+
+        self.constants.custom_model = model
+        build.BuildOpenCore(model, self.constants)
+        uncached_tree = _snapshot()
+
+        self.constants.efi_build_cache = True
+        try:
+            for attempt, expected_stage in enumerate(["Cache Build", "Restore Cached Build"]):
+                stages = [span["Name"] for span in build.BuildOpenCore(model, self.constants).profile.spans]
+                if expected_stage not in stages:
+                    raise Exception(f"Validation failed for EFI build cache, build {attempt + 1} of {model} lacks stage '{expected_stage}': {stages}")
+                if _snapshot() != uncached_tree:
+                    raise Exception(f"Validation failed for EFI build cache, build {attempt + 1} of {model} differs from an uncached build")
+        finally:
+            self.constants.efi_build_cache = False
+
+        logging.info(f"- Second build restored from cache, {len(uncached_tree)} files identical to an uncached build")
+
+
+    def _validate_settings_view_model(self) -> None:
+        """
+        Drive the Settings Frame's view-model headless, over entries shaped as SettingsFrame._settings()
+
+        Uses its own constants, and restores the global settings file afterwards
+        """
+        logging.info("Validating Settings Frame view-model")
+
+        if not getattr(sys, "frozen", False):
+            result = subprocess.run(
+                [sys.executable, "-c", "import sys, oclp_r.wx_gui.gui_settings_model; sys.exit('wx' in sys.modules)"],
+                cwd=Path(__file__).parent.parent.parent,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            if result.returncode != 0:
+                subprocess_wrapper.log(result)
+                raise Exception("Validation failed for Settings Frame view-model, unable to import without wx")
+
+        global_constants = constants.Constants()
+        global_constants.computer = copy.deepcopy(example_data.MacBookPro.MacBookPro111_Stock)
+        real_model = global_constants.computer.real_model
+
+        settings = {
+            "Build": {
+                "General": {
+                    "type": "title",
+                },
+                "Boot Picker Timeout": {
+                    "type": "spinctrl",
+                    "value": lambda: global_constants.oc_timeout,
+                    "variable": "oc_timeout",
+                    "min": 0,
+                    "max": 60,
+                },
+                "Verbose": {
+                    "type": "checkbox",
+                    "value": lambda: global_constants.verbose_debug,
+                    "variable": "verbose_debug",
+                },
+            },
+            "Extras": {
+                "Disable Thunderbolt": {
+                    "type": "checkbox",
+                    "value": lambda: global_constants.disable_tb,
+                    "variable": "disable_tb",
+                    "condition": lambda: (global_constants.custom_model or real_model) in ["MacBookPro11,1", "MacBookPro11,2", "MacBookPro11,3"],
+                },
+                "SMBIOS Spoof Level": {
+                    "type": "choice",
+                    "choices": ["None", "Minimal", "Moderate", "Advanced"],
+                    "value": lambda: global_constants.serial_settings,
+                    "variable": "serial_settings",
+                },
+            },
+        }
+
+        def _set_model(model: str) -> None:
+            # As SettingsFrame._set_model()
+            global_constants.custom_model = model
+            defaults.GenerateDefaults(model or real_model, model is None, global_constants)
+
+        settings_file = Path(global_settings.GlobalEnviromentSettings().global_settings_plist)
+        saved_settings = settings_file.read_bytes() if settings_file.exists() else None
+        try:
+            _set_model(None)
+            view_model = gui_settings_model.SettingsViewModel(settings)
+            states = {**view_model.attach("Build"), **view_model.attach("Extras")}
+            if ("Build", "General") in states or states[("Extras", "Disable Thunderbolt")] != gui_settings_model.ControlState(False, True):
+                raise Exception(f"Validation failed for Settings Frame view-model, unexpected initial states: {states}")
+
+            # Edits made through a control are reported once
+            gui_settings_model.update_setting(global_constants, "disable_tb", True)
+            changed = view_model.refresh()
+            if changed != {("Extras", "Disable Thunderbolt"): gui_settings_model.ControlState(True, True)} or view_model.refresh() != {}:
+                raise Exception(f"Validation failed for Settings Frame view-model, control edit reported as: {changed}")
+
+            # Model changes reset and toggle the controls depending on the model
+            # Back on the host model, the edit is restored from its 'GUI:' key
+            # Neither model has defaults with host side effects (ie. Moraea_BlurBeta)
+            for model, expected_state in [("MacBookPro9,2", gui_settings_model.ControlState(False, False)), (None, gui_settings_model.ControlState(True, True))]:
+                changed = view_model.apply(lambda: _set_model(model))
+                if changed.get(("Extras", "Disable Thunderbolt")) != expected_state:
+                    raise Exception(f"Validation failed for Settings Frame view-model, switching to {model or real_model} reported: {changed}")
+                if any(view_model.evaluate(*key) != state for key, state in view_model.states.items()):
+                    raise Exception(f"Validation failed for Settings Frame view-model, states out of date after switching to {model or real_model}")
+
+            # Persisted 'GUI:' keys are restored by a new session's host defaults
+            persisted = {"oc_timeout": 7, "serial_settings": "Moderate", "verbose_debug": True, "custom_sip_value": None}
+            for variable, value in persisted.items():
+                gui_settings_model.update_setting(global_constants, variable, value)
+            stored = {variable: global_settings.GlobalEnviromentSettings().read_property(f"GUI:{variable}") for variable in persisted}
+            if stored != {**persisted, "custom_sip_value": "PYTHON_NONE_VALUE"}:
+                raise Exception(f"Validation failed for Settings Frame view-model, persisted as: {stored}")
+
+            session_constants = constants.Constants()
+            session_constants.computer = copy.deepcopy(example_data.MacBookPro.MacBookPro111_Stock)
+            defaults.GenerateDefaults(real_model, True, session_constants)
+            restored = {variable: getattr(session_constants, variable) for variable in persisted}
+            if restored != persisted:
+                raise Exception(f"Validation failed for Settings Frame view-model, restored as: {restored}")
+        finally:
+            if saved_settings is None:
+                settings_file.unlink(missing_ok=True)
+            else:
+                settings_file.write_bytes(saved_settings)
+
+        logging.info(f"- {len(view_model.states)} controls tracked, persisted settings restored by host defaults")
+
+
     def _build_prebuilt(self) -> None:
         """
         Generate a build for each predefined model
@@ -128,38 +777,28 @@ class PatcherValidation:
         patch_type_overwrite_exempt = []
 
         patchset = HardwarePatchsetDetection(self.constants, xnu_major=major_kernel, xnu_minor=minor_kernel, validation=True).patches
+        plan = PatchPlan(patchset)  # Raises on unknown PatchTypes
+
+        source_files = []
+        for operation in plan.installs():
+            if operation.is_dynamic:
+                continue
 
-        for patch_core in patchset:
-            # Check if any unknown PathType is present
-            for install_type in patchset[patch_core]:
-                if install_type not in PatchType:
-                    raise Exception(f"Unknown PatchType: {install_type}")
-
-            for install_type in [PatchType.OVERWRITE_SYSTEM_VOLUME, PatchType.OVERWRITE_DATA_VOLUME, PatchType.MERGE_SYSTEM_VOLUME, PatchType.MERGE_DATA_VOLUME]:
-                if install_type in patchset[patch_core]:
-                    for install_directory in patchset[patch_core][install_type]:
-                        for install_file in patchset[patch_core][install_type][install_directory]:
-                            try:
-                                if patchset[patch_core][install_type][install_directory][install_file] in DynamicPatchset:
-                                    continue
-                            except TypeError:
-                                pass
-
-                            # Technically there is nothing wrong with using a .framework with OVERWRITE, but it's a good indicator of a mistake
-                            if install_type in [PatchType.OVERWRITE_SYSTEM_VOLUME, PatchType.OVERWRITE_DATA_VOLUME]:
-                                if install_file.endswith(".framework") and install_file not in patch_type_overwrite_exempt:
-                                    raise Exception(f"{install_file} used with {install_type}, are you certain this is correct?")
-                            elif install_type in [PatchType.MERGE_SYSTEM_VOLUME, PatchType.MERGE_DATA_VOLUME]:
-                                if not install_file.endswith(".framework") and install_file not in patch_type_merge_exempt:
-                                    raise Exception(f"{install_file} used with {install_type}, are you certain this is correct?")
-
-                            source_file = str(self.constants.payload_local_binaries_root_path) + "/" + patchset[patch_core][install_type][install_directory][install_file] + install_directory + "/" + install_file
-                            if not Path(source_file).exists():
-                                logging.info(f"File not found: {source_file}")
-                                raise Exception(f"Failed to find {source_file}")
-                            if self.verify_unused_files is True:
-                                if source_file not in self.active_patchset_files:
-                                    self.active_patchset_files.append(source_file)
+            # Technically there is nothing wrong with using a .framework with OVERWRITE, but it's a good indicator of a mistake
+            if not operation.is_merge:
+                if operation.file.endswith(".framework") and operation.file not in patch_type_overwrite_exempt:
+                    raise Exception(f"{operation.file} used with {operation.type}, are you certain this is correct?")
+            elif not operation.file.endswith(".framework") and operation.file not in patch_type_merge_exempt:
+                raise Exception(f"{operation.file} used with {operation.type}, are you certain this is correct?")
+
+            source_file = operation.source_path(str(self.constants.payload_local_binaries_root_path))
+            source_files.append(source_file)
+            if self.verify_unused_files is True:
+                self.active_patchset_files.add(source_file)
+
+        for source_file in self.payload_index.missing(source_files):
+            logging.info(f"File not found: {source_file}")
+            self.missing_patchset_files.append((f"{major_kernel}.{minor_kernel}", source_file))
 
         logging.info(f"Validating against Darwin {major_kernel}.{minor_kernel}")
         if not sys_patch_helpers.SysPatchHelpers(self.constants).generate_patchset_plist(patchset, f"OpenCore Legacy Patcher-{major_kernel}.{minor_kernel}.plist", None, None):
@@ -233,10 +872,25 @@ class PatcherValidation:
 
         atexit.register(self._unmount_dmg)
 
+        start_time = time.time()
+        self.payload_index = sys_patch_utilities.PayloadIndex.load_or_build(
+            self.constants.payload_local_binaries_root_path,
+            self.constants.payload_local_binaries_index_path,
+            self.constants.patcher_support_pkg_version,
+            self.constants.payload_local_binaries_root_path_dmg,
+        )
+        logging.info(f"Loaded payload index ({len(self.payload_index)} files) in {time.time() - start_time:.2f}s")
+
         for supported_os in [os_data.os_data.big_sur, os_data.os_data.monterey, os_data.os_data.ventura, os_data.os_data.sonoma, os_data.os_data.sequoia]:
             for i in range(0, 10):
                 self._validate_root_patch_files(supported_os, i)
 
+        if self.missing_patchset_files:
+            logging.info(f"Missing {len(self.missing_patchset_files)} file(s) from PatcherSupportPkg:")
+            for darwin_version, source_file in self.missing_patchset_files:
+                logging.info(f"- Darwin {darwin_version}: {source_file}")
+            raise Exception(f"Failed to find {self.missing_patchset_files[0][1]}")
+
         logging.info("Validating SNB Board ID patcher")
         self.constants.computer.reported_board_id = "Mac-7BA5B2DFE22DDD8C"
         sys_patch_helpers.SysPatchHelpers(self.constants).snb_board_id_patch(self.constants.payload_local_binaries_root_path)
@@ -270,40 +924,13 @@ class PatcherValidation:
     def _find_unused_files(self) -> None:
         """
         Find PatcherSupportPkg files that are unused by the patcher
-
-        Note this function is extremely slow, so only manually run when needed
         """
-        if self.active_patchset_files == []:
+        if not self.active_patchset_files:
             return
 
-        unused_files = []
-
-        for file in Path(self.constants.payload_local_binaries_root_path).rglob("*"):
-            if file.is_dir():
-                continue
-
-            relative_path = Path(file).relative_to(self.constants.payload_local_binaries_root_path)
-
-            if relative_path.name == ".DS_Store":
-                continue
-
-            if str(relative_path) in [".fseventsd/fseventsd-uuid", ".signed"]:
-                continue
-
-            is_used = False
-            for used_file in self.active_patchset_files:
-                used_relative_path = Path(used_file).relative_to(self.constants.payload_local_binaries_root_path)
-                if str(relative_path) in str(used_relative_path):
-                    is_used = True
-                    break
-                if str(used_relative_path) in str(relative_path):
-                    is_used = True
-                    break
-
-            if is_used:
-                continue
-
-            unused_files.append(relative_path)
+        start_time = time.time()
+        unused_files = self.payload_index.unused(self.active_patchset_files)
+        logging.info(f"Checked {len(self.payload_index)} files for usage in {time.time() - start_time:.2f}s")
 
         if len(unused_files) > 0:
             logging.info("Unused files found:")
@@ -2,30 +2,18 @@
 start.py: Start automatic patching of host
 """
 
-import wx
-import wx.html2
-
 import logging
 import plistlib
-import requests
-import markdown2
 import subprocess
 import webbrowser
 
 
 from ... import constants
 
-from ...datasets import css_data
-
-from ...wx_gui import (
-    gui_entry,
-    gui_support
-)
 from ...support import (
     utilities,
     updates,
     global_settings,
-    network_handler,
 )
 from ..patchsets import (
     HardwarePatchsetDetection,
@@ -66,83 +54,8 @@ class StartAutomaticPatching:
 
         dict = updates.CheckBinaryUpdates(self.constants).check_binary_updates()
         if dict:
-            version = dict["Version"]
-            logging.info(f"- Found new version: {version}")
-
-            app = wx.App()
-            mainframe = wx.Frame(None, -1, "OpenCore Legacy Patcher")
-
-            ID_GITHUB = wx.NewId()
-            ID_UPDATE = wx.NewId()
-
-            url = "https://api.github.com/repos/sumitduster/OCLP-R/releases/latest"
-            response = requests.get(url).json()
-            try:
-                changelog = response["body"].split("## Asset Information")[0]
-            except: #if user constantly checks for updates, github will rate limit them
-                changelog = """## Unable to fetch changelog
-
-Please check the Github page for more information about this release."""
-
-            html_markdown = markdown2.markdown(changelog, extras=["tables"])
-            html_css = css_data.updater_css
-            frame = wx.Dialog(None, -1, title="", size=(650, 500))
-            frame.SetMinSize((650, 500))
-            frame.SetWindowStyle(wx.STAY_ON_TOP)
-            panel = wx.Panel(frame)
-            sizer = wx.BoxSizer(wx.VERTICAL)
-            sizer.AddSpacer(10)
-            self.title_text = wx.StaticText(panel, label="A new version of OpenCore Legacy Patcher is available!")
-            #nightly_label="(Nightly)"
-            nightly_label="(Nightly)"
-            self.description = wx.StaticText(panel, label=f"OpenCore Legacy Patcher {version} is now available - You have {self.constants.patcher_version}{f' {nightly_label}' if not self.constants.commit_info[0].startswith('refs/tags') else ''}. Would you like to update?")
-            self.title_text.SetFont(gui_support.font_factory(19, wx.FONTWEIGHT_BOLD))
-            self.description.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
-            self.web_view = wx.html2.WebView.New(panel, style=wx.BORDER_SUNKEN)
-            html_code = f'''
-<html>
-    <head>
-        <style>
-            {html_css}
-        </style>
-    </head>
-    <body class="markdown-body">
-        {html_markdown.replace("<a href=", "<a target='_blank' href=")}
-    </body>
-</html>
-'''
-            self.web_view.SetPage(html_code, "")
-            self.web_view.Bind(wx.html2.EVT_WEBVIEW_NEWWINDOW, self._onWebviewNav)
-            self.web_view.EnableContextMenu(False)
-            self.close_button = wx.Button(panel, label="Ignore")
-            self.close_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(wx.ID_CANCEL))
-            self.view_button = wx.Button(panel, ID_GITHUB, label="View on GitHub")
-            self.view_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(ID_GITHUB))
-            self.install_button = wx.Button(panel, label="Download and Install")
-            self.install_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(ID_UPDATE))
-            self.install_button.SetDefault()
-
-            buttonsizer = wx.BoxSizer(wx.HORIZONTAL)
-            buttonsizer.Add(self.close_button, 0, wx.ALIGN_CENTRE | wx.RIGHT, 5)
-            buttonsizer.Add(self.view_button, 0, wx.ALIGN_CENTRE | wx.LEFT|wx.RIGHT, 5)
-            buttonsizer.Add(self.install_button, 0, wx.ALIGN_CENTRE | wx.LEFT, 5)
-            sizer = wx.BoxSizer(wx.VERTICAL)
-            sizer.Add(self.title_text, 0, wx.ALIGN_CENTRE | wx.TOP, 20)
-            sizer.Add(self.description, 0, wx.ALIGN_CENTRE | wx.BOTTOM, 20)
-            sizer.Add(self.web_view, 1, wx.EXPAND | wx.LEFT|wx.RIGHT, 10)
-            sizer.Add(buttonsizer, 0, wx.ALIGN_RIGHT | wx.ALL, 20)
-            panel.SetSizer(sizer)
-            frame.Centre()
-
-            result = frame.ShowModal()
-
-
-            if result == ID_GITHUB:
-                webbrowser.open(dict["Github Link"])
-            elif result == ID_UPDATE:
-                gui_entry.EntryPoint(self.constants).start(entry=gui_entry.SupportedEntryPoints.UPDATE_APP)
-
-
+            logging.info(f"- Found new version: {dict['Version']}")
+            self._display_update_dialog(dict)
             return
 
         if utilities.check_seal() is True:
@@ -165,7 +78,7 @@ Please check the Github page for more information about this release."""
                 logging.info("- No new binaries found on Github, proceeding with patching")
 
                 warning_str = ""
-                if network_handler.NetworkUtilities("https://api.github.com/repos/sumitduster/OCLP-R/releases/latest").verify_network_connection() is False:
+                if updates.fetch_latest_release() is None:
                     warning_str = f"""\n\nWARNING: We're unable to verify whether there are any new releases of OpenCore Legacy Patcher on Github. Be aware that you may be using an outdated version for this OS. If you're unsure, verify on Github that OpenCore Legacy Patcher {self.constants.patcher_version} is the latest official release"""
 
                 args = [
@@ -180,7 +93,7 @@ Please check the Github page for more information about this release."""
                     stderr=subprocess.STDOUT
                 )
                 if output.returncode == 0:
-                    gui_entry.EntryPoint(self.constants).start(entry=gui_entry.SupportedEntryPoints.SYS_PATCH, start_patching=True)
+                    self._launch_gui("SYS_PATCH", start_patching=True)
                 return
 
             else:
@@ -192,6 +105,112 @@ Please check the Github page for more information about this release."""
             self._determine_if_boot_matches()
 
 
+    def _display_update_dialog(self, update: dict) -> None:
+        """
+        Display changelog of a new release, and offer to update
+
+        wxPython, WebKit and markdown are only loaded here, so login checks
+        that end without showing a window never pay for their import
+
+        Parameters:
+            update (dict): Update information from CheckBinaryUpdates
+        """
+
+        import wx
+        import wx.html2
+        import markdown2
+
+        from ...datasets import css_data
+        from ...wx_gui import gui_support
+
+        version = update["Version"]
+
+        app = wx.App()
+        mainframe = wx.Frame(None, -1, "OpenCore Legacy Patcher")
+
+        ID_GITHUB = wx.NewId()
+        ID_UPDATE = wx.NewId()
+
+        # Served from the same response as the version check
+        changelog = update.get("Changelog")
+        if not changelog:
+            changelog = """## Unable to fetch changelog
+
+Please check the Github page for more information about this release."""
+
+        html_markdown = markdown2.markdown(changelog, extras=["tables"])
+        html_css = css_data.updater_css
+        frame = wx.Dialog(None, -1, title="", size=(650, 500))
+        frame.SetMinSize((650, 500))
+        frame.SetWindowStyle(wx.STAY_ON_TOP)
+        panel = wx.Panel(frame)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.AddSpacer(10)
+        self.title_text = wx.StaticText(panel, label="A new version of OpenCore Legacy Patcher is available!")
+        #nightly_label="(Nightly)"
+        nightly_label="(Nightly)"
+        self.description = wx.StaticText(panel, label=f"OpenCore Legacy Patcher {version} is now available - You have {self.constants.patcher_version}{f' {nightly_label}' if not self.constants.commit_info[0].startswith('refs/tags') else ''}. Would you like to update?")
+        self.title_text.SetFont(gui_support.font_factory(19, wx.FONTWEIGHT_BOLD))
+        self.description.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
+        self.web_view = wx.html2.WebView.New(panel, style=wx.BORDER_SUNKEN)
+        html_code = f'''
+<html>
+<head>
+    <style>
+        {html_css}
+    </style>
+</head>
+<body class="markdown-body">
+    {html_markdown.replace("<a href=", "<a target='_blank' href=")}
+</body>
+</html>
+'''
+        self.web_view.SetPage(html_code, "")
+        self.web_view.Bind(wx.html2.EVT_WEBVIEW_NEWWINDOW, self._onWebviewNav)
+        self.web_view.EnableContextMenu(False)
+        self.close_button = wx.Button(panel, label="Ignore")
+        self.close_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(wx.ID_CANCEL))
+        self.view_button = wx.Button(panel, ID_GITHUB, label="View on GitHub")
+        self.view_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(ID_GITHUB))
+        self.install_button = wx.Button(panel, label="Download and Install")
+        self.install_button.Bind(wx.EVT_BUTTON, lambda event: frame.EndModal(ID_UPDATE))
+        self.install_button.SetDefault()
+
+        buttonsizer = wx.BoxSizer(wx.HORIZONTAL)
+        buttonsizer.Add(self.close_button, 0, wx.ALIGN_CENTRE | wx.RIGHT, 5)
+        buttonsizer.Add(self.view_button, 0, wx.ALIGN_CENTRE | wx.LEFT|wx.RIGHT, 5)
+        buttonsizer.Add(self.install_button, 0, wx.ALIGN_CENTRE | wx.LEFT, 5)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.title_text, 0, wx.ALIGN_CENTRE | wx.TOP, 20)
+        sizer.Add(self.description, 0, wx.ALIGN_CENTRE | wx.BOTTOM, 20)
+        sizer.Add(self.web_view, 1, wx.EXPAND | wx.LEFT|wx.RIGHT, 10)
+        sizer.Add(buttonsizer, 0, wx.ALIGN_RIGHT | wx.ALL, 20)
+        panel.SetSizer(sizer)
+        frame.Centre()
+
+        result = frame.ShowModal()
+
+
+        if result == ID_GITHUB:
+            webbrowser.open(update["Github Link"])
+        elif result == ID_UPDATE:
+            self._launch_gui("UPDATE_APP")
+
+
+    def _launch_gui(self, entry: str, **kwargs) -> None:
+        """
+        Start the GUI at the provided entry point
+
+        Parameters:
+            entry (str): Name of the SupportedEntryPoints member
+            **kwargs:    Additional parameters for EntryPoint.start
+        """
+
+        from ...wx_gui import gui_entry
+
+        gui_entry.EntryPoint(self.constants).start(entry=getattr(gui_entry.SupportedEntryPoints, entry), **kwargs)
+
+
     def _onWebviewNav(self, event):
         url = event.GetURL()
         webbrowser.open(url)
@@ -241,7 +260,7 @@ Please check the Github page for more information about this release."""
         if output.returncode == 0:
             logging.info("- Launching GUI's Build/Install menu")
             self.constants.start_build_install = True
-            gui_entry.EntryPoint(self.constants).start(entry=gui_entry.SupportedEntryPoints.BUILD_OC)
+            self._launch_gui("BUILD_OC")
 
         return False
 
@@ -316,7 +335,7 @@ Please check the Github page for more information about this release."""
             if output.returncode == 0:
                 logging.info("- Launching GUI's Build/Install menu")
                 self.constants.start_build_install = True
-                gui_entry.EntryPoint(self.constants).start(entry=gui_entry.SupportedEntryPoints.BUILD_OC)
+                self._launch_gui("BUILD_OC")
 
         except KeyError:
             logging.info("- Unable to determine if boot disk is removable, skipping prompt")
\ No newline at end of file
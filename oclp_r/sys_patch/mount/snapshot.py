@@ -9,6 +9,8 @@ import subprocess
 from ...datasets import os_data
 from ...support  import subprocess_wrapper
 
+from ...detections.boot_state import BootState
+
 
 class APFSSnapshot:
 
@@ -21,11 +23,7 @@ class APFSSnapshot:
         """
         Check if currently running inside of Rosetta
         """
-        result = subprocess_wrapper.run(["/usr/sbin/sysctl", "-n", "sysctl.proc_translated"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        if result.returncode != 0:
-            return False
-
-        return True if result.stdout.decode().strip() == "1" else False
+        return BootState.current().sysctl.get("sysctl.proc_translated") == "1"
 
 
     def create_snapshot(self) -> bool:
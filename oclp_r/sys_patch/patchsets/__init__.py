@@ -3,4 +3,5 @@ patchsets module
 """
 
 from .base   import PatchType, DynamicPatchset
-from .detect import HardwarePatchsetDetection, HardwarePatchsetSettings, HardwarePatchsetValidation
\ No newline at end of file
+from .detect import HardwarePatchsetDetection, HardwarePatchsetSettings, HardwarePatchsetValidation
+from .plan   import PatchPlan, PatchOperation
\ No newline at end of file
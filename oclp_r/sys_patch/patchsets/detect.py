@@ -4,8 +4,6 @@ detect.py: Detects patches for a given system
 
 import logging
 import plistlib
-import subprocess
-import py_sip_xnu
 import packaging.version
 
 from enum      import StrEnum
@@ -62,6 +60,7 @@ from ...detections import (
     amfi_detect,
     device_probe
 )
+from ...detections.boot_state import BootState
 
 
 class HardwarePatchsetSettings(StrEnum):
@@ -97,9 +96,11 @@ class HardwarePatchsetDetection:
     def __init__(self, constants: constants.Constants,
                  xnu_major: int = None, xnu_minor:  int = None,
                  os_build:  str = None, os_version: str = None,
-                 validation: bool = False # Whether to run validation checks
+                 validation: bool = False, # Whether to run validation checks
+                 boot_state: BootState = None # Boot state to detect against, defaults to BootState.current()
                  ) -> None:
         self._constants = constants
+        self._boot_state = boot_state or BootState.current()
 
         self._xnu_major  = xnu_major  or self._constants.detected_os
         self._xnu_minor  = xnu_minor  or self._constants.detected_os_minor
@@ -145,7 +146,9 @@ class HardwarePatchsetDetection:
         self.can_patch         = False
         self.can_unpatch       = False
 
-        self._detect()
+        # Hardware patch sets read the active boot state
+        with self._boot_state:
+            self._detect()
 
 
     def _validation_check_unsupported_host_os(self) -> bool:
@@ -179,40 +182,39 @@ class HardwarePatchsetDetection:
             return False
 
         # OpenCore Legacy Patcher exposes whether it patched APFS.kext to allow for FileVault
-        nvram = utilities.get_nvram("OCLP-Settings", "4D1FDA02-38C7-4A6A-9CC6-4BCCA8B30102", decode=True)
-        if nvram:
-            if "-allow_fv" in nvram:
-                return False
+        if utilities.check_filevault_skip(self._boot_state) is True:
+            return False
 
-        return "FileVault is Off" not in subprocess.run(["/usr/bin/fdesetup", "status"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout.decode()
+        # FileVault may have been toggled since the snapshot was captured
+        return self._boot_state.refresh("filevault").filevault
 
 
     def _validation_check_system_integrity_protection_enabled(self, configs: list[str]) -> bool:
         """
         Determine if System Integrity Protection is enabled
         """
-        return utilities.csr_decode(configs)
+        return utilities.csr_decode(configs, self._boot_state)
 
 
     def _validation_check_secure_boot_model_enabled(self) -> bool:
         """
         Determine if SecureBootModel is enabled
         """
-        return utilities.check_secure_boot_level()
+        return utilities.check_secure_boot_level(self._boot_state)
 
 
     def _validation_check_amfi_enabled(self, level: amfi_detect.AmfiConfigDetectLevel) -> bool:
         """
         Determine if AMFI is enabled
         """
-        return not amfi_detect.AmfiConfigurationDetection().check_config(self._override_amfi_level(level))
+        return not amfi_detect.AmfiConfigurationDetection(self._boot_state).check_config(self._override_amfi_level(level))
 
 
     def _validation_check_whatevergreen_missing(self) -> bool:
         """
         Determine if WhateverGreen.kext is missing
         """
-        return utilities.check_kext_loaded("as.vit9696.WhateverGreen") is False
+        return self._boot_state.kext_version("as.vit9696.WhateverGreen") is False
 
 
     @cache
@@ -220,7 +222,7 @@ class HardwarePatchsetDetection:
         """
         Determine if Force OpenGL property is missing
         """
-        nv_on = utilities.get_nvram("boot-args", decode=True)
+        nv_on = self._boot_state.nvram_value("boot-args", decode=True)
         if nv_on:
             if "ngfxgl=" in nv_on:
                 return False
@@ -235,7 +237,7 @@ class HardwarePatchsetDetection:
         """
         Determine if Force compat property is missing
         """
-        nv_on = utilities.get_nvram("boot-args", decode=True)
+        nv_on = self._boot_state.nvram_value("boot-args", decode=True)
         if nv_on:
             if "ngfxcompat=" in nv_on:
                 return False
@@ -250,11 +252,11 @@ class HardwarePatchsetDetection:
         """
         Determine if nvda_drv(_vrl) variable is missing
         """
-        nv_on = utilities.get_nvram("boot-args", decode=True)
+        nv_on = self._boot_state.nvram_value("boot-args", decode=True)
         if nv_on:
             if "nvda_drv_vrl=" in nv_on:
                 return False
-        nv_on = utilities.get_nvram("nvda_drv")
+        nv_on = self._boot_state.nvram_value("nvda_drv")
         if nv_on:
             return False
         return True
@@ -265,7 +267,7 @@ class HardwarePatchsetDetection:
         """
         Override level required based on whether AMFIPass is loaded
         """
-        amfipass_version = utilities.check_kext_loaded("com.dhinakg.AMFIPass")
+        amfipass_version = self._boot_state.kext_version("com.dhinakg.AMFIPass")
         if amfipass_version:
             if packaging.version.parse(amfipass_version) >= packaging.version.parse(self._constants.amfipass_compatibility_version):
                 # If AMFIPass is loaded, our binaries will work
@@ -419,7 +421,7 @@ class HardwarePatchsetDetection:
         """
         Handle SIP breakdown
         """
-        current_sip_status  = hex(py_sip_xnu.SipXnu().get_sip_status().value)
+        current_sip_status  = hex(self._boot_state.sip_status)
         expected_sip_status = hex(self._convert_required_sip_config_to_int(required_sip_configs))
         sip_string = f"Validation: Booted SIP: {current_sip_status} vs expected: {expected_sip_status}"
         index = list(requirements.keys()).index(HardwarePatchsetValidation.SIP_ENABLED)
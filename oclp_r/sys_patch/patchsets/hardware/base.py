@@ -12,6 +12,7 @@ from ....constants import Constants
 from ....datasets.os_data       import os_data
 from ....datasets.sip_data      import system_integrity_protection
 from ....detections.amfi_detect import AmfiConfigDetectLevel
+from ....detections.boot_state  import BootState
 from ....detections             import device_probe
 
 
@@ -46,6 +47,8 @@ class BaseHardware(BasePatchset):
         self._constants = global_constants
         self._computer  = global_constants.computer
 
+        self._boot_state = BootState.current()
+
         self._xnu_float = float(f"{self._xnu_major}.{self._xnu_minor}")
 
 
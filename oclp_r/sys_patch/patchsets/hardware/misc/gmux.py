@@ -7,7 +7,6 @@ from ..base import BaseHardware, HardwareVariant
 from ...base import PatchType
 
 from .....constants import Constants
-from .....support   import utilities
 
 from .....datasets.os_data import os_data
 
@@ -44,7 +43,7 @@ class GraphicsMultiplexer(BaseHardware):
         """
         # If GFX0 is missing, assume machine was demuxed
         # -wegnoegpu would also trigger this, so ensure arg is not present
-        if not "-wegnoegpu" in (utilities.get_nvram("boot-args", decode=True) or ""):
+        if not "-wegnoegpu" in (self._boot_state.nvram_value("boot-args", decode=True) or ""):
             igpu = self._constants.computer.igpu
             dgpu = self._check_dgpu_status()
             if igpu and not dgpu:
@@ -7,7 +7,6 @@ from ..base import BaseHardware, HardwareVariant
 from ...base import PatchType
 
 from .....constants import Constants
-from .....support   import utilities
 
 from .....datasets.os_data import os_data
 
@@ -64,7 +63,7 @@ class LegacyAudio(BaseHardware):
                                       "iMac12,1",
                                       "iMac12,2",
                                       "MacPro3,1"
-        ] and utilities.check_kext_loaded("as.vit9696.AppleALC") is False)
+        ] and self._boot_state.kext_version("as.vit9696.AppleALC") is False)
 
 
     def native_os(self) -> bool:
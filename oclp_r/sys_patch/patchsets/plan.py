@@ -0,0 +1,296 @@
+"""
+plan.py: Compile patchsets into a flat list of operations
+
+Patchsets are nested dictionaries:
+    patch name -> PatchType -> directory -> file -> source
+
+PatchPlan flattens them once into PatchOperation records, so preflight,
+execution, validation and reporting iterate a single list instead of
+re-walking the dictionaries.
+
+Usage:
+    >>> from oclp_r.sys_patch.patchsets import PatchPlan
+    >>> plan = PatchPlan(HardwarePatchsetDetection(constants).patches)
+    >>> for operation in plan.installs():
+    >>>     print(operation.source_path(payload_root), operation.destination_folder(mount_location, mount_location_data))
+"""
+
+import logging
+
+from .base import PatchType, DynamicPatchset
+
+
+INSTALL_TYPES: list = [
+    PatchType.OVERWRITE_SYSTEM_VOLUME,
+    PatchType.OVERWRITE_DATA_VOLUME,
+    PatchType.MERGE_SYSTEM_VOLUME,
+    PatchType.MERGE_DATA_VOLUME,
+]
+REMOVE_TYPES: list = [
+    PatchType.REMOVE_SYSTEM_VOLUME,
+    PatchType.REMOVE_DATA_VOLUME,
+]
+SYSTEM_VOLUME_TYPES: list = [
+    PatchType.OVERWRITE_SYSTEM_VOLUME,
+    PatchType.MERGE_SYSTEM_VOLUME,
+    PatchType.REMOVE_SYSTEM_VOLUME,
+]
+
+# Per patch, operations run in this order
+PHASE_ORDER: list = [*REMOVE_TYPES, *INSTALL_TYPES, PatchType.EXECUTE]
+
+# Plain values for membership tests, as 'str in Enum' raises TypeError on Python 3.11
+# (an unknown value passed to PatchType() raises ValueError, thus is checked beforehand)
+PATCH_TYPE_VALUES:       set = {item.value for item in PatchType}
+DYNAMIC_PATCHSET_VALUES: set = {item.value for item in DynamicPatchset}
+
+AUXKC_SOURCE_DIRECTORY:      str = "/System/Library/Extensions"
+AUXKC_DESTINATION_DIRECTORY: str = "/Library/Extensions"
+
+
+class PatchOperation:
+    """
+    Single patch operation
+
+    For EXECUTE operations, 'file' holds the command and 'source' whether it runs as root
+    """
+
+    __slots__ = ("patch", "type", "directory", "file", "source", "auxkc")
+
+    def __init__(self, patch: str, type: PatchType, directory: str, file: str, source = None, auxkc: bool = False) -> None:
+        self.patch:     str       = patch
+        self.type:      PatchType = type
+        self.directory: str       = directory  # Directory as listed in the patchset
+        self.file:      str       = file
+        self.source                = source     # Source variant (ex. '10.13.6'), absolute path or DynamicPatchset
+        self.auxkc:     bool      = auxkc      # Redirected to the Auxiliary KC ('/Library/Extensions')
+
+
+    def __repr__(self) -> str:
+        return f"PatchOperation({self.patch!r}, {self.type!r}, {self.directory!r}, {self.file!r}, {self.source!r})"
+
+
+    @property
+    def is_install(self) -> bool:
+        return self.type in INSTALL_TYPES
+
+
+    @property
+    def is_remove(self) -> bool:
+        return self.type in REMOVE_TYPES
+
+
+    @property
+    def is_merge(self) -> bool:
+        return self.type in [PatchType.MERGE_SYSTEM_VOLUME, PatchType.MERGE_DATA_VOLUME]
+
+
+    @property
+    def is_dynamic(self) -> bool:
+        return isinstance(self.source, str) and self.source in DYNAMIC_PATCHSET_VALUES
+
+
+    @property
+    def volume(self) -> str:
+        """
+        Volume written to, 'System' or 'Data' (None for EXECUTE)
+        """
+        if self.type == PatchType.EXECUTE:
+            return None
+        if self.auxkc is True:
+            return "Data"
+        return "System" if self.type in SYSTEM_VOLUME_TYPES else "Data"
+
+
+    @property
+    def destination_directory(self) -> str:
+        """
+        Directory written to, accounting for AuxKC redirection
+        """
+        return AUXKC_DESTINATION_DIRECTORY if self.auxkc is True else self.directory
+
+
+    def source_folder(self, payload_root: str) -> str:
+        """
+        Folder containing the source file
+
+        Parameters:
+            payload_root (str): Root of PatcherSupportPkg's binaries, used for relative sources
+        """
+        if self.source.startswith("/"):
+            return self.source + self.directory
+        return f"{payload_root}/{self.source}{self.directory}"
+
+
+    def source_path(self, payload_root: str) -> str:
+        """
+        Full path of the source file
+        """
+        return f"{self.source_folder(payload_root)}/{self.file}"
+
+
+    def destination_folder(self, mount_location: str, mount_location_data: str) -> str:
+        """
+        Folder the file is installed to, or removed from
+
+        Parameters:
+            mount_location      (str): Root volume mount point
+            mount_location_data (str): Data volume mount point
+        """
+        if self.volume == "System":
+            return str(mount_location) + self.destination_directory
+        return str(mount_location_data) + self.destination_directory
+
+
+class PatchPlan:
+    """
+    Flat, de-duplicated list of operations compiled from a patchset dictionary
+    """
+
+    def __init__(self, patches: dict, auxkc_redirect: bool = False) -> None:
+        """
+        Parameters:
+            patches        (dict): Patchset dictionary (ie. HardwarePatchsetDetection.patches)
+            auxkc_redirect (bool): Redirect '/System/Library/Extensions' kexts to the Auxiliary KC
+        """
+        self.auxkc_redirect: bool = auxkc_redirect
+
+        self.operations: list = []  # PatchOperation, in execution order
+        self.duplicates: list = []  # PatchOperation skipped as an earlier patch installs the same file
+        self.conflicts:  list = []  # (PatchOperation, PatchOperation) writing the same destination
+
+        self.patch_names: list = []
+
+        self._compile(patches)
+
+
+    def __iter__(self):
+        return iter(self.operations)
+
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+
+    def __contains__(self, patch: str) -> bool:
+        return patch in self.patch_names
+
+
+    def _compile(self, patches: dict) -> None:
+        """
+        Flatten the patchset dictionary, de-duplicating identical installs
+        and recording patches that disagree on a destination (last one wins)
+        """
+        writes: dict = {}  # (volume, destination directory, file) -> PatchOperation
+
+        for patch in patches:
+            if not isinstance(patches[patch], dict):
+                # Metadata (ie. patchset plist written to the root volume)
+                continue
+
+            for install_type in patches[patch]:
+                if install_type not in PATCH_TYPE_VALUES:
+                    raise Exception(f"Unknown PatchType: {install_type}")
+
+            self.patch_names.append(patch)
+
+            for install_type in PHASE_ORDER:
+                if install_type not in patches[patch]:
+                    continue
+                install_type = PatchType(install_type)
+
+                if install_type == PatchType.EXECUTE:
+                    for process in patches[patch][install_type]:
+                        self.operations.append(PatchOperation(patch, install_type, None, process, patches[patch][install_type][process]))
+                    continue
+
+                for directory in patches[patch][install_type]:
+                    files = patches[patch][install_type][directory]
+                    for file in files:
+                        operation = PatchOperation(
+                            patch, install_type, directory, file,
+                            source=files[file] if isinstance(files, dict) else None,
+                            auxkc=self._redirects_to_auxkc(install_type, directory, file),
+                        )
+
+                        key = (operation.volume, operation.destination_directory, file)
+                        if key in writes:
+                            existing = writes[key]
+                            if existing.type == operation.type and existing.source == operation.source:
+                                self.duplicates.append(operation)
+                                continue
+                            # Merges layered over each other, and a patch removing then reinstalling, are intended
+                            if not (existing.is_merge and operation.is_merge) and existing.patch != operation.patch:
+                                self.conflicts.append((existing, operation))
+                        writes[key] = operation
+
+                        self.operations.append(operation)
+
+        for first, second in self.conflicts:
+            logging.info(f"- Conflicting patch operations for {second.destination_directory}/{second.file}: {first.patch} ({first.type}, {first.source}) and {second.patch} ({second.type}, {second.source})")
+
+
+    def _redirects_to_auxkc(self, install_type: PatchType, directory: str, file: str) -> bool:
+        """
+        Mirrors KernelCacheSupport.add_auxkc_support()'s destination logic
+        """
+        return self.auxkc_redirect is True \
+            and install_type in INSTALL_TYPES \
+            and directory == AUXKC_SOURCE_DIRECTORY \
+            and file.endswith(".kext")
+
+
+    def installs(self) -> list:
+        return [operation for operation in self.operations if operation.is_install]
+
+
+    def removals(self) -> list:
+        return [operation for operation in self.operations if operation.is_remove]
+
+
+    def executions(self) -> list:
+        return [operation for operation in self.operations if operation.type == PatchType.EXECUTE]
+
+
+    def resolve_dynamic(self, resolver: callable) -> None:
+        """
+        Replace DynamicPatchset sources with concrete paths
+
+        Parameters:
+            resolver (callable): Function returning a path for a DynamicPatchset, called once per variant
+        """
+        resolved = {}
+        for operation in [*self.installs(), *self.duplicates]:
+            if not operation.is_dynamic:
+                continue
+            if operation.source not in resolved:
+                resolved[operation.source] = resolver(DynamicPatchset(operation.source))
+            operation.source = resolved[operation.source]
+
+
+    def source_paths(self, payload_root: str) -> list:
+        """
+        Unique source paths required by installs, in plan order
+        """
+        return list(dict.fromkeys(operation.source_path(payload_root) for operation in self.installs()))
+
+
+    def to_patchset(self) -> dict:
+        """
+        Rebuild the patchset dictionary, reflecting resolved sources and AuxKC redirects
+
+        De-duplicated operations are kept, so each patch lists all of its files
+
+        Returns:
+            dict: patch name -> PatchType -> directory -> file -> source
+        """
+        patchset = {patch: {} for patch in self.patch_names}
+        for operation in [*self.operations, *self.duplicates]:
+            types = patchset[operation.patch]
+            if operation.type == PatchType.EXECUTE:
+                types.setdefault(operation.type, {})[operation.file] = operation.source
+            elif operation.is_remove:
+                types.setdefault(operation.type, {}).setdefault(operation.destination_directory, []).append(operation.file)
+            else:
+                types.setdefault(operation.type, {}).setdefault(operation.destination_directory, {})[operation.file] = operation.source
+        return patchset
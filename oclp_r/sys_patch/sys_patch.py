@@ -49,6 +49,8 @@ from .mount import (
 from .utilities import (
     install_new_file,
     remove_file,
+    find_missing_files,
+    PayloadIndex,
     PatcherSupportPkgMount,
     KernelDebugKitMerge
 )
@@ -68,7 +70,7 @@ from ..support import (
 from .patchsets import (
     HardwarePatchsetDetection,
     HardwarePatchsetSettings,
-    PatchType,
+    PatchPlan,
     DynamicPatchset
 )
 from . import (
@@ -370,76 +372,60 @@ class PatchSysVolume:
         )
 
         source_files_path = str(self.constants.payload_local_binaries_root_path)
-        required_patches = self._preflight_checks(required_patches, source_files_path)
-        for patch in required_patches:
-            logging.info("- Installing Patchset: " + patch)
-            for method_remove in [PatchType.REMOVE_SYSTEM_VOLUME, PatchType.REMOVE_DATA_VOLUME]:
-                if method_remove in required_patches[patch]:
-                    for remove_patch_directory in required_patches[patch][method_remove]:
-                        logging.info("- Remove Files at: " + remove_patch_directory)
-                        for remove_patch_file in required_patches[patch][method_remove][remove_patch_directory]:
-                            if method_remove == PatchType.REMOVE_SYSTEM_VOLUME:
-                                destination_folder_path = str(self.mount_location) + remove_patch_directory
-                            else:
-                                destination_folder_path = str(self.mount_location_data) + remove_patch_directory
-                            remove_file(destination_folder_path, remove_patch_file)
-
-
-            for method_install in [PatchType.OVERWRITE_SYSTEM_VOLUME, PatchType.OVERWRITE_DATA_VOLUME, PatchType.MERGE_SYSTEM_VOLUME, PatchType.MERGE_DATA_VOLUME]:
-                if method_install not in required_patches[patch]:
-                    continue
-
-                for install_patch_directory in list(required_patches[patch][method_install]):
-                    logging.info(f"- Handling Installs in: {install_patch_directory}")
-                    for install_file in list(required_patches[patch][method_install][install_patch_directory]):
-                        source_folder_path = required_patches[patch][method_install][install_patch_directory][install_file] + install_patch_directory
-                        # Check whether to source from root
-                        if not required_patches[patch][method_install][install_patch_directory][install_file].startswith("/"):
-                            source_folder_path = source_files_path + "/" + source_folder_path
-
-                        if method_install in [PatchType.OVERWRITE_SYSTEM_VOLUME, PatchType.MERGE_SYSTEM_VOLUME]:
-                            destination_folder_path = str(self.mount_location) + install_patch_directory
-                        else:
-                            if install_patch_directory == "/Library/Extensions":
-                                self.needs_kmutil_exemptions = True
-                                if kc_support_obj.check_kexts_needs_authentication(install_file) is True:
-                                    self.constants.needs_to_open_preferences = True
-
-                            destination_folder_path = str(self.mount_location_data) + install_patch_directory
-
-                        updated_destination_folder_path = kc_support_obj.add_auxkc_support(install_file, source_folder_path, install_patch_directory, destination_folder_path)
-                        if updated_destination_folder_path != destination_folder_path:
-                            if kc_support_obj.check_kexts_needs_authentication(install_file) is True:
-                                self.constants.needs_to_open_preferences = True
-
-                        if destination_folder_path != updated_destination_folder_path:
-                            # Update required_patches to reflect the new destination folder path
-                            if updated_destination_folder_path not in required_patches[patch][method_install]:
-                                required_patches[patch][method_install].update({updated_destination_folder_path: {}})
-                            required_patches[patch][method_install][updated_destination_folder_path].update({install_file: required_patches[patch][method_install][install_patch_directory][install_file]})
-                            required_patches[patch][method_install][install_patch_directory].pop(install_file)
-
-                            destination_folder_path = updated_destination_folder_path
-
-                        install_new_file(source_folder_path, destination_folder_path, install_file, method_install)
-
-            if PatchType.EXECUTE in required_patches[patch]:
-                for process in required_patches[patch][PatchType.EXECUTE]:
-                    # Some processes need sudo, however we cannot directly call sudo in some scenarios
-                    # Instead, call elevated funtion if string's boolean is True
-                    if required_patches[patch][PatchType.EXECUTE][process] is True:
-                        logging.info(f"- Running Process as Root:\n{process}")
-                        subprocess_wrapper.run_as_root_and_verify(process.split(" "), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-                    else:
-                        logging.info(f"- Running Process:\n{process}")
-                        subprocess_wrapper.run_and_verify(process, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
-
-        if any(x in required_patches for x in ["AMD Legacy GCN", "AMD Legacy Polaris", "AMD Legacy Vega"]):
+        plan = PatchPlan(required_patches, auxkc_redirect=self.skip_root_kmutil_requirement and self.constants.detected_os >= os_data.os_data.ventura)
+        plan = self._preflight_checks(plan, source_files_path)
+
+        current_patch = None
+        current_directory = None
+        for operation in plan:
+            if operation.patch != current_patch:
+                current_patch, current_directory = operation.patch, None
+                logging.info("- Installing Patchset: " + operation.patch)
+
+            if operation.is_remove:
+                if operation.directory != current_directory:
+                    current_directory = operation.directory
+                    logging.info("- Remove Files at: " + operation.directory)
+                remove_file(operation.destination_folder(self.mount_location, self.mount_location_data), operation.file)
+                continue
+
+            if operation.is_install:
+                if operation.directory != current_directory:
+                    current_directory = operation.directory
+                    logging.info(f"- Handling Installs in: {operation.directory}")
+
+                source_folder_path      = operation.source_folder(source_files_path)
+                destination_folder_path = operation.destination_folder(self.mount_location, self.mount_location_data)
+
+                if operation.volume == "Data" and operation.directory == "/Library/Extensions":
+                    self.needs_kmutil_exemptions = True
+                    if kc_support_obj.check_kexts_needs_authentication(operation.file) is True:
+                        self.constants.needs_to_open_preferences = True
+
+                if operation.auxkc is True:
+                    # Destination is resolved by the plan, update the kext's OSBundleRequired
+                    kc_support_obj.add_auxkc_support(operation.file, source_folder_path, operation.directory, destination_folder_path)
+                    if kc_support_obj.check_kexts_needs_authentication(operation.file) is True:
+                        self.constants.needs_to_open_preferences = True
+
+                install_new_file(source_folder_path, destination_folder_path, operation.file, operation.type)
+                continue
+
+            # Some processes need sudo, however we cannot directly call sudo in some scenarios
+            # Instead, call elevated funtion if string's boolean is True
+            if operation.source is True:
+                logging.info(f"- Running Process as Root:\n{operation.file}")
+                subprocess_wrapper.run_as_root_and_verify(operation.file.split(" "), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            else:
+                logging.info(f"- Running Process:\n{operation.file}")
+                subprocess_wrapper.run_and_verify(operation.file, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
+
+        if any(x in plan for x in ["AMD Legacy GCN", "AMD Legacy Polaris", "AMD Legacy Vega"]):
             sys_patch_helpers.SysPatchHelpers(self.constants).disable_window_server_caching()
-        if "Metal 3802 Common Extended" in required_patches:
+        if "Metal 3802 Common Extended" in plan:
             sys_patch_helpers.SysPatchHelpers(self.constants).patch_gpu_compiler_libraries(mount_point=self.mount_location)
 
-        self._write_patchset(required_patches)
+        self._write_patchset(plan.to_patchset())
 
 
     def _resolve_metallib_support_pkg(self) -> str:
@@ -483,40 +469,31 @@ class PatchSysVolume:
         raise Exception(f"Unknown Dynamic Patchset: {variant}")
 
 
-    def _preflight_checks(self, required_patches: dict, source_files_path: Path) -> dict:
+    def _preflight_checks(self, plan: PatchPlan, source_files_path: str) -> PatchPlan:
         """
         Runs preflight checks before patching
 
         Parameters:
-            required_patches (dict): Patchset dictionary (from HardwarePatchsetDetection)
-            source_files_path (Path): Path to the source files (PatcherSupportPkg)
+            plan (PatchPlan): Compiled patchset (from HardwarePatchsetDetection)
+            source_files_path (str): Path to the source files (PatcherSupportPkg)
 
         Returns:
-            dict: Updated patchset dictionary
+            PatchPlan: Plan with dynamic patchsets resolved
         """
 
         logging.info("- Running Preflight Checks before patching")
 
-        for patch in required_patches:
-            # Check if all files are present
-            for method_type in [PatchType.OVERWRITE_SYSTEM_VOLUME, PatchType.OVERWRITE_DATA_VOLUME, PatchType.MERGE_SYSTEM_VOLUME, PatchType.MERGE_DATA_VOLUME]:
-                if method_type not in required_patches[patch]:
-                    continue
-                for install_patch_directory in required_patches[patch][method_type]:
-                    for install_file in required_patches[patch][method_type][install_patch_directory]:
-                        try:
-                            if required_patches[patch][method_type][install_patch_directory][install_file] in DynamicPatchset:
-                                required_patches[patch][method_type][install_patch_directory][install_file] = self._resolve_dynamic_patchset(required_patches[patch][method_type][install_patch_directory][install_file])
-                        except TypeError:
-                            pass
-
-                        source_file = required_patches[patch][method_type][install_patch_directory][install_file] + install_patch_directory + "/" + install_file
-
-                        # Check whether to source from root
-                        if not required_patches[patch][method_type][install_patch_directory][install_file].startswith("/"):
-                            source_file = source_files_path + "/" + source_file
-                        if not Path(source_file).exists():
-                            raise Exception(f"Failed to find {source_file}")
+        # Check if all files are present
+        plan.resolve_dynamic(self._resolve_dynamic_patchset)
+        payload_index = PayloadIndex.load(self.constants.payload_local_binaries_index_path, source_files_path)
+        if payload_index is not None and payload_index.identity == PayloadIndex.identity_for(self.constants.patcher_support_pkg_version, self.constants.payload_local_binaries_root_path_dmg):
+            missing_files = payload_index.missing(plan.source_paths(source_files_path))
+        else:
+            missing_files = find_missing_files(plan.source_paths(source_files_path))
+        if missing_files:
+            for source_file in missing_files:
+                logging.info(f"  - Missing: {source_file}")
+            raise Exception(f"Failed to find {len(missing_files)} file(s), first: {missing_files[0]}")
 
         # Make sure old SkyLight plugins aren't being used
         self._clean_skylight_plugins()
@@ -532,15 +509,15 @@ class PatchSysVolume:
         ).clean_auxiliary_kc()
 
         # Make sure SNB kexts are compatible with the host
-        if "Intel Sandy Bridge" in required_patches:
+        if "Intel Sandy Bridge" in plan:
             sys_patch_helpers.SysPatchHelpers(self.constants).snb_board_id_patch(source_files_path)
 
         # Ensure KDK is properly installed
-        self._merge_kdk_with_root(save_hid_cs=True if "Legacy USB 1.1" in required_patches else False)
+        self._merge_kdk_with_root(save_hid_cs=True if "Legacy USB 1.1" in plan else False)
 
         logging.info("- Finished Preflight, starting patching")
 
-        return required_patches
+        return plan
 
 
     # Entry Function
@@ -16,6 +16,8 @@ from .. import constants
 from ..datasets import os_data
 from ..volume   import generate_copy_arguments
 
+from .utilities.binary_patch import BinaryPatcher, BinaryPatchRule
+
 from ..support import (
     generate_smbios,
     subprocess_wrapper
@@ -55,13 +57,10 @@ class SysPatchHelpers:
         board_to_patch = generate_smbios.determine_best_board_id_for_sandy(self.constants.computer.reported_board_id, self.constants.computer.gpus)
         logging.info(f"Replacing {board_to_patch} with {self.constants.computer.reported_board_id}")
 
-        board_to_patch_hex = bytes.fromhex(board_to_patch.encode('utf-8').hex())
-        reported_board_hex = bytes.fromhex(self.constants.computer.reported_board_id.encode('utf-8').hex())
+        board_to_patch_hex = board_to_patch.encode('utf-8')
+        reported_board_hex = self.constants.computer.reported_board_id.encode('utf-8')
 
-        if len(board_to_patch_hex) > len(reported_board_hex):
-            # Pad the reported Board ID with zeros to match the length of the board to patch
-            reported_board_hex = reported_board_hex + bytes(len(board_to_patch_hex) - len(reported_board_hex))
-        elif len(board_to_patch_hex) < len(reported_board_hex):
+        if len(board_to_patch_hex) < len(reported_board_hex):
             logging.info(f"Error: Board ID {self.constants.computer.reported_board_id} is longer than {board_to_patch}")
             raise Exception("Host's Board ID is longer than the kext's Board ID, cannot patch!!!")
 
@@ -70,11 +69,8 @@ class SysPatchHelpers:
             logging.info(f"Error: Could not find {path}")
             raise Exception("Failed to find AppleIntelSNBGraphicsFB.kext, cannot patch!!!")
 
-        with open(path, 'rb') as f:
-            data = f.read()
-            data = data.replace(board_to_patch_hex, reported_board_hex)
-            with open(path, 'wb') as f:
-                f.write(data)
+        # Pad the reported Board ID with zeros to match the length of the board to patch
+        BinaryPatcher([BinaryPatchRule("Board ID", board_to_patch_hex, reported_board_hex, pad=True)]).apply(path)
 
 
     def generate_patchset_plist(self, patchset: dict, file_name: str, kdk_used: Path, metallib_used: Path):
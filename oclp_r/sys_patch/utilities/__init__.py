@@ -1,6 +1,8 @@
 """
 utilities: General utility functions for root volume patching
 """
-from .files import install_new_file, remove_file, fix_permissions
+from .files import install_new_file, remove_file, fix_permissions, find_missing_files
 from .dmg_mount import PatcherSupportPkgMount
-from .kdk_merge import KernelDebugKitMerge
\ No newline at end of file
+from .kdk_merge import KernelDebugKitMerge
+from .payload_index import PayloadIndex
+from .binary_patch import BinaryPatcher, BinaryPatchRule
@@ -0,0 +1,157 @@
+"""
+binary_patch.py: In-place find/replace patching of binaries
+
+Rules are matched together in a single pass over a memory-mapped file,
+and only the matched ranges are rewritten. Replacements must not change
+the file's length, so offsets within Mach-O binaries stay valid.
+
+Usage:
+    >>> from oclp_r.sys_patch.utilities import BinaryPatcher, BinaryPatchRule
+    >>> patcher = BinaryPatcher([BinaryPatchRule("Board ID", b"Mac-942B59F58194171B", b"Mac-7BA5B2DFE22DDD8C")])
+    >>> hits = patcher.apply("/path/to/AppleIntelSNBGraphicsFB")
+    >>> hits["Board ID"]
+    [123456, 234567]
+"""
+
+import re
+import mmap
+import logging
+
+from dataclasses import dataclass
+
+
+@dataclass
+class BinaryPatchRule:
+    """
+    Single find/replace rule
+
+    Replacements shorter than the pattern are padded with zeros when 'pad' is set,
+    longer replacements are rejected. Occurrence constraints are checked before
+    anything is written.
+    """
+
+    name:      str
+    find:      bytes
+    replace:   bytes
+    pad:       bool = False  # Zero pad 'replace' to the length of 'find'
+    min_count: int  = 0      # Minimum occurrences, fewer aborts the patch
+    max_count: int  = None   # Maximum occurrences, more aborts the patch (None for no limit)
+
+
+    def __post_init__(self) -> None:
+        if not self.find:
+            raise ValueError(f"{self.name}: Pattern must not be empty")
+        if len(self.replace) > len(self.find):
+            raise ValueError(f"{self.name}: Replacement is longer than pattern ({len(self.replace)} > {len(self.find)})")
+        if len(self.replace) < len(self.find):
+            if self.pad is False:
+                raise ValueError(f"{self.name}: Replacement is shorter than pattern, set pad to zero fill")
+            self.replace = self.replace + bytes(len(self.find) - len(self.replace))
+
+
+class BinaryPatcher:
+    """
+    Applies a set of BinaryPatchRules to files
+
+    The same patcher can be applied to several files, hits are reported per file
+    """
+
+    def __init__(self, rules: list) -> None:
+        """
+        Parameters:
+            rules (list): BinaryPatchRules, patterns must be unique
+        """
+        self.rules: list = rules
+
+        self._rules_by_pattern: dict = {}
+        for rule in rules:
+            if rule.find in self._rules_by_pattern:
+                raise ValueError(f"{rule.name}: Pattern already used by {self._rules_by_pattern[rule.find].name}")
+            self._rules_by_pattern[rule.find] = rule
+
+        # Longest first, so a pattern is not shadowed by one of its own prefixes
+        patterns = sorted(self._rules_by_pattern, key=len, reverse=True)
+        self._expression = re.compile(b"|".join(re.escape(pattern) for pattern in patterns))
+
+
+    def scan(self, path: str) -> dict:
+        """
+        Find all rule occurrences without modifying the file
+
+        Parameters:
+            path (str): File to scan
+
+        Returns:
+            dict: Rule name -> list of offsets
+        """
+        with open(path, "rb") as file:
+            return self._scan(file, mmap.ACCESS_READ)[0]
+
+
+    def apply(self, path: str) -> dict:
+        """
+        Patch the file in place
+
+        Parameters:
+            path (str): File to patch
+
+        Returns:
+            dict: Rule name -> list of patched offsets
+        """
+        with open(path, "r+b") as file:
+            hits, mapped = self._scan(file, mmap.ACCESS_WRITE)
+            if mapped is None:
+                self._check_constraints(path, hits)
+                return hits
+
+            with mapped:
+                self._check_constraints(path, hits)
+
+                for rule in self.rules:
+                    if rule.replace == rule.find:
+                        continue
+                    for offset in hits[rule.name]:
+                        mapped[offset:offset + len(rule.find)] = rule.replace
+                mapped.flush()
+
+        for rule in self.rules:
+            logging.info(f"  - {rule.name}: {len(hits[rule.name])} occurrence(s) patched")
+
+        return hits
+
+
+    def _scan(self, file, access: int) -> tuple:
+        """
+        Single pass over the mapped file, matching all patterns at once
+
+        Returns:
+            tuple: (hits, mmap), mmap is closed and None for read-only scans or empty files
+        """
+        hits = {rule.name: [] for rule in self.rules}
+
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=access)
+        except ValueError:
+            # Empty file, cannot be mapped
+            return hits, None
+
+        for match in self._expression.finditer(mapped):
+            hits[self._rules_by_pattern[match.group()].name].append(match.start())
+
+        if access == mmap.ACCESS_READ:
+            mapped.close()
+            return hits, None
+
+        return hits, mapped
+
+
+    def _check_constraints(self, path: str, hits: dict) -> None:
+        """
+        Raise if any rule's occurrences are outside of its constraints
+        """
+        for rule in self.rules:
+            count = len(hits[rule.name])
+            if count < rule.min_count:
+                raise Exception(f"{path}: {rule.name} found {count} time(s), expected at least {rule.min_count}")
+            if rule.max_count is not None and count > rule.max_count:
+                raise Exception(f"{path}: {rule.name} found {count} time(s), expected at most {rule.max_count}")
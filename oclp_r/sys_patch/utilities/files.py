@@ -2,10 +2,12 @@
 utilities.py: Supporting functions for file handling during root volume patching
 """
 
+import os
 import logging
 import subprocess
 
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from ..patchsets.base import PatchType
 
@@ -88,3 +90,62 @@ def fix_permissions(destination_file: Path) -> None:
         chown_args.pop(1)
     subprocess_wrapper.run_as_root_and_verify(chmod_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     subprocess_wrapper.run_as_root_and_verify(chown_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+def find_missing_files(paths: list, max_workers: int = 8, listings: dict = None) -> list:
+    """
+    Returns the paths that do not exist
+
+    Paths are grouped by parent directory, each directory is listed once
+    with os.scandir() and directories are listed concurrently. Stat calls
+    on the mounted Universal-Binaries image are slow, a listing answers
+    every lookup in that directory.
+
+    Names absent from a listing are confirmed with os.path.exists(), so
+    case-insensitive volumes behave as Path.exists() would.
+
+    Parameters:
+        paths       (list): Paths to check
+        max_workers  (int): Maximum directories listed at once
+        listings    (dict): Directory listings to reuse across calls, only valid while the tree is unchanged
+
+    Returns:
+        list: Missing paths, in the order provided
+    """
+
+    if listings is None:
+        listings = {}
+
+    split_paths = [os.path.split(str(path)) for path in paths]
+
+    pending = list(dict.fromkeys(directory for directory, _ in split_paths if directory not in listings))
+    if len(pending) == 1 or max_workers <= 1:
+        for directory in pending:
+            listings[directory] = _list_directory(directory)
+    elif pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            for directory, entries in zip(pending, executor.map(_list_directory, pending)):
+                listings[directory] = entries
+
+    missing = []
+    for path, (directory, name) in zip(paths, split_paths):
+        entries = listings[directory]
+        if entries is not None and name in entries:
+            continue
+        if os.path.exists(path):
+            continue
+        missing.append(path)
+
+    return missing
+
+
+def _list_directory(directory: str) -> set:
+    """
+    Names within a directory, None if the directory could not be listed
+    """
+
+    try:
+        with os.scandir(directory) as iterator:
+            return {entry.name for entry in iterator}
+    except OSError:
+        return None
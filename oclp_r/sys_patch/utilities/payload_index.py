@@ -0,0 +1,281 @@
+"""
+payload_index.py: Sorted path table of PatcherSupportPkg's Universal-Binaries
+
+The index lists every file within the mounted payload with its size and
+SHA-256 digest, sorted by relative path so directory queries are prefix
+lookups (bisect) instead of scans. It is built once per PatcherSupportPkg
+version and stored next to Universal-Binaries.dmg.
+
+Usage:
+    >>> from oclp_r.sys_patch.utilities import PayloadIndex
+    >>> index = PayloadIndex.load_or_build(constants.payload_local_binaries_root_path, constants.payload_local_binaries_index_path, constants.patcher_support_pkg_version, constants.payload_local_binaries_root_path_dmg)
+    >>> index.missing(["/path/to/Universal-Binaries/13.5/System/Library/Extensions/AppleIntelHDGraphics.kext"])
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+INDEX_FORMAT_VERSION: int = 1
+
+IGNORED_FILES: list = [".DS_Store"]
+IGNORED_PATHS: list = [".fseventsd/fseventsd-uuid", ".signed"]
+
+DIGEST_CHUNK_SIZE: int = 1024 * 1024
+
+
+class PayloadIndex:
+    """
+    Sorted table of files within a payload root
+
+    Paths are stored relative to the root, with '/' separators
+    """
+
+    def __init__(self, root: str, paths: list, sizes: list, digests: list, identity: dict = None) -> None:
+        """
+        Parameters:
+            root     (str):  Payload root the paths are relative to
+            paths    (list): Relative file paths, sorted
+            sizes    (list): File sizes, matching paths
+            digests  (list): SHA-256 hex digests, matching paths
+            identity (dict): Source the index was built from (PatcherSupportPkg version, DMG size and mtime)
+        """
+        self.root:     str  = str(root)
+        self.paths:    list = paths
+        self.sizes:    list = sizes
+        self.digests:  list = digests
+        self.identity: dict = identity or {}
+
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+    @classmethod
+    def build(cls, root: str, identity: dict = None, max_workers: int = 8) -> "PayloadIndex":
+        """
+        Walk the payload root, recording each file's size and digest
+
+        Parameters:
+            root        (str):  Payload root (ie. mounted Universal-Binaries)
+            identity    (dict): Source the index is built from
+            max_workers (int):  Maximum files hashed at once
+
+        Returns:
+            PayloadIndex: Index of the payload
+        """
+        root = str(root)
+
+        entries = []
+        for directory, _, files in os.walk(root):
+            relative_directory = os.path.relpath(directory, root)
+            for file in files:
+                if file in IGNORED_FILES:
+                    continue
+                relative_path = file if relative_directory == "." else f"{relative_directory}/{file}"
+                if relative_path in IGNORED_PATHS:
+                    continue
+                entries.append(relative_path)
+
+        entries.sort()
+
+        def _stat_and_hash(relative_path: str) -> tuple:
+            path = os.path.join(root, relative_path)
+            digest = hashlib.sha256()
+            try:
+                with open(path, "rb") as file:
+                    while chunk := file.read(DIGEST_CHUNK_SIZE):
+                        digest.update(chunk)
+                return os.path.getsize(path), digest.hexdigest()
+            except OSError:
+                # ex. Dangling symlinks
+                return 0, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_stat_and_hash, entries))
+
+        return cls(root, entries, [size for size, _ in results], [digest for _, digest in results], identity)
+
+
+    @classmethod
+    def load(cls, index_path: str, root: str) -> "PayloadIndex":
+        """
+        Load a stored index, None if missing or unreadable
+
+        Parameters:
+            index_path (str): Stored index
+            root       (str): Payload root the index is used against
+        """
+        try:
+            with open(index_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get("Format") != INDEX_FORMAT_VERSION:
+            return None
+
+        return cls(root, data["Paths"], data["Sizes"], data["Digests"], data["Identity"])
+
+
+    def save(self, index_path: str) -> None:
+        """
+        Store the index, failures are logged and ignored
+        """
+        try:
+            with open(index_path, "w") as file:
+                json.dump({
+                    "Format":   INDEX_FORMAT_VERSION,
+                    "Identity": self.identity,
+                    "Paths":    self.paths,
+                    "Sizes":    self.sizes,
+                    "Digests":  self.digests,
+                }, file)
+        except OSError as e:
+            logging.info(f"- Failed to store payload index: {e}")
+
+
+    @staticmethod
+    def identity_for(version: str, dmg_path: str) -> dict:
+        """
+        Identity of a PatcherSupportPkg DMG, an index is only reused while it matches
+        """
+        try:
+            stat = os.stat(dmg_path)
+        except OSError:
+            return {"Version": version}
+        return {"Version": version, "Size": stat.st_size, "Modified": int(stat.st_mtime)}
+
+
+    @classmethod
+    def load_or_build(cls, root: str, index_path: str, version: str, dmg_path: str) -> "PayloadIndex":
+        """
+        Load the stored index if it matches the DMG, otherwise build and store a new one
+
+        Parameters:
+            root       (str): Mounted payload root
+            index_path (str): Stored index, next to the DMG
+            version    (str): PatcherSupportPkg version
+            dmg_path   (str): Universal-Binaries.dmg
+        """
+        identity = cls.identity_for(version, dmg_path)
+
+        index = cls.load(index_path, root)
+        if index is not None and index.identity == identity:
+            return index
+
+        logging.info(f"- Building payload index for PatcherSupportPkg {version}")
+        index = cls.build(root, identity)
+        index.save(index_path)
+        return index
+
+
+    def relative(self, path: str) -> str:
+        """
+        Path relative to the payload root, None if outside of it
+        """
+        path = str(path)
+        if path == self.root:
+            return ""
+        if not path.startswith(self.root + "/"):
+            return None
+        return path[len(self.root) + 1:].rstrip("/")
+
+
+    def _range(self, relative_path: str) -> tuple:
+        """
+        Index range of the file, or files under the directory, at relative_path
+        """
+        if relative_path == "":
+            return 0, len(self.paths)
+
+        start = bisect.bisect_left(self.paths, relative_path)
+        if start < len(self.paths) and self.paths[start] == relative_path:
+            return start, start + 1
+
+        # Directory: every path starting with 'relative_path/'
+        prefix = relative_path + "/"
+        start = bisect.bisect_left(self.paths, prefix)
+        end   = bisect.bisect_left(self.paths, relative_path + "0")  # '0' sorts right after '/'
+        return start, end
+
+
+    def files_under(self, path: str) -> list:
+        """
+        Relative paths of the file, or all files within the directory, at path
+        """
+        relative_path = self.relative(path)
+        if relative_path is None:
+            return []
+        start, end = self._range(relative_path)
+        return self.paths[start:end]
+
+
+    def contains(self, path: str) -> bool:
+        """
+        Whether path is a file, or a non-empty directory, within the payload
+        """
+        relative_path = self.relative(path)
+        if relative_path is None:
+            return False
+        start, end = self._range(relative_path)
+        return end > start
+
+
+    def missing(self, paths: list) -> list:
+        """
+        Paths absent from the payload, in the order provided
+
+        Paths outside of the root, and paths the index does not know,
+        are checked on disk so the result matches Path.exists()
+        """
+        return [path for path in paths if not self.contains(path) and not os.path.exists(path)]
+
+
+    def digest(self, path: str) -> str:
+        """
+        SHA-256 hex digest of a file within the payload, None if not indexed
+        """
+        relative_path = self.relative(path)
+        if relative_path is None:
+            return None
+        position = bisect.bisect_left(self.paths, relative_path)
+        if position < len(self.paths) and self.paths[position] == relative_path:
+            return self.digests[position]
+        return None
+
+
+    def size(self, path: str) -> int:
+        """
+        Size in bytes of a file, or total of a directory, within the payload
+        """
+        relative_path = self.relative(path)
+        if relative_path is None:
+            return 0
+        start, end = self._range(relative_path)
+        return sum(self.sizes[start:end])
+
+
+    def unused(self, used_paths: list) -> list:
+        """
+        Relative paths of files not covered by any of used_paths
+
+        A used path covers itself, and every file within it when a directory (ie. .kext bundles)
+
+        Parameters:
+            used_paths (list): Absolute paths within the payload
+        """
+        used = [False] * len(self.paths)
+        for path in used_paths:
+            relative_path = self.relative(path)
+            if relative_path is None:
+                continue
+            start, end = self._range(relative_path)
+            used[start:end] = [True] * (end - start)
+
+        return [path for path, is_used in zip(self.paths, used) if not is_used]
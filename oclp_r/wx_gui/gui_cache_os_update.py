@@ -12,7 +12,7 @@ import threading
 from pathlib import Path
 
 from .. import constants
-from ..support import kdk_handler, utilities, metallib_handler
+from ..support import kdk_handler, utilities, metallib_handler, download_manager
 from ..wx_gui import gui_support, gui_download
 
 from ..sys_patch.patchsets import HardwarePatchsetDetection, HardwarePatchsetSettings
@@ -73,14 +73,16 @@ class OSUpdateFrame(wx.Frame):
             self.metallib_obj = metallib_handler.MetalLibraryObject(self.constants, self.os_data[1], self.os_data[0])
 
 
+        # Resolve both assets at once, neither depends on the other
+        resolve_threads = []
         if results[HardwarePatchsetSettings.KERNEL_DEBUG_KIT_REQUIRED] is True:
-            kdk_thread = threading.Thread(target=_kdk_thread_spawn)
-            kdk_thread.start()
-            gui_support.wait_for_thread(kdk_thread)
+            resolve_threads.append(threading.Thread(target=_kdk_thread_spawn))
         if results[HardwarePatchsetSettings.METALLIB_SUPPORT_PKG_REQUIRED] is True:
-            metallib_thread = threading.Thread(target=_metallib_thread_spawn)
-            metallib_thread.start()
-            gui_support.wait_for_thread(metallib_thread)
+            resolve_threads.append(threading.Thread(target=_metallib_thread_spawn))
+        for thread in resolve_threads:
+            thread.start()
+        for thread in resolve_threads:
+            gui_support.wait_for_thread(thread)
 
 
         download_objects = {
@@ -115,6 +117,13 @@ class OSUpdateFrame(wx.Frame):
             if self.did_cancel == -1:
                 time.sleep(1)
 
+        # Download all assets concurrently, frames track each in turn
+        # so staging takes as long as the largest download
+        download_futures = {
+            item: download_manager.DOWNLOAD_MANAGER.enqueue(download_objects[item])
+            for item in download_objects
+        }
+
         for item in download_objects:
             name = item
             download_obj = download_objects[item]
@@ -124,7 +133,8 @@ class OSUpdateFrame(wx.Frame):
                 title=self.title,
                 global_constants=self.constants,
                 download_obj=download_obj,
-                item_name=name
+                item_name=name,
+                download_future=download_futures[item]
             )
             if download_obj.download_complete is True:
                 if item.startswith("KDK"):
@@ -4,7 +4,8 @@ gui_download.py: Generate UI for downloading files
 
 import wx
 import logging
-import time
+
+from concurrent.futures import Future
 
 from .. import constants
 
@@ -12,6 +13,7 @@ from ..wx_gui import gui_support
 
 from ..support import (
     network_handler,
+    download_manager,
     utilities
 )
 
@@ -19,13 +21,17 @@ from ..support import (
 class DownloadFrame(wx.Frame):
     """
     Update provided frame with download stats
+
+    If download_future is provided, the download was already queued with
+    download_manager and is only tracked, otherwise it is started here
     """
-    def __init__(self, parent: wx.Frame, title: str, global_constants: constants.Constants, download_obj: network_handler.DownloadObject, item_name: str, download_icon = None) -> None:
+    def __init__(self, parent: wx.Frame, title: str, global_constants: constants.Constants, download_obj: network_handler.DownloadObject, item_name: str, download_icon = None, download_future: Future = None) -> None:
         logging.info("Initializing Download Frame")
         self.constants: constants.Constants = global_constants
         self.title: str = title
         self.parent: wx.Frame = parent
         self.download_obj: network_handler.DownloadObject = download_obj
+        self.download_future: Future = download_future
         self.item_name: str = item_name
         if download_icon:
             self.download_icon: str = download_icon
@@ -54,10 +60,10 @@ class DownloadFrame(wx.Frame):
         title_label.SetFont(gui_support.font_factory(19, wx.FONTWEIGHT_BOLD))
         title_label.Centre(wx.HORIZONTAL)
 
-        progress_bar = wx.Gauge(frame, range=100, pos=(-1, title_label.GetPosition()[1] + title_label.GetSize()[1] + 5), size=(300, 20), style=wx.GA_SMOOTH|wx.GA_PROGRESS)
+        self.progress_bar = progress_bar = wx.Gauge(frame, range=100, pos=(-1, title_label.GetPosition()[1] + title_label.GetSize()[1] + 5), size=(300, 20), style=wx.GA_SMOOTH|wx.GA_PROGRESS)
         progress_bar.Centre(wx.HORIZONTAL)
 
-        label_amount = wx.StaticText(frame, label="Preparing download", pos=(-1, progress_bar.GetPosition()[1] + progress_bar.GetSize()[1]))
+        self.label_amount = label_amount = wx.StaticText(frame, label="Preparing download", pos=(-1, progress_bar.GetPosition()[1] + progress_bar.GetSize()[1]))
         label_amount.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
         label_amount.Centre(wx.HORIZONTAL)
 
@@ -69,25 +75,17 @@ class DownloadFrame(wx.Frame):
         frame.SetSize((-1, return_button.GetPosition()[1] + return_button.GetSize()[1] + 40))
         frame.ShowWindowModal()
 
-        self.download_obj.download()
-        while self.download_obj.is_active():
-
-            percentage: int = round(self.download_obj.get_percent())
-            if percentage == 0:
-                percentage = 1
-
-            if percentage == -1:
-                amount_str = f"{utilities.human_fmt(self.download_obj.downloaded_file_size)} downloaded ({utilities.human_fmt(self.download_obj.get_speed())}/s)"
-                progress_bar.Pulse()
-            else:
-                amount_str = f"{utilities.seconds_to_readable_time(self.download_obj.get_time_remaining())}left - {utilities.human_fmt(self.download_obj.downloaded_file_size)} of {utilities.human_fmt(self.download_obj.total_file_size)} ({utilities.human_fmt(self.download_obj.get_speed())}/s)"
-                progress_bar.SetValue(int(percentage))
-
-            label_amount.SetLabel(amount_str)
-            label_amount.Centre(wx.HORIZONTAL)
-
-            wx.Yield()
-            time.sleep(self.constants.thread_sleep_interval)
+        # Run a nested event loop until the download reports completion or error,
+        # progress is pushed by the download thread instead of polled
+        self.event_loop = wx.GUIEventLoop()
+        self.download_obj.subscribe(self._on_download_event, interval=0.25)
+        if self.download_future is None:
+            self.download_obj.download()
+        else:
+            # Queued downloads may already be finished, or resolved without events (ie. deduplicated)
+            self.download_future.add_done_callback(lambda future: wx.CallAfter(self.event_loop.Exit))
+        self.event_loop.Run()
+        self.download_obj.unsubscribe(self._on_download_event)
 
         if self.download_obj.download_complete is False and self.user_cancelled is False:
             wx.MessageBox(f"Download failed: \n{self.download_obj.error_msg}", "Error", wx.OK | wx.ICON_ERROR)
@@ -96,6 +94,36 @@ class DownloadFrame(wx.Frame):
         frame.Destroy()
 
 
+    def _on_download_event(self, event: network_handler.DownloadEvent, progress: network_handler.DownloadProgress) -> None:
+        """
+        Download subscriber, invoked from the download thread
+        """
+        if event == network_handler.DownloadEvent.PROGRESS:
+            wx.CallAfter(self._update_progress, progress)
+            return
+        if self.download_future is None:
+            wx.CallAfter(self.event_loop.Exit)
+
+
+    def _update_progress(self, progress: network_handler.DownloadProgress) -> None:
+        """
+        Update progress bar and label with the provided progress
+        """
+        percentage: int = round(progress.percent)
+        if percentage == 0:
+            percentage = 1
+
+        if percentage == -1:
+            amount_str = f"{utilities.human_fmt(progress.downloaded_file_size)} downloaded ({utilities.human_fmt(progress.speed)}/s)"
+            self.progress_bar.Pulse()
+        else:
+            amount_str = f"{utilities.seconds_to_readable_time(progress.time_remaining)}left - {utilities.human_fmt(progress.downloaded_file_size)} of {utilities.human_fmt(progress.total_file_size)} ({utilities.human_fmt(progress.speed)}/s)"
+            self.progress_bar.SetValue(int(percentage))
+
+        self.label_amount.SetLabel(amount_str)
+        self.label_amount.Centre(wx.HORIZONTAL)
+
+
     def terminate_download(self) -> None:
         """
         Terminate download
@@ -103,6 +131,9 @@ class DownloadFrame(wx.Frame):
         if wx.MessageBox("Are you sure you want to cancel the download?", "Cancel Download", wx.YES_NO | wx.ICON_QUESTION | wx.NO_DEFAULT) == wx.YES:
             logging.info("User cancelled download")
             self.user_cancelled = True
+            if self.download_future is not None:
+                download_manager.DOWNLOAD_MANAGER.cancel(self.download_future)
+                return
             self.download_obj.stop()
 
 
@@ -10,6 +10,7 @@ import threading
 import subprocess
 
 from pathlib import Path
+from concurrent.futures import Future
 
 from .. import constants
 
@@ -27,7 +28,11 @@ from ..support import (
     network_handler,
     kdk_handler,
     metallib_handler,
-    subprocess_wrapper
+    download_manager,
+    subprocess_wrapper,
+    installer_progress,
+    media_verification,
+    disk_inventory
 )
 
 
@@ -280,19 +285,31 @@ class macOSInstallerFlashFrame(wx.Frame):
             self.on_return_to_main_menu()
             return
 
-        # Base Size
-        estimated_size = 16000
-        # AutoPkg (700MB~)
-        estimated_size += 700 if installer['OS'] >= os_data.os_data.big_sur else 0
-        # KDK (700MB~, and overhead for copying to installer)
-        estimated_size += 700 * 2 if installer['OS'] >= os_data.os_data.ventura else 0
+        # /dev/diskX -> diskX
+        root_disk = disk['identifier'][5:]
+
+        # Exact size of the installer, payloads are added as they are queued
+        # Mount point is queried afresh, as the volume is erased and remounted mid-flash
+        self.installer_progress = installer_progress.InstallerMediaProgress(
+            installer['Path'],
+            self.constants.installer_progress_log_path,
+            lambda: (disk_inventory.disk_info(f"{root_disk}s2") or {}).get("MountPoint"),
+        )
 
         progress_bar_animation.stop_pulse()
-        progress_bar.SetRange(estimated_size)
+        progress_bar.SetRange(max(self.installer_progress.total_bytes // (1024 * 1024), 1))
+
+        # Recorded while createinstallmedia reads the installer, verified against once flashed
+        self.installer_manifest = None
+        def _record_manifest():
+            try:
+                self.installer_manifest = media_verification.InstallerManifest.from_directory(installer['Path'])
+            except OSError as e:
+                logging.info(f"Failed to record installer manifest: {e}")
+
+        manifest_thread = threading.Thread(target=_record_manifest)
+        manifest_thread.start()
 
-        # /dev/diskX -> diskX
-        root_disk = disk['identifier'][5:]
-        initial_bytes_written = float(utilities.monitor_disk_output(root_disk))
         self.result = False
         def _flash():
             logging.info(f"Flashing {installer['Path']} to {root_disk}")
@@ -302,18 +319,12 @@ class macOSInstallerFlashFrame(wx.Frame):
         thread.start()
 
         # Wait for installer to be created
+        progress = None
         while thread.is_alive():
-            try:
-                total_bytes_written = float(utilities.monitor_disk_output(root_disk))
-            except:
-                total_bytes_written = initial_bytes_written
-            bytes_written = total_bytes_written - initial_bytes_written
-            wx.CallAfter(bytes_written_label.SetLabel, f"Bytes Written: {bytes_written:.2f} MB")
-            try:
-                bytes_written = int(bytes_written)
-            except:
-                bytes_written = 0
-            wx.CallAfter(progress_bar.SetValue, bytes_written)
+            # poll() returns the same snapshot until it is refreshed
+            if (latest := self.installer_progress.poll()) is not progress:
+                progress = latest
+                wx.CallAfter(self._update_progress, progress, bytes_written_label, progress_bar)
 
             wx.Yield()
             thread.join(timeout=self.constants.thread_sleep_interval)
@@ -328,7 +339,8 @@ class macOSInstallerFlashFrame(wx.Frame):
         progress_bar_animation.start_pulse()
 
         bytes_written_label.SetLabel("Validating Installer Integrity...")
-        error_message = self._validate_installer_pkg(disk['identifier'])
+        gui_support.wait_for_thread(manifest_thread)
+        error_message = self._validate_installer_pkg(disk['identifier'], Path(installer['Path']).name)
 
         progress_bar_animation.stop_pulse()
 
@@ -338,7 +350,7 @@ class macOSInstallerFlashFrame(wx.Frame):
             self.on_return_to_main_menu()
             return
 
-        progress_bar.SetValue(estimated_size)
+        progress_bar.SetValue(progress_bar.GetRange())
 
         if gui_support.CheckProperties(self.constants).host_can_build() is False:
             wx.MessageBox("Installer created successfully! If you want to install OpenCore to this USB, you will need to change the Target Model in settings", "Successfully created the macOS installer!", wx.OK | wx.ICON_INFORMATION)
@@ -361,10 +373,32 @@ class macOSInstallerFlashFrame(wx.Frame):
         self.Destroy()
 
 
+    def _update_progress(self, progress: installer_progress.InstallerProgress, label: wx.StaticText, progress_bar: wx.Gauge) -> None:
+        """
+        Display installer creation progress
+        """
+        written = progress.bytes_written / (1024 * 1024)
+        total   = progress.total_bytes / (1024 * 1024)
+        text = f"{progress.stage}: {written:.0f} of {total:.0f} MB"
+        if progress.speed > 0:
+            text += f" ({progress.speed / (1024 * 1024):.1f} MB/s"
+            if progress.time_remaining >= 0:
+                text += f", {utilities.seconds_to_readable_time(progress.time_remaining)}left"
+            text += ")"
+        label.SetLabel(text)
+        label.Centre(wx.HORIZONTAL)
+
+        if progress_bar.GetRange() != max(int(total), 1):
+            progress_bar.SetRange(max(int(total), 1))
+        progress_bar.SetValue(min(int(written), progress_bar.GetRange()))
+
+
     def _prepare_resources(self, installer_path: str, disk: str) -> None:
 
         def prepare_script(self, installer_path: str, disk: str, constants: constants.Constants):
-            self.prepare_result = macos_installer_handler.InstallerCreation().generate_installer_creation_script(constants.payload_path, installer_path, disk)
+            # Drop output from a previous run, progress is read from this log
+            Path(constants.installer_progress_log_path).unlink(missing_ok=True)
+            self.prepare_result = macos_installer_handler.InstallerCreation().generate_installer_creation_script(constants.payload_path, installer_path, disk, progress_log=constants.installer_progress_log_path)
 
         thread = threading.Thread(target=prepare_script, args=(self, installer_path, disk, self.constants))
         thread.start()
@@ -390,7 +424,7 @@ class macOSInstallerFlashFrame(wx.Frame):
         output = result.stdout
         error  = result.stderr if result.stderr else ""
 
-        if "Install media now available at" not in output:
+        if result.returncode != 0 or "Install media now available at" not in output:
             logging.info("Failed to create macOS installer")
             popup = wx.MessageDialog(self, f"Failed to create macOS installer\n\nOutput: {output}\n\nError: {error}", "Error", wx.OK | wx.ICON_ERROR)
             popup.ShowModal()
@@ -428,7 +462,7 @@ class macOSInstallerFlashFrame(wx.Frame):
             path = self.constants.installer_pkg_path
 
         autopkg_download = network_handler.DownloadObject(link, path)
-        autopkg_download.download(spawn_thread=False)
+        download_manager.DOWNLOAD_MANAGER.enqueue(autopkg_download, priority=download_manager.DownloadPriority.HIGH).result()
 
         if autopkg_download.download_complete is False:
             logging.warning("Failed to download Install.pkg")
@@ -460,21 +494,34 @@ class macOSInstallerFlashFrame(wx.Frame):
             logging.info("Installer unsupported, requires Big Sur or newer")
             return
 
+        self.installer_progress.add_payload(f"{path}/Library/Packages/{Path(self.constants.installer_pkg_path).name}", Path(self.constants.installer_pkg_path).stat().st_size)
+
         subprocess.run(["/bin/mkdir", "-p", f"{path}/Library/Packages/"])
         subprocess.run(generate_copy_arguments(self.constants.installer_pkg_path, f"{path}/Library/Packages/"))
 
         # Chainload KDK and Metallib
-        self._chainload_metallib(os_version["ProductBuildVersion"], os_version["ProductVersion"], Path(path + "/Library/Packages/"))
-        self._kdk_chainload(os_version["ProductBuildVersion"], os_version["ProductVersion"], Path(path + "/Library/Packages/"))
+        # Both are queued before waiting, so they download concurrently
+        metallib_future = self._chainload_metallib(os_version["ProductBuildVersion"], os_version["ProductVersion"], Path(path + "/Library/Packages/"))
+        kdk_future      = self._kdk_chainload(os_version["ProductBuildVersion"], os_version["ProductVersion"], Path(path + "/Library/Packages/"))
 
+        download_manager.DOWNLOAD_MANAGER.wait([future for future in [metallib_future, kdk_future] if future is not None])
 
-    def _kdk_chainload(self, build: str, version: str, download_dir: str):
+        if metallib_future is not None:
+            self._finish_chainload_metallib(metallib_future.result())
+        if kdk_future is not None:
+            self._finish_kdk_chainload(kdk_future.result(), Path(path + "/Library/Packages/"))
+
+
+    def _kdk_chainload(self, build: str, version: str, download_dir: str) -> Future:
         """
-        Download the correct KDK to be chainloaded in the macOS installer
+        Queue the correct KDK to be chainloaded in the macOS installer
 
         Parameters
             build (str): The build number of the macOS installer (e.g. 20A5343j)
             version (str): The version of the macOS installer (e.g. 11.0.1)
+
+        Returns:
+            Future: Queued KDK download, None if unavailable
         """
 
         kdk_dmg_path = Path(download_dir) / "KDK.dmg"
@@ -494,12 +541,13 @@ class macOSInstallerFlashFrame(wx.Frame):
         if kdk_obj.success is False:
             logging.info("Failed to retrieve KDK")
             logging.info(kdk_obj.error_msg)
-            return
+            return None
 
         kdk_download_obj = kdk_obj.retrieve_download(override_path=kdk_dmg_path)
         if kdk_download_obj is None:
             logging.info("Failed to retrieve KDK")
             logging.info(kdk_obj.error_msg)
+            return None
 
         # Check remaining disk space before downloading
         space = utilities.get_free_space(download_dir)
@@ -508,12 +556,30 @@ class macOSInstallerFlashFrame(wx.Frame):
             logging.info(f"Attempting to download locally first")
             if space < kdk_obj.kdk_url_expected_size:
                 logging.info("Not enough disk space to install KDK, skipping")
-                return
+                return None
             # Ideally we'd download the KDK onto the disk to display progress in the UI
             # However we'll just download to our temp directory and move it to the target disk
-            kdk_dmg_path = self.constants.kdk_download_path
+            kdk_download_obj.filepath = Path(self.constants.kdk_download_path)
+        else:
+            self.installer_progress.add_payload(kdk_dmg_path, kdk_obj.kdk_url_expected_size)
+        # The pkg extracted from the disk image is about as large
+        self.installer_progress.add_payload(kdk_pkg_path, kdk_obj.kdk_url_expected_size)
+
+        return download_manager.DOWNLOAD_MANAGER.enqueue(kdk_download_obj)
+
+
+    def _finish_kdk_chainload(self, kdk_download_obj: network_handler.DownloadObject, download_dir: str) -> None:
+        """
+        Extract the downloaded KDK's pkg for chainloading
+
+        Parameters
+            kdk_download_obj (DownloadObject): Finished KDK download
+            download_dir (str): Packages directory of the macOS installer
+        """
+
+        kdk_dmg_path = Path(kdk_download_obj.filepath)
+        kdk_pkg_path = Path(download_dir) / "KDK.pkg"
 
-        kdk_download_obj.download(spawn_thread=False)
         if kdk_download_obj.download_complete is False:
             logging.info("Failed to download KDK")
             logging.info(kdk_download_obj.error_msg)
@@ -546,9 +612,12 @@ class macOSInstallerFlashFrame(wx.Frame):
         kdk_dmg_path.unlink()
 
 
-    def _chainload_metallib(self, build: str, version: str, download_dir: str):
+    def _chainload_metallib(self, build: str, version: str, download_dir: str) -> Future:
         """
-        Download the correct Metallib to be chainloaded in the macOS installer
+        Queue the correct Metallib to be chainloaded in the macOS installer
+
+        Returns:
+            Future: Queued Metallib download, None if unavailable
         """
 
         metallib_pkg_path = Path(download_dir) / "MetallibSupportPkg.pkg"
@@ -565,21 +634,34 @@ class macOSInstallerFlashFrame(wx.Frame):
         if metallib_obj.success is False:
             logging.info("Failed to retrieve Metallib")
             logging.info(metallib_obj.error_msg)
-            return
+            return None
 
         metallib_download_obj = metallib_obj.retrieve_download(override_path=metallib_pkg_path)
         if metallib_download_obj is None:
             logging.info("Failed to retrieve Metallib")
             logging.info(metallib_obj.error_msg)
+            return None
 
         # Check remaining disk space before downloading
         space = utilities.get_free_space(download_dir)
         size = 100 * 1024 * 1024
         if space < size:
             logging.info("Not enough disk space to download and install Metallib")
-            return
+            return None
+
+        return download_manager.DOWNLOAD_MANAGER.enqueue(metallib_download_obj)
+
+
+    def _finish_chainload_metallib(self, metallib_download_obj: network_handler.DownloadObject) -> None:
+        """
+        Verify the downloaded Metallib is in place for chainloading
+
+        Parameters
+            metallib_download_obj (DownloadObject): Finished Metallib download
+        """
+
+        metallib_pkg_path = Path(metallib_download_obj.filepath)
 
-        metallib_download_obj.download(spawn_thread=False)
         if metallib_download_obj.download_complete is False:
             logging.info("Failed to download Metallib")
             logging.info(metallib_download_obj.error_msg)
@@ -590,16 +672,41 @@ class macOSInstallerFlashFrame(wx.Frame):
             return
 
 
-    def _validate_installer_pkg(self, disk: str) -> bool:
+    def _validate_installer_pkg(self, disk: str, installer_name: str = None) -> str:
+        """
+        Verify the installer copied onto the media
+
+        Compared file by file against the manifest recorded while flashing,
+        falls back to verifying SharedSupport.dmg if no manifest was recorded
+
+        Parameters:
+            disk           (str): Disk identifier of the media (ie. /dev/disk4)
+            installer_name (str): Name of the installer application (ie. 'Install macOS Ventura.app')
+
+        Returns:
+            str: Error message, empty if validated
+        """
         logging.info("Validating installer pkg")
         error_message = ""
         def _integrity_check():
             nonlocal error_message
-            for folder in Path(utilities.grab_mount_point_from_disk(disk + "s2")).glob("*.app"):
-                if folder.is_dir():
-                    dmg_path = folder / "Contents" / "SharedSupport" / "SharedSupport.dmg"
-                    break
+            mount_point = Path(utilities.grab_mount_point_from_disk(disk + "s2"))
+            installer_path = mount_point / installer_name if installer_name else None
+            if installer_path is None or not installer_path.is_dir():
+                installer_path = next((folder for folder in mount_point.glob("*.app") if folder.is_dir()), None)
+            if installer_path is None:
+                logging.error(f"Failed to find installer on {mount_point}")
+                error_message = f"Failed to find installer on {mount_point}"
+                return error_message
+
+            if self.installer_manifest is not None:
+                result = media_verification.verify(self.installer_manifest, installer_path, sampled=self.constants.fast_media_verify)
+                if result.passed is False:
+                    logging.error(f"Installer files do not match the source:\n{result.summary(limit=100)}")
+                    error_message = f"Installer files do not match the source:\n{result.summary()}"
+                return error_message
 
+            dmg_path = installer_path / "Contents" / "SharedSupport" / "SharedSupport.dmg"
             if not Path(dmg_path).exists():
                 logging.error(f"Failed to find {dmg_path}")
                 error_message = f"Failed to find {dmg_path}"
@@ -4,9 +4,9 @@ gui_settings.py: Settings Frame for the GUI
 
 import wx
 import wx.adv
+import time
 import pprint
 import logging
-import py_sip_xnu
 import subprocess
 
 from pathlib import Path
@@ -17,7 +17,8 @@ from ..sys_patch import sys_patch
 
 from ..wx_gui import (
     gui_support,
-    gui_update
+    gui_update,
+    gui_settings_model
 )
 from ..support import (
     global_settings,
@@ -33,6 +34,7 @@ from ..datasets import (
     os_data,
     cpu_data
 )
+from ..detections.boot_state import BootState
 
 
 class SettingsFrame(wx.Frame):
@@ -41,6 +43,7 @@ class SettingsFrame(wx.Frame):
     """
     def __init__(self, parent: wx.Frame, title: str, global_constants: constants.Constants, screen_location: tuple = None):
         logging.info("Initializing Settings Frame")
+        start_time = time.perf_counter()
         self.constants: constants.Constants = global_constants
         self.title: str = title
         self.parent: wx.Frame = parent
@@ -48,11 +51,16 @@ class SettingsFrame(wx.Frame):
         self.hyperlink_colour = (25, 179, 231)
 
         self.settings = self._settings()
+        self.view_model = gui_settings_model.SettingsViewModel(self.settings)
+
+        self.controls: dict = {}          # (tab, label) -> (control, description, description colour)
+        self.system_settings: dict = {}  # Global domain defaults read so far
 
         self.frame_modal = wx.Dialog(parent, title=title, size=(600, 685))
 
         self._generate_elements(self.frame_modal)
         self.frame_modal.ShowWindowModal()
+        logging.info(f"- Settings Frame interactive in {(time.perf_counter() - start_time) * 1000:.1f}ms")
 
     def _generate_elements(self, frame: wx.Frame = None) -> None:
         """
@@ -99,134 +107,168 @@ class SettingsFrame(wx.Frame):
 
         frame.SetSizer(sizer)
 
-        horizontal_center = frame.GetSize()[0] / 2
-        for tab in tabs:
-            if tab not in self.settings:
-                continue
+        # Tabs are built when first shown
+        self.notebook = notebook
+        self.tabs = tabs
+        self.built_tabs = set()
+        self.horizontal_center = frame.GetSize()[0] / 2
+        notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.on_tab_change)
+        self._generate_tab(tabs[notebook.GetSelection()])
 
-            stock_height = 0
-            stock_width = 20
 
-            height = stock_height
-            width = stock_width
+    def on_tab_change(self, event: wx.Event) -> None:
+        self._generate_tab(self.tabs[event.GetSelection()])
+        event.Skip()
 
-            lowest_height_reached = height
-            highest_height_reached = height
 
-            panel = notebook.GetPage(tabs.index(tab))
+    def _generate_tab(self, tab: str) -> None:
+        """
+        Generates a tab's elements, once
+        """
+        if tab in self.built_tabs or tab not in self.settings:
+            return
+        self.built_tabs.add(tab)
 
-            for setting, setting_info in self.settings[tab].items():
-                if setting_info["type"] == "populate":
-                    # execute populate function
-                    if setting_info["args"] == wx.Frame:
-                        setting_info["function"](panel)
-                    else:
-                        raise Exception("Invalid populate function")
-                    continue
+        states = self.view_model.attach(tab)
+        horizontal_center = self.horizontal_center
 
-                if setting_info["type"] == "title":
-                    stock_height = lowest_height_reached
-                    height = stock_height
-                    width = stock_width
+        stock_height = 0
+        stock_width = 20
 
-                    height += 10
+        height = stock_height
+        width = stock_width
 
-                    # Add title
-                    title = wx.StaticText(panel, label=setting, pos=(-1, -1))
-                    title.SetFont(gui_support.font_factory(19, wx.FONTWEIGHT_BOLD))
+        lowest_height_reached = height
+        highest_height_reached = height
 
-                    title.SetPosition((int(horizontal_center) - int(title.GetSize()[0] / 2) - 15, height))
-                    highest_height_reached = height + title.GetSize()[1] + 10
-                    height += title.GetSize()[1] + 10
-                    continue
+        panel = self.notebook.GetPage(self.tabs.index(tab))
+
+        for setting, setting_info in self.settings[tab].items():
+            if setting_info["type"] == "populate":
+                # execute populate function
+                if setting_info["args"] == wx.Frame:
+                    setting_info["function"](panel)
+                else:
+                    raise Exception("Invalid populate function")
+                if (tab, setting) in states:
+                    self._update_control(tab, setting, states[(tab, setting)])
+                continue
 
-                if setting_info["type"] == "sub_title":
-                    # Add sub-title
-                    sub_title = wx.StaticText(panel, label=setting, pos=(-1, -1))
-                    sub_title.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
+            if setting_info["type"] == "title":
+                stock_height = lowest_height_reached
+                height = stock_height
+                width = stock_width
 
-                    sub_title.SetPosition((int(horizontal_center) - int(sub_title.GetSize()[0] / 2) - 15, height))
-                    highest_height_reached = height + sub_title.GetSize()[1] + 10
-                    height += sub_title.GetSize()[1] + 10
-                    continue
+                height += 10
 
-                if setting_info["type"] == "wrap_around":
-                    height = highest_height_reached
-                    width = 300 if width is stock_width else stock_width
-                    continue
+                # Add title
+                title = wx.StaticText(panel, label=setting, pos=(-1, -1))
+                title.SetFont(gui_support.font_factory(19, wx.FONTWEIGHT_BOLD))
 
-                if setting_info["type"] == "checkbox":
-                    # Add checkbox, and description underneath
-                    checkbox = wx.CheckBox(panel, label=setting, pos=(10 + width, 10 + height), size = (300,-1))
-
-                    value = False
-                    if "value" in setting_info:
-                        try:
-                            value = bool(setting_info["value"])
-                        except ValueError:
-                            logging.error(f"Invalid value for {setting}, got {setting_info['value']} (type: {type(setting_info['value'])})")
-                            value = False
-
-                    checkbox.SetValue(value)
-                    checkbox.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
-                    event = lambda event, warning=setting_info["warning"] if "warning" in setting_info else "", override=bool(setting_info["override_function"]) if "override_function" in setting_info else False: self.on_checkbox(event, warning, override)
-                    checkbox.Bind(wx.EVT_CHECKBOX, event)
-                    if "condition" in setting_info:
-                        checkbox.Enable(setting_info["condition"])
-                        if setting_info["condition"] is False:
-                            checkbox.SetValue(False)
-
-                elif setting_info["type"] == "spinctrl":
-                    # Add spinctrl, and description underneath
-                    spinctrl = wx.SpinCtrl(panel, value=str(setting_info["value"]), pos=(width - 20, 10 + height), min=setting_info["min"], max=setting_info["max"], size = (45,-1))
-                    spinctrl.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
-                    spinctrl.Bind(wx.EVT_TEXT, lambda event, variable=setting: self.on_spinctrl(event, variable))
-                    # Add label next to spinctrl
-                    label = wx.StaticText(panel, label=setting, pos=(spinctrl.GetSize()[0] + width - 16, spinctrl.GetPosition()[1]))
-                    label.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
-                elif setting_info["type"] == "choice":
-                    # Title
-                    title = wx.StaticText(panel, label=setting, pos=(width + 30, 10 + height))
-                    title.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
-                    height += title.GetSize()[1] + 10
-
-                    # Add combobox, and description underneath
-                    choice = wx.Choice(panel, pos=(width + 25, 10 + height), choices=setting_info["choices"], size = (150,-1))
-                    choice.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
-                    choice.SetSelection(choice.FindString(setting_info["value"]))
-                    if "override_function" in setting_info:
-                        choice.Bind(wx.EVT_CHOICE, lambda event, variable=setting: self.settings[tab][variable]["override_function"](event))
-                    else:
-                        choice.Bind(wx.EVT_CHOICE, lambda event, variable=setting: self.on_choice(event, variable))
-                    height += 10
-                elif setting_info["type"] == "button":
-                    button = wx.Button(panel, label=setting, pos=(width + 25, 10 + height), size = (200,-1))
-                    button.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
-                    button.Bind(wx.EVT_BUTTON, lambda event, variable=setting: self.settings[tab][variable]["function"](event))
-                    height += 10
+                title.SetPosition((int(horizontal_center) - int(title.GetSize()[0] / 2) - 15, height))
+                highest_height_reached = height + title.GetSize()[1] + 10
+                height += title.GetSize()[1] + 10
+                continue
 
+            if setting_info["type"] == "sub_title":
+                # Add sub-title
+                sub_title = wx.StaticText(panel, label=setting, pos=(-1, -1))
+                sub_title.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
+
+                sub_title.SetPosition((int(horizontal_center) - int(sub_title.GetSize()[0] / 2) - 15, height))
+                highest_height_reached = height + sub_title.GetSize()[1] + 10
+                height += sub_title.GetSize()[1] + 10
+                continue
+
+            if setting_info["type"] == "wrap_around":
+                height = highest_height_reached
+                width = 300 if width is stock_width else stock_width
+                continue
+
+            if setting_info["type"] == "checkbox":
+                # Add checkbox, and description underneath
+                checkbox = wx.CheckBox(panel, label=setting, pos=(10 + width, 10 + height), size = (300,-1))
+                checkbox.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
+                event = lambda event, warning=setting_info["warning"] if "warning" in setting_info else "", override=bool(setting_info["override_function"]) if "override_function" in setting_info else False: self.on_checkbox(event, warning, override)
+                checkbox.Bind(wx.EVT_CHECKBOX, event)
+                control = checkbox
+
+            elif setting_info["type"] == "spinctrl":
+                # Add spinctrl, and description underneath
+                spinctrl = wx.SpinCtrl(panel, value=str(states[(tab, setting)].value), pos=(width - 20, 10 + height), min=setting_info["min"], max=setting_info["max"], size = (45,-1))
+                spinctrl.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
+                spinctrl.Bind(wx.EVT_TEXT, lambda event, variable=setting: self.on_spinctrl(event, variable))
+                # Add label next to spinctrl
+                label = wx.StaticText(panel, label=setting, pos=(spinctrl.GetSize()[0] + width - 16, spinctrl.GetPosition()[1]))
+                label.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
+                control = spinctrl
+            elif setting_info["type"] == "choice":
+                # Title
+                title = wx.StaticText(panel, label=setting, pos=(width + 30, 10 + height))
+                title.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
+                height += title.GetSize()[1] + 10
+
+                # Add combobox, and description underneath
+                choice = wx.Choice(panel, pos=(width + 25, 10 + height), choices=setting_info["choices"], size = (150,-1))
+                choice.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
+                if "override_function" in setting_info:
+                    choice.Bind(wx.EVT_CHOICE, lambda event, variable=setting: self.settings[tab][variable]["override_function"](event))
+                else:
+                    choice.Bind(wx.EVT_CHOICE, lambda event, variable=setting: self.on_choice(event, variable))
+                height += 10
+                control = choice
+            elif setting_info["type"] == "button":
+                button = wx.Button(panel, label=setting, pos=(width + 25, 10 + height), size = (200,-1))
+                button.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
+                button.Bind(wx.EVT_BUTTON, lambda event, variable=setting: self.settings[tab][variable]["function"](event))
+                height += 10
+
+            else:
+                raise Exception("Invalid setting type")
+
+            lines = '\n'.join(setting_info["description"])
+            description = wx.StaticText(panel, label=lines, pos=(30 + width, 10 + height + 20))
+            description.SetFont(gui_support.font_factory(11, wx.FONTWEIGHT_NORMAL))
+            height += 40
+            if (tab, setting) in states:
+                self.controls[(tab, setting)] = (control, description, description.GetForegroundColour())
+                self._update_control(tab, setting, states[(tab, setting)])
+
+            # Check number of lines in description, and adjust spacer accordingly
+            for i, line in enumerate(lines.split('\n')):
+                if line == "":
+                    continue
+                if i == 0:
+                    height += 11
                 else:
-                    raise Exception("Invalid setting type")
+                    height += 13
 
-                lines = '\n'.join(setting_info["description"])
-                description = wx.StaticText(panel, label=lines, pos=(30 + width, 10 + height + 20))
-                description.SetFont(gui_support.font_factory(11, wx.FONTWEIGHT_NORMAL))
-                height += 40
-                if "condition" in setting_info:
-                    if setting_info["condition"] is False:
-                        description.SetForegroundColour((128, 128, 128))
+            if height > lowest_height_reached:
+                lowest_height_reached = height
 
-                # Check number of lines in description, and adjust spacer accordingly
-                for i, line in enumerate(lines.split('\n')):
-                    if line == "":
-                        continue
-                    if i == 0:
-                        height += 11
-                    else:
-                        height += 13
 
-                if height > lowest_height_reached:
-                    lowest_height_reached = height
+    def _update_control(self, tab: str, label: str, state: gui_settings_model.ControlState) -> None:
+        """
+        Show a control's state from the view-model
+        """
+        if self.settings[tab][label]["type"] == "populate":
+            self.settings[tab][label]["update_function"](state.value)
+            return
+
+        control, description, description_colour = self.controls[(tab, label)]
+        if isinstance(control, wx.CheckBox):
+            control.SetValue(state.value)
+        elif isinstance(control, wx.SpinCtrl):
+            control.SetValue(state.value)
+        elif isinstance(control, wx.Choice):
+            # Values outside the choices keep the current selection (ie. an MXM GPU without an override entry)
+            index = control.FindString(state.value)
+            if index != wx.NOT_FOUND or control.GetSelection() == wx.NOT_FOUND:
+                control.SetSelection(index)
+
+        control.Enable(state.enabled)
+        description.SetForegroundColour(description_colour if state.enabled else (128, 128, 128))
+        description.Refresh()
 
 
     def _settings(self) -> dict:
@@ -236,12 +278,14 @@ class SettingsFrame(wx.Frame):
         {
             "Tab Name": {
                 "type": "title" | "checkbox" | "spinctrl" | "populate" | "wrap_around",
-                "value": bool | int | str,
+                "value": bool | int | str | function, (Functions are bindings, re-evaluated when settings change)
                 "variable": str,  (Variable name)
                 "constants_variable": str, (Constants variable name, if different from "variable")
                 "description": [str, str, str], (List of strings)
                 "warning": str, (Optional) (Warning message to be displayed when checkbox is checked)
                 "override_function": function, (Optional) (Function to be executed when checkbox is checked)
+                "condition": bool | function, (Optional) (Whether the control is enabled)
+                "update_function": function, (Populate only, if "value" is set) (Function showing the value)
             }
         }
         """
@@ -257,28 +301,28 @@ class SettingsFrame(wx.Frame):
                 },
                 "FireWire Booting": {
                     "type": "checkbox",
-                    "value": self.constants.firewire_boot,
+                    "value": lambda: self.constants.firewire_boot,
                     "variable": "firewire_boot",
                     "description": [
                         "Enable booting macOS from",
                         "FireWire drives.",
                     ],
-                    "condition": not (generate_smbios.check_firewire(self.constants.custom_model or self.constants.computer.real_model) is False)
+                    "condition": lambda: not (generate_smbios.check_firewire(self.constants.custom_model or self.constants.computer.real_model) is False)
                 },
                 "XHCI Booting": {
                     "type": "checkbox",
-                    "value": self.constants.xhci_boot,
+                    "value": lambda: self.constants.xhci_boot,
                     "variable": "xhci_boot",
                     "description": [
                         "Enable booting macOS from add-in",
                         "USB 3.0 expansion cards on systems",
                         "without native support.",
                     ],
-                    "condition": not gui_support.CheckProperties(self.constants).host_has_cpu_gen(cpu_data.CPUGen.ivy_bridge) # Sandy Bridge and older do not natively support XHCI booting
+                    "condition": lambda: not gui_support.CheckProperties(self.constants).host_has_cpu_gen(cpu_data.CPUGen.ivy_bridge) # Sandy Bridge and older do not natively support XHCI booting
                 },
                 "NVMe Booting": {
                     "type": "checkbox",
-                    "value": self.constants.nvme_boot,
+                    "value": lambda: self.constants.nvme_boot,
                     "variable": "nvme_boot",
                     "description": [
                         "Enable booting macOS from NVMe",
@@ -287,14 +331,14 @@ class SettingsFrame(wx.Frame):
                         "Note: Requires Firmware support",
                         "for OpenCore to load from NVMe.",
                     ],
-                    "condition": not gui_support.CheckProperties(self.constants).host_has_cpu_gen(cpu_data.CPUGen.ivy_bridge) # Sandy Bridge and older do not natively support NVMe booting
+                    "condition": lambda: not gui_support.CheckProperties(self.constants).host_has_cpu_gen(cpu_data.CPUGen.ivy_bridge) # Sandy Bridge and older do not natively support NVMe booting
                 },
                 "wrap_around 2": {
                     "type": "wrap_around",
                 },
                 "OpenCore Vaulting": {
                     "type": "checkbox",
-                    "value": self.constants.vault,
+                    "value": lambda: self.constants.vault,
                     "variable": "vault",
                     "description": [
                         "Digitally sign OpenCore to prevent",
@@ -304,7 +348,7 @@ class SettingsFrame(wx.Frame):
 
                 "Show OpenCore Boot Picker": {
                     "type": "checkbox",
-                    "value": self.constants.showpicker,
+                    "value": lambda: self.constants.showpicker,
                     "variable": "showpicker",
                     "description": [
                         "When disabled, users can hold ESC to",
@@ -313,7 +357,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Boot Picker Timeout": {
                     "type": "spinctrl",
-                    "value": self.constants.oc_timeout,
+                    "value": lambda: self.constants.oc_timeout,
                     "variable": "oc_timeout",
                     "description": [
                         "Timeout before boot picker selects default",
@@ -326,13 +370,13 @@ class SettingsFrame(wx.Frame):
                 },
                 "MacPro3,1/Xserve2,1 Workaround": {
                     "type": "checkbox",
-                    "value": self.constants.force_quad_thread,
+                    "value": lambda: self.constants.force_quad_thread,
                     "variable": "force_quad_thread",
                     "description": [
                         "Limits to 4 threads max on these units.",
                         "Required for macOS Sequoia and later.",
                     ],
-                    "condition": (self.constants.custom_model and self.constants.custom_model in ["MacPro3,1", "Xserve2,1"]) or self.constants.computer.real_model in ["MacPro3,1", "Xserve2,1"]
+                    "condition": lambda: (self.constants.custom_model and self.constants.custom_model in ["MacPro3,1", "Xserve2,1"]) or self.constants.computer.real_model in ["MacPro3,1", "Xserve2,1"]
                 },
                 "Debug": {
                     "type": "title",
@@ -340,7 +384,7 @@ class SettingsFrame(wx.Frame):
 
                 "Verbose": {
                     "type": "checkbox",
-                    "value": self.constants.verbose_debug,
+                    "value": lambda: self.constants.verbose_debug,
                     "variable": "verbose_debug",
                     "description": [
                         "Verbose output during boot.",
@@ -349,7 +393,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Kext Debugging": {
                     "type": "checkbox",
-                    "value": self.constants.kext_debug,
+                    "value": lambda: self.constants.kext_debug,
                     "variable": "kext_debug",
                     "description": [
                         "Use DEBUG variants of kexts and",
@@ -361,7 +405,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "OpenCore Debugging": {
                     "type": "checkbox",
-                    "value": self.constants.opencore_debug,
+                    "value": lambda: self.constants.opencore_debug,
                     "variable": "opencore_debug",
                     "description": [
                         "Use DEBUG variant of OpenCore",
@@ -375,7 +419,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Wake on WLAN": {
                     "type": "checkbox",
-                    "value": self.constants.enable_wake_on_wlan,
+                    "value": lambda: self.constants.enable_wake_on_wlan,
                     "variable": "enable_wake_on_wlan",
                     "description": [
                         "Disabled by default due to",
@@ -387,17 +431,17 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable Thunderbolt": {
                     "type": "checkbox",
-                    "value": self.constants.disable_tb,
+                    "value": lambda: self.constants.disable_tb,
                     "variable": "disable_tb",
                     "description": [
                         "For MacBookPro11,x with faulty",
                         "PCHs that may crash sporadically.",
                     ],
-                    "condition": (self.constants.custom_model and self.constants.custom_model in ["MacBookPro11,1", "MacBookPro11,2", "MacBookPro11,3"]) or self.constants.computer.real_model in ["MacBookPro11,1", "MacBookPro11,2", "MacBookPro11,3"]
+                    "condition": lambda: (self.constants.custom_model and self.constants.custom_model in ["MacBookPro11,1", "MacBookPro11,2", "MacBookPro11,3"]) or self.constants.computer.real_model in ["MacBookPro11,1", "MacBookPro11,2", "MacBookPro11,3"]
                 },
                 "Windows GMUX": {
                     "type": "checkbox",
-                    "value": self.constants.dGPU_switch,
+                    "value": lambda: self.constants.dGPU_switch,
                     "variable": "dGPU_switch",
                     "description": [
                         "Allow iGPU to be exposed in Windows",
@@ -406,7 +450,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable CPUFriend": {
                     "type": "checkbox",
-                    "value": self.constants.disallow_cpufriend,
+                    "value": lambda: self.constants.disallow_cpufriend,
                     "variable": "disallow_cpufriend",
                     "description": [
                         "Disables power management helper",
@@ -415,21 +459,21 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable mediaanalysisd service": {
                     "type": "checkbox",
-                    "value": self.constants.disable_mediaanalysisd,
+                    "value": lambda: self.constants.disable_mediaanalysisd,
                     "variable": "disable_mediaanalysisd",
                     "description": [
                         "For systems that are the primary iCloud",
                         "Photo Library host with a 3802-based GPU,",
                         "this may aid in prolonged idle stability.",
                     ],
-                    "condition": gui_support.CheckProperties(self.constants).host_has_3802_gpu()
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_has_3802_gpu()
                 },
                 "wrap_around 1": {
                     "type": "wrap_around",
                 },
                 "Allow AppleALC Audio": {
                     "type": "checkbox",
-                    "value": self.constants.set_alc_usage,
+                    "value": lambda: self.constants.set_alc_usage,
                     "variable": "set_alc_usage",
                     "description": [
                         "Allow AppleALC to manage audio",
@@ -440,7 +484,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "NVRAM WriteFlash": {
                     "type": "checkbox",
-                    "value": self.constants.nvram_write,
+                    "value": lambda: self.constants.nvram_write,
                     "variable": "nvram_write",
                     "description": [
                         "Allow OpenCore to write to NVRAM.",
@@ -451,7 +495,7 @@ class SettingsFrame(wx.Frame):
 
                 "3rd Party NVMe PM": {
                     "type": "checkbox",
-                    "value": self.constants.allow_nvme_fixing,
+                    "value": lambda: self.constants.allow_nvme_fixing,
                     "variable": "allow_nvme_fixing",
                     "description": [
                         "Enable non-stock NVMe power",
@@ -460,17 +504,17 @@ class SettingsFrame(wx.Frame):
                 },
                 "3rd Party SATA PM": {
                     "type": "checkbox",
-                    "value": self.constants.allow_3rd_party_drives,
+                    "value": lambda: self.constants.allow_3rd_party_drives,
                     "variable": "allow_3rd_party_drives",
                     "description": [
                         "Enable non-stock SATA power",
                         "management in macOS.",
                     ],
-                    "condition": not bool(self.constants.computer.third_party_sata_ssd is False and not self.constants.custom_model)
+                    "condition": lambda: not bool(self.constants.computer.third_party_sata_ssd is False and not self.constants.custom_model)
                 },
                 "APFS Trim": {
                     "type": "checkbox",
-                    "value": self.constants.apfs_trim_timeout,
+                    "value": lambda: self.constants.apfs_trim_timeout,
                     "variable": "apfs_trim_timeout",
                     "description": [
                         "Recommended for all users, however faulty",
@@ -484,7 +528,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable Firmware Throttling": {
                     "type": "checkbox",
-                    "value": self.constants.disable_fw_throttle,
+                    "value": lambda: self.constants.disable_fw_throttle,
                     "variable": "disable_fw_throttle",
                     "description": [
                         "Disables firmware-based throttling",
@@ -494,7 +538,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Software DeMUX": {
                     "type": "checkbox",
-                    "value": self.constants.software_demux,
+                    "value": lambda: self.constants.software_demux,
                     "variable": "software_demux",
                     "description": [
                         "Enable software based DeMUX",
@@ -504,7 +548,7 @@ class SettingsFrame(wx.Frame):
                         "'gpu-power-prefs'.",
                     ],
                     "warning": "This settings requires 'gpu-power-prefs' NVRAM argument to be set to '1'.\n\nIf missing and this option is toggled, the system will not boot\n\nFull command:\nnvram FA4CE28D-B62F-4C99-9CC3-6815686E30F9:gpu-power-prefs=%01%00%00%00",
-                    "condition": not bool((not self.constants.custom_model and self.constants.computer.real_model not in ["MacBookPro8,2", "MacBookPro8,3"]) or (self.constants.custom_model and self.constants.custom_model not in ["MacBookPro8,2", "MacBookPro8,3"]))
+                    "condition": lambda: not bool((not self.constants.custom_model and self.constants.computer.real_model not in ["MacBookPro8,2", "MacBookPro8,3"]) or (self.constants.custom_model and self.constants.custom_model not in ["MacBookPro8,2", "MacBookPro8,3"]))
                 },
                 "wrap_around 1": {
                     "type": "wrap_around",
@@ -516,7 +560,7 @@ class SettingsFrame(wx.Frame):
                         "Partial",
                         "Disabled",
                     ],
-                    "value": "Enabled",
+                    "value": lambda: self._get_fu_selection(),
                     "variable": "",
                     "description": [
                         "Configure FeatureUnlock level.",
@@ -531,7 +575,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Hibernation Work-around": {
                     "type": "checkbox",
-                    "value": self.constants.disable_connectdrivers,
+                    "value": lambda: self.constants.disable_connectdrivers,
                     "variable": "disable_connectdrivers",
                     "description": [
                         "Only load minimum EFI drivers",
@@ -545,23 +589,23 @@ class SettingsFrame(wx.Frame):
                 },
                 "AMD GOP Injection": {
                     "type": "checkbox",
-                    "value": self.constants.amd_gop_injection,
+                    "value": lambda: self.constants.amd_gop_injection,
                     "variable": "amd_gop_injection",
                     "description": [
                         "Inject AMD GOP for boot screen",
                         "support on PC GPUs.",
                     ],
-                    "condition": not bool((not self.constants.custom_model and self.constants.computer.real_model not in socketed_gpu_models) or (self.constants.custom_model and self.constants.custom_model not in socketed_gpu_models))
+                    "condition": lambda: not bool((not self.constants.custom_model and self.constants.computer.real_model not in socketed_gpu_models) or (self.constants.custom_model and self.constants.custom_model not in socketed_gpu_models))
                 },
                 "Nvidia GOP Injection": {
                     "type": "checkbox",
-                    "value": self.constants.nvidia_kepler_gop_injection,
+                    "value": lambda: self.constants.nvidia_kepler_gop_injection,
                     "variable": "nvidia_kepler_gop_injection",
                     "description": [
                         "Inject Nvidia Kepler GOP for boot",
                         "screen support on PC GPUs.",
                     ],
-                    "condition": not bool((not self.constants.custom_model and self.constants.computer.real_model not in socketed_gpu_models) or (self.constants.custom_model and self.constants.custom_model not in socketed_gpu_models))
+                    "condition": lambda: not bool((not self.constants.custom_model and self.constants.computer.real_model not in socketed_gpu_models) or (self.constants.custom_model and self.constants.custom_model not in socketed_gpu_models))
                 },
                 "wrap_around 2": {
                     "type": "wrap_around",
@@ -576,13 +620,13 @@ class SettingsFrame(wx.Frame):
                         "AMD Lexa",
                         "AMD Navi",
                     ],
-                    "value": "None",
+                    "value": lambda: f"{self.constants.imac_vendor} {self.constants.imac_model}".strip(),
                     "variable": "",
                     "description": [
                         "Override detected/assumed GPU on",
                         "socketed MXM-based iMacs.",
                     ],
-                    "condition": bool((not self.constants.custom_model and self.constants.computer.real_model in socketed_imac_models) or (self.constants.custom_model and self.constants.custom_model in socketed_imac_models))
+                    "condition": lambda: bool((not self.constants.custom_model and self.constants.computer.real_model in socketed_imac_models) or (self.constants.custom_model and self.constants.custom_model in socketed_imac_models))
                 },
                 "Populate Graphics Override": {
                     "type": "populate",
@@ -597,7 +641,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable Library Validation": {
                     "type": "checkbox",
-                    "value": self.constants.disable_cs_lv,
+                    "value": lambda: self.constants.disable_cs_lv,
                     "variable": "disable_cs_lv",
                     "description": [
                         "Required for loading modified",
@@ -606,7 +650,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable AMFI": {
                     "type": "checkbox",
-                    "value": self.constants.disable_amfi,
+                    "value": lambda: self.constants.disable_amfi,
                     "variable": "disable_amfi",
                     "description": [
                         "Extended version of 'Disable",
@@ -620,7 +664,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Secure Boot Model": {
                     "type": "checkbox",
-                    "value": self.constants.secure_status,
+                    "value": lambda: self.constants.secure_status,
                     "variable": "secure_status",
                     "description": [
                         "Set Apple Secure Boot Model Identifier",
@@ -635,6 +679,8 @@ class SettingsFrame(wx.Frame):
                     "type": "populate",
                     "function": self._populate_sip_settings,
                     "args": wx.Frame,
+                    "value": lambda: self._get_configured_sip_value(),
+                    "update_function": self._update_sip_settings,
                 },
             },
             "SMBIOS": {
@@ -649,7 +695,7 @@ class SettingsFrame(wx.Frame):
                         "Moderate",
                         "Advanced",
                     ],
-                    "value": self.constants.serial_settings,
+                    "value": lambda: self.constants.serial_settings,
                     "variable": "serial_settings",
                     "description": [
                         "Supported Levels:",
@@ -663,7 +709,7 @@ class SettingsFrame(wx.Frame):
                 "SMBIOS Spoof Model": {
                     "type": "choice",
                     "choices": models + ["Default"],
-                    "value": self.constants.override_smbios,
+                    "value": lambda: self.constants.override_smbios,
                     "variable": "override_smbios",
                     "description": [
                         "Set Mac Model to spoof to.",
@@ -675,7 +721,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Allow spoofing native Macs": {
                     "type": "checkbox",
-                    "value": self.constants.allow_native_spoofs,
+                    "value": lambda: self.constants.allow_native_spoofs,
                     "variable": "allow_native_spoofs",
                     "description": [
                         "Allow OpenCore to spoof natively",
@@ -691,6 +737,8 @@ class SettingsFrame(wx.Frame):
                     "type": "populate",
                     "function": self._populate_serial_spoofing_settings,
                     "args": wx.Frame,
+                    "value": lambda: (self.constants.custom_serial_number, self.constants.custom_board_serial_number, self.constants.custom_model or self.constants.computer.real_model),
+                    "update_function": self._update_serial_spoofing_settings,
                 },
             },
             "Root Patching": {
@@ -699,7 +747,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "TeraScale 2 Acceleration": {
                     "type": "checkbox",
-                    "value": global_settings.GlobalEnviromentSettings().read_property("MacBookPro_TeraScale_2_Accel") or self.constants.allow_ts2_accel,
+                    "value": lambda: global_settings.GlobalEnviromentSettings().read_property("MacBookPro_TeraScale_2_Accel") or self.constants.allow_ts2_accel,
                     "variable": "MacBookPro_TeraScale_2_Accel",
                     "constants_variable": "allow_ts2_accel",
                     "description": [
@@ -710,7 +758,7 @@ class SettingsFrame(wx.Frame):
                         "common GPU failures on these models.",
                     ],
                     "override_function": self._update_global_settings,
-                    "condition": not bool(self.constants.computer.real_model not in ["MacBookPro8,2", "MacBookPro8,3"])
+                    "condition": lambda: not bool(self.constants.computer.real_model not in ["MacBookPro8,2", "MacBookPro8,3"])
                 },
                 "wrap_around 1": {
                     "type": "wrap_around",
@@ -723,7 +771,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Dark Menu Bar": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Moraea_DarkMenuBar"),
+                    "value": lambda: self._get_system_settings("Moraea_DarkMenuBar"),
                     "variable": "Moraea_DarkMenuBar",
                     "description": [
                         "If Beta Menu Bar is enabled,",
@@ -731,35 +779,35 @@ class SettingsFrame(wx.Frame):
                         "change as needed.",
                     ],
                     "override_function": self._update_system_defaults,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
                 },
                 "Beta Blur": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Moraea_BlurBeta"),
+                    "value": lambda: self._get_system_settings("Moraea_BlurBeta"),
                     "variable": "Moraea_BlurBeta",
                     "description": [
                         "Control window blur behaviour.",
                     ],
                     "override_function": self._update_system_defaults,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
 
                 },
                 "Beach Ball Cursor Workaround": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Moraea.EnableSpinHack"),
+                    "value": lambda: self._get_system_settings("Moraea.EnableSpinHack"),
                     "variable": "Moraea.EnableSpinHack",
                     "description": [
                         "Control beach ball cursor behaviour.",
                     ],
                     "override_function": self._update_system_defaults_root,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
                 },
                 "wrap_around 2": {
                     "type": "wrap_around",
                 },
                 "Beta Menu Bar": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Amy.MenuBar2Beta"),
+                    "value": lambda: self._get_system_settings("Amy.MenuBar2Beta"),
                     "variable": "Amy.MenuBar2Beta",
                     "description": [
                         "Supports dynamic colour changes.",
@@ -768,27 +816,27 @@ class SettingsFrame(wx.Frame):
                         "disable this setting.",
                     ],
                     "override_function": self._update_system_defaults,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
                 },
                 "Disable Beta Rim": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Moraea_RimBetaDisabled"),
+                    "value": lambda: self._get_system_settings("Moraea_RimBetaDisabled"),
                     "variable": "Moraea_RimBetaDisabled",
                     "description": [
                         "Control Window Rim rendering.",
                     ],
                     "override_function": self._update_system_defaults,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
                 },
                 "Disable Color Widgets Enforcement": {
                     "type": "checkbox",
-                    "value": self._get_system_settings("Moraea_ColorWidgetDisabled"),
+                    "value": lambda: self._get_system_settings("Moraea_ColorWidgetDisabled"),
                     "variable": "Moraea_ColorWidgetDisabled",
                     "description": [
                         "Control Color Desktop Widgets Enforcement.",
                     ],
                     "override_function": self._update_system_defaults,
-                    "condition": gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
+                    "condition": lambda: gui_support.CheckProperties(self.constants).host_is_non_metal(general_check=True)
                 },
             },
             "App": {
@@ -797,7 +845,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Allow native models": {
                     "type": "checkbox",
-                    "value": self.constants.allow_oc_everywhere,
+                    "value": lambda: self.constants.allow_oc_everywhere,
                     "variable": "allow_oc_everywhere",
                     "description": [
                         "Allow OpenCore to be installed",
@@ -810,7 +858,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Ignore App Updates": {
                     "type": "checkbox",
-                    "value": global_settings.GlobalEnviromentSettings().read_property("IgnoreAppUpdates") or self.constants.ignore_updates,
+                    "value": lambda: global_settings.GlobalEnviromentSettings().read_property("IgnoreAppUpdates") or self.constants.ignore_updates,
                     "variable": "IgnoreAppUpdates",
                     "constants_variable": "ignore_updates",
                     "description": [
@@ -823,7 +871,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Disable Reporting": {
                     "type": "checkbox",
-                    "value": global_settings.GlobalEnviromentSettings().read_property("DisableCrashAndAnalyticsReporting"),
+                    "value": lambda: global_settings.GlobalEnviromentSettings().read_property("DisableCrashAndAnalyticsReporting"),
                     "variable": "DisableCrashAndAnalyticsReporting",
                     "description": [
                         "When enabled, patcher will not",
@@ -833,7 +881,7 @@ class SettingsFrame(wx.Frame):
                 },
                 "Remove Unused KDKs": {
                     "type": "checkbox",
-                    "value": global_settings.GlobalEnviromentSettings().read_property("ShouldNukeKDKs") or self.constants.should_nuke_kdks,
+                    "value": lambda: global_settings.GlobalEnviromentSettings().read_property("ShouldNukeKDKs") or self.constants.should_nuke_kdks,
                     "variable": "ShouldNukeKDKs",
                     "constants_variable": "should_nuke_kdks",
                     "description": [
@@ -915,9 +963,26 @@ class SettingsFrame(wx.Frame):
         Sets model to use for patching.
         """
 
+        start_time = time.perf_counter()
+
         selection = model_choice.GetStringSelection()
+        changed = self.view_model.apply(lambda: self._set_model(selection))
+        for (tab, label), state in changed.items():
+            self._update_control(tab, label, state)
+
         if selection == "Host Model":
             selection = self.constants.computer.real_model
+        else:
+            self.parent.build_button.Enable()
+
+        self.parent.model_label.SetLabel(f"Model: {selection}")
+        self.parent.model_label.Centre(wx.HORIZONTAL)
+
+        logging.info(f"- Updated {len(changed)} settings for {selection} in {(time.perf_counter() - start_time) * 1000:.1f}ms")
+
+
+    def _set_model(self, selection: str) -> None:
+        if selection == "Host Model":
             self.constants.custom_model = None
             logging.info(f"Using Real Model: {self.constants.computer.real_model}")
             defaults.GenerateDefaults(self.constants.computer.real_model, True, self.constants)
@@ -925,20 +990,6 @@ class SettingsFrame(wx.Frame):
             logging.info(f"Using Custom Model: {selection}")
             self.constants.custom_model = selection
             defaults.GenerateDefaults(self.constants.custom_model, False, self.constants)
-            self.parent.build_button.Enable()
-
-
-
-        self.parent.model_label.SetLabel(f"Model: {selection}")
-        self.parent.model_label.Centre(wx.HORIZONTAL)
-
-        self.frame_modal.Destroy()
-        SettingsFrame(
-            parent=self.parent,
-            title=self.title,
-            global_constants=self.constants,
-            screen_location=self.parent.GetPosition()
-        )
 
 
     def _populate_sip_settings(self, panel: wx.Frame) -> None:
@@ -967,18 +1018,12 @@ class SettingsFrame(wx.Frame):
         sip_csr_h.SetVisitedColour(self.hyperlink_colour)
 
         # Label: SIP Status
-        if self.constants.custom_sip_value is not None:
-            self.sip_value = int(self.constants.custom_sip_value, 16)
-        elif self.constants.sip_status is True:
-            self.sip_value = 0x00
-        else:
-            self.sip_value = 0x803
-        sip_configured_label = wx.StaticText(panel, label=f"Currently configured SIP: {hex(self.sip_value)}", pos=(sip_label.GetPosition()[0] + 35, sip_label.GetPosition()[1] + 20))
+        sip_configured_label = wx.StaticText(panel, label="Currently configured SIP: 0x0", pos=(sip_label.GetPosition()[0] + 35, sip_label.GetPosition()[1] + 20))
         sip_configured_label.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_BOLD))
         self.sip_configured_label = sip_configured_label
 
         # Label: SIP Status
-        sip_booted_label = wx.StaticText(panel, label=f"Currently booted SIP: {hex(py_sip_xnu.SipXnu().get_sip_status().value)}", pos=(sip_configured_label.GetPosition()[0], sip_configured_label.GetPosition()[1] + 20))
+        sip_booted_label = wx.StaticText(panel, label=f"Currently booted SIP: {hex(BootState.current().sip_status)}", pos=(sip_configured_label.GetPosition()[0], sip_configured_label.GetPosition()[1] + 20))
         sip_booted_label.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
 
 
@@ -987,13 +1032,13 @@ class SettingsFrame(wx.Frame):
         horizontal_spacer = 15
         vertical_spacer = 25
         index = 1
+        self.sip_checkboxes = {}
         for sip_bit in sip_data.system_integrity_protection.csr_values_extended:
             self.sip_checkbox = wx.CheckBox(panel, label=sip_data.system_integrity_protection.csr_values_extended[sip_bit]["name"].split("CSR_")[1], pos = (vertical_spacer, sip_booted_label.GetPosition()[1] + 20 + horizontal_spacer))
             self.sip_checkbox.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
             self.sip_checkbox.SetToolTip(f'Description: {sip_data.system_integrity_protection.csr_values_extended[sip_bit]["description"]}\nValue: {hex(sip_data.system_integrity_protection.csr_values_extended[sip_bit]["value"])}\nIntroduced in: macOS {sip_data.system_integrity_protection.csr_values_extended[sip_bit]["introduced_friendly"]}')
 
-            if self.sip_value & sip_data.system_integrity_protection.csr_values_extended[sip_bit]["value"] == sip_data.system_integrity_protection.csr_values_extended[sip_bit]["value"]:
-                self.sip_checkbox.SetValue(True)
+            self.sip_checkboxes[sip_bit] = self.sip_checkbox
 
             horizontal_spacer += 20
             if index == entries_per_row:
@@ -1004,6 +1049,22 @@ class SettingsFrame(wx.Frame):
             self.sip_checkbox.Bind(wx.EVT_CHECKBOX, self.on_sip_value)
 
 
+    def _get_configured_sip_value(self) -> int:
+        if self.constants.custom_sip_value is not None:
+            return int(self.constants.custom_sip_value, 16)
+        if self.constants.sip_status is True:
+            return 0x00
+        return 0x803
+
+
+    def _update_sip_settings(self, sip_value: int) -> None:
+        self.sip_value = sip_value
+        self.sip_configured_label.SetLabel(f"Currently configured SIP: {hex(self.sip_value)}")
+        for sip_bit, checkbox in self.sip_checkboxes.items():
+            bit_value = sip_data.system_integrity_protection.csr_values_extended[sip_bit]["value"]
+            checkbox.SetValue(self.sip_value & bit_value == bit_value)
+
+
     def _populate_serial_spoofing_settings(self, panel: wx.Frame) -> None:
         title: wx.StaticText = None
         for child in panel.GetChildren():
@@ -1020,7 +1081,6 @@ class SettingsFrame(wx.Frame):
         custom_serial_number_textbox.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
         custom_serial_number_textbox.SetToolTip("Enter a custom serial number here. This will be used for the SMBIOS and iMessage.\n\nNote: This will not be used if the \"Use Custom Serial Number\" checkbox is not checked.")
         custom_serial_number_textbox.Bind(wx.EVT_TEXT, self.on_custom_serial_number_textbox)
-        custom_serial_number_textbox.SetValue(self.constants.custom_serial_number)
         self.custom_serial_number_textbox = custom_serial_number_textbox
 
         # Label: Custom Board Serial Number
@@ -1032,13 +1092,22 @@ class SettingsFrame(wx.Frame):
         custom_board_serial_number_textbox.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
         custom_board_serial_number_textbox.SetToolTip("Enter a custom board serial number here. This will be used for the SMBIOS and iMessage.\n\nNote: This will not be used if the \"Use Custom Board Serial Number\" checkbox is not checked.")
         custom_board_serial_number_textbox.Bind(wx.EVT_TEXT, self.on_custom_board_serial_number_textbox)
-        custom_board_serial_number_textbox.SetValue(self.constants.custom_board_serial_number)
         self.custom_board_serial_number_textbox = custom_board_serial_number_textbox
 
         # Button: Generate Serial Number (below)
-        generate_serial_number_button = wx.Button(panel, label=f"Generate S/N: {self.constants.custom_model or self.constants.computer.real_model}", pos=(title.GetPosition()[0] - 30, custom_board_serial_number_label.GetPosition()[1] + 60), size=(200, 25))
+        generate_serial_number_button = wx.Button(panel, label="Generate S/N", pos=(title.GetPosition()[0] - 30, custom_board_serial_number_label.GetPosition()[1] + 60), size=(200, 25))
         generate_serial_number_button.SetFont(gui_support.font_factory(13, wx.FONTWEIGHT_NORMAL))
         generate_serial_number_button.Bind(wx.EVT_BUTTON, self.on_generate_serial_number)
+        self.generate_serial_number_button = generate_serial_number_button
+
+
+    def _update_serial_spoofing_settings(self, value: tuple) -> None:
+        serial_number, board_serial_number, model = value
+        if self.custom_serial_number_textbox.GetValue() != serial_number:
+            self.custom_serial_number_textbox.SetValue(serial_number)
+        if self.custom_board_serial_number_textbox.GetValue() != board_serial_number:
+            self.custom_board_serial_number_textbox.SetValue(board_serial_number)
+        self.generate_serial_number_button.SetLabel(f"Generate S/N: {model}")
 
 
     def _populate_app_stats(self, panel: wx.Frame) -> None:
@@ -1113,12 +1182,7 @@ Hardware Information:
 
 
     def _update_setting(self, variable, value):
-        logging.info(f"Updating Local Setting: {variable} = {value}")
-        setattr(self.constants, variable, value)
-        tmp_value = value
-        if tmp_value is None:
-            tmp_value = "PYTHON_NONE_VALUE"
-        global_settings.GlobalEnviromentSettings().write_property(f"GUI:{variable}", tmp_value)
+        gui_settings_model.update_setting(self.constants, variable, value)
 
 
     def _update_global_settings(self, variable, value, global_setting = None):
@@ -1141,6 +1205,7 @@ Hardware Information:
             value_type = "-bool"
 
         logging.info(f"Updating System Defaults: {variable} = {value} ({value_type})")
+        self.system_settings[variable] = value
         subprocess.run(["/usr/bin/defaults", "write", "-globalDomain", variable, value_type, str(value)])
 
 
@@ -1154,6 +1219,7 @@ Hardware Information:
             value_type = "-bool"
 
         logging.info(f"Updating System Defaults (root): {variable} = {value} ({value_type})")
+        self.system_settings[variable] = value
         subprocess_wrapper.run_as_root(["/usr/bin/defaults", "write", "/Library/Preferences/.GlobalPreferences.plist", variable, value_type, str(value)])
 
 
@@ -1228,12 +1294,14 @@ Hardware Information:
                 break
 
         gpu_combo_box.Bind(wx.EVT_CHOICE, self.fu_selection_click)
+
+
+    def _get_fu_selection(self) -> str:
         if self.constants.fu_status is False:
-            gpu_combo_box.SetStringSelection("Disabled")
-        elif self.constants.fu_arguments is None or self.constants.fu_arguments == "":
-            gpu_combo_box.SetStringSelection("Enabled")
-        else:
-            gpu_combo_box.SetStringSelection("Partial")
+            return "Disabled"
+        if self.constants.fu_arguments is None or self.constants.fu_arguments == "":
+            return "Enabled"
+        return "Partial"
 
 
     def fu_selection_click(self, event: wx.Event) -> None:
@@ -1273,12 +1341,6 @@ Hardware Information:
                 break
 
         gpu_combo_box.Bind(wx.EVT_CHOICE, self.gpu_selection_click)
-        gpu_combo_box.SetStringSelection(f"{self.constants.imac_vendor} {self.constants.imac_model}")
-
-        socketed_gpu_models = ["iMac9,1", "iMac10,1", "iMac11,1", "iMac11,2", "iMac11,3", "iMac12,1", "iMac12,2"]
-        if ((not self.constants.custom_model and self.constants.computer.real_model not in socketed_gpu_models) or (self.constants.custom_model and self.constants.custom_model not in socketed_gpu_models)):
-            gpu_combo_box.Disable()
-            return
 
 
     def gpu_selection_click(self, event: wx.Event) -> None:
@@ -1321,13 +1383,17 @@ Hardware Information:
 
 
     def _get_system_settings(self, variable) -> bool:
+        if variable in self.system_settings:
+            return self.system_settings[variable]
+
+        self.system_settings[variable] = False
         result = subprocess.run(["/usr/bin/defaults", "read", "-globalDomain", variable], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         if result.returncode == 0:
             try:
-                return bool(int(result.stdout.decode().strip()))
+                self.system_settings[variable] = bool(int(result.stdout.decode().strip()))
             except:
-                return False
-        return False
+                pass
+        return self.system_settings[variable]
 
 
     def on_return(self, event):
@@ -0,0 +1,149 @@
+"""
+gui_settings_model.py: View-model of the Settings Frame
+
+Controls of the Settings Frame bind to entries of SettingsFrame._settings().
+An entry's "value" and "condition" are either static, or bindings: callables
+re-evaluated whenever the settings behind them may have changed (ie. after
+switching target model). The view-model evaluates the entries of the tabs
+built so far, and reports the controls whose state changed, so only their
+widgets are updated.
+
+Does not depend on wx, the view-model can be driven headless.
+
+Usage:
+    >>> from oclp_r.wx_gui import gui_settings_model
+    >>> view_model = gui_settings_model.SettingsViewModel(settings)
+    >>> view_model.attach("Build")
+    {('Build', 'FireWire Booting'): ControlState(value=False, enabled=True), ...}
+    >>> view_model.apply(lambda: defaults.GenerateDefaults("MacPro3,1", False, constants))
+    {('Build', 'MacPro3,1/Xserve2,1 Workaround'): ControlState(value=True, enabled=True)}
+    >>> gui_settings_model.update_setting(constants, "verbose_debug", True)
+    >>> view_model.refresh()
+    {('Build', 'Verbose'): ControlState(value=True, enabled=True)}
+"""
+
+import logging
+
+from dataclasses import dataclass
+
+from .. import constants
+
+from ..support import global_settings
+
+
+# Entry types backed by a control, populate entries only when they declare a "value"
+BOUND_TYPES: list = ["checkbox", "spinctrl", "choice", "populate"]
+
+
+@dataclass(frozen=True)
+class ControlState:
+    """
+    State a control displays
+    """
+
+    value:   object
+    enabled: bool = True
+
+
+def _evaluate(binding):
+    return binding() if callable(binding) else binding
+
+
+def update_setting(global_constants: constants.Constants, variable: str, value) -> None:
+    """
+    Set a field edited through a control, and persist it as 'GUI:<variable>'
+
+    Persisted fields are restored on host builds by defaults.py's "Saved Settings" rule
+
+    Parameters:
+        global_constants (Constants): Settings behind the controls
+        variable         (str):       Constants field
+        value            (object):    New value, None is saved as 'PYTHON_NONE_VALUE'
+    """
+    logging.info(f"Updating Local Setting: {variable} = {value}")
+    setattr(global_constants, variable, value)
+    global_settings.GlobalEnviromentSettings().write_property(f"GUI:{variable}", "PYTHON_NONE_VALUE" if value is None else value)
+
+
+class SettingsViewModel:
+    """
+    Evaluated state of the Settings Frame's controls, per (tab, label)
+    """
+
+    def __init__(self, settings: dict) -> None:
+        """
+        Parameters:
+            settings (dict): Tab -> label -> entry, see SettingsFrame._settings()
+        """
+        self.settings: dict = settings
+        self.states:   dict = {}  # (tab, label) -> ControlState of attached controls
+
+
+    def is_bound(self, tab: str, label: str) -> bool:
+        entry = self.settings[tab][label]
+        if entry["type"] not in BOUND_TYPES:
+            return False
+        return entry["type"] != "populate" or "value" in entry
+
+
+    def evaluate(self, tab: str, label: str) -> ControlState:
+        """
+        Current state of an entry's control
+        """
+        entry = self.settings[tab][label]
+        value = _evaluate(entry.get("value"))
+        enabled = bool(_evaluate(entry.get("condition", True)))
+
+        if entry["type"] == "checkbox":
+            try:
+                value = bool(value)
+            except ValueError:
+                logging.error(f"Invalid value for {label}, got {value} (type: {type(value)})")
+                value = False
+            if enabled is False:
+                value = False
+
+        return ControlState(value, enabled)
+
+
+    def attach(self, tab: str) -> dict:
+        """
+        Start tracking a tab's controls, once they are built
+
+        Returns:
+            dict: (tab, label) -> ControlState to build them with
+        """
+        states = {(tab, label): self.evaluate(tab, label) for label in self.settings[tab] if self.is_bound(tab, label)}
+        self.states.update(states)
+        return states
+
+
+    def refresh(self) -> dict:
+        """
+        Re-evaluate attached controls
+
+        Returns:
+            dict: (tab, label) -> ControlState, of controls whose state changed since last evaluated
+        """
+        changed = {}
+        for key, state in self.states.items():
+            new_state = self.evaluate(*key)
+            if new_state != state:
+                changed[key] = new_state
+        self.states.update(changed)
+        return changed
+
+
+    def apply(self, change: callable) -> dict:
+        """
+        Run a change to the settings behind the controls (ie. defaults.GenerateDefaults())
+
+        Controls write their own edits to the settings, so states are refreshed
+        beforehand, and only what the change itself did is reported
+
+        Returns:
+            dict: (tab, label) -> ControlState, of controls to update
+        """
+        self.refresh()
+        change()
+        return self.refresh()